@@ -1,18 +1,22 @@
 from fastapi import FastAPI, File, UploadFile, HTTPException, Form, Depends
+from fastapi.responses import StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from src.middleware import SecurityHeadersMiddleware, RateLimitMiddleware, RequestLoggingMiddleware
 import uvicorn
 import os
 import logging
 from dotenv import load_dotenv
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict
 from pydantic import BaseModel
 import time
+import json
 from google.api_core import exceptions as GoogleAPIErrors
 from src.services.model_registry import (
     get_available_pdf_models,
 )
+from src.services.local_llm import LOCAL_LLM_ENABLED
 from src.services.llm_service import (
+    stream_pdf_summary,
     summarize_pdf_auto,
 )
 
@@ -204,6 +208,188 @@ async def list_models():
         )
 
 
+async def _save_pdf_summary(
+    current_user: User,
+    filename: str,
+    content_bytes: bytes,
+    result: Dict[str, Any],
+    provider: str,
+    model_id: str,
+    title: Optional[str],
+    description: Optional[str],
+    start_time: float,
+) -> Dict[str, str]:
+    """Encrypts and saves an uploaded PDF and its summary, and logs the audit entries.
+
+    The summary is credited to the model that wrote it (result['generated_by']),
+    which is not the requested one when a backup model answered (see llm_failover).
+
+    Returns:
+        The ids of the created health record, summary and document.
+    """
+    file_size = len(content_bytes)
+    summary = result["summary"]
+    generated_by = result["generated_by"]
+    answered_provider, _, answered_model = generated_by.partition(":")
+    requested = f"{provider}:{model_id}"
+
+    from src.services.database_service import get_database
+    from src.services.security.encryption import encryption_service
+    from src.services.security.audit import audit_service, AuditAction
+    from src.models.file_ingestion import RecordType, ProcessingStatus
+
+    db = get_database()
+
+    # Encrypt PDF content
+    encrypted_pdf = encryption_service.encrypt_bytes(content_bytes, "health_record")
+
+    # Create health record for the PDF
+    record_title = title or f"PDF Summary - {filename}"
+    health_record = await db.healthrecord.create({
+        "data": {
+            "userId": current_user.id,
+            "recordType": RecordType.OTHER.value,
+            "title": record_title,
+            "description": description,
+            "encryptedData": encrypted_pdf["ciphertext"],
+            "encryptionIv": encrypted_pdf["iv"],
+            "encryptionSalt": encrypted_pdf["salt"],
+            "status": ProcessingStatus.COMPLETED.value,
+            "metadata": {
+                "originalFilename": filename,
+                "fileSize": file_size,
+                "contentType": "application/pdf",
+                "processing": {
+                    "provider": answered_provider,
+                    "model": answered_model,
+                    "models": result["models"],
+                    "requestedModel": requested,
+                    "processingTime": time.time() - start_time
+                }
+            }
+        }
+    })
+
+    # Create document reference
+    document = await db.document.create({
+        "data": {
+            "healthRecordId": health_record.id,
+            "fileName": filename,
+            "fileType": "application/pdf",
+            "fileSize": file_size,
+            "uploadedBy": current_user.id,
+            "storageUrl": f"encrypted:{health_record.id}",
+        }
+    })
+
+    # Encrypt and save summary
+    encrypted_summary = encryption_service.encrypt(summary, "summary")
+    summary_record = await db.summary.create({
+        "data": {
+            "healthRecordId": health_record.id,
+            "type": "PDF_SUMMARY",
+            "encryptedContent": encrypted_summary["ciphertext"],
+            "encryptionIv": encrypted_summary["iv"], 
+            "encryptionSalt": encrypted_summary["salt"],
+            "generatedBy": generated_by,
+            "metadata": {
+                "provider": answered_provider,
+                "model": answered_model,
+                "models": result["models"],
+                "requestedModel": requested,
+                "processingTime": time.time() - start_time,
+                "originalFilename": filename
+            }
+        }
+    })
+
+    # Log audit entries
+    await audit_service.log_activity(
+        user_id=current_user.id,
+        action=AuditAction.CREATE.value,
+        resource_type="HealthRecord",
+        resource_id=health_record.id,
+        details={
+            "filename": filename,
+            "record_type": RecordType.OTHER.value,
+            "action": "pdf_upload_and_summarization"
+        }
+    )
+
+    await audit_service.log_activity(
+        user_id=current_user.id,
+        action=AuditAction.CREATE.value,
+        resource_type="Summary",
+        resource_id=summary_record.id,
+        details={
+            "type": "PDF_SUMMARY",
+            "provider": answered_provider,
+            "model": answered_model,
+            "health_record_id": health_record.id
+        }
+    )
+
+    return {
+        "health_record_id": health_record.id,
+        "summary_id": summary_record.id,
+        "document_id": document.id,
+    }
+
+
+def _sse_event(event: str, data: dict) -> str:
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _stream_pdf_summary_events(
+    events,
+    first_event: dict,
+    current_user: User,
+    filename: str,
+    content_bytes: bytes,
+    provider: str,
+    model_id: str,
+    title: Optional[str],
+    description: Optional[str],
+    start_time: float,
+):
+    """Forwards summary events as SSE, then saves the complete summary and reports the record ids.
+
+    The events generator is always closed, including when the client disconnects mid-stream.
+    """
+    try:
+        yield _sse_event(first_event["event"], first_event)
+        result = None
+        async for event in events:
+            if event["event"] == "end":
+                result = event
+                yield _sse_event("end", {
+                    "event": "end",
+                    "length": len(event["summary"]),
+                    "generated_by": event["generated_by"],
+                    "models": event["models"],
+                })
+            else:
+                yield _sse_event(event["event"], event)
+        record_ids = await _save_pdf_summary(
+            current_user, filename, content_bytes, result, provider, model_id, title, description, start_time
+        )
+        processing_time = time.time() - start_time
+        logger.info(
+            f"Successfully streamed and saved the summary of {filename} in {processing_time:.2f} seconds using {result['generated_by']}."
+        )
+        yield _sse_event("saved", {"event": "saved", **record_ids, "processing_time": processing_time})
+    except HTTPException as http_exc:
+        logger.error(f"HTTPException during streamed summarization for {filename}: {http_exc.detail}")
+        yield _sse_event("error", {"event": "error", "status_code": http_exc.status_code, "detail": http_exc.detail})
+    except Exception as e:
+        logger.critical(f"Unexpected error during streamed summarization for {filename}: {e}", exc_info=True)
+        yield _sse_event("error", {"event": "error", "status_code": 500, "detail": "An unexpected error occurred during summarization."})
+    finally:
+        # Closes the provider stream and frees its dispatch slot right away when the client disconnects
+        await events.aclose()
+
+
 @app.post("/summarize-pdf/")
 async def summarize_pdf(
     provider: str = Form(...), 
@@ -211,16 +397,22 @@ async def summarize_pdf(
     file: UploadFile = File(...),
     title: str = Form(None),
     description: str = Form(None),
+    stream: bool = Form(False),
     current_user: User = Depends(get_current_user)
 ):
-    """Receives a PDF file, provider, and model ID, returns a summary and saves to database."""
+    """Receives a PDF file, provider, and model ID, returns a summary and saves to database.
+
+    With stream=true, the summary is sent as Server-Sent Events while it is generated
+    ('start', 'delta' and 'end', see llm_service.stream_pdf_summary), and the records
+    are saved once it is complete ('saved' event with their ids, or 'error').
+    """
     start_time = time.time()
     logger.info(
         f"Received PDF summarization request for file: {file.filename}, provider: {provider}, model: {model_id}, user: {current_user.id}"
     )
 
-    # Basic validation
-    if provider not in ["openai", "google", "anthropic"]:
+    # Basic validation (the local mock provider only when enabled, for load tests)
+    if provider not in ["openai", "google", "anthropic"] + (["local"] if LOCAL_LLM_ENABLED else []):
         logger.warning(f"Invalid provider specified: {provider}")
         raise HTTPException(
             status_code=400,
@@ -243,121 +435,43 @@ async def summarize_pdf(
         # Read file content for database storage
         await file.seek(0)  # Reset file pointer
         content_bytes = await file.read()
-        file_size = len(content_bytes)
-        
+
         # Reset file pointer for LLM processing
         await file.seek(0)
-        
+
+        if stream:
+            # Plan (and validate) the PDF before the response starts, so errors keep their status codes
+            events = stream_pdf_summary(provider, model_id, content_bytes, file.filename)
+            first_event = await events.__anext__()
+            return StreamingResponse(
+                _stream_pdf_summary_events(
+                    events, first_event, current_user, file.filename, content_bytes,
+                    provider, model_id, title, description, start_time,
+                ),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+            )
+
         # Call the refactored service function
-        summary = await summarize_pdf_auto(
+        result = await summarize_pdf_auto(
             provider=provider, model_id=model_id, pdf_file=file
         )
-        
-        # Save to database
-        from src.services.database_service import get_database
-        from src.services.security.encryption import encryption_service
-        from src.services.security.audit import audit_service, AuditAction
-        from src.models.file_ingestion import RecordType, ProcessingStatus
-        
-        db = get_database()
-        
-        # Encrypt PDF content
-        encrypted_pdf = encryption_service.encrypt_bytes(content_bytes, "health_record")
-        
-        # Create health record for the PDF
-        record_title = title or f"PDF Summary - {file.filename}"
-        health_record = await db.healthrecord.create({
-            "data": {
-                "userId": current_user.id,
-                "recordType": RecordType.OTHER.value,
-                "title": record_title,
-                "description": description,
-                "encryptedData": encrypted_pdf["ciphertext"],
-                "encryptionIv": encrypted_pdf["iv"],
-                "encryptionSalt": encrypted_pdf["salt"],
-                "status": ProcessingStatus.COMPLETED.value,
-                "metadata": {
-                    "originalFilename": file.filename,
-                    "fileSize": file_size,
-                    "contentType": "application/pdf",
-                    "processing": {
-                        "provider": provider,
-                        "model": model_id,
-                        "processingTime": time.time() - start_time
-                    }
-                }
-            }
-        })
-        
-        # Create document reference
-        document = await db.document.create({
-            "data": {
-                "healthRecordId": health_record.id,
-                "fileName": file.filename,
-                "fileType": "application/pdf",
-                "fileSize": file_size,
-                "uploadedBy": current_user.id,
-                "storageUrl": f"encrypted:{health_record.id}",
-            }
-        })
-        
-        # Encrypt and save summary
-        encrypted_summary = encryption_service.encrypt(summary, "summary")
-        summary_record = await db.summary.create({
-            "data": {
-                "healthRecordId": health_record.id,
-                "type": "PDF_SUMMARY",
-                "encryptedContent": encrypted_summary["ciphertext"],
-                "encryptionIv": encrypted_summary["iv"], 
-                "encryptionSalt": encrypted_summary["salt"],
-                "generatedBy": f"{provider}:{model_id}",
-                "metadata": {
-                    "provider": provider,
-                    "model": model_id,
-                    "processingTime": time.time() - start_time,
-                    "originalFilename": file.filename
-                }
-            }
-        })
-        
-        # Log audit entries
-        await audit_service.log_activity(
-            user_id=current_user.id,
-            action=AuditAction.CREATE.value,
-            resource_type="HealthRecord",
-            resource_id=health_record.id,
-            details={
-                "filename": file.filename,
-                "record_type": RecordType.OTHER.value,
-                "action": "pdf_upload_and_summarization"
-            }
-        )
-        
-        await audit_service.log_activity(
-            user_id=current_user.id,
-            action=AuditAction.CREATE.value,
-            resource_type="Summary",
-            resource_id=summary_record.id,
-            details={
-                "type": "PDF_SUMMARY",
-                "provider": provider,
-                "model": model_id,
-                "health_record_id": health_record.id
-            }
+
+        record_ids = await _save_pdf_summary(
+            current_user, file.filename, content_bytes, result, provider, model_id, title, description, start_time
         )
-        
+
         end_time = time.time()
         processing_time = end_time - start_time
         
         logger.info(
-            f"Successfully summarized and saved {file.filename} in {processing_time:.2f} seconds using {provider} model {model_id}. Records: {health_record.id}, Summary: {summary_record.id}"
+            f"Successfully summarized and saved {file.filename} in {processing_time:.2f} seconds using {result['generated_by']}. Records: {record_ids['health_record_id']}, Summary: {record_ids['summary_id']}"
         )
         
         return {
-            "summary": summary,
-            "health_record_id": health_record.id,
-            "summary_id": summary_record.id,
-            "document_id": document.id,
+            "summary": result["summary"],
+            "generated_by": result["generated_by"],
+            **record_ids,
             "processing_time": processing_time
         }
 
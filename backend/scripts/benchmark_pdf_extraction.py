@@ -0,0 +1,74 @@
+# /backend/scripts/benchmark_pdf_extraction.py
+"""
+Benchmarks the PDF text extraction backends in src/services/pdf_utils.py on a corpus of PDFs.
+
+For each backend, every PDF is analyzed with analyze_pdf_content() (extraction plus the
+text/image classification used by the media stage). The script reports throughput, the
+number of PDFs classified as text, and the PDFs the backends classify differently.
+
+Usage (from the root of the `backend` directory):
+    `python scripts/benchmark_pdf_extraction.py /path/to/Media --repeat 3`
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.pdf_utils import PDF_TEXT_BACKENDS, analyze_pdf_content  # noqa: E402
+
+
+def benchmark_backend(backend: str, pdfs: dict, repeat: int) -> dict:
+    """Analyzes every PDF `repeat` times; returns the best wall time per PDF and the classification."""
+    results = {}
+    for name, content in pdfs.items():
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            pdf_type, text = analyze_pdf_content(content, backend=backend)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        results[name] = {"seconds": best, "type": pdf_type, "chars": len(text or "")}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PDF text extraction backends.")
+    parser.add_argument("corpus_dir", help="Directory of PDFs (searched recursively).")
+    parser.add_argument("--backends", nargs="+", default=list(PDF_TEXT_BACKENDS), choices=list(PDF_TEXT_BACKENDS))
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per PDF; the fastest is reported.")
+    parser.add_argument("--limit", type=int, default=None, help="Only use the first N PDFs.")
+    args = parser.parse_args()
+
+    paths = sorted(p for p in Path(args.corpus_dir).rglob("*") if p.suffix.lower() == ".pdf")[: args.limit]
+    if not paths:
+        print(f"No PDFs found in {args.corpus_dir}")
+        return
+    pdfs = {str(p.relative_to(args.corpus_dir)): p.read_bytes() for p in paths}
+    total_mb = sum(len(content) for content in pdfs.values()) / (1024 * 1024)
+    print(f"Corpus: {len(pdfs)} PDFs, {total_mb:.1f} MB, best of {args.repeat} run(s)\n")
+
+    all_results = {backend: benchmark_backend(backend, pdfs, args.repeat) for backend in args.backends}
+
+    print(f"{'backend':<10} {'seconds':>9} {'PDFs/s':>9} {'MB/s':>8} {'text PDFs':>10} {'chars':>12}")
+    for backend, results in all_results.items():
+        seconds = sum(r["seconds"] for r in results.values())
+        text_pdfs = sum(1 for r in results.values() if r["type"] == "text")
+        chars = sum(r["chars"] for r in results.values())
+        print(f"{backend:<10} {seconds:>9.2f} {len(pdfs) / seconds:>9.1f} {total_mb / seconds:>8.1f} {text_pdfs:>10} {chars:>12}")
+
+    if len(all_results) > 1:
+        disagreements = [
+            name for name in pdfs
+            if len({results[name]["type"] for results in all_results.values()}) > 1
+        ]
+        print(f"\nPDFs classified differently by the backends: {len(disagreements)}")
+        for name in disagreements:
+            print("  " + name + ": " + ", ".join(f"{b}={r[name]['type']}" for b, r in all_results.items()))
+
+
+if __name__ == "__main__":
+    main()
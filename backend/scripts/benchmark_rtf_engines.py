@@ -0,0 +1,117 @@
+# /backend/scripts/benchmark_rtf_engines.py
+"""
+Benchmarks the RTF-to-text engines in src/services/ingestion/rtf_processor.py.
+
+By default, a synthetic sample is generated that mirrors the note sizes seen in
+Epic Rich Text folders: mostly short notes, some longer ones with large font and
+style tables, and a few with embedded pictures. Pass a directory of .rtf files
+to benchmark real notes instead. The script reports the time per engine and the
+number of notes whose text differs between engines (after whitespace normalization).
+
+Usage (from the root of the `backend` directory):
+    `python scripts/benchmark_rtf_engines.py`
+    `python scripts/benchmark_rtf_engines.py /path/to/Rich\\ Text --repeat 3`
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from src.services.ingestion.rtf_processor import RTF_ENGINES  # noqa: E402
+from src.services.ingestion.text_decoding import rtf_declared_codepage  # noqa: E402
+
+# (approximate note size in bytes, share of notes, embedded picture bytes)
+NOTE_PROFILE = [
+    (2_000, 0.6, 0),
+    (12_000, 0.3, 0),
+    (60_000, 0.08, 0),
+    (400_000, 0.02, 300_000),
+]
+
+HEADER = (
+    r"{\rtf1\ansi\ansicpg1252\deff0{\fonttbl" + "".join(rf"{{\f{i}\fswiss\fcharset0 Font{i};}}" for i in range(40)) + "}"
+    r"{\colortbl;" + r"\red0\green0\blue0;" * 16 + "}"
+    r"{\stylesheet" + "".join(rf"{{\s{i}\sbasedon0 Style {i};}}" for i in range(60)) + "}"
+    r"{\*\generator Epic Hyperspace;}"
+)
+SENTENCES = [
+    r"Patient seen for follow-up of hypertension.\par ",
+    r"BP 128/82, HR 72, afebrile.\par ",
+    r"Plan: continue lisinopril 10\~mg daily; recheck BMP in 2 weeks.\par ",
+    r"{\b Assessment:} stable, no acute distress.\par ",
+    r"Caf\'e9 au lait spots noted \u8212\'97 unchanged.\par ",
+    r"\tab Sodium\cell 139\cell mmol/L\row ",
+]
+
+
+def synthetic_notes(count: int, seed: int = 7) -> dict:
+    rng = random.Random(seed)
+    sizes, weights, pictures = zip(*[(size, share, picture) for size, share, picture in NOTE_PROFILE])
+    notes = {}
+    for n in range(count):
+        index = rng.choices(range(len(sizes)), weights=weights)[0]
+        body = []
+        length = 0
+        while length < sizes[index]:
+            sentence = rng.choice(SENTENCES)
+            body.append(sentence)
+            length += len(sentence)
+        picture = ""
+        if pictures[index]:
+            picture = r"{\pict\pngblip\picw800\pich600 " + "".join(rng.choice("0123456789abcdef") for _ in range(pictures[index])) + "}"
+        notes[f"note{n}.rtf"] = HEADER + "".join(body[: len(body) // 2]) + picture + "".join(body[len(body) // 2:]) + "}"
+    return notes
+
+
+def load_notes(corpus_dir: str, limit: int) -> dict:
+    notes = {}
+    for path in sorted(Path(corpus_dir).rglob("*"))[:limit]:
+        if path.suffix.lower() == ".rtf" and path.is_file():
+            notes[path.name] = path.read_bytes().decode("latin-1")
+    return notes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RTF-to-text engines.")
+    parser.add_argument("corpus_dir", nargs="?", help="Directory of .rtf notes (default: synthetic sample).")
+    parser.add_argument("--notes", type=int, default=500, help="Number of synthetic notes (or max notes read).")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per engine; the fastest is reported.")
+    args = parser.parse_args()
+
+    notes = load_notes(args.corpus_dir, args.notes) if args.corpus_dir else synthetic_notes(args.notes)
+    if not notes:
+        print("No RTF notes found.")
+        return
+    total_mb = sum(len(note) for note in notes.values()) / (1024 * 1024)
+    print(f"Sample: {len(notes)} notes, {total_mb:.1f} MB, best of {args.repeat} run(s)\n")
+    encodings = {name: rtf_declared_codepage(note[:1024].encode("latin-1")) or "cp1252" for name, note in notes.items()}
+
+    outputs = {}
+    print(f"{'engine':<10} {'seconds':>9} {'notes/s':>9} {'MB/s':>8}")
+    for engine, convert in RTF_ENGINES.items():
+        best = None
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            texts = {name: convert(note, encodings[name]) for name, note in notes.items()}
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        outputs[engine] = texts
+        print(f"{engine:<10} {best:>9.2f} {len(notes) / best:>9.1f} {total_mb / best:>8.2f}")
+
+    engines = list(outputs)
+    differing = [
+        name for name in notes
+        if len({" ".join(outputs[engine][name].split()) for engine in engines}) > 1
+    ]
+    print(f"\nNotes whose text differs between engines: {len(differing)}")
+    for name in differing[:10]:
+        print(f"  {name}")
+
+
+if __name__ == "__main__":
+    main()
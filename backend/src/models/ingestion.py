@@ -1,8 +1,34 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Literal, Optional
 
 class EhrIngestionRequest(BaseModel):
     """Request model for triggering EHR TSV ingestion."""
     input_dir: str = Field(..., description="Absolute path to the directory containing EHR TSV files.")
     output_dir: Optional[str] = Field(None, description="Optional absolute path for the output Markdown directory. Defaults to '<input_dir>_Markdown'.")
-    schema_json: Optional[str] = Field(None, description="Optional absolute path to the JSON schema file.")
+    schema_json: Optional[str] = Field(None, description="Optional absolute path to the schema file (JSON or compiled schema artifact).")
+    columnar_format: Optional[Literal["parquet", "arrow"]] = Field(None, description="Optional columnar output ('parquet' or 'arrow') written alongside the Markdown files.")
+    sqlite_db: Optional[str] = Field(None, description="Optional absolute path to an SQLite database to bulk-load the tables into, indexed on schema primary keys.")
+    resume: bool = Field(False, description="Continue a previous run into the same output directory, skipping files it already completed.")
+
+class EhrIngestionJobResponse(BaseModel):
+    """Response model returned when an EHR ingestion job is started."""
+    job_id: str = Field(..., description="Identifier of the ingestion job.")
+    message: str = Field(..., description="Status message.")
+
+class EhrIngestionJobStatus(BaseModel):
+    """Live status and counters of an EHR ingestion job."""
+    job_id: str
+    status: str = Field(..., description="RUNNING, CANCELLING, COMPLETED, CANCELLED or FAILED.")
+    input_dir: Optional[str] = None
+    files_total: int = 0
+    files_done: int = 0
+    bytes_total: int = 0
+    bytes_done: int = 0
+    rows: int = 0
+    errors: int = 0
+    skipped: int = 0
+    rows_per_second: float = 0.0
+    elapsed_seconds: float = 0.0
+    eta_seconds: Optional[float] = Field(None, description="Estimated seconds remaining, based on bytes processed so far.")
+    exit_code: Optional[int] = Field(None, description="Worker process exit code once finished.")
+    error: Optional[str] = Field(None, description="Why the job failed (FAILED jobs only).")
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, BackgroundTasks, HTTPException, status, File, UploadFile, Form, Depends
+from fastapi import APIRouter, HTTPException, status, File, UploadFile, Form, Depends
 from pathlib import Path
 import logging
 from typing import List
@@ -8,7 +8,7 @@ import os
 import uuid
 from datetime import datetime
 
-from ..models.ingestion import EhrIngestionRequest
+from ..models.ingestion import EhrIngestionRequest, EhrIngestionJobResponse, EhrIngestionJobStatus
 from ..models.file_ingestion import (
     TextIngestionRequest, 
     TextIngestionResponse, 
@@ -16,7 +16,7 @@ from ..models.file_ingestion import (
     RecordType,
     ProcessingStatus
 )
-from ..services.ingestion.ehr_parser import run_ehr_parsing
+from ..services.ingestion.ingestion_jobs import ingestion_job_manager, IngestionCapacityError
 from ..services.auth.auth_service import get_current_user, User
 from ..services.database_service import get_database
 from ..services.security.encryption import encryption_service
@@ -34,9 +34,9 @@ router = APIRouter(
     tags=["Ingestion"],
 )
 
-@router.post("/ehr", status_code=status.HTTP_202_ACCEPTED)
-def trigger_ehr_ingestion(request: EhrIngestionRequest, background_tasks: BackgroundTasks):
-    """Triggers the background process to ingest EHR TSV files from a specified directory."""
+@router.post("/ehr", status_code=status.HTTP_202_ACCEPTED, response_model=EhrIngestionJobResponse)
+def trigger_ehr_ingestion(request: EhrIngestionRequest):
+    """Starts an EHR ingestion job for TSV files in a specified directory, in a separate worker process."""
     logger.info(f"Received request to ingest EHR data from: {request.input_dir}")
 
     # Basic input validation: Check if input directory exists
@@ -48,17 +48,52 @@ def trigger_ehr_ingestion(request: EhrIngestionRequest, background_tasks: Backgr
             detail=f"Input directory not found: {request.input_dir}"
         )
 
-    # Add the parsing task to run in the background
-    background_tasks.add_task(
-        run_ehr_parsing,
-        input_dir=request.input_dir,
-        output_dir=request.output_dir,
-        schema_json=request.schema_json,
-        verbose=True # Enable verbose logging for background task for now
-    )
-
-    logger.info(f"EHR ingestion task added to background for: {request.input_dir}")
-    return {"message": "EHR ingestion process started in the background."}
+    try:
+        job_id = ingestion_job_manager.start_ehr_job(
+            input_dir=request.input_dir,
+            output_dir=request.output_dir,
+            schema_json=request.schema_json,
+            columnar_format=request.columnar_format,
+            sqlite_db=request.sqlite_db,
+            resume=request.resume,
+            verbose=True # Enable verbose logging for background task for now
+        )
+    except IngestionCapacityError as e:
+        logger.warning(f"Rejected EHR ingestion request for {request.input_dir}: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e)
+        )
+
+    logger.info(f"EHR ingestion job {job_id} started for: {request.input_dir}")
+    return EhrIngestionJobResponse(job_id=job_id, message="EHR ingestion job started in a worker process.")
+
+@router.get("/ehr/jobs", response_model=List[EhrIngestionJobStatus])
+def list_ehr_ingestion_jobs():
+    """Lists running and recently finished EHR ingestion jobs."""
+    return ingestion_job_manager.list_jobs()
+
+@router.get("/ehr/jobs/{job_id}", response_model=EhrIngestionJobStatus)
+def get_ehr_ingestion_job(job_id: str):
+    """Returns live progress counters for an EHR ingestion job."""
+    job = ingestion_job_manager.get_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Ingestion job not found: {job_id}"
+        )
+    return job
+
+@router.post("/ehr/jobs/{job_id}/cancel", status_code=status.HTTP_202_ACCEPTED, response_model=EhrIngestionJobStatus)
+def cancel_ehr_ingestion_job(job_id: str):
+    """Requests cancellation of an EHR ingestion job. Files already in progress finish first."""
+    job = ingestion_job_manager.cancel_job(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Ingestion job not found: {job_id}"
+        )
+    return job
 
 @router.post("/text", status_code=status.HTTP_200_OK, response_model=TextIngestionResponse)
 async def ingest_text_file(
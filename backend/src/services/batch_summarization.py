@@ -0,0 +1,628 @@
+# /backend/src/services/batch_summarization.py
+"""
+Offline batch summarization of ingested documents.
+
+Summarizing a whole Epic export (thousands of notes converted by rtf_processor
+and media_processor) one interactive call at a time is slow and costs full
+price. A batch job instead:
+
+1. collects the pending documents: the .txt outputs of the ingestion stages
+   that have no summary yet (see collect_pending_documents);
+2. answers what it can from the LLM response cache and submits the rest
+   through the provider's batch endpoint (OpenAI Batch, Anthropic Message
+   Batches), split to stay under the per-batch request count and size limits;
+3. polls the batches until they have ended (providers allow up to 24 hours);
+4. caches the summaries and hands them, one ended batch at a time, to a bulk
+   writer (summary files next to the ingestion outputs, and/or database records).
+
+Providers without a batch endpoint (Google) use the local backend, which runs
+the same requests as regular calls at background priority (see llm_dispatch),
+so they never hold up interactive summaries. The local backend takes any
+summarize function, so jobs can also run without the network.
+
+Submitted batch ids are kept in a state file, so a job interrupted while
+polling picks its batches up again instead of submitting (and paying for)
+them twice.
+
+Usage (from the root of the `backend` directory):
+    `python -m src.services.batch_summarization /path/to/ingestion_output --provider anthropic --model claude-3-5-haiku-latest`
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from .ingestion.ingestion_orchestrator import INGESTION_STAGES
+from .ingestion.run_journal import atomic_write_text
+from .llm_cache import get_llm_cache
+from .llm_dispatch import LLMPriority, dispatch_llm_call, llm_priority
+from .llm_service import (
+    DEFAULT_INPUT_BUDGET,
+    MAX_CONCURRENT_CHUNKS,
+    PDF_SUMMARIZERS,
+    PROVIDER_INPUT_BUDGETS,
+    SUMMARY_MAX_TOKENS,
+    SUMMARY_TEMPERATURE,
+    SYSTEM_PROMPT,
+    _get_anthropic_client,
+    _get_openai_client,
+    estimate_text_tokens,
+    split_text_into_chunks,
+    summarize_chunks,
+    text_summary_cache_key,
+)
+
+logger = logging.getLogger(__name__)
+
+# Requests and bytes per submitted batch (OpenAI allows 50,000 requests and 200 MB,
+# Anthropic 100,000 requests and 256 MB)
+BATCH_MAX_REQUESTS = int(os.getenv("LLM_BATCH_MAX_REQUESTS", "10000"))
+BATCH_MAX_BYTES = 100 * 1024 * 1024
+BATCH_POLL_SECONDS = float(os.getenv("LLM_BATCH_POLL_SECONDS", "60"))
+
+# Ingestion stages whose text outputs are summarized
+BATCH_STAGES = ("rich_text", "media")
+SUMMARIES_DIR_NAME = "Summaries"
+STATE_FILE_NAME = ".batch_summarization.json"
+
+# Record types of the health records created for each stage's documents
+STAGE_RECORD_TYPES = {"rich_text": "CLINICAL_NOTE", "media": "OTHER"}
+
+
+def collect_pending_documents(output_root: Path, stages=BATCH_STAGES) -> List[Dict[str, Any]]:
+    """Returns the ingested documents of an export that have no summary file yet.
+
+    Args:
+        output_root: Output directory of the ingestion run (see ingestion_orchestrator).
+        stages: Ingestion stages whose .txt outputs are summarized.
+
+    Returns:
+        One dictionary per document with 'custom_id' (stable, and valid as a batch
+        request id), 'stage', 'name', 'source' (path of the text) and 'text'.
+    """
+    documents = []
+    for stage in stages:
+        text_dir_name = INGESTION_STAGES[stage][1]
+        text_dir = output_root / text_dir_name
+        summary_dir = output_root / SUMMARIES_DIR_NAME / text_dir_name
+        if not text_dir.is_dir():
+            continue
+        for path in sorted(text_dir.glob("*.txt")):
+            if (summary_dir / path.name).exists():
+                continue
+            text = path.read_text(encoding="utf-8", errors="replace").strip()
+            if not text:
+                continue
+            digest = hashlib.sha256(f"{stage}/{path.name}".encode("utf-8")).hexdigest()[:32]
+            documents.append({
+                "custom_id": f"doc-{digest}",
+                "stage": stage,
+                "name": path.name,
+                "source": str(path),
+                "text": text,
+            })
+    return documents
+
+
+# --- Batch Backends --- #
+# Each backend builds the request of one document, submits a list of requests as a
+# batch, reports its progress and returns its results ({custom_id: {"summary": ...}
+# or {"error": ...}}).
+
+class OpenAIBatchBackend:
+    """OpenAI Batch API: the requests are uploaded as a JSONL file of chat completions."""
+
+    name = "openai"
+    ENDED_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+    def __init__(self, client: Any = None):
+        self._client = client
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            self._client = _get_openai_client()
+        return self._client
+
+    def request(self, custom_id: str, model_id: str, text: str) -> Dict[str, Any]:
+        return {
+            "custom_id": custom_id,
+            "method": "POST",
+            "url": "/v1/chat/completions",
+            "body": {
+                "model": model_id,
+                "messages": [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": text}],
+                "max_tokens": SUMMARY_MAX_TOKENS,
+                "temperature": SUMMARY_TEMPERATURE,
+            },
+        }
+
+    async def submit(self, requests: List[Dict[str, Any]]) -> str:
+        data = "\n".join(json.dumps(request) for request in requests).encode("utf-8")
+        batch_file = await _background_call(
+            self.name, lambda: self.client.files.create(file=("summaries.jsonl", data), purpose="batch")
+        )
+        batch = await _background_call(
+            self.name,
+            lambda: self.client.batches.create(
+                input_file_id=batch_file.id, endpoint="/v1/chat/completions", completion_window="24h"
+            ),
+        )
+        return batch.id
+
+    async def poll(self, batch_id: str) -> Dict[str, Any]:
+        batch = await _background_call(self.name, lambda: self.client.batches.retrieve(batch_id))
+        counts = batch.request_counts
+        return {
+            "ended": batch.status in self.ENDED_STATUSES,
+            "status": batch.status,
+            "done": (counts.completed + counts.failed) if counts else 0,
+            "total": counts.total if counts else 0,
+        }
+
+    async def results(self, batch_id: str) -> Dict[str, Dict[str, str]]:
+        batch = await _background_call(self.name, lambda: self.client.batches.retrieve(batch_id))
+        results: Dict[str, Dict[str, str]] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if not file_id:
+                continue
+            content = await _background_call(self.name, lambda: self.client.files.content(file_id))
+            for line in content.text.splitlines():
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                response = entry.get("response") or {}
+                if response.get("status_code") == 200:
+                    summary = response["body"]["choices"][0]["message"]["content"] or ""
+                    results[entry["custom_id"]] = {"summary": summary.strip()}
+                else:
+                    error = entry.get("error") or response.get("body") or f"batch {batch.status}"
+                    results[entry["custom_id"]] = {"error": str(error)}
+        return results
+
+
+class AnthropicBatchBackend:
+    """Anthropic Message Batches API."""
+
+    name = "anthropic"
+
+    def __init__(self, client: Any = None):
+        self._client = client
+
+    @property
+    def client(self) -> Any:
+        if self._client is None:
+            self._client = _get_anthropic_client()
+        return self._client
+
+    def request(self, custom_id: str, model_id: str, text: str) -> Dict[str, Any]:
+        return {
+            "custom_id": custom_id,
+            "params": {
+                "model": model_id,
+                "system": SYSTEM_PROMPT,
+                "messages": [{"role": "user", "content": text}],
+                "max_tokens": SUMMARY_MAX_TOKENS,
+                "temperature": SUMMARY_TEMPERATURE,
+            },
+        }
+
+    async def submit(self, requests: List[Dict[str, Any]]) -> str:
+        batch = await _background_call(self.name, lambda: self.client.messages.batches.create(requests=requests))
+        return batch.id
+
+    async def poll(self, batch_id: str) -> Dict[str, Any]:
+        batch = await _background_call(self.name, lambda: self.client.messages.batches.retrieve(batch_id))
+        counts = batch.request_counts
+        done = counts.succeeded + counts.errored + counts.canceled + counts.expired
+        return {
+            "ended": batch.processing_status == "ended",
+            "status": batch.processing_status,
+            "done": done,
+            "total": done + counts.processing,
+        }
+
+    async def results(self, batch_id: str) -> Dict[str, Dict[str, str]]:
+        results: Dict[str, Dict[str, str]] = {}
+        entries = await _background_call(self.name, lambda: self.client.messages.batches.results(batch_id))
+        async for entry in entries:
+            result = entry.result
+            if result.type == "succeeded":
+                summary = "".join(block.text for block in result.message.content if block.type == "text")
+                results[entry.custom_id] = {"summary": summary.strip()}
+            else:
+                error = getattr(result, "error", None)
+                results[entry.custom_id] = {"error": str(error) if error is not None else result.type}
+        return results
+
+
+class LocalBatchBackend:
+    """Runs batch requests as regular calls at background priority.
+
+    The stand-in for providers without a batch endpoint, and for running jobs
+    without the network: `summarize` is any async (model_id, text) -> summary
+    function, by default the provider's summarize function (llm_service.PDF_SUMMARIZERS).
+    Batches live in memory, so they do not survive a restart of the job.
+    """
+
+    name = "local"
+
+    def __init__(
+        self,
+        provider: Optional[str] = None,
+        summarize: Optional[Callable[[str, str], Awaitable[str]]] = None,
+        max_concurrency: int = MAX_CONCURRENT_CHUNKS,
+    ):
+        if summarize is None:
+            if provider not in PDF_SUMMARIZERS:
+                raise ValueError(f"Unsupported LLM provider: {provider}")
+            summarize = lambda model_id, text: PDF_SUMMARIZERS[provider](model_id=model_id, text_content=text)
+        self.summarize = summarize
+        self.max_concurrency = max_concurrency
+        self._batches: Dict[str, Dict[str, Any]] = {}
+
+    def request(self, custom_id: str, model_id: str, text: str) -> Dict[str, Any]:
+        return {"custom_id": custom_id, "model_id": model_id, "text": text}
+
+    async def _run(self, batch: Dict[str, Any], requests: List[Dict[str, Any]]) -> None:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run_one(request: Dict[str, Any]) -> None:
+            async with semaphore:
+                try:
+                    summary = await self.summarize(request["model_id"], request["text"])
+                    batch["results"][request["custom_id"]] = {"summary": summary.strip()}
+                except Exception as e:
+                    batch["results"][request["custom_id"]] = {"error": str(e)}
+
+        with llm_priority(LLMPriority.BACKGROUND):
+            await asyncio.gather(*(run_one(request) for request in requests))
+
+    async def submit(self, requests: List[Dict[str, Any]]) -> str:
+        batch_id = f"local-{uuid.uuid4().hex}"
+        batch: Dict[str, Any] = {"total": len(requests), "results": {}}
+        batch["task"] = asyncio.ensure_future(self._run(batch, requests))
+        self._batches[batch_id] = batch
+        return batch_id
+
+    async def poll(self, batch_id: str) -> Dict[str, Any]:
+        batch = self._batches[batch_id]
+        ended = batch["task"].done()
+        return {
+            "ended": ended,
+            "status": "ended" if ended else "in_progress",
+            "done": len(batch["results"]),
+            "total": batch["total"],
+        }
+
+    async def results(self, batch_id: str) -> Dict[str, Dict[str, str]]:
+        batch = self._batches.pop(batch_id)
+        await batch["task"]
+        return batch["results"]
+
+
+# Backends of the providers with a batch endpoint; others use LocalBatchBackend
+BATCH_BACKENDS = {
+    "openai": OpenAIBatchBackend,
+    "anthropic": AnthropicBatchBackend,
+}
+
+
+def get_batch_backend(provider: str) -> Any:
+    """Returns the batch backend of a provider (the local backend if it has no batch endpoint)."""
+    if provider in BATCH_BACKENDS:
+        return BATCH_BACKENDS[provider]()
+    return LocalBatchBackend(provider)
+
+
+async def _background_call(provider: str, call: Callable[[], Awaitable[Any]]) -> Any:
+    """A batch API call, with the retries and limits of a background LLM call (see llm_dispatch)."""
+    return await dispatch_llm_call(provider, "batch", call, priority=LLMPriority.BACKGROUND)
+
+
+# --- Batch Jobs --- #
+
+def split_batches(
+    requests: List[Dict[str, Any]], max_requests: int = BATCH_MAX_REQUESTS, max_bytes: int = BATCH_MAX_BYTES
+) -> List[List[Dict[str, Any]]]:
+    """Splits requests into batches of at most max_requests requests and about max_bytes of JSON."""
+    batches: List[List[Dict[str, Any]]] = []
+    current: List[Dict[str, Any]] = []
+    size = 0
+    for request in requests:
+        request_size = len(json.dumps(request)) + 1
+        if current and (len(current) >= max_requests or size + request_size > max_bytes):
+            batches.append(current)
+            current, size = [], 0
+        current.append(request)
+        size += request_size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _load_state(state_path: Optional[Path], provider: str, model_id: str, backend_name: str) -> List[Dict[str, Any]]:
+    """Returns the batches a previous run of the same job left submitted."""
+    if state_path is None or not state_path.exists():
+        return []
+    try:
+        state = json.loads(state_path.read_text(encoding="utf-8"))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable batch state {state_path}: {e}")
+        return []
+    if (state.get("provider"), state.get("model_id"), state.get("backend")) != (provider, model_id, backend_name):
+        logger.warning(f"Ignoring batch state {state_path} of another provider, model or backend.")
+        return []
+    if backend_name == LocalBatchBackend.name:
+        return []  # Local batches died with the previous run
+    return state.get("batches", [])
+
+
+def _save_state(
+    state_path: Optional[Path], provider: str, model_id: str, backend_name: str, batches: List[Dict[str, Any]]
+) -> None:
+    if state_path is None:
+        return
+    if not batches:
+        state_path.unlink(missing_ok=True)
+        return
+    state = {"provider": provider, "model_id": model_id, "backend": backend_name, "batches": batches}
+    atomic_write_text(state_path, json.dumps(state), durable=True)
+
+
+async def run_batch_summarization(
+    documents: List[Dict[str, Any]],
+    provider: str,
+    model_id: str,
+    backend: Any = None,
+    write_summaries: Optional[Callable[[List[Dict[str, Any]]], Awaitable[None]]] = None,
+    state_path: Optional[Path] = None,
+    poll_seconds: float = BATCH_POLL_SECONDS,
+    max_requests: int = BATCH_MAX_REQUESTS,
+    max_bytes: int = BATCH_MAX_BYTES,
+) -> Dict[str, Any]:
+    """Summarizes documents through a provider's batch endpoint.
+
+    Summaries are cached under the same key as summarize_text_with_llm, so cached
+    documents cost nothing and an interactive summary of a batch-summarized text
+    is answered from the cache. Documents over the provider's input budget cannot
+    be sent as one request; they are summarized in chunks (see summarize_chunks)
+    at background priority.
+
+    Args:
+        documents: Dictionaries with at least 'custom_id' and 'text' (see collect_pending_documents).
+        provider: The LLM provider.
+        model_id: The model.
+        backend: The batch backend (default: get_batch_backend(provider)).
+        write_summaries: Called with the summarized documents (each with a 'summary' and
+            the 'generated_by' "provider:model", which differs from the requested one if a
+            backup model answered a chunked summary) once per ended batch, to write them in bulk.
+        state_path: File recording the submitted batches, for resuming the job.
+        poll_seconds: Seconds between polls of the submitted batches.
+        max_requests: Requests per batch.
+        max_bytes: Approximate size of a batch.
+
+    Returns:
+        A dictionary with the 'summaries' and 'errors' by custom id, and the counts
+        of 'documents', 'cached', 'submitted', 'batches', 'oversized', 'summarized' and 'failed'.
+    """
+    backend = backend or get_batch_backend(provider)
+    cache = get_llm_cache()
+    budget = PROVIDER_INPUT_BUDGETS.get(provider, DEFAULT_INPUT_BUDGET)
+    by_id = {document["custom_id"]: document for document in documents}
+    summaries: Dict[str, str] = {}
+    errors: Dict[str, str] = {}
+    stats = {"documents": len(documents), "cached": 0, "submitted": 0, "batches": 0, "oversized": 0}
+
+    requested = f"{provider}:{model_id}"
+
+    async def finish(custom_ids: List[str], results: Dict[str, Dict[str, Any]]) -> None:
+        done = []
+        for custom_id in custom_ids:
+            result = results.get(custom_id, {"error": "missing from the batch results"})
+            if result.get("summary"):
+                summaries[custom_id] = result["summary"]
+                generated_by = result.get("generated_by", requested)
+                if cache is not None and result.get("models", [requested]) == [requested]:
+                    cache.set(text_summary_cache_key(provider, model_id, by_id[custom_id]["text"]), result["summary"])
+                done.append(dict(by_id[custom_id], summary=result["summary"], generated_by=generated_by))
+            else:
+                errors[custom_id] = result.get("error") or "empty summary"
+        if done and write_summaries is not None:
+            await write_summaries(done)
+
+    # Documents already submitted by an interrupted run of this job. Ids no longer
+    # pending were written before the run stopped, and are left out of its results
+    batches = []
+    for batch in _load_state(state_path, provider, model_id, backend.name):
+        pending = [custom_id for custom_id in batch["custom_ids"] if custom_id in by_id]
+        if pending:
+            batches.append(dict(batch, custom_ids=pending))
+    submitted = {custom_id for batch in batches for custom_id in batch["custom_ids"]}
+    if batches:
+        logger.info(f"Resuming {len(batches)} submitted batch(es) of {len(submitted)} documents.")
+
+    cached_ids, requests, oversized = [], [], []
+    for document in documents:
+        custom_id = document["custom_id"]
+        if custom_id in submitted:
+            continue
+        cached = cache.get(text_summary_cache_key(provider, model_id, document["text"])) if cache is not None else None
+        if cached is not None:
+            cached_ids.append(custom_id)
+            summaries[custom_id] = cached
+        elif estimate_text_tokens(document["text"]) > budget["max_input_tokens"]:
+            oversized.append(document)
+        else:
+            requests.append(backend.request(custom_id, model_id, document["text"]))
+    stats["cached"] = len(cached_ids)
+    await finish(cached_ids, {custom_id: {"summary": summaries[custom_id]} for custom_id in cached_ids})
+
+    for batch_requests in split_batches(requests, max_requests, max_bytes):
+        batch_id = await backend.submit(batch_requests)
+        batches.append({"id": batch_id, "custom_ids": [request["custom_id"] for request in batch_requests]})
+        _save_state(state_path, provider, model_id, backend.name, batches)
+        stats["submitted"] += len(batch_requests)
+        logger.info(f"Submitted {provider} batch {batch_id} of {len(batch_requests)} summaries.")
+    stats["batches"] = len(batches)
+
+    start = time.monotonic()
+    while batches:
+        for batch in list(batches):
+            progress = await backend.poll(batch["id"])
+            if not progress["ended"]:
+                logger.info(
+                    f"Batch {batch['id']}: {progress['status']}, {progress['done']}/{progress['total']} done "
+                    f"after {time.monotonic() - start:.0f}s."
+                )
+                continue
+            await finish(batch["custom_ids"], await backend.results(batch["id"]))
+            batches.remove(batch)
+            _save_state(state_path, provider, model_id, backend.name, batches)
+            logger.info(f"Batch {batch['id']} ended ({progress['status']}).")
+        if batches:
+            await asyncio.sleep(poll_seconds)
+
+    stats["oversized"] = len(oversized)
+    for document in oversized:
+        custom_id = document["custom_id"]
+        try:
+            with llm_priority(LLMPriority.BACKGROUND):
+                chunks = split_text_into_chunks([(0, document["text"])])
+                result = await summarize_chunks(provider, model_id, chunks)
+            await finish([custom_id], {custom_id: result})
+        except Exception as e:
+            logger.error(f"Chunked summary of {document.get('name', custom_id)} failed: {e}", exc_info=True)
+            errors[custom_id] = str(e)
+
+    stats.update(summarized=len(summaries), failed=len(errors), summaries=summaries, errors=errors)
+    logger.info(
+        f"Batch summarization done: {stats['summarized']} summarized ({stats['cached']} cached, "
+        f"{stats['oversized']} chunked), {stats['failed']} failed."
+    )
+    return stats
+
+
+# --- Summary Writers --- #
+
+def summary_file_writer(output_root: Path) -> Callable[[List[Dict[str, Any]]], Awaitable[None]]:
+    """Writes summaries to <output_root>/Summaries/<stage output dir>/<name>, which marks
+    the documents as summarized for collect_pending_documents."""
+    async def write(documents: List[Dict[str, Any]]) -> None:
+        for document in documents:
+            path = output_root / SUMMARIES_DIR_NAME / INGESTION_STAGES[document["stage"]][1] / document["name"]
+            atomic_write_text(path, document["summary"])
+
+    return write
+
+
+def summary_database_writer(user_id: str, provider: str, model_id: str) -> Callable[[List[Dict[str, Any]]], Awaitable[None]]:
+    """Saves summarized documents as encrypted health records with their summaries, in
+    one database batch per call."""
+    async def write(documents: List[Dict[str, Any]]) -> None:
+        from .database_service import get_database
+        from .security.encryption import encryption_service
+        from .security.audit import audit_service, AuditAction
+        from ..models.file_ingestion import ProcessingStatus
+
+        db = get_database()
+        async with db.batch_() as batcher:
+            for document in documents:
+                # Ids are assigned here because a batch does not return the created records
+                health_record_id = uuid.uuid4().hex
+                encrypted_text = encryption_service.encrypt_bytes(document["text"].encode("utf-8"), "health_record")
+                batcher.healthrecord.create(data={
+                    "id": health_record_id,
+                    "userId": user_id,
+                    "recordType": STAGE_RECORD_TYPES.get(document["stage"], "OTHER"),
+                    "title": document["name"],
+                    "encryptedData": encrypted_text["ciphertext"],
+                    "encryptionIv": encrypted_text["iv"],
+                    "encryptionSalt": encrypted_text["salt"],
+                    "status": ProcessingStatus.COMPLETED.value,
+                    "metadata": {"originalFilename": document["name"], "ingestionStage": document["stage"]},
+                })
+                encrypted_summary = encryption_service.encrypt(document["summary"], "summary")
+                batcher.summary.create(data={
+                    "healthRecordId": health_record_id,
+                    "type": "BATCH_SUMMARY",
+                    "encryptedContent": encrypted_summary["ciphertext"],
+                    "encryptionIv": encrypted_summary["iv"],
+                    "encryptionSalt": encrypted_summary["salt"],
+                    "generatedBy": document["generated_by"],
+                    "metadata": {
+                        "provider": document["generated_by"].partition(":")[0],
+                        "model": document["generated_by"].partition(":")[2],
+                        "requestedModel": f"{provider}:{model_id}",
+                        "originalFilename": document["name"],
+                    },
+                })
+
+        await audit_service.log_activity(
+            user_id=user_id,
+            action=AuditAction.CREATE.value,
+            resource_type="Summary",
+            resource_id="batch",
+            details={
+                "type": "BATCH_SUMMARY",
+                "provider": provider,
+                "model": model_id,
+                "count": len(documents),
+                "documents": [document["name"] for document in documents],
+            },
+        )
+
+    return write
+
+
+async def _main(args: argparse.Namespace) -> None:
+    output_root = Path(args.output_root).resolve()
+    documents = collect_pending_documents(output_root, args.stages)
+    logger.info(f"{len(documents)} documents pending summarization in {output_root}.")
+    if not documents:
+        return
+
+    file_writer = summary_file_writer(output_root)
+    database_writer = summary_database_writer(args.user_id, args.provider, args.model) if args.user_id else None
+
+    async def write_summaries(summarized: List[Dict[str, Any]]) -> None:
+        if database_writer is not None:
+            await database_writer(summarized)
+        await file_writer(summarized)  # Last, as it marks the documents done
+
+    backend = LocalBatchBackend(args.provider) if args.local else get_batch_backend(args.provider)
+    if args.user_id:
+        from ..database.client import db_client
+        await db_client.connect()
+    try:
+        await run_batch_summarization(
+            documents,
+            args.provider,
+            args.model,
+            backend=backend,
+            write_summaries=write_summaries,
+            state_path=output_root / SUMMARIES_DIR_NAME / STATE_FILE_NAME,
+            poll_seconds=args.poll_seconds,
+        )
+    finally:
+        if args.user_id:
+            await db_client.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize ingested documents through provider batch APIs.")
+    parser.add_argument("output_root", help="Output directory of an ingestion run.")
+    parser.add_argument("--provider", required=True, help="LLM provider (openai, anthropic, google).")
+    parser.add_argument("--model", required=True, help="Model id.")
+    parser.add_argument("--stages", nargs="+", choices=BATCH_STAGES, default=list(BATCH_STAGES), help="Stages to summarize.")
+    parser.add_argument("--user-id", help="Also save the summaries as health records of this user.")
+    parser.add_argument("--local", action="store_true", help="Use regular background calls instead of the batch endpoint.")
+    parser.add_argument("--poll-seconds", type=float, default=BATCH_POLL_SECONDS, help="Seconds between status polls.")
+    asyncio.run(_main(parser.parse_args()))
@@ -0,0 +1,262 @@
+"""
+Writes EHI TSV tables as typed columnar files (Parquet or Arrow IPC).
+
+Column types come from the parsed EHI schema JSON (see ehi_schema_parser).
+Parquet output is written in row groups with min/max statistics so that
+downstream readers (pyarrow.dataset, DuckDB, pandas) can prune row groups
+and run vectorized filters instead of re-parsing Markdown.
+"""
+
+import csv
+import logging
+import re
+from io import StringIO
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.ipc as pa_ipc
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is only needed when columnar output is requested
+    pa = None
+
+from .run_journal import atomic_output_path
+
+logger = logging.getLogger(__name__)
+
+COLUMNAR_FORMATS = ("parquet", "arrow")
+COLUMNAR_EXTENSIONS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Rows per Parquet row group. Each group carries its own min/max statistics,
+# so smaller groups allow finer pruning at the cost of slightly larger files.
+PARQUET_ROW_GROUP_SIZE = 64 * 1024
+
+# Datetime layouts seen in Epic EHI exports, tried in order.
+EHI_DATETIME_FORMATS = [
+    "%m/%d/%Y %I:%M:%S %p",
+    "%m/%d/%Y %H:%M:%S",
+    "%m/%d/%Y",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%d",
+]
+
+
+# EHI schema types stored as Arrow int64, matched exactly (not by prefix: INTERVAL is not an integer)
+EHI_INTEGER_TYPES = frozenset({"INTEGER", "INT", "BIGINT", "SMALLINT", "TINYINT"})
+EHI_FLOAT_TYPES = frozenset({"FLOAT", "REAL", "DOUBLE", "DOUBLE PRECISION"})
+# Exact numeric types: decimals with their declared precision, otherwise typed from the data
+# (see _infer_numeric_type), as float64 would round identifiers and amounts past 15 digits
+EHI_DECIMAL_TYPES = frozenset({"NUMERIC", "DECIMAL"})
+# Maximum precisions of Arrow's decimal types
+DECIMAL128_MAX_PRECISION = 38
+DECIMAL256_MAX_PRECISION = 76
+
+_EHI_TYPE_PATTERN = re.compile(r"^([A-Z]+(?: PRECISION)?)\s*(?:\(\s*(\d+)\s*(?:,\s*(\d+)\s*)?\))?")
+# Integer and fraction digits of a plain decimal literal, leading zeros excluded
+_DECIMAL_DIGITS_PATTERN = r"^[+-]?0*(?P<integer>\d*)(?:\.(?P<fraction>\d*))?$"
+
+
+class ColumnarOutputError(Exception):
+    """Raised when a table cannot be written in a columnar format."""
+    pass
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ColumnarOutputError(
+            "pyarrow is not installed. Please install it: pip install pyarrow"
+        )
+
+
+def parse_ehi_type(ehi_type: Optional[str]) -> Tuple[str, Optional[int], Optional[int]]:
+    """Splits an EHI column type such as 'NUMERIC(18,2)' into (base type, precision, scale)."""
+    normalized = (ehi_type or "").strip().upper()
+    match = _EHI_TYPE_PATTERN.match(normalized)
+    if not match:
+        return "", None, None
+    precision, scale = match.group(2), match.group(3)
+    return match.group(1), int(precision) if precision else None, int(scale) if scale else None
+
+
+def ehi_type_to_arrow(ehi_type: Optional[str]) -> "pa.DataType":
+    """Maps an EHI schema column type (e.g. 'VARCHAR', 'NUMERIC(18,2)', 'DATETIME (Local)') to an Arrow type.
+
+    NUMERIC/DECIMAL become decimals only with a declared precision; values that do
+    not fit it keep the column as strings (see _cast_column). Without one they map
+    to string here, and build_arrow_table() types the column from its values.
+    """
+    _require_pyarrow()
+    base, precision, scale = parse_ehi_type(ehi_type)
+    if base in EHI_INTEGER_TYPES:
+        return pa.int64()
+    if base in EHI_FLOAT_TYPES:
+        return pa.float64()
+    if base in EHI_DECIMAL_TYPES and precision is not None:
+        scale = scale or 0
+        if not 0 < precision <= DECIMAL256_MAX_PRECISION or scale > precision:
+            return pa.string()
+        if precision <= DECIMAL128_MAX_PRECISION:
+            return pa.decimal128(precision, scale)
+        return pa.decimal256(precision, scale)
+    if base in ("DATETIME", "DATE"):
+        return pa.timestamp("ms")
+    return pa.string()
+
+
+def _infer_numeric_type(values: "pa.Array") -> "pa.DataType":
+    """Types a NUMERIC column declared without a precision from its values.
+
+    int64 when every value is an integer that fits, otherwise a decimal sized
+    from the observed digits. Raises ArrowInvalid if the values are not numbers.
+    """
+    try:
+        pc.cast(values, pa.int64())
+        return pa.int64()
+    except pa.ArrowInvalid:
+        pass
+    digits = pc.extract_regex(values, _DECIMAL_DIGITS_PATTERN)
+    if digits.null_count != values.null_count:
+        raise pa.ArrowInvalid("not a decimal number")
+    integer_digits = pc.max(pc.utf8_length(digits.field("integer"))).as_py() or 0
+    scale = pc.max(pc.utf8_length(digits.field("fraction"))).as_py() or 0
+    precision = max(integer_digits + scale, 1)
+    if precision <= DECIMAL128_MAX_PRECISION:
+        return pa.decimal128(precision, scale)
+    if precision <= DECIMAL256_MAX_PRECISION:
+        return pa.decimal256(precision, scale)
+    raise pa.ArrowInvalid(f"{precision} digits do not fit a decimal")
+
+
+def _cast_column(
+    values: "pa.Array",
+    target: Optional["pa.DataType"],
+    column_name: str,
+    table_name: str,
+) -> "pa.Array":
+    """Casts a string column to the target type, falling back to string on malformed data.
+
+    A target of None infers the type of a NUMERIC column without a declared precision.
+    """
+    if target is not None and pa.types.is_string(target):
+        return values
+    try:
+        if target is None:
+            target = _infer_numeric_type(values)
+        if pa.types.is_timestamp(target):
+            for fmt in EHI_DATETIME_FORMATS:
+                try:
+                    return pc.strptime(values, format=fmt, unit="ms")
+                except pa.ArrowInvalid:
+                    continue
+            raise pa.ArrowInvalid("no known datetime format matched")
+        return pc.cast(values, target)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+        logger.debug(
+            "Column %s.%s kept as string (could not cast to %s: %s)",
+            table_name, column_name, target or "a numeric type", e,
+        )
+        return values
+
+
+def build_arrow_table(
+    header: List[str],
+    data_rows: List[List[str]],
+    table_name: str,
+    schema_info: Optional[Dict[str, Any]] = None,
+) -> "pa.Table":
+    """Builds a typed Arrow table from parsed TSV rows.
+
+    Args:
+        header: Column names from the TSV header row.
+        data_rows: Data rows as lists of strings.
+        table_name: EHI table name (used for log messages).
+        schema_info: Optional schema entry for the table with a 'columns' list.
+
+    Returns:
+        A pyarrow.Table whose column types follow the schema. Empty cells become nulls.
+    """
+    _require_pyarrow()
+    column_types = {}
+    if schema_info:
+        column_types = {col["name"]: col.get("type") for col in schema_info.get("columns", [])}
+
+    width = len(header)
+    columns: List[List[Optional[str]]] = [[] for _ in range(width)]
+    for row in data_rows:
+        for idx in range(width):
+            cell = row[idx].strip() if idx < len(row) else ""
+            columns[idx].append(cell if cell else None)
+
+    arrays = []
+    fields = []
+    for name, values in zip(header, columns):
+        base, precision, _ = parse_ehi_type(column_types.get(name))
+        if base in EHI_DECIMAL_TYPES and precision is None:
+            target = None
+        else:
+            target = ehi_type_to_arrow(column_types.get(name))
+        array = _cast_column(pa.array(values, type=pa.string()), target, name, table_name)
+        arrays.append(array)
+        fields.append(pa.field(name, array.type, metadata={"ehi_type": column_types.get(name) or ""}))
+
+    metadata = {"ehi_table": table_name}
+    if schema_info:
+        if schema_info.get("primary_key"):
+            metadata["primary_key"] = ",".join(schema_info["primary_key"])
+        if schema_info.get("description"):
+            metadata["description"] = " ".join(schema_info["description"].split())
+    return pa.Table.from_arrays(arrays, schema=pa.schema(fields, metadata=metadata))
+
+
+def write_columnar_table(
+    tsv_content: str,
+    filename: str,
+    output_dir: Path,
+    columnar_format: str,
+    schema_data: Optional[Dict[str, Any]] = None,
+) -> Optional[Path]:
+    """Writes TSV content as a typed Parquet or Arrow IPC file.
+
+    Args:
+        tsv_content: The string content of the TSV file.
+        filename: The original filename (used for table name extraction).
+        output_dir: Directory the columnar file is written to.
+        columnar_format: Either 'parquet' or 'arrow'.
+        schema_data: Optional dictionary containing schema info for all tables.
+
+    Returns:
+        The path of the written file, or None if the TSV had no header.
+    """
+    _require_pyarrow()
+    if columnar_format not in COLUMNAR_FORMATS:
+        raise ColumnarOutputError(f"Unsupported columnar format: {columnar_format}")
+
+    reader = csv.reader(StringIO(tsv_content), delimiter='\t', quotechar='"')
+    try:
+        header = next(reader)
+    except StopIteration:
+        logger.warning("File %s has no header row. Skipping columnar output.", filename)
+        return None
+    data_rows = list(reader)
+
+    table_name = Path(filename).stem
+    schema_info = schema_data.get(table_name) if schema_data else None
+    table = build_arrow_table(header, data_rows, table_name, schema_info)
+
+    output_path = output_dir / f"{table_name}{COLUMNAR_EXTENSIONS[columnar_format]}"
+    with atomic_output_path(output_path) as tmp_path:
+        if columnar_format == "parquet":
+            pq.write_table(
+                table,
+                tmp_path,
+                row_group_size=PARQUET_ROW_GROUP_SIZE,
+                write_statistics=True,
+                compression="zstd",
+            )
+        else:
+            with pa.OSFile(str(tmp_path), "wb") as sink:
+                with pa_ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table, max_chunksize=PARQUET_ROW_GROUP_SIZE)
+    return output_path
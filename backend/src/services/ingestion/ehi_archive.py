@@ -0,0 +1,135 @@
+"""
+Reads an Epic EHI export straight from its ZIP archive.
+
+EhiArchive is a read-only virtual directory over the archive. Members are
+listed and routed by path: TSV tables to the EHR converter, PDFs and TIFs
+under a 'media' folder to the media processor, and RTF notes to the RTF
+processor. Process pool workers open the archive once each and read only
+the members they are handed into memory. Nothing is extracted to disk,
+except scans to OCR: the page renderer needs a file, so those members are
+copied to a temporary directory (see EhiArchive.extract).
+"""
+
+import csv
+import functools
+import logging
+import os
+import shutil
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Any, Dict, List, Optional, Union
+
+from .ehr_parser import CSV_FIELD_SIZE_LIMIT, convert_tsv_bytes
+from .media_processor import classify_media_name, process_pdf_bytes
+from .rtf_processor import convert_rtf_bytes
+from .schema_artifact import get_cached_schema
+
+logger = logging.getLogger(__name__)
+
+# Routing targets, named like the ingestion_orchestrator stages
+ARCHIVE_STAGES = ("ehi_tables", "media", "rich_text")
+
+
+def route_member(name: str) -> Optional[str]:
+    """Returns the stage an archive member belongs to, or None if no stage handles it.
+
+    Args:
+        name: The member's path inside the archive (always '/'-separated).
+    """
+    path = PurePosixPath(name)
+    suffix = path.suffix.lower()
+    if suffix == '.tsv':
+        return "ehi_tables"
+    if suffix == '.rtf':
+        return "rich_text"
+    if any(part.lower() == "media" for part in path.parts[:-1]):
+        return "media"
+    return None
+
+
+class EhiArchive:
+    """Read-only virtual directory over an EHI export ZIP archive."""
+
+    def __init__(self, zip_path: Union[str, Path]):
+        self.zip_path = Path(zip_path)
+        self._zip = zipfile.ZipFile(self.zip_path)
+
+    def __enter__(self) -> "EhiArchive":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._zip.close()
+
+    def files(self, subdir: Optional[str] = None) -> List[zipfile.ZipInfo]:
+        """Lists file members, optionally only those under a folder with the given name (case-insensitive)."""
+        members = [info for info in self._zip.infolist() if not info.is_dir()]
+        if subdir is None:
+            return members
+        subdir = subdir.lower()
+        return [info for info in members if subdir in (part.lower() for part in PurePosixPath(info.filename).parts[:-1])]
+
+    def routed_files(self) -> Dict[Optional[str], List[zipfile.ZipInfo]]:
+        """Groups file members by route_member() stage; unhandled members are under None."""
+        routed: Dict[Optional[str], List[zipfile.ZipInfo]] = {stage: [] for stage in ARCHIVE_STAGES}
+        routed[None] = []
+        for info in self.files():
+            routed[route_member(info.filename)].append(info)
+        return routed
+
+    def read_bytes(self, name: str) -> bytes:
+        """Reads one member into memory (decompressing it, never writing it to disk)."""
+        return self._zip.read(name)
+
+    def open(self, name: str):
+        """Opens one member as a streaming binary file object."""
+        return self._zip.open(name)
+
+    def extract(self, name: str, dest_dir: Path) -> Path:
+        """Copies one member to dest_dir under its base name (streamed, not read into memory)."""
+        dest_dir.mkdir(parents=True, exist_ok=True)
+        path = dest_dir / PurePosixPath(name).name
+        with self._zip.open(name) as member, open(path, "wb") as f:
+            shutil.copyfileobj(member, f)
+        return path
+
+
+@functools.lru_cache(maxsize=2)
+def _open_archive_cached(zip_path: str, mtime_ns: int) -> EhiArchive:
+    return EhiArchive(zip_path)
+
+
+def process_archive_member(
+    zip_path: str,
+    name: str,
+    stage: str,
+    output_dir: Path,
+    schema_path: Optional[str] = None,
+    columnar_format: Optional[str] = None,
+    ocr: bool = False,
+) -> Union[str, Dict[str, Any]]:
+    """Process pool entry point: reads one member and hands it to its stage's converter.
+
+    Each worker process opens the archive once and keeps it open for later members.
+    With ocr, text PDFs with scanned pages are left to OCR (see process_pdf_bytes).
+
+    Returns:
+        For 'ehi_tables', the convert_tsv_bytes() result dictionary; for 'media'
+        and 'rich_text', the outcome name of the media or RTF processor.
+    """
+    archive = _open_archive_cached(zip_path, os.stat(zip_path).st_mtime_ns)
+    filename = PurePosixPath(name).name # Only the base name is used for output paths
+    if stage == "media" and PurePosixPath(name).suffix.lower() != '.pdf':
+        return classify_media_name(filename)
+
+    raw = archive.read_bytes(name)
+    if stage == "ehi_tables":
+        csv.field_size_limit(CSV_FIELD_SIZE_LIMIT)
+        return convert_tsv_bytes(raw, filename, output_dir, get_cached_schema(schema_path), columnar_format)
+    if stage == "media":
+        return process_pdf_bytes(raw, filename, output_dir, ocr)
+    if stage == "rich_text":
+        return convert_rtf_bytes(raw, filename, output_dir)
+    raise ValueError(f"Unknown archive stage '{stage}'. Choose one of: {', '.join(ARCHIVE_STAGES)}")
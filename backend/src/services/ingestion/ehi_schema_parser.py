@@ -3,240 +3,285 @@ Parses HTML schema files from the Epic EHI export to extract table metadata.
 
 Reads .htm files from a specified directory, extracts schema information
 (table description, primary keys, column names, types, descriptions),
-and outputs the consolidated schema as a JSON file.
+and outputs the consolidated schema as a JSON file or a compiled binary
+schema artifact (see schema_artifact).
 """
 
 import argparse
-import json
+import concurrent.futures
 import logging
-import os
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple, Union
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG, format='%(asctime)s - %(levelname)s - %(filename)s:%(lineno)d - %(message)s')
+from lxml import etree
+
+from .schema_artifact import (
+    SchemaArtifactError,
+    file_sha256,
+    load_manifest,
+    load_schema,
+    manifest_path_for,
+    write_manifest,
+    write_schema,
+)
+from .ingestion_logging import ProgressReporter, configure_process_logging
+
+logger = logging.getLogger(__name__)
+
+
+def _class_token(name: str) -> str:
+    """XPath predicate matching elements whose class attribute contains the given token."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# XPath expressions are compiled once at import and reused for every schema page.
+_HTML_PARSER = etree.HTMLParser(encoding='utf-8', remove_comments=True)
+_DESC_TABLE_XPATH = etree.XPath(f"(//table[{_class_token('KeyValue')}])[1]")
+_DESC_TD_XPATH = etree.XPath(f"(.//td[{_class_token('T1Value')}])[1]")
+_SECTION_LIST_XPATH = etree.XPath(
+    f"(//td[. = $header])[1]/ancestor::table[{_class_token('SubHeader3')}][1]"
+)
+_PK_LIST_XPATH = etree.XPath(f"following-sibling::table[{_class_token('List')}][1]")
+_PK_ROW_XPATH = etree.XPath(".//tr")
+_FIRST_TD_XPATH = etree.XPath("(.//td)[1]")
+_COL_TABLE_XPATH = etree.XPath("following-sibling::table[normalize-space(@class) = 'SubList List'][1]")
+_COL_ROWS_XPATH = etree.XPath("(.//tbody)[1]/tr")
+
+# Below this many changed files, parsing runs inline instead of starting a process pool.
+PARALLEL_PARSE_MIN_FILES = 8
+PARSE_CHUNK_SIZE = 16
+
+# Inline style Epic puts on the cells holding column description text.
+DESCRIPTION_STYLE = 'white-space: normal;'
 
-try:
-    from bs4 import BeautifulSoup
-except ImportError:
-    logging.error("BeautifulSoup4 is not installed. Please install it: pip install beautifulsoup4")
-    # Consider adding lxml for performance: pip install lxml
-    exit(1)
 
 def extract_text(element: Optional[Any], default: str = "") -> str:
-    """Safely extract text from a BeautifulSoup element."""
-    return element.get_text(strip=True) if element else default
+    """Safely extract stripped text from an lxml element (matches BeautifulSoup's get_text(strip=True))."""
+    if element is None:
+        return default
+    if len(element) == 0: # Fast path: text-only cell
+        return (element.text or "").strip()
+    return "".join(part.strip() for part in element.itertext())
+
 
-def parse_schema_html(html_content: str) -> Optional[Dict[str, Any]]:
+def parse_schema_html(html_content: Union[str, bytes]) -> Optional[Dict[str, Any]]:
     """Parses a single HTML schema file content.
 
     Args:
-        html_content: The HTML content as a string.
+        html_content: The HTML content as a string or UTF-8 bytes.
 
     Returns:
         A dictionary containing the extracted schema, or None if parsing fails.
     """
     try:
-        soup = BeautifulSoup(html_content, 'lxml') # Use lxml for speed if available, otherwise 'html.parser'
+        if isinstance(html_content, str):
+            html_content = html_content.encode('utf-8')
+        root = etree.fromstring(html_content, _HTML_PARSER)
+        if root is None:
+            logger.warning("Empty HTML document.")
+            return None
         schema: Dict[str, Any] = {}
 
         # --- Extract Table Description ---
-        desc_table = soup.find('table', class_='KeyValue')
-        if desc_table:
-            desc_td = desc_table.find('td', class_='T1Value')
-            schema['description'] = extract_text(desc_td)
+        desc_tables = _DESC_TABLE_XPATH(root)
+        if desc_tables:
+            desc_tds = _DESC_TD_XPATH(desc_tables[0])
+            schema['description'] = extract_text(desc_tds[0] if desc_tds else None)
         else:
             schema['description'] = "No description found."
-            logging.warning("Could not find description table with class 'KeyValue'")
+            logger.warning("Could not find description table with class 'KeyValue'")
 
         # --- Extract Primary Key ---
-        pk_header = soup.find('td', string='Primary Key')
-        if pk_header:
-            pk_table = pk_header.find_parent('table', class_='SubHeader3')
-            if pk_table:
-                list_table = pk_table.find_next_sibling('table', class_='List')
-                if list_table:
-                    pk_rows = list_table.find_all('tr')[1:] # Skip header row
-                    schema['primary_key'] = [extract_text(row.find('td')) for row in pk_rows if row.find('td')]
-                else:
-                    schema['primary_key'] = []
-                    logging.warning("Could not find primary key list table with class 'List' after header.")
+        schema['primary_key'] = []
+        pk_tables = _SECTION_LIST_XPATH(root, header='Primary Key')
+        if pk_tables:
+            list_tables = _PK_LIST_XPATH(pk_tables[0])
+            if list_tables:
+                for row in _PK_ROW_XPATH(list_tables[0])[1:]: # Skip header row
+                    first_td = _FIRST_TD_XPATH(row)
+                    if first_td:
+                        schema['primary_key'].append(extract_text(first_td[0]))
             else:
-                 schema['primary_key'] = []
-                 logging.warning("Could not find parent table for primary key header.")
+                logger.warning("Could not find primary key list table with class 'List' after header.")
         else:
-            schema['primary_key'] = []
-            logging.warning("Could not find 'Primary Key' header td.")
-
+            logger.warning("Could not find 'Primary Key' section (SubHeader3 table).")
 
         # --- Extract Column Information ---
-        col_info_header = soup.find('td', string='Column Information')
+        # Rows with 4+ direct <td> cells define a column; the rows that follow
+        # (until the next definition row) hold its description.
         schema['columns'] = []
-        if col_info_header:
-            col_info_parent_table = col_info_header.find_parent('table', class_='SubHeader3')
-            if col_info_parent_table:
-                logging.debug("Found 'Column Information' parent table (SubHeader3).")
-                col_table = col_info_parent_table.find_next_sibling('table', class_='SubList List')
-                if col_table:
-                    logging.debug("Found column data table ('SubList List') after parent.")
-                    tbody = col_table.find('tbody') # Find the tbody within the table
-                    if tbody:
-                        # Find all direct 'tr' children of the tbody
-                        all_rows_in_section = tbody.find_all('tr', recursive=False)
-                        logging.debug(f"Found {len(all_rows_in_section)} total rows in the column section tbody.")
-                    else:
-                        logging.warning("Could not find tbody within the column data table.")
-                        all_rows_in_section = [] # Ensure it's an empty list if tbody not found
-
-                    current_column = None
-                    rows_processed = 0 # Debugging counter
-                    columns_found = 0 # Debugging counter
-                    i = 0 # Explicitly initialize index before header check
-
-                    # Skip potential header row if present within this table section
-                    if all_rows_in_section and all_rows_in_section[0].find_all('th', recursive=False):
-                        logging.debug("Skipping first row as it appears to be a header row (contains th).")
-                        i = 1
-
-                    while i < len(all_rows_in_section):
-                        row = all_rows_in_section[i]
-                        rows_processed += 1
-                        logging.debug(f"Processing row index {i} (absolute index in section)")
-
-                        # Find ALL direct child TDs, not just those with class T1Head
-                        direct_tds = row.find_all('td', recursive=False)
-                        logging.debug(f"  Row {i} has {len(direct_tds)} direct TD children.")
-
-                        # Simpler check: Does it look like a row defining a column (at least 4 cells)?
-                        is_potential_column_row = len(direct_tds) >= 4
-
-                        if is_potential_column_row:
-                            logging.debug(f"  Row {i} IS potential column definition.")
-                            try:
-                                current_column = {
-                                    'name': extract_text(direct_tds[1]),
-                                    'type': extract_text(direct_tds[2]),
-                                    'discontinued': extract_text(direct_tds[3]),
-                                    'description': '' # Placeholder
-                                }
-                                logging.debug(f"    Extracted basic info for: {current_column.get('name', 'N/A')}")
-                            except IndexError:
-                                logging.warning(f"  Row {i} looked like column def, but IndexError occurred accessing cells 1, 2, or 3.", exc_info=False) # Reduce noise
-                                current_column = None # Reset if extraction failed
-                                i += 1
-                                continue # Skip to next row
-
-                            # Look ahead for the description row(s)
-                            j = i + 1
-                            description_parts = []
-                            while j < len(all_rows_in_section):
-                                next_row = all_rows_in_section[j]
-                                next_row_direct_tds = next_row.find_all('td', recursive=False)
-
-                                # Check if the next row *also* looks like a column definition row
-                                is_next_row_column_def = len(next_row_direct_tds) >= 4
-
-                                if is_next_row_column_def:
-                                    logging.debug(f"    Next row {j} looks like new column def (>=4 TDs). Stopping description search.")
-                                    break # Stop if we hit the next column definition
-
-                                # Otherwise, assume it's part of the description
-                                logging.debug(f"    Assuming row {j} is description.")
-                                desc_td = next_row.find('td', class_='T1Value', style='white-space: normal;')
-                                nested_desc_td = None # Initialize
-                                if not desc_td:
-                                     # Sometimes description is in a nested table structure
-                                    nested_desc_td = next_row.find('td', style='white-space: normal;') # Find any td with this style
-
-                                if desc_td:
-                                    description_parts.append(extract_text(desc_td))
-                                    logging.debug(f"      Found description part in T1Value td.")
-                                elif nested_desc_td:
-                                    description_parts.append(extract_text(nested_desc_td))
-                                    logging.debug(f"      Found description part in nested td (style='white-space: normal;').")
-                                j += 1
-
-                            # Append completed column data
-                            if current_column:
-                                current_column['description'] = ' '.join(description_parts).strip()
-                                logging.debug(f"    Final description for {current_column.get('name', 'N/A')}: '{current_column.get('description', '')[:50]}...'" )
-                                schema['columns'].append(current_column)
-                                columns_found += 1
-                                logging.debug(f"    Appended column {current_column.get('name', 'N/A')}. Total columns found so far: {columns_found}")
-                                current_column = None # Reset for next iteration
-                            i = j # Move main index past description rows
-                        else:
-                            logging.debug(f"  Row {i} is NOT potential column definition (only {len(direct_tds)} TDs). Skipping.")
-                            i += 1 # Move to next row
-
-                    logging.info(f"Finished processing rows for columns. Rows processed: {rows_processed}. Columns appended: {columns_found}")
-                else:
-                    logging.warning("Could not find column data table with class 'SubList List' after parent.")
-            else:
-                 logging.warning("Could not find parent table (SubHeader3) for 'Column Information' header.")
+        col_header_tables = _SECTION_LIST_XPATH(root, header='Column Information')
+        col_tables = _COL_TABLE_XPATH(col_header_tables[0]) if col_header_tables else []
+        if col_tables:
+            rows = _COL_ROWS_XPATH(col_tables[0])
+            if rows and any(child.tag == 'th' for child in rows[0]):
+                rows = rows[1:] # Skip header row
+
+            current_column = None
+            description_parts: List[str] = []
+            for row in rows:
+                direct_tds = row.findall('td')
+                if len(direct_tds) >= 4:
+                    if current_column is not None:
+                        current_column['description'] = ' '.join(description_parts).strip()
+                        schema['columns'].append(current_column)
+                    current_column = {
+                        'name': extract_text(direct_tds[1]),
+                        'type': extract_text(direct_tds[2]),
+                        'discontinued': extract_text(direct_tds[3]),
+                        'description': ''
+                    }
+                    description_parts = []
+                elif current_column is not None:
+                    # Prefer the T1Value cell; sometimes the description is in a nested
+                    # table cell that only carries the style.
+                    desc_td = None
+                    for td in row.iter('td'):
+                        if td.get('style') == DESCRIPTION_STYLE:
+                            if 'T1Value' in (td.get('class') or '').split():
+                                desc_td = td
+                                break
+                            if desc_td is None:
+                                desc_td = td
+                    if desc_td is not None:
+                        description_parts.append(extract_text(desc_td))
+            if current_column is not None:
+                current_column['description'] = ' '.join(description_parts).strip()
+                schema['columns'].append(current_column)
+        elif col_header_tables:
+            logger.warning("Could not find column data table with class 'SubList List' after header.")
         else:
-             logging.warning("Could not find 'Column Information' header td.")
+            logger.warning("Could not find 'Column Information' section (SubHeader3 table).")
 
         if not schema.get('columns'):
-            logging.warning("No columns extracted.")
+            logger.warning("No columns extracted.")
             return None # Indicate failure if no columns found
 
         return schema
 
     except Exception as e:
-        logging.error(f"Error parsing HTML: {e}", exc_info=True)
+        logger.error("Error parsing HTML: %s", e, exc_info=True)
         return None
 
-def parse_all_schemas(schema_dir: Path, output_file: Path) -> None:
-    """Parses all .htm schema files in a directory and saves to JSON.
+def _parse_schema_file(file_path: Path) -> Tuple[Optional[Dict[str, Any]], str]:
+    """Process pool worker: hashes and parses one .htm schema file.
+
+    Returns:
+        A tuple of (schema dict or None, SHA-256 of the file content).
+    """
+    try:
+        raw = file_path.read_bytes()
+    except OSError as e:
+        logger.error("Error reading schema file %s: %s", file_path.name, e)
+        return None, ""
+    digest = file_sha256(raw)
+    try:
+        raw.decode('utf-8')
+    except UnicodeDecodeError:
+        raw = raw.decode('utf-8', errors='ignore').encode('utf-8') # Drop undecodable bytes
+    return parse_schema_html(raw), digest
+
+
+def parse_all_schemas(
+    schema_dir: Path,
+    output_file: Path,
+    max_workers: Optional[int] = None,
+    force: bool = False,
+) -> Dict[str, int]:
+    """Parses all .htm schema files in a directory and saves the consolidated schema.
+
+    Parsing fans out across a process pool. A hash manifest stored next to the
+    output file records the size, mtime and SHA-256 of every parsed page, so
+    unchanged pages are reused from the previous output instead of re-parsed.
 
     Args:
         schema_dir: The directory containing the .htm schema files.
-        output_file: The path to the output JSON file.
+        output_file: The output path. A '.json' path gets compact JSON; any other
+            extension (e.g. 'schema.ehischema') gets the binary schema artifact.
+        max_workers: Optional process pool size. Defaults to the CPU count.
+        force: If True, ignore the manifest and re-parse every file.
+
+    Returns:
+        A dictionary with 'files', 'parsed', 'reused' and 'errors' counts.
     """
+    manifest_file = manifest_path_for(output_file)
+    manifest = load_manifest(manifest_file)
+    previous_schemas: Dict[str, Dict[str, Any]] = {}
+    if not force and manifest["files"] and output_file.is_file():
+        try:
+            previous_schemas = load_schema(output_file)
+        except (SchemaArtifactError, OSError, ValueError) as e:
+            logger.warning("Could not load previous schema output %s, re-parsing all files: %s", output_file, e)
+
+    htm_files = sorted(item for item in schema_dir.iterdir() if item.is_file() and item.suffix.lower() == '.htm')
+    logger.info("Starting schema parsing from directory: %s (%s files)", schema_dir, len(htm_files))
+
     all_schemas: Dict[str, Dict[str, Any]] = {}
-    file_count = 0
+    new_manifest = {"version": manifest["version"], "files": {}}
+    pending: List[Tuple[Path, Dict[str, Any]]] = []
+    reused_count = 0
+
+    # --- Skip unchanged files using the hash manifest ---
+    for item in htm_files:
+        table_name = item.stem # Use filename without extension as table name
+        stat = item.stat()
+        entry = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        previous_entry = manifest["files"].get(item.name)
+        if previous_entry and table_name in previous_schemas:
+            if previous_entry["size"] == entry["size"] and previous_entry["mtime_ns"] == entry["mtime_ns"]:
+                entry["sha256"] = previous_entry["sha256"]
+            else:
+                # Re-extracted exports touch every mtime; the content hash decides.
+                entry["sha256"] = file_sha256(item.read_bytes())
+            if entry["sha256"] == previous_entry["sha256"]:
+                all_schemas[table_name] = previous_schemas[table_name]
+                new_manifest["files"][item.name] = entry
+                reused_count += 1
+                continue
+        pending.append((item, entry))
+
+    # --- Parse new and changed files in parallel ---
     parsed_count = 0
     error_files = []
-
-    logging.info(f"Starting schema parsing from directory: {schema_dir}")
-
-    for item in schema_dir.iterdir():
-        if item.is_file() and item.suffix.lower() == '.htm':
-            file_count += 1
-            table_name = item.stem # Use filename without extension as table name
-            logging.info(f"Parsing schema for table: {table_name} (File: {item.name})")
-            try:
-                with open(item, 'r', encoding='utf-8', errors='ignore') as f:
-                    html_content = f.read()
-                
-                schema_data = parse_schema_html(html_content)
-                
+    if pending:
+        paths = [item for item, _ in pending]
+        if len(paths) < PARALLEL_PARSE_MIN_FILES:
+            results = map(_parse_schema_file, paths)
+            executor = None
+        else:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+            results = executor.map(_parse_schema_file, paths, chunksize=PARSE_CHUNK_SIZE)
+        progress = ProgressReporter(logger, "Parsing schema files", len(paths))
+        try:
+            for done, ((item, entry), (schema_data, digest)) in enumerate(zip(pending, results), start=1):
                 if schema_data:
-                    all_schemas[table_name] = schema_data
+                    all_schemas[item.stem] = schema_data
+                    entry["sha256"] = digest
+                    new_manifest["files"][item.name] = entry
                     parsed_count += 1
                 else:
-                    logging.error(f"Failed to parse schema from file: {item.name}")
                     error_files.append(item.name)
-            except Exception as e:
-                logging.error(f"Error processing file {item.name}: {e}", exc_info=True)
-                error_files.append(item.name)
+                progress.update(done)
+        finally:
+            if executor is not None:
+                executor.shutdown()
 
-    logging.info(f"Finished parsing. Total files found: {file_count}")
-    logging.info(f"Successfully parsed: {parsed_count}")
+    logger.info("Finished parsing. Total files found: %s", len(htm_files))
+    logger.info("Parsed: %s, reused unchanged: %s", parsed_count, reused_count)
     if error_files:
-        logging.warning(f"Errors occurred in {len(error_files)} files: {', '.join(error_files)}")
+        logger.warning("Errors occurred in %s files: %s", len(error_files), ', '.join(error_files))
 
     try:
-        output_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(all_schemas, f, indent=4)
-        logging.info(f"Schema successfully saved to: {output_file}")
+        write_schema(all_schemas, output_file)
+        write_manifest(manifest_file, new_manifest)
+        logger.info("Schema successfully saved to: %s", output_file)
     except IOError as e:
-        logging.error(f"Failed to write schema JSON to {output_file}: {e}")
+        logger.error("Failed to write schema to %s: %s", output_file, e)
+
+    return {"files": len(htm_files), "parsed": parsed_count, "reused": reused_count, "errors": len(error_files)}
 
 if __name__ == "__main__":
-    parser = argparse.ArgumentParser(description="Parse Epic EHI HTML schema files into JSON.")
+    parser = argparse.ArgumentParser(description="Parse Epic EHI HTML schema files into a JSON file or compiled schema artifact.")
     parser.add_argument(
         "schema_dir",
         type=str,
@@ -245,15 +290,32 @@ if __name__ == "__main__":
     parser.add_argument(
         "output_file",
         type=str,
-        help="Path to the output JSON file to save the schema."
+        help="Output path. '.json' writes JSON; any other extension (e.g. schema.ehischema) writes the versioned schema artifact."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Number of parser processes. Defaults to the CPU count."
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Ignore the hash manifest and re-parse every file."
+    )
+    parser.add_argument(
+        "-v", "--verbose",
+        action="store_true",
+        help="Enable debug logging."
     )
     args = parser.parse_args()
+    configure_process_logging(args.verbose)
 
     schema_path = Path(args.schema_dir)
     output_path = Path(args.output_file)
 
     if not schema_path.is_dir():
-        logging.error(f"Error: Schema directory not found or is not a directory: {schema_path}")
+        logger.error("Error: Schema directory not found or is not a directory: %s", schema_path)
         exit(1)
 
-    parse_all_schemas(schema_path, output_path)
+    parse_all_schemas(schema_path, output_path, max_workers=args.workers, force=args.force)
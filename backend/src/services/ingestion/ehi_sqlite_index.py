@@ -0,0 +1,254 @@
+"""
+Bulk-loads EHI TSV tables into a local SQLite database.
+
+One SQLite table is created per EHI table, with declared column types and
+an index on the schema's primary key. A few common join columns
+(patient, encounter, order, note IDs) are indexed as well, so cross-table
+lookups such as an order's results or an encounter's notes become indexed
+queries instead of directory scans.
+"""
+
+import csv
+import logging
+import sqlite3
+from datetime import datetime
+from io import StringIO
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set
+
+from .columnar_writer import EHI_DATETIME_FORMATS, EHI_DECIMAL_TYPES, EHI_FLOAT_TYPES, EHI_INTEGER_TYPES, parse_ehi_type
+
+logger = logging.getLogger(__name__)
+
+# Rows per executemany() call.
+SQLITE_BATCH_SIZE = 5000
+
+# Columns that are frequently used to join EHI tables; indexed wherever present.
+LOOKUP_INDEX_COLUMNS = ("PAT_ID", "PAT_ENC_CSN_ID", "ORDER_PROC_ID", "ORDER_ID", "NOTE_ID")
+
+# Digits SQLite's NUMERIC affinity stores exactly: integers fit in 64 bits up to
+# 18 digits, other values become doubles, exact up to 15 significant digits.
+SQLITE_EXACT_INTEGER_DIGITS = 18
+SQLITE_EXACT_REAL_DIGITS = 15
+
+TABLE_INFO_DDL = (
+    'CREATE TABLE IF NOT EXISTS "_ehi_table_info" ('
+    '"table_name" TEXT PRIMARY KEY, "description" TEXT, "primary_key" TEXT, "row_count" INTEGER)'
+)
+
+
+def _quote(identifier: str) -> str:
+    """Quotes an SQLite identifier."""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def ehi_type_to_sqlite(ehi_type: Optional[str]) -> str:
+    """Maps an EHI schema column type to an SQLite declared type.
+
+    NUMERIC/DECIMAL columns are NUMERIC only when their declared precision is
+    stored exactly by SQLite; otherwise, and without a declared precision, they
+    are TEXT so that long IDs and amounts keep every digit.
+    """
+    base, precision, scale = parse_ehi_type(ehi_type)
+    if base in EHI_INTEGER_TYPES:
+        return "INTEGER"
+    if base in EHI_FLOAT_TYPES:
+        return "REAL"
+    if base in EHI_DECIMAL_TYPES:
+        exact_digits = SQLITE_EXACT_REAL_DIGITS if scale else SQLITE_EXACT_INTEGER_DIGITS
+        return "NUMERIC" if precision is not None and precision <= exact_digits else "TEXT"
+    if base in ("DATETIME", "DATE"):
+        return "DATETIME"
+    return "TEXT"
+
+
+def _normalize_datetime(value: str) -> str:
+    """Converts an EHI datetime to ISO-8601 so it sorts and range-filters correctly."""
+    for fmt in EHI_DATETIME_FORMATS:
+        try:
+            return datetime.strptime(value, fmt).isoformat(sep=" ")
+        except ValueError:
+            continue
+    return value
+
+
+def connect_ehi_index(db_path: Path) -> sqlite3.Connection:
+    """Opens the EHI SQLite index in WAL mode with settings tuned for bulk loading.
+
+    The connection is in autocommit mode; load_table() manages its own transactions.
+    """
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+def load_table(
+    conn: sqlite3.Connection,
+    table_name: str,
+    tsv_content: str,
+    schema_info: Optional[Dict[str, Any]] = None,
+) -> int:
+    """Loads one TSV table into SQLite, replacing any existing copy.
+
+    The whole load runs in one explicit transaction: if it fails, the previous
+    copy of the table and its '_ehi_table_info' row are left untouched.
+
+    Args:
+        conn: Open SQLite connection.
+        table_name: EHI table name (used as the SQLite table name).
+        tsv_content: The string content of the TSV file.
+        schema_info: Optional schema entry for the table ('columns', 'primary_key').
+
+    Returns:
+        The number of rows inserted.
+    """
+    reader = csv.reader(StringIO(tsv_content), delimiter='\t', quotechar='"')
+    try:
+        header = next(reader)
+    except StopIteration:
+        logger.warning("Table %s has no header row. Skipping SQLite load.", table_name)
+        return 0
+
+    column_types = {}
+    if schema_info:
+        column_types = {col["name"]: col.get("type") for col in schema_info.get("columns", [])}
+    declared = [ehi_type_to_sqlite(column_types.get(name)) for name in header]
+    datetime_idx = [i for i, t in enumerate(declared) if t == "DATETIME"]
+    width = len(header)
+
+    def rows() -> Iterable[List[Optional[str]]]:
+        for row in reader:
+            if len(row) < width:
+                row.extend([''] * (width - len(row)))
+            values = [cell.strip() or None for cell in row[:width]]
+            for i in datetime_idx:
+                if values[i]:
+                    values[i] = _normalize_datetime(values[i])
+            yield values
+
+    quoted_table = _quote(table_name)
+    column_defs = ", ".join(f"{_quote(name)} {col_type}" for name, col_type in zip(header, declared))
+    insert_sql = f"INSERT INTO {quoted_table} VALUES ({', '.join('?' * width)})"
+
+    row_count = 0
+    # An explicit BEGIN, as the sqlite3 module would otherwise commit the DROP/CREATE
+    # right away and a failed load would leave an empty table behind.
+    conn.execute("BEGIN")
+    try:
+        conn.execute(f"DROP TABLE IF EXISTS {quoted_table}")
+        conn.execute(f"CREATE TABLE {quoted_table} ({column_defs})")
+
+        batch = []
+        for values in rows():
+            batch.append(values)
+            if len(batch) >= SQLITE_BATCH_SIZE:
+                conn.executemany(insert_sql, batch)
+                row_count += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(insert_sql, batch)
+            row_count += len(batch)
+
+        # Build indexes after the bulk insert; it is much faster than maintaining them per row.
+        primary_key = [col for col in (schema_info or {}).get("primary_key", []) if col in header]
+        if primary_key:
+            conn.execute(
+                f"CREATE INDEX {_quote(f'idx_{table_name}_pk')} ON {quoted_table} "
+                f"({', '.join(_quote(col) for col in primary_key)})"
+            )
+        for col in LOOKUP_INDEX_COLUMNS:
+            if col in header and (not primary_key or primary_key[0] != col):
+                conn.execute(
+                    f"CREATE INDEX {_quote(f'idx_{table_name}_{col}')} ON {quoted_table} ({_quote(col)})"
+                )
+
+        conn.execute(TABLE_INFO_DDL)
+        conn.execute(
+            'INSERT OR REPLACE INTO "_ehi_table_info" VALUES (?, ?, ?, ?)',
+            (
+                table_name,
+                (schema_info or {}).get("description"),
+                ",".join(primary_key),
+                row_count,
+            ),
+        )
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+    return row_count
+
+
+def indexed_tables(db_path: Path) -> Set[str]:
+    """Returns the tables fully loaded into an existing SQLite index (empty if there is none)."""
+    if not db_path.is_file():
+        return set()
+    conn = sqlite3.connect(str(db_path))
+    try:
+        return {row[0] for row in conn.execute('SELECT "table_name" FROM "_ehi_table_info"')}
+    except sqlite3.Error:
+        return set()
+    finally:
+        conn.close()
+
+
+def build_sqlite_index(
+    tsv_files: List[Path],
+    db_path: Path,
+    schema_data: Optional[Dict[str, Any]] = None,
+    cancel_event: Optional[Any] = None,
+    on_table: Optional[Callable[[Path, int], None]] = None,
+) -> Dict[str, int]:
+    """Loads a set of EHI TSV files into an SQLite database.
+
+    Tables already in the database and not in tsv_files are left as they are.
+
+    Args:
+        tsv_files: TSV files to load; each becomes a table named after the file stem.
+        db_path: Path of the SQLite database file (created if missing).
+        schema_data: Optional dictionary containing schema info for all tables.
+        cancel_event: Optional Event; when set, loading stops before the next table.
+        on_table: Optional callback, called with the TSV path and row count once its
+            table is committed (e.g. to journal it for a resumed run).
+
+    Returns:
+        A dictionary with 'tables', 'rows' and 'errors' counts.
+    """
+    # Imported here: ehr_parser imports this module to build the index.
+    from .ehr_parser import decode_tsv_bytes
+
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    stats = {"tables": 0, "rows": 0, "errors": 0}
+    conn = connect_ehi_index(db_path)
+    try:
+        for file_path in tsv_files:
+            if cancel_event is not None and cancel_event.is_set():
+                logger.warning("Cancellation requested. Stopping SQLite load.")
+                break
+            table_name = file_path.stem
+            try:
+                tsv_content = decode_tsv_bytes(file_path.read_bytes(), file_path.name)
+                if tsv_content is None:
+                    logger.error("Failed to decode %s for SQLite load. Skipping.", file_path.name)
+                    stats["errors"] += 1
+                    continue
+                schema_info = schema_data.get(table_name) if schema_data else None
+                rows = load_table(conn, table_name, tsv_content, schema_info)
+                stats["rows"] += rows
+                stats["tables"] += 1
+                if on_table is not None:
+                    on_table(file_path, rows)
+            except (sqlite3.Error, csv.Error, OSError) as e:
+                logger.error("Failed to load %s into SQLite: %s", file_path.name, e, exc_info=True)
+                stats["errors"] += 1
+        conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+
+    logger.info(
+        "SQLite index built at %s: %d tables, %d rows, %d errors.",
+        db_path, stats["tables"], stats["rows"], stats["errors"],
+    )
+    return stats
@@ -2,11 +2,10 @@
 import argparse
 import csv
 import logging
-import sys
 import json 
 from io import StringIO
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Callable
 import concurrent.futures 
 import functools
 import xml.etree.ElementTree as ET
@@ -14,12 +13,15 @@ from fhir.resources.bundle import Bundle
 from fhir.resources.patient import Patient
 from fhir.resources.observation import Observation 
 
-# Configure logging
-# Set level to INFO for less verbose output during normal runs
-# Change to DEBUG if needed for detailed tracing
-# logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from .columnar_writer import COLUMNAR_EXTENSIONS, COLUMNAR_FORMATS, write_columnar_table
+from .ehi_sqlite_index import build_sqlite_index, indexed_tables
+from .schema_artifact import SchemaArtifactError, get_cached_schema
+from .ingestion_logging import ProgressReporter, configure_process_logging, set_verbosity
+from .run_journal import RunJournal, atomic_write_text, source_signature
+from .text_decoding import decode_bytes
 
-# Define logger at the global scope
+# Define logger at the global scope. Handlers and levels are configured by the application
+# (or by configure_process_logging() when run from the command line).
 logger = logging.getLogger(__name__)
 
 # Custom exception for FHIR parsing errors
@@ -27,12 +29,9 @@ class FHIRParsingError(Exception):
     """Raised when FHIR resource parsing fails."""
     pass
 
-# TODO: Enhance this parser/pipeline. When processing an extracted EHR ZIP archive,
-# this script (or the calling ingestion route) should identify non-TSV/HTM files
-# (e.g., PDFs in 'media/', images like JPG/PNG) based on path and extension.
-# These identified files should be routed to their respective dedicated ingestion
-# pipelines (e.g., PDF summarization, image processing) instead of being ignored
-# or causing errors here. The current focus is only on TSV/HTM conversion.
+# EHI exports arrive as ZIP archives. ehi_archive routes archive members by path
+# (TSVs here via convert_tsv_bytes, 'media/' PDFs/TIFs and RTFs to their own
+# processors) without extracting them; see ingestion_orchestrator.
 
 def parse_fhir_resource(file_path):
     """
@@ -119,31 +118,12 @@ def parse_fhir_resource(file_path):
             raise
         raise FHIRParsingError(f"Failed to parse FHIR resource: {e}")
 
-def detect_encoding(file_path: Path, encodings_to_try: List[str]) -> Optional[str]:
-    """Attempts to detect the encoding of a file by trying a list of common encodings."""
-    for enc in encodings_to_try:
-        try:
-            with open(file_path, 'r', encoding=enc) as f:
-                f.read()  # Try reading the file content
-            # Use debug level for successful detection unless debugging
-            logger.debug(f"Successfully detected encoding '{enc}' for {file_path.name}")
-            return enc
-        except UnicodeDecodeError:
-            logger.debug(f"Encoding '{enc}' failed for {file_path.name}")
-            continue
-        except Exception as e:
-            logger.error(f"Unexpected error while trying encoding '{enc}' for {file_path.name}: {e}")
-            continue
-    return None
+# Common encodings for EHI TSV exports, tried in order
+TSV_ENCODINGS = ['utf-8', 'cp1252', 'latin-1']
 
-def read_tsv_content(file_path: Path, encoding: str) -> str:
-    """Reads the content of a TSV file with the specified encoding."""
-    try:
-        with open(file_path, 'r', encoding=encoding) as f:
-            return f.read()
-    except Exception as e:
-        logger.error(f"Error reading file {file_path.name} with encoding {encoding}: {e}")
-        raise # Re-raise exception to be handled in the main loop
+def decode_tsv_bytes(raw: bytes, name: str, encodings_to_try: List[str] = TSV_ENCODINGS) -> Optional[str]:
+    """Decodes TSV bytes with the first encoding that works, or returns None."""
+    return decode_bytes(raw, name, encodings_to_try)[0]
 
 def tsv_to_markdown(tsv_content: str, filename: str, schema_data: Optional[Dict[str, Any]] = None) -> str:
     """Converts TSV content string to a Markdown formatted table string.
@@ -158,7 +138,7 @@ def tsv_to_markdown(tsv_content: str, filename: str, schema_data: Optional[Dict[
     """
     lines = tsv_content.strip().split('\n')
     if not lines:
-        logger.warning(f"Skipping empty file: {filename}")
+        logger.warning("Skipping empty file: %s", filename)
         return ""
 
     # Use StringIO to handle the string content as a file-like object for csv.reader
@@ -169,34 +149,22 @@ def tsv_to_markdown(tsv_content: str, filename: str, schema_data: Optional[Dict[
         # Convert reader iterator to list to check if data rows exist
         data_rows = list(reader)
         if not data_rows:
-             logger.warning(f"File {filename} has header but no data rows. Skipping content generation.")
+             logger.warning("File %s has header but no data rows. Skipping content generation.", filename)
              return f"# {filename}\n\n_(Header only, no data rows found in TSV)_" # Indicate header-only
 
     except StopIteration:
-         logger.warning(f"File {filename} seems to be empty (no header found). Skipping.")
+         logger.warning("File %s seems to be empty (no header found). Skipping.", filename)
          return "" # Handle files with no header
     except Exception as e:
-        logger.error(f"Error parsing CSV data in {filename}: {e}", exc_info=True)
+        logger.error("Error parsing CSV data in %s: %s", filename, e, exc_info=True)
         # Return an error message within the Markdown structure
         return f"# {filename}\n\nError parsing TSV content: {e}"
 
 
     table_name = Path(filename).stem
-    # --- Debug schema lookup ---
-    logger.debug(f"--- DEBUG [tsv_to_markdown]: Processing filename: {filename}, Extracted table_name: {table_name}")
-    if schema_data:
-        logger.debug(f"--- DEBUG [tsv_to_markdown]: Schema data is available (Keys: {len(schema_data)}). Attempting lookup for '{table_name}'...")
-        schema_info = schema_data.get(table_name)
-        if schema_info:
-            logger.debug(f"--- DEBUG [tsv_to_markdown]: Schema info FOUND for '{table_name}'. Description: {schema_info.get('description', 'N/A')[:50]}...")
-        else:
-            logger.debug(f"--- DEBUG [tsv_to_markdown]: Schema info NOT FOUND for key '{table_name}'.")
-            # Add a check for case variations or common prefixes/suffixes if needed
-            # Example: check_variations(table_name, schema_data.keys())
-    else:
-        logger.debug("--- DEBUG [tsv_to_markdown]: Schema data is None.")
-        schema_info = None
-    # --- End Debug ---
+    schema_info = schema_data.get(table_name) if schema_data else None
+    if schema_data and schema_info is None:
+        logger.debug("No schema entry for table '%s'.", table_name)
 
     markdown_output = f"# {filename} (`{table_name}`)\n\n" # Add table name in backticks
 
@@ -216,16 +184,19 @@ def tsv_to_markdown(tsv_content: str, filename: str, schema_data: Optional[Dict[
     markdown_output += "|--" + "|--".join(['-'] * len(header)) + "|\n" # Simpler header separator
 
     # Create Markdown table rows
+    truncated_rows = 0
     for row in data_rows:
         # Ensure row has the same number of columns as header, padding if necessary
         if len(row) < len(header):
             row.extend([''] * (len(header) - len(row)))
         elif len(row) > len(header):
-            logger.warning(f"Row in {filename} has more columns ({len(row)}) than header ({len(header)}). Truncating.")
+            truncated_rows += 1
             row = row[:len(header)] # Truncate if too long
         # Escape pipe characters within cells
         processed_row = [cell.strip().replace('|', '\\|') for cell in row]
         markdown_output += "| " + " | ".join(processed_row) + " |\n"
+    if truncated_rows:
+        logger.warning("%d rows in %s have more columns than the header (%d). Truncated.", truncated_rows, filename, len(header))
 
     # Add Column Definitions section
     if schema_info and 'columns' in schema_info:
@@ -244,171 +215,367 @@ def tsv_to_markdown(tsv_content: str, filename: str, schema_data: Optional[Dict[
                 markdown_output += f"| `{col_name}` | `{col_type}` | {col_desc} |\n"
             else:
                 # It's expected some columns might not be in schema. Log only if debugging.
-                logger.debug(f"No schema definition found for column '{col_name}' in table '{table_name}'.")
+                logger.debug("No schema definition found for column '%s' in table '%s'.", col_name, table_name)
                 markdown_output += f"| `{col_name}` | N/A | _No schema definition found_ |\n"
 
     return markdown_output
 
 
 # --- Individual File Processing --- # Renamed section comment
-def process_file(file_path: Path, output_dir: Path, schema_data: Optional[Dict[str, Any]] = None):
-    """Processes a single TSV file and writes its Markdown representation.
+def convert_tsv_bytes(raw: bytes, filename: str, output_dir: Path, schema_data: Optional[Dict[str, Any]] = None, columnar_format: Optional[str] = None) -> Dict[str, Any]:
+    """Converts the raw bytes of one TSV file and writes its Markdown representation.
+
+    Shared by process_file() and archive ingestion, which reads members straight
+    from a ZIP without extracting them.
 
     Args:
-        file_path: Path to the input TSV file.
+        raw: The undecoded TSV content.
+        filename: The TSV file name (used for the table name and output file name).
         output_dir: Path to the output directory.
         schema_data: Optional dictionary containing schema info for the table.
+        columnar_format: Optional 'parquet' or 'arrow'. When set, a typed columnar
+            file is written next to the Markdown file.
 
     Returns:
-        None on success. Can be modified to return status or error info.
+        A dictionary with 'status' ('processed', 'skipped' or 'error'), 'rows'
+        (data lines in the TSV) and 'bytes' (size of the input).
     """
-    logger.debug(f"Starting processing for file: {file_path.name}")
-    encodings_to_try = ['utf-8', 'cp1252', 'latin-1'] # Common encodings
-    detected_encoding = detect_encoding(file_path, encodings_to_try)
+    result = {"status": "error", "rows": 0, "bytes": len(raw)}
 
-    if not detected_encoding:
-        logger.error(f"Failed to decode {file_path.name} with tried encodings: {', '.join(encodings_to_try)}. Skipping.")
-        return # Indicate error or skip
+    tsv_content = decode_tsv_bytes(raw, filename)
+    if tsv_content is None:
+        logger.error("Failed to decode %s with tried encodings: %s. Skipping.", filename, ', '.join(TSV_ENCODINGS))
+        return result
 
     try:
-        # Read content using the detected encoding
-        tsv_content = read_tsv_content(file_path, detected_encoding)
-
         # Check if the file is empty or only contains whitespace after reading
         if not tsv_content.strip():
-            logger.warning(f"File {file_path.name} is empty or contains only whitespace after reading. Skipping.")
-            return # Indicate skip
+            logger.warning("File %s is empty or contains only whitespace after reading. Skipping.", filename)
+            result["status"] = "skipped"
+            return result
 
         # Convert to Markdown
-        markdown_content = tsv_to_markdown(tsv_content, file_path.name, schema_data)
+        markdown_content = tsv_to_markdown(tsv_content, filename, schema_data)
 
         if not markdown_content:
              # tsv_to_markdown logs warnings for header-only files or parsing errors resulting in empty content
-             logger.warning(f"No Markdown content generated for {file_path.name}. Skipping file write.")
-             return # Indicate skip or specific status if needed
+             logger.warning("No Markdown content generated for %s. Skipping file write.", filename)
+             result["status"] = "skipped"
+             return result
 
         # Write the generated Markdown content
-        output_file_path = output_dir / f"{file_path.stem}.md"
-        with open(output_file_path, 'w', encoding='utf-8') as file:
-            file.write(markdown_content)
-        # logger.info(f"Successfully converted {file_path.name} to {output_file_path.name}") # Too verbose for parallel
+        output_file_path = output_dir / f"{Path(filename).stem}.md"
+        atomic_write_text(output_file_path, markdown_content)
+
+        if columnar_format:
+            write_columnar_table(tsv_content, filename, output_dir, columnar_format, schema_data)
+
+        result["rows"] = tsv_content.strip().count('\n') # Data lines after the header
+        result["status"] = "processed"
 
     except Exception as e:
-        logger.error(f"Failed to process {file_path.name} during read/convert/write: {e}", exc_info=True)
-        return # Indicate error
+        logger.error("Failed to process %s during convert/write: %s", filename, e, exc_info=True)
+
+    return result
+
+
+def process_file(file_path: Path, output_dir: Path, schema_data: Optional[Dict[str, Any]] = None, columnar_format: Optional[str] = None) -> Dict[str, Any]:
+    """Processes a single TSV file and writes its Markdown representation.
+
+    Args:
+        file_path: Path to the input TSV file.
+        output_dir: Path to the output directory.
+        schema_data: Optional dictionary containing schema info for the table.
+        columnar_format: Optional 'parquet' or 'arrow'. When set, a typed columnar
+            file is written next to the Markdown file.
+
+    Returns:
+        A dictionary with 'status' ('processed', 'skipped' or 'error'), 'rows'
+        (data lines in the TSV) and 'bytes' (size of the input file).
+    """
+    logger.debug("Starting processing for file: %s", file_path.name)
+    try:
+        raw = file_path.read_bytes() # Read once; decoding is tried on the bytes
+    except OSError as e:
+        logger.error("Error reading file %s: %s", file_path.name, e)
+        return {"status": "error", "rows": 0, "bytes": 0}
+    return convert_tsv_bytes(raw, file_path.name, output_dir, schema_data, columnar_format)
+
 
-    return None # Indicate success
+def _process_file_worker(file_path: Path, output_dir: Path, schema_path: Optional[str] = None, columnar_format: Optional[str] = None) -> Dict[str, Any]:
+    """Process pool entry point. Loads the schema (JSON file or schema artifact) once per
+    worker process instead of pickling the whole schema into every task."""
+    # Workers started before the limit was raised (or not forked) do not inherit it.
+    csv.field_size_limit(CSV_FIELD_SIZE_LIMIT)
+    return process_file(file_path, output_dir, get_cached_schema(schema_path), columnar_format)
 
 
 # --- Main Parsing Orchestration --- # Added new function
-def run_ehr_parsing(input_dir: str, output_dir: Optional[str] = None, schema_json: Optional[str] = None, verbose: bool = False):
+# Use a large but reasonable limit to prevent potential DoS via excessively large fields
+CSV_FIELD_SIZE_LIMIT = 1024 * 1024 # 1MB limit per field
+
+# Maps process_file() statuses to run_ehr_parsing() counters
+STATUS_COUNTERS = {"processed": "processed", "skipped": "skipped", "error": "errors"}
+
+def _add_file_result(stats: Dict[str, Any], result: Dict[str, Any]) -> None:
+    stats[STATUS_COUNTERS[result["status"]]] += 1
+    stats["rows"] += result["rows"]
+    stats["bytes_done"] += result["bytes"]
+    stats["files_done"] += 1
+
+def _ehr_outputs(file_path: Path, output_dir: Path, result: Dict[str, Any], columnar_format: Optional[str]) -> List[Path]:
+    """Output files written for a TSV, as recorded in the run journal."""
+    if result["status"] != "processed":
+        return []
+    outputs = [output_dir / f"{file_path.stem}.md"]
+    if columnar_format:
+        outputs.append(output_dir / f"{file_path.stem}{COLUMNAR_EXTENSIONS[columnar_format]}")
+    return outputs
+
+def run_ehr_parsing(
+    input_dir: str,
+    output_dir: Optional[str] = None,
+    schema_json: Optional[str] = None,
+    verbose: bool = False,
+    columnar_format: Optional[str] = None,
+    sqlite_db: Optional[str] = None,
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancel_event: Optional[Any] = None,
+    executor: Optional[concurrent.futures.Executor] = None,
+    resume: bool = False,
+) -> Optional[Dict[str, Any]]:
     """Runs the EHR TSV to Markdown conversion process.
 
     Args:
         input_dir: Path string to the input directory containing TSV files.
         output_dir: Optional path string to the output directory. Defaults to adjacent dir.
-        schema_json: Optional path string to the JSON schema file.
-        verbose: If True, sets logging level to DEBUG.
-    """
-    # --- Logging Setup ---
-    log_level = logging.DEBUG if verbose else logging.INFO
-    # Ensure handlers are not added multiple times if called repeatedly
-    if not logger.handlers:
-        handler = logging.StreamHandler(sys.stdout)
-        formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
-    logger.setLevel(log_level)
+        schema_json: Optional path string to the schema file: JSON or a compiled schema
+            artifact written by ehi_schema_parser.
+        verbose: If True, sets the EHR parser's log level to DEBUG for this run; the
+            previous level is restored when it returns. Handlers are never added here;
+            see ingestion_logging for per-subsystem verbosity.
+        columnar_format: Optional 'parquet' or 'arrow'. Also writes each table as a typed
+            columnar file (types taken from the schema JSON) alongside the Markdown.
+        sqlite_db: Optional path string to an SQLite database. When set, every TSV is also
+            bulk-loaded into it, one table per EHI table, indexed on the schema primary keys.
+            Loaded tables are journaled too, so a resumed run only loads what is left.
+        progress_callback: Optional callable invoked with the running counters
+            (see the returned dictionary) after every completed file.
+        cancel_event: Optional threading/multiprocessing Event. When set, files that have
+            not started yet are cancelled and the run stops early.
+        executor: Optional process pool to run the conversions on (e.g. one shared with
+            the other ingestion stages). It is not shut down here. Defaults to a
+            private ProcessPoolExecutor for this run.
+        resume: If True, continue a previous run into the same output directory: files
+            recorded in its run journal whose source and outputs are unchanged are not
+            converted again. Otherwise the journal is started afresh.
 
+    Returns:
+        A dictionary of counters ('files_total', 'files_done', 'processed', 'skipped',
+        'errors', 'rows', 'bytes_total', 'bytes_done', 'cancelled', 'resumed'), or None if the
+        run could not start (invalid input directory or options).
+    """
+    previous_level = set_verbosity(logging.DEBUG, "ehr") if verbose else None
+    try:
+        return _run_ehr_parsing(
+            input_dir, output_dir, schema_json, columnar_format, sqlite_db,
+            progress_callback, cancel_event, executor, resume,
+        )
+    finally:
+        if previous_level is not None:
+            set_verbosity(previous_level, "ehr")
+
+
+def _run_ehr_parsing(
+    input_dir: str,
+    output_dir: Optional[str],
+    schema_json: Optional[str],
+    columnar_format: Optional[str],
+    sqlite_db: Optional[str],
+    progress_callback: Optional[Callable[[Dict[str, Any]], None]],
+    cancel_event: Optional[Any],
+    executor: Optional[concurrent.futures.Executor],
+    resume: bool,
+) -> Optional[Dict[str, Any]]:
+    """Body of run_ehr_parsing, run with the caller's verbosity already applied."""
     logger.info("--- Starting EHR Parsing --- ")
-    logger.debug(f"Verbose mode enabled.")
 
     # --- Path and Schema Handling ---
     input_path = Path(input_dir)
     if not input_path.is_dir():
-        logger.error(f"Input path is not a valid directory: {input_dir}")
-        return # Exit if input dir is invalid
+        logger.error("Input path is not a valid directory: %s", input_dir)
+        return None # Exit if input dir is invalid
 
     if output_dir:
         output_dir_path = Path(output_dir)
-        logger.info(f"Using specified output directory: {output_dir_path}")
+        logger.info("Using specified output directory: %s", output_dir_path)
     else:
         output_dir_path = input_path.parent / f"{input_path.name}_Markdown"
-        logger.info(f"Output directory not specified, defaulting to: {output_dir_path}")
+        logger.info("Output directory not specified, defaulting to: %s", output_dir_path)
 
     output_dir_path.mkdir(parents=True, exist_ok=True)
 
+    if columnar_format and columnar_format not in COLUMNAR_FORMATS:
+        logger.error("Unsupported columnar format: %s. Choose one of: %s", columnar_format, ', '.join(COLUMNAR_FORMATS))
+        return None
+
     schema_json_path = Path(schema_json) if schema_json else None
     loaded_schema_data = None
     if schema_json_path and schema_json_path.is_file():
         try:
-            with open(schema_json_path, 'r', encoding='utf-8') as f:
-                loaded_schema_data = json.load(f)
-            logger.info(f"Successfully loaded schema data from: {schema_json_path.name}")
-            logger.debug(f"Schema contains {len(loaded_schema_data)} table definitions.")
-        except json.JSONDecodeError as e:
-            logger.error(f"Error decoding JSON schema file {schema_json_path.name}: {e}", exc_info=True)
+            loaded_schema_data = get_cached_schema(str(schema_json_path))
+            logger.info("Successfully loaded schema data from: %s", schema_json_path.name)
+            logger.debug("Schema contains %s table definitions.", len(loaded_schema_data))
+        except (json.JSONDecodeError, SchemaArtifactError) as e:
+            logger.error("Error decoding schema file %s: %s", schema_json_path.name, e, exc_info=True)
         except Exception as e:
-            logger.error(f"Error reading schema file {schema_json_path.name}: {e}", exc_info=True)
+            logger.error("Error reading schema file %s: %s", schema_json_path.name, e, exc_info=True)
     elif schema_json:
-         logger.warning(f"Schema file specified but not found or not a file: {schema_json_path}")
+         logger.warning("Schema file specified but not found or not a file: %s", schema_json_path)
 
     if not loaded_schema_data:
         logger.warning("Proceeding without schema data. Markdown files will not include schema details.")
 
     # Increase CSV field size limit
-    # Use a large but reasonable limit to prevent potential DoS via excessively large fields
-    new_limit = 1024 * 1024 # 1MB limit per field
     try:
-        csv.field_size_limit(new_limit)
-        logger.debug(f"Set CSV field size limit to {new_limit} bytes.")
+        csv.field_size_limit(CSV_FIELD_SIZE_LIMIT)
+        logger.debug("Set CSV field size limit to %s bytes.", CSV_FIELD_SIZE_LIMIT)
     except Exception as e:
-        logger.error(f"Failed to set CSV field size limit: {e}")
+        logger.error("Failed to set CSV field size limit: %s", e)
         logger.warning("Could not increase CSV field size limit. Processing may fail for files with very large fields.")
 
     # --- Parallel File Processing ---
     tsv_files = [item for item in input_path.iterdir() if item.is_file() and item.suffix.lower() == '.tsv']
     total_files = len(tsv_files)
-    logger.info(f"Found {total_files} TSV files to process.")
+    logger.info("Found %s TSV files to process.", total_files)
+
+    stats = {
+        "files_total": total_files,
+        "files_done": 0,
+        "processed": 0,
+        "skipped": 0,
+        "errors": 0,
+        "rows": 0,
+        "bytes_total": sum(item.stat().st_size for item in tsv_files),
+        "bytes_done": 0,
+        "cancelled": False,
+        "resumed": 0,
+    }
 
     if not tsv_files:
         logger.info("No TSV files found in the input directory. Exiting.")
-        return
-
-    # Use functools.partial to pass fixed arguments (output_dir, schema_data) to process_file
-    process_file_partial = functools.partial(process_file, output_dir=output_dir_path, schema_data=loaded_schema_data)
-
-    processed_count = 0
-    skipped_count = 0 # Track skips based on return value from process_file if modified
-    error_count = 0
-
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        futures = {executor.submit(process_file_partial, file_path): file_path for file_path in tsv_files}
+        return stats
+
+    # Completed files are journaled; a resumed run only converts what is left.
+    journal = RunJournal(
+        output_dir_path,
+        config={"schema": source_signature(schema_json_path) if loaded_schema_data else None, "columnar_format": columnar_format},
+        resume=resume,
+    )
+    pending_files = []
+    for file_path in tsv_files:
+        source = source_signature(file_path)
+        previous = journal.completed_result(file_path.name, source) if resume else None
+        if previous is None:
+            pending_files.append((file_path, source))
+        else:
+            _add_file_result(stats, previous)
+            stats["resumed"] += 1
+    if stats["resumed"]:
+        logger.info("Resuming: %d of %d files already completed.", stats["resumed"], total_files)
+
+    # Use functools.partial to pass fixed arguments to the worker. Workers receive the schema
+    # path rather than the schema itself and load it once per process.
+    process_file_partial = functools.partial(
+        _process_file_worker,
+        output_dir=output_dir_path,
+        schema_path=str(schema_json_path) if loaded_schema_data else None,
+        columnar_format=columnar_format,
+    )
+
+    # SQLite allows a single writer, so the index is loaded on one thread in this process,
+    # overlapping with the Markdown conversion running in the worker processes.
+    sqlite_executor = None
+    sqlite_future = None
+    if sqlite_db:
+        sqlite_path = Path(sqlite_db).resolve()
+        # Journal units of the index; the table must also still be in the database
+        sqlite_sources = {
+            file_path: {**source_signature(file_path), "sqlite_db": str(sqlite_path)} for file_path in tsv_files
+        }
+        loaded = indexed_tables(sqlite_path) if resume else set()
+        sqlite_files = [
+            file_path for file_path in tsv_files
+            if file_path.stem not in loaded
+            or journal.completed_result(f"sqlite:{file_path.name}", sqlite_sources[file_path]) is None
+        ]
+        if len(sqlite_files) < len(tsv_files):
+            logger.info("Resuming SQLite index: %d of %d tables already loaded.", len(tsv_files) - len(sqlite_files), len(tsv_files))
+
+        def record_table(file_path: Path, rows: int) -> None:
+            journal.record(f"sqlite:{file_path.name}", sqlite_sources[file_path], {"rows": rows}, [])
+
+        sqlite_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        sqlite_future = sqlite_executor.submit(
+            build_sqlite_index, sqlite_files, sqlite_path, loaded_schema_data, cancel_event, record_table
+        )
+
+    progress = ProgressReporter(logger, "EHR files", total_files)
+    own_executor = executor is None
+    if own_executor:
+        executor = concurrent.futures.ProcessPoolExecutor()
+    try:
+        futures = {executor.submit(process_file_partial, file_path): (file_path, source) for file_path, source in pending_files}
 
         for future in concurrent.futures.as_completed(futures):
-            file_path = futures[future]
+            file_path, source = futures[future]
+            try:
+                result = future.result()
+            except concurrent.futures.CancelledError:
+                continue
+            except Exception as e:
+                logger.error("Error processing file %s in worker: %s", file_path.name, e, exc_info=True)
+                result = {"status": "error", "rows": 0, "bytes": 0}
+            _add_file_result(stats, result)
+            if result["status"] != "error":
+                journal.record(file_path.name, source, result, _ehr_outputs(file_path, output_dir_path, result, columnar_format))
+            if progress_callback is not None:
+                progress_callback(dict(stats))
+            progress.update(stats["files_done"])
+
+            if cancel_event is not None and cancel_event.is_set() and not stats["cancelled"]:
+                logger.warning("Cancellation requested. Cancelling files that have not started yet.")
+                stats["cancelled"] = True
+                for pending in futures:
+                    pending.cancel()
+    finally:
+        if own_executor:
+            executor.shutdown()
+        if sqlite_future is not None:
+            # The index thread journals its tables, so it finishes before the journal is closed
             try:
-                result = future.result() # result is None on success, could indicate skip/error if modified
-                if result is None: # Assuming None means success
-                    processed_count += 1
-                    # logger.debug(f"Successfully processed: {file_path.name}") # Too verbose
-                # else: # Handle skipped/error results if process_file returns specific values
-                    # skipped_count += 1 # Example
+                sqlite_stats = sqlite_future.result()
+                logger.info("SQLite index: %s tables, %s rows loaded into %s", sqlite_stats['tables'], sqlite_stats['rows'], sqlite_db)
             except Exception as e:
-                logger.error(f"Error processing file {file_path.name} in worker: {e}", exc_info=True)
-                error_count += 1
+                logger.error("Error building SQLite index %s: %s", sqlite_db, e, exc_info=True)
             finally:
-                 current_done = processed_count + error_count + skipped_count
-                 if current_done % 100 == 0 or current_done == total_files:
-                     logger.info(f"Progress: {current_done}/{total_files} files processed.")
+                sqlite_executor.shutdown()
+        journal.close()
 
     logger.info("--- Processing Summary --- ")
-    logger.info(f"Total TSV files found: {total_files}")
-    logger.info(f"Successfully processed: {processed_count}")
-    logger.info(f"Skipped (e.g., empty/header-only/decode failed): {skipped_count}") # Requires process_file return status
-    logger.info(f"Errors (during worker execution): {error_count}")
-    logger.info(f"Markdown files saved to: {output_dir_path}")
+    logger.info("Total TSV files found: %s", total_files)
+    logger.info("Successfully processed: %s", stats['processed'])
+    if stats["resumed"]:
+        logger.info("Already completed in a previous run: %s", stats["resumed"])
+    logger.info("Skipped (e.g., empty/header-only): %s", stats['skipped'])
+    logger.info("Errors (decode failures or worker errors): %s", stats['errors'])
+    if stats["cancelled"]:
+        logger.info("Cancelled before processing: %s", total_files - stats['files_done'])
+    logger.info("Markdown files saved to: %s", output_dir_path)
+    if columnar_format:
+        logger.info("Columnar (%s) files saved to: %s", columnar_format, output_dir_path)
     logger.info("--- EHR Parsing Finished --- ")
+    return stats
 
 
 # --- Command-Line Interface --- # Added section comment
@@ -416,14 +583,21 @@ if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Convert TSV files in a directory to Markdown tables, optionally enriching with schema data.')
     parser.add_argument('input_dir', type=str, help='Input directory containing TSV files.')
     parser.add_argument('--output-dir', type=str, default=None, help='Optional: Output directory for Markdown files. Defaults to <input_dir>_Markdown next to the input directory.')
-    parser.add_argument('--schema-json', type=str, help='Optional path to the JSON file containing schema definitions.')
-    parser.add_argument('-v', '--verbose', action='store_true', help='Enable debug print statements.')
+    parser.add_argument('--schema-json', type=str, help='Optional path to the schema definitions (JSON or compiled schema artifact).')
+    parser.add_argument('--columnar', choices=COLUMNAR_FORMATS, default=None, help='Optional: Also write each table as a typed Parquet or Arrow IPC file.')
+    parser.add_argument('--sqlite-db', type=str, default=None, help='Optional: Also bulk-load every table into this SQLite database, indexed on schema primary keys.')
+    parser.add_argument('--resume', action='store_true', help='Continue a previous run into the same output directory, skipping files it already completed.')
+    parser.add_argument('-v', '--verbose', action='store_true', help='Enable debug logging.')
     args = parser.parse_args()
+    configure_process_logging(args.verbose)
 
     # Call the main orchestration function
     run_ehr_parsing(
         input_dir=args.input_dir,
         output_dir=args.output_dir,
         schema_json=args.schema_json,
-        verbose=args.verbose
+        verbose=args.verbose,
+        columnar_format=args.columnar,
+        sqlite_db=args.sqlite_db,
+        resume=args.resume
     )
\ No newline at end of file
@@ -0,0 +1,256 @@
+"""
+Background EHR ingestion jobs.
+
+Each ingestion run is a job with an id, executed in its own worker process
+(never inside the API server process). Progress counters live in shared
+memory so the API can report files/bytes done, rows per second and an ETA
+without any polling traffic from the worker. Jobs can be cancelled, and the
+number of concurrently running jobs is capped.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from enum import Enum
+from typing import Any, Dict, List, Optional
+
+from .ehr_parser import run_ehr_parsing
+from .ingestion_logging import configure_process_logging
+
+logger = logging.getLogger(__name__)
+
+# Layout of the shared counter array written by the worker process.
+COUNTER_FIELDS = (
+    "files_total",
+    "files_done",
+    "bytes_total",
+    "bytes_done",
+    "rows",
+    "errors",
+    "skipped",
+    "cancelled",
+    "started_at",
+    "finished_at",
+)
+_IDX = {name: i for i, name in enumerate(COUNTER_FIELDS)}
+
+# Finished jobs kept in memory for status lookups.
+MAX_FINISHED_JOBS = 50
+
+# Size of the shared buffer holding a failed worker's error message (longer ones are truncated).
+ERROR_MESSAGE_BYTES = 1024
+
+
+class IngestionJobStatus(str, Enum):
+    """Lifecycle states of an ingestion job."""
+    RUNNING = "RUNNING"
+    CANCELLING = "CANCELLING"
+    COMPLETED = "COMPLETED"
+    CANCELLED = "CANCELLED"
+    FAILED = "FAILED"
+
+
+class IngestionCapacityError(Exception):
+    """Raised when the concurrent ingestion job cap has been reached."""
+    pass
+
+
+def _run_ehr_job(params: Dict[str, Any], counters: Any, cancel_event: Any, error: Any) -> None:
+    """Worker process entry point: runs the EHR parser and mirrors its counters (and its error, if it fails)."""
+    configure_process_logging(params.get("verbose", False))
+    counters[_IDX["started_at"]] = time.time()
+
+    def on_progress(stats: Dict[str, Any]) -> None:
+        with counters.get_lock():
+            counters[_IDX["files_total"]] = stats["files_total"]
+            counters[_IDX["files_done"]] = stats["files_done"]
+            counters[_IDX["bytes_total"]] = stats["bytes_total"]
+            counters[_IDX["bytes_done"]] = stats["bytes_done"]
+            counters[_IDX["rows"]] = stats["rows"]
+            counters[_IDX["errors"]] = stats["errors"]
+            counters[_IDX["skipped"]] = stats["skipped"]
+
+    try:
+        stats = run_ehr_parsing(progress_callback=on_progress, cancel_event=cancel_event, **params)
+        if stats is None:
+            raise RuntimeError("EHR parsing could not start (invalid input directory or options).")
+        on_progress(stats)
+        counters[_IDX["cancelled"]] = 1.0 if stats["cancelled"] else 0.0
+    except Exception as e:
+        error.value = f"{type(e).__name__}: {e}".encode("utf-8")[:ERROR_MESSAGE_BYTES - 1]
+        raise
+    finally:
+        counters[_IDX["finished_at"]] = time.time()
+
+
+class _IngestionJob:
+    """Parent-side handle for one ingestion worker process."""
+
+    def __init__(
+        self, job_id: str, params: Dict[str, Any], process: Any, counters: Any, cancel_event: Any, error: Any
+    ):
+        self.job_id = job_id
+        self.params = params
+        self.process = process
+        self.counters = counters
+        self.cancel_event = cancel_event
+        self.error = error
+        self.created_at = time.time()
+
+    def is_active(self) -> bool:
+        return self.process.is_alive()
+
+    def status(self) -> IngestionJobStatus:
+        if self.process.is_alive():
+            return IngestionJobStatus.CANCELLING if self.cancel_event.is_set() else IngestionJobStatus.RUNNING
+        if self.process.exitcode != 0:
+            return IngestionJobStatus.FAILED
+        if self.counters[_IDX["cancelled"]]:
+            return IngestionJobStatus.CANCELLED
+        return IngestionJobStatus.COMPLETED
+
+    def error_message(self) -> Optional[str]:
+        """Why a failed job failed: the worker's exception, or its exit code if it died without one."""
+        if self.status() != IngestionJobStatus.FAILED:
+            return None
+        with self.error.get_lock():
+            message = self.error.value.decode("utf-8", errors="replace")
+        return message or f"Worker process exited with code {self.process.exitcode}."
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.counters.get_lock():
+            values = {name: self.counters[i] for i, name in enumerate(COUNTER_FIELDS)}
+
+        started_at = values["started_at"] or None
+        finished_at = values["finished_at"] or None
+        elapsed = ((finished_at or time.time()) - started_at) if started_at else 0.0
+        rows_per_second = values["rows"] / elapsed if elapsed > 0 else 0.0
+        bytes_per_second = values["bytes_done"] / elapsed if elapsed > 0 else 0.0
+
+        status = self.status()
+        eta_seconds = None
+        if status == IngestionJobStatus.RUNNING and bytes_per_second > 0:
+            eta_seconds = max(values["bytes_total"] - values["bytes_done"], 0) / bytes_per_second
+
+        return {
+            "job_id": self.job_id,
+            "status": status.value,
+            "input_dir": self.params.get("input_dir"),
+            "files_total": int(values["files_total"]),
+            "files_done": int(values["files_done"]),
+            "bytes_total": int(values["bytes_total"]),
+            "bytes_done": int(values["bytes_done"]),
+            "rows": int(values["rows"]),
+            "errors": int(values["errors"]),
+            "skipped": int(values["skipped"]),
+            "rows_per_second": round(rows_per_second, 1),
+            "elapsed_seconds": round(elapsed, 1),
+            "eta_seconds": round(eta_seconds, 1) if eta_seconds is not None else None,
+            "exit_code": self.process.exitcode,
+            "error": self.error_message(),
+        }
+
+
+class IngestionJobManager:
+    """Starts, tracks and cancels EHR ingestion jobs running in worker processes."""
+
+    def __init__(self):
+        self.max_concurrent_jobs = int(os.getenv("MAX_CONCURRENT_INGESTION_JOBS", "2"))
+        # 'spawn' keeps the worker free of the API server's event loop, sockets and DB clients.
+        self._ctx = multiprocessing.get_context("spawn")
+        self._jobs: Dict[str, _IngestionJob] = {}
+        self._lock = threading.Lock()
+
+    def _prune_finished(self) -> None:
+        finished = sorted(
+            (job for job in self._jobs.values() if not job.is_active()), key=lambda j: j.created_at
+        )
+        for job in finished[:max(len(finished) - MAX_FINISHED_JOBS, 0)]:
+            job.process.join(timeout=0)
+            del self._jobs[job.job_id]
+
+    def active_count(self) -> int:
+        with self._lock:
+            return sum(1 for job in self._jobs.values() if job.is_active())
+
+    def start_ehr_job(self, **params: Any) -> str:
+        """
+        Start an EHR ingestion job in a new worker process.
+
+        Args:
+            **params: Keyword arguments forwarded to run_ehr_parsing
+                (input_dir, output_dir, schema_json, columnar_format, sqlite_db, resume, verbose).
+
+        Returns:
+            The new job id.
+
+        Raises:
+            IngestionCapacityError: If the concurrent job cap has been reached.
+        """
+        with self._lock:
+            self._prune_finished()
+            active = sum(1 for job in self._jobs.values() if job.is_active())
+            if active >= self.max_concurrent_jobs:
+                raise IngestionCapacityError(
+                    f"{active} ingestion jobs already running (limit {self.max_concurrent_jobs})."
+                )
+
+            job_id = str(uuid.uuid4())
+            counters = self._ctx.Array("d", len(COUNTER_FIELDS))
+            cancel_event = self._ctx.Event()
+            error = self._ctx.Array("c", ERROR_MESSAGE_BYTES)
+            process = self._ctx.Process(
+                target=_run_ehr_job,
+                args=(params, counters, cancel_event, error),
+                name=f"ehr-ingestion-{job_id[:8]}",
+            )
+            process.start()
+            self._jobs[job_id] = _IngestionJob(job_id, params, process, counters, cancel_event, error)
+
+        logger.info(f"Started EHR ingestion job {job_id} (pid {process.pid}) for {params.get('input_dir')}")
+        return job_id
+
+    def get_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Return a status snapshot for a job, or None if the job is unknown."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job.snapshot() if job else None
+
+    def list_jobs(self) -> List[Dict[str, Any]]:
+        """Return status snapshots for all tracked jobs, newest first."""
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda j: j.created_at, reverse=True)
+        return [job.snapshot() for job in jobs]
+
+    def cancel_job(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Request cancellation of a job. Files already being converted finish;
+        everything not yet started is skipped.
+
+        Returns:
+            The job's status snapshot, or None if the job is unknown.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if not job:
+            return None
+        if job.is_active():
+            job.cancel_event.set()
+            logger.info(f"Cancellation requested for EHR ingestion job {job_id}")
+        return job.snapshot()
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Block until a job's worker process exits (or the timeout elapses)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if not job:
+            return None
+        job.process.join(timeout)
+        return job.snapshot()
+
+
+# Singleton instance
+ingestion_job_manager = IngestionJobManager()
@@ -0,0 +1,142 @@
+"""
+Logging helpers for the ingestion pipeline.
+
+Ingestion modules log only through their own module loggers. Nothing in the
+library installs handlers or changes the root logger; that is left to the
+application, or to configure_process_logging() in command-line entry points
+and worker processes that the pipeline owns.
+
+Verbosity can be set per subsystem (for example DEBUG for the EHR parser
+while the schema parser stays at WARNING), either with set_verbosity() or
+with the INGESTION_LOG_LEVELS environment variable, e.g.
+"ehr=DEBUG,schema=WARNING". Long loops report progress through
+ProgressReporter, which emits a sampled line instead of one message per item.
+"""
+
+import logging
+import os
+import time
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+# Logger for the whole ingestion package (parent of every module logger below).
+PACKAGE_LOGGER = __name__.rpartition(".")[0]
+
+# Subsystem name -> module name inside the ingestion package.
+SUBSYSTEMS = {
+    "ehr": "ehr_parser",
+    "schema": "ehi_schema_parser",
+    "artifact": "schema_artifact",
+    "columnar": "columnar_writer",
+    "sqlite": "ehi_sqlite_index",
+    "jobs": "ingestion_jobs",
+    "media": "media_processor",
+    "ocr": "ocr_processor",
+    "rtf": "rtf_processor",
+    "orchestrator": "ingestion_orchestrator",
+}
+
+LOG_LEVELS_ENV = "INGESTION_LOG_LEVELS"
+PROCESS_LOG_FORMAT = '%(asctime)s - %(levelname)s - %(name)s - %(message)s'
+
+# Minimum seconds between two progress lines from one ProgressReporter.
+DEFAULT_PROGRESS_INTERVAL = 5.0
+
+
+def get_subsystem_logger(subsystem: Optional[str] = None) -> logging.Logger:
+    """Returns the logger of an ingestion subsystem, or the package logger for None.
+
+    Raises:
+        ValueError: If the subsystem name is unknown.
+    """
+    if subsystem is None:
+        return logging.getLogger(PACKAGE_LOGGER)
+    if subsystem not in SUBSYSTEMS:
+        raise ValueError(f"Unknown ingestion subsystem '{subsystem}'. Choose one of: {', '.join(SUBSYSTEMS)}")
+    return logging.getLogger(f"{PACKAGE_LOGGER}.{SUBSYSTEMS[subsystem]}")
+
+
+def set_verbosity(level: Union[int, str], subsystem: Optional[str] = None) -> int:
+    """Sets the log level of one ingestion subsystem (or of the whole package).
+
+    Only the level of the ingestion loggers changes; handlers and the root
+    logger are left alone.
+
+    Returns:
+        The logger's previous level, so a caller can restore it.
+    """
+    if isinstance(level, str):
+        level = level.upper()
+    subsystem_logger = get_subsystem_logger(subsystem)
+    previous_level = subsystem_logger.level
+    subsystem_logger.setLevel(level)
+    return previous_level
+
+
+def apply_env_verbosity(value: Optional[str] = None) -> None:
+    """Applies per-subsystem levels from INGESTION_LOG_LEVELS ("ehr=DEBUG,schema=WARNING").
+
+    An entry without a subsystem ("INFO") applies to the whole package. Invalid
+    entries are logged and ignored.
+    """
+    value = os.getenv(LOG_LEVELS_ENV, "") if value is None else value
+    for entry in filter(None, (part.strip() for part in value.split(","))):
+        subsystem, _, level = entry.rpartition("=")
+        try:
+            set_verbosity(level.strip(), subsystem.strip() or None)
+        except ValueError as e:
+            logger.warning("Ignoring %s entry '%s': %s", LOG_LEVELS_ENV, entry, e)
+
+
+def configure_process_logging(verbose: bool = False) -> None:
+    """Configures logging for a process the ingestion pipeline owns.
+
+    Meant for `__main__` blocks and ingestion worker processes only; library
+    code must never call it.
+    """
+    logging.basicConfig(level=logging.INFO, format=PROCESS_LOG_FORMAT)
+    if verbose:
+        set_verbosity(logging.DEBUG)
+    apply_env_verbosity()
+
+
+class ProgressReporter:
+    """Logs sampled progress for a long loop.
+
+    update() is cheap to call for every item: a line is emitted at most once
+    per `interval` seconds, plus once when the last item is done, and nothing
+    is formatted when the level is disabled.
+    """
+
+    def __init__(
+        self,
+        log: logging.Logger,
+        label: str,
+        total: int,
+        interval: float = DEFAULT_PROGRESS_INTERVAL,
+        level: int = logging.INFO,
+    ):
+        self.log = log
+        self.label = label
+        self.total = total
+        self.interval = interval
+        self.level = level
+        self._start = time.monotonic()
+        self._last = self._start
+
+    def update(self, done: int) -> bool:
+        """Reports `done` of `total` items if a line is due. Returns True if one was logged."""
+        now = time.monotonic()
+        if done < self.total and now - self._last < self.interval:
+            return False
+        if not self.log.isEnabledFor(self.level):
+            return False
+        self._last = now
+        elapsed = now - self._start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        self.log.log(self.level, "%s: %d/%d done (%.1f/s)", self.label, done, self.total, rate)
+        return True
+
+
+apply_env_verbosity()
@@ -1,89 +1,405 @@
-# backend/src/services/ingestion_orchestrator.py
+# backend/src/services/ingestion/ingestion_orchestrator.py
+"""
+Runs the ingestion stages of an Epic "Requested Record" export.
 
+The export root contains 'EHITables' (TSV), 'Media' (PDF/TIF) and
+'Rich Text' (RTF). Each stage is coordinated on its own thread, and all
+three submit their per-file work to one shared, bounded process pool, so
+the CPU stays busy across stages and a full export takes roughly as long
+as its slowest stage rather than the sum of all three.
+
+The export can also be ingested straight from its ZIP archive (see
+ehi_archive); members are then read into memory one at a time instead of
+being extracted to disk.
+"""
+
+import argparse
+import concurrent.futures
 import logging
-from pathlib import Path
+import os
+import tempfile
+import time
+import zipfile
+from pathlib import Path, PurePosixPath
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
-# TODO: Update imports once file structure is confirmed
-from .ingestion.epic_ehi_parser import process_ehi_directory
-from .ingestion.media_processor import process_media_directory
-from .ingestion.rtf_processor import process_rtf_directory
+from .columnar_writer import COLUMNAR_EXTENSIONS
+from .ehi_archive import EhiArchive, process_archive_member
+from .ehr_parser import STATUS_COUNTERS, run_ehr_parsing
+from .media_processor import MEDIA_OUTCOMES, classify_media_name, process_media_directory
+from .ocr_processor import DEFAULT_OCR_ENGINE, ocr_available, ocr_documents
+from .rtf_processor import DEFAULT_RTF_ENGINE, RTF_OUTCOMES, process_rtf_directory
+from .run_journal import JOURNAL_FILE_NAME, RunJournal, source_signature, verify_journal
+from .schema_artifact import get_cached_schema
+from .ingestion_logging import configure_process_logging
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
 
+# Stage name -> (input subdirectory of the export root, output subdirectory)
+INGESTION_STAGES = {
+    "ehi_tables": ("EHITables", "EHITables_Markdown"),
+    "media": ("Media", "Media_Text"),
+    "rich_text": ("Rich Text", "RichText_Text"),
+}
 
-def orchestrate_ingestion(root_input_dir: Path, root_output_dir: Path):
-    """Orchestrates the ingestion process for various EHR data types."""
 
-    logging.info(f"Starting ingestion orchestration for: {root_input_dir}")
-    logging.info(f"Output will be saved to: {root_output_dir}")
+def _run_stage(
+    name: str,
+    stage_func: Callable[[Path, Path, concurrent.futures.Executor], Optional[Dict[str, Any]]],
+    input_dir: Path,
+    output_dir: Path,
+    executor: concurrent.futures.Executor,
+) -> Dict[str, Any]:
+    """Runs one stage and returns its status, wall time and counts, plus any other
+    entries of a structured stage result (e.g. the media stage's 'failures' and 'timings')."""
+    result = {"status": "missing", "seconds": 0.0, "counts": None, "input_dir": str(input_dir), "output_dir": str(output_dir)}
+    if not input_dir.is_dir():
+        logger.warning("Stage %s: input directory not found: %s", name, input_dir)
+        return result
 
-    # Define specific subdirectories based on typical structure
-    ehi_tables_input_dir = root_input_dir / "EHITables"
-    media_input_dir = root_input_dir / "Media"
-    rich_text_input_dir = root_input_dir / "Rich Text"
+    logger.info("Stage %s: processing %s", name, input_dir)
+    start = time.perf_counter()
+    try:
+        outcome = stage_func(input_dir, output_dir, executor)
+        result["status"] = "completed" if outcome is not None else "failed"
+        if outcome is not None and "counts" in outcome:
+            result.update(outcome) # Structured result (media): counts plus failures and timings
+        else:
+            result["counts"] = outcome
+    except Exception as e:
+        logger.error("Stage %s failed: %s", name, e, exc_info=True)
+        result["status"] = "failed"
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    logger.info("Stage %s %s in %.1fs. Output in: %s", name, result["status"], result["seconds"], output_dir)
+    return result
 
-    # Define output subdirectories
-    ehi_tables_output_dir = root_output_dir / "EHITables_Markdown"
-    media_output_dir = root_output_dir / "Media_Text"
-    rich_text_output_dir = root_output_dir / "RichText_Text"
 
-    # Create output directories if they don't exist
-    ehi_tables_output_dir.mkdir(parents=True, exist_ok=True)
-    media_output_dir.mkdir(parents=True, exist_ok=True)
-    rich_text_output_dir.mkdir(parents=True, exist_ok=True)
+def orchestrate_ingestion(
+    root_input_dir: Path,
+    root_output_dir: Path,
+    max_workers: Optional[int] = None,
+    schema_json: Optional[str] = None,
+    resume: bool = False,
+) -> Dict[str, Any]:
+    """Orchestrates the ingestion process for various EHR data types.
 
-    # --- Process EHI Tables (TSV to Markdown) ---
-    if ehi_tables_input_dir.is_dir():
-        logging.info(f"Processing EHI Tables from: {ehi_tables_input_dir}")
-        try:
-            process_ehi_directory(ehi_tables_input_dir, ehi_tables_output_dir)
-            logging.info(f"Finished processing EHI Tables. Output in: {ehi_tables_output_dir}")
-        except Exception as e:
-            logging.error(f"Error processing EHI Tables: {e}", exc_info=True)
-    else:
-        logging.warning(f"EHI Tables directory not found: {ehi_tables_input_dir}")
+    Args:
+        root_input_dir: Export root containing 'EHITables', 'Media' and 'Rich Text',
+            or the export's ZIP archive (see orchestrate_archive_ingestion).
+        root_output_dir: Directory under which each stage writes its own output subdirectory.
+        max_workers: Size of the process pool shared by all stages. Defaults to the CPU count.
+        schema_json: Optional schema file (JSON or compiled artifact) for the EHI tables stage.
+        resume: If True, continue a previous run into the same output directory. Every
+            stage skips the units its run journal records as complete and verified.
 
-    # --- Process Media Files (PDF/TIF) ---
-    if media_input_dir.is_dir():
-        logging.info(f"Processing Media files from: {media_input_dir}")
-        try:
-            # Note: process_media_directory handles its own output subdirs ('pdf_text', 'tif_analysis')
-            process_media_directory(media_input_dir, media_output_dir) 
-            logging.info(f"Finished processing Media files. Output in: {media_output_dir}")
-        except Exception as e:
-            logging.error(f"Error processing Media files: {e}", exc_info=True)
-    else:
-        logging.warning(f"Media directory not found: {media_input_dir}")
+    Returns:
+        A dictionary with 'stages' (stage name -> 'status', 'seconds', 'counts',
+        'input_dir', 'output_dir') and the total wall time in 'seconds'.
+        A stage's status is 'completed', 'failed' or 'missing' (no input directory).
+        A completed media stage also has 'failures' and per-file 'timings'.
+    """
+    if root_input_dir.is_file() and zipfile.is_zipfile(root_input_dir):
+        return orchestrate_archive_ingestion(root_input_dir, root_output_dir, max_workers, schema_json, resume=resume)
+
+    logger.info("Starting ingestion orchestration for: %s", root_input_dir)
+    logger.info("Output will be saved to: %s", root_output_dir)
+
+    stage_funcs = {
+        "ehi_tables": lambda input_dir, output_dir, executor: run_ehr_parsing(
+            str(input_dir), str(output_dir), schema_json, executor=executor, resume=resume
+        ),
+        "media": lambda input_dir, output_dir, executor: process_media_directory(input_dir, output_dir, executor, resume),
+        "rich_text": lambda input_dir, output_dir, executor: process_rtf_directory(input_dir, output_dir, executor, resume),
+    }
+
+    start = time.perf_counter()
+    max_workers = max_workers or os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor, \
+            concurrent.futures.ThreadPoolExecutor(max_workers=len(INGESTION_STAGES), thread_name_prefix="ingestion-stage") as stage_threads:
+        # Start the worker processes from this thread, before any stage thread exists;
+        # forking from a process with running threads can deadlock the children.
+        executor.submit(os.getpid).result()
+        futures = {
+            name: stage_threads.submit(
+                _run_stage, name, stage_funcs[name], root_input_dir / input_subdir, root_output_dir / output_subdir, executor
+            )
+            for name, (input_subdir, output_subdir) in INGESTION_STAGES.items()
+        }
+        stages = {name: future.result() for name, future in futures.items()}
+
+    summary = {"stages": stages, "seconds": round(time.perf_counter() - start, 3)}
+    logger.info("Ingestion orchestration finished in %.1fs.", summary["seconds"])
+    for name, stage in stages.items():
+        logger.info("  %s: %s in %.1fs, counts: %s", name, stage["status"], stage["seconds"], stage["counts"])
+    return summary
+
+
+def _initial_counts(stage: str, members: List[zipfile.ZipInfo]) -> Dict[str, Any]:
+    """Returns zeroed counters shaped like the directory-mode result of a stage."""
+    if stage == "ehi_tables":
+        return {
+            "files_total": len(members), "files_done": 0, "processed": 0, "skipped": 0, "errors": 0,
+            "rows": 0, "bytes_total": sum(info.file_size for info in members), "bytes_done": 0, "cancelled": False,
+            "resumed": 0,
+        }
+    outcomes = MEDIA_OUTCOMES if stage == "media" else RTF_OUTCOMES
+    counts = dict.fromkeys(outcomes, 0)
+    counts["files"] = len(members)
+    counts["resumed"] = 0
+    return counts
+
+
+def _member_outputs(stage: str, info: zipfile.ZipInfo, output_dir: Path, outcome: Any, columnar_format: Optional[str]) -> List[Path]:
+    """Output files written for an archive member, as recorded in the run journal."""
+    stem = PurePosixPath(info.filename).stem
+    if stage == "ehi_tables":
+        if outcome["status"] != "processed":
+            return []
+        outputs = [output_dir / f"{stem}.md"]
+        if columnar_format:
+            outputs.append(output_dir / f"{stem}{COLUMNAR_EXTENSIONS[columnar_format]}")
+        return outputs
+    if outcome in ("text_pdfs", "processed"):
+        return [output_dir / f"{stem}.txt"]
+    return []
+
+
+def orchestrate_archive_ingestion(
+    zip_path: Path,
+    root_output_dir: Path,
+    max_workers: Optional[int] = None,
+    schema_json: Optional[str] = None,
+    columnar_format: Optional[str] = None,
+    resume: bool = False,
+    ocr: Optional[bool] = None,
+    ocr_engine: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Ingests an EHI export directly from its ZIP archive, without extracting it.
+
+    Members are routed by path (see ehi_archive.route_member) and processed in
+    parallel on one process pool, largest first. Each worker reads the members it
+    is handed straight from the archive. Unhandled members are never read. As in
+    directory mode, image-based PDFs, the scanned pages of text PDFs and TIFs are
+    OCR'd (see ocr_processor) on the same pool once the other members are done;
+    only those scans are copied out of the archive, to a temporary directory.
+
+    Args:
+        zip_path: Path to the export's ZIP archive.
+        root_output_dir: Directory under which each stage writes its own output subdirectory.
+        max_workers: Process pool size. Defaults to the CPU count.
+        schema_json: Optional schema file (JSON or compiled artifact) for the EHI tables.
+        columnar_format: Optional 'parquet' or 'arrow' output for the EHI tables.
+        resume: If True, skip members that the stage run journals record as complete
+            (same size and CRC in the archive, outputs verified).
+        ocr: Whether to OCR scans. Defaults to whether the OCR engine is available;
+            without OCR they are only counted.
+        ocr_engine: Registered OCR engine name. Defaults to DEFAULT_OCR_ENGINE.
 
-    # --- Process Rich Text Files (RTF) ---
-    if rich_text_input_dir.is_dir():
-        logging.info(f"Processing Rich Text files from: {rich_text_input_dir}")
+    Returns:
+        The same structure as orchestrate_ingestion(). A stage's 'seconds' is the time
+        from the start of the run until its last member finished, and its 'counts'
+        have the same keys as in directory mode; the media stage also has 'ocr' (the
+        ocr_documents() summary, or None). 'unrouted_members' counts archive members
+        no stage handles.
+    """
+    logger.info("Starting archive ingestion for: %s", zip_path)
+    logger.info("Output will be saved to: %s", root_output_dir)
+    start = time.perf_counter()
+
+    with EhiArchive(zip_path) as archive:
+        routed = archive.routed_files()
+    unrouted = routed.pop(None)
+
+    schema_path = None
+    if schema_json:
         try:
-            process_rtf_directory(rich_text_input_dir, rich_text_output_dir)
-            logging.info(f"Finished processing Rich Text files. Output in: {rich_text_output_dir}")
+            get_cached_schema(schema_json)
+            schema_path = schema_json
         except Exception as e:
-            logging.error(f"Error processing Rich Text files: {e}", exc_info=True)
-    else:
-        logging.warning(f"Rich Text directory not found: {rich_text_input_dir}")
+            logger.error("Error loading schema file %s: %s. Proceeding without schema data.", schema_json, e)
+
+    ocr_engine = ocr_engine or DEFAULT_OCR_ENGINE
+    if ocr is None:
+        ocr = ocr_available(ocr_engine)
+        if not ocr and routed["media"]:
+            logger.info("OCR engine '%s' is not available; image-based PDFs and TIFs are only counted.", ocr_engine)
+
+    journal_configs = {
+        "ehi_tables": {"schema": source_signature(Path(schema_path)) if schema_path else None, "columnar_format": columnar_format},
+        "media": {"stage": "media", "ocr_engine": ocr_engine} if ocr else {"stage": "media"},
+        "rich_text": {"stage": "rich_text", "engine": DEFAULT_RTF_ENGINE},
+    }
+    stages: Dict[str, Dict[str, Any]] = {}
+    journals: Dict[str, RunJournal] = {}
+    remaining: Dict[str, int] = {}
+    for name, (_, output_subdir) in INGESTION_STAGES.items():
+        members = routed[name]
+        output_dir = root_output_dir / output_subdir
+        stages[name] = {
+            "status": "completed" if members else "missing",
+            "seconds": 0.0,
+            "counts": _initial_counts(name, members) if members else None,
+            "input_dir": str(zip_path),
+            "output_dir": str(output_dir),
+        }
+        if name == "media" and members:
+            stages[name]["ocr"] = None
+        remaining[name] = len(members)
+        if members:
+            journals[name] = RunJournal(output_dir, config=journal_configs[name], resume=resume)
+            logger.info("Stage %s: %d members in archive", name, len(members))
+
+    def record(name: str, outcome: Any, resumed: bool = False) -> None:
+        counts = stages[name]["counts"]
+        if name == "ehi_tables":
+            counts[STATUS_COUNTERS[outcome["status"]]] += 1
+            counts["rows"] += outcome["rows"]
+            counts["bytes_done"] += outcome["bytes"]
+            counts["files_done"] += 1
+        else:
+            counts[outcome] += 1
+        if resumed:
+            counts["resumed"] += 1
+        remaining[name] -= 1
+        if remaining[name] == 0:
+            stages[name]["seconds"] = round(time.perf_counter() - start, 3)
+            logger.info("Stage %s completed in %.1fs.", name, stages[name]["seconds"])
+
+    # Only PDFs need a media worker; TIFs and other media members are classified by name.
+    # Scans to OCR (TIFs, and PDFs that turn out to have scanned pages) are recorded
+    # once their OCR output is written.
+    tasks = []
+    ocr_members: List[Tuple[zipfile.ZipInfo, Dict[str, int], str]] = []
+    for name, members in routed.items():
+        for info in members:
+            source = {"size": info.file_size, "crc": info.CRC}
+            if name == "media" and not info.filename.lower().endswith('.pdf'):
+                outcome = classify_media_name(info.filename)
+                if not (ocr and outcome == "tifs"):
+                    record(name, outcome)
+                elif resume and journals[name].completed_result(info.filename, source) is not None:
+                    record(name, outcome, resumed=True)
+                else:
+                    ocr_members.append((info, source, outcome))
+                continue
+            previous = journals[name].completed_result(info.filename, source) if resume else None
+            if previous is None:
+                tasks.append((name, info, source))
+            else:
+                record(name, previous, resumed=True)
+    tasks.sort(key=lambda task: task[1].file_size, reverse=True) # Largest first keeps the pool busy at the end
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers or os.cpu_count() or 1) as executor:
+            futures = {
+                executor.submit(
+                    process_archive_member, str(zip_path), info.filename, name,
+                    root_output_dir / INGESTION_STAGES[name][1], schema_path, columnar_format, ocr,
+                ): (name, info, source)
+                for name, info, source in tasks
+            }
+            for future in concurrent.futures.as_completed(futures):
+                name, info, source = futures[future]
+                try:
+                    outcome = future.result()
+                except Exception as e:
+                    logger.error("Error processing archive member %s: %s", info.filename, e, exc_info=True)
+                    outcome = {"status": "error", "rows": 0, "bytes": 0} if name == "ehi_tables" else "errors"
+                if ocr and outcome in ("image_pdfs", "mixed_pdfs"):
+                    ocr_members.append((info, source, outcome))
+                    continue
+                record(name, outcome)
+                failed = outcome["status"] == "error" if name == "ehi_tables" else outcome == "errors"
+                if not failed:
+                    journal = journals[name]
+                    journal.record(info.filename, source, outcome, _member_outputs(name, info, journal.output_dir, outcome, columnar_format))
+
+            if ocr_members:
+                stages["media"]["ocr"] = _ocr_archive_members(zip_path, ocr_members, journals["media"], executor, ocr_engine, record)
+    finally:
+        for journal in journals.values():
+            journal.close()
+
+    summary = {"stages": stages, "seconds": round(time.perf_counter() - start, 3), "unrouted_members": len(unrouted)}
+    logger.info("Archive ingestion finished in %.1fs (%d members not handled by any stage).", summary["seconds"], len(unrouted))
+    for name, stage in stages.items():
+        logger.info("  %s: %s in %.1fs, counts: %s", name, stage["status"], stage["seconds"], stage["counts"])
+    return summary
+
+
+def _ocr_archive_members(
+    zip_path: Path,
+    members: List[Tuple[zipfile.ZipInfo, Dict[str, int], str]],
+    journal: RunJournal,
+    executor: concurrent.futures.Executor,
+    ocr_engine: str,
+    record: Callable[..., None],
+) -> Dict[str, Any]:
+    """OCRs archive scans ((info, source, outcome) tuples) into the media output directory.
+
+    The scans are copied to a temporary directory, one subdirectory per member so
+    members with the same base name do not overwrite each other, and removed afterwards.
+    """
+    with tempfile.TemporaryDirectory(prefix="ehi-ocr-") as scratch, EhiArchive(zip_path) as archive:
+        by_path = {
+            archive.extract(info.filename, Path(scratch) / str(n)): (info, source, outcome)
+            for n, (info, source, outcome) in enumerate(members)
+        }
+
+        def record_ocr(path: Path, document: Dict[str, Any]) -> None:
+            info, source, outcome = by_path[path]
+            record("media", outcome)
+            if document["status"] != "error":
+                journal.record(info.filename, source, outcome, document["outputs"])
+
+        return ocr_documents(list(by_path), journal.output_dir, executor, ocr_engine, on_document=record_ocr)
+
+
+def verify_ingestion_output(root_output_dir: Path) -> Dict[str, Dict[str, Any]]:
+    """Verification pass over a (possibly interrupted) run's output.
+
+    Checks that every output recorded in the stages' run journals exists with its
+    recorded size. Units that fail are redone by the next resumed run.
 
-    logging.info("Ingestion orchestration finished.")
+    Returns:
+        Stage name -> verify_journal() report, for each stage that has a journal.
+    """
+    reports = {}
+    for name, (_, output_subdir) in INGESTION_STAGES.items():
+        output_dir = root_output_dir / output_subdir
+        if (output_dir / JOURNAL_FILE_NAME).is_file():
+            reports[name] = verify_journal(output_dir)
+            logger.info("Verified %s: %s", name, {k: v for k, v in reports[name].items() if k != "failed_units"})
+    return reports
 
 
 if __name__ == "__main__":
     # Example usage: Replace with your actual paths
     # Ensure the paths point to the parent directory containing 'EHITables', 'Media', 'Rich Text'
     # e.g., /Users/potalora/Downloads/Requested Record/
-    default_input_root = Path("/Users/potalora/Downloads/Requested Record/") 
+    default_input_root = Path("/Users/potalora/Downloads/Requested Record/")
     # Output will be organized within this directory
-    default_output_root = Path("/Users/potalora/ai_workspace/ai_web_records_app/processed_data/") 
+    default_output_root = Path("/Users/potalora/ai_workspace/ai_web_records_app/processed_data/")
 
-    import argparse
     parser = argparse.ArgumentParser(description="Orchestrate EHR data ingestion.")
     parser.add_argument("--input_dir", type=Path, default=default_input_root,
-                        help="Root directory containing EHR subfolders (EHITables, Media, Rich Text).")
+                        help="Root directory containing EHR subfolders (EHITables, Media, Rich Text), or the export's ZIP archive.")
     parser.add_argument("--output_dir", type=Path, default=default_output_root,
                         help="Root directory where processed data will be saved.")
+    parser.add_argument("--schema-json", type=str, default=None,
+                        help="Optional schema file (JSON or compiled artifact) for the EHI tables.")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Size of the process pool shared by all stages. Defaults to the CPU count.")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continue a previous run into the same output directory, skipping completed work.")
+    parser.add_argument("--verify", action="store_true",
+                        help="Only verify the outputs recorded in the run journals, then exit (status 1 on failures).")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Enable debug logging.")
 
     args = parser.parse_args()
+    configure_process_logging(args.verbose)
 
-    orchestrate_ingestion(args.input_dir, args.output_dir)
+    if args.verify:
+        reports = verify_ingestion_output(args.output_dir)
+        raise SystemExit(1 if any(report["failed_units"] for report in reports.values()) else 0)
+    orchestrate_ingestion(args.input_dir, args.output_dir, max_workers=args.workers, schema_json=args.schema_json, resume=args.resume)
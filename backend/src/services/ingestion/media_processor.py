@@ -1,102 +1,339 @@
 # backend/src/services/ingestion/media_processor.py
 import argparse
 import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
 from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..pdf_utils import analyze_pdf_content, classify_pdf_pages
+from .ingestion_logging import ProgressReporter, configure_process_logging
+from .ocr_processor import DEFAULT_OCR_ENGINE, ocr_available, ocr_documents
+from .run_journal import RunJournal, atomic_write_text, source_signature
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-from ..pdf_utils import analyze_pdf_content
+# process_media_file() outcomes, which are also the process_media_directory() counter names.
+# 'mixed_pdfs' are text PDFs with scanned pages, which are OCR'd page by page.
+MEDIA_OUTCOMES = ("text_pdfs", "image_pdfs", "mixed_pdfs", "tifs", "other", "errors")
+
+# Default cap on the total size of the PDFs submitted to worker processes at once
+MEDIA_MAX_INFLIGHT_BYTES = 256 * 1024 * 1024
+
+
+def _scanned_page_count(pdf_content: bytes) -> int:
+    """Number of pages of a text PDF that are scans (see pdf_utils.classify_pdf_pages)."""
+    try:
+        return sum(1 for page in classify_pdf_pages(pdf_content) if page["type"] == "image")
+    except Exception as e: # e.g. PyMuPDF is not installed
+        logger.debug("Could not classify the pages of a text PDF: %s", e)
+        return 0
+
+
+def _extract_pdf_text(pdf_content: bytes, name: str, output_dir: Path, ocr: bool = False) -> Tuple[str, Optional[str]]:
+    """Does the work of process_pdf_bytes() and also returns why a PDF failed (None otherwise)."""
+    output_txt_path = output_dir / f"{Path(name).stem}.txt"
+    logger.debug("Processing PDF file: %s", name)
+    try:
+        if not pdf_content:
+            logger.warning("Skipping empty PDF file: %s", name)
+            return "errors", "empty file"
+
+        pdf_type, extracted_text = analyze_pdf_content(pdf_content)
+
+        if pdf_type == 'text' and extracted_text:
+            scanned = _scanned_page_count(pdf_content) if ocr else 0
+            if scanned:
+                logger.info("PDF %s has %s scanned page(s) besides its text. Needs page-by-page OCR.", name, scanned)
+                return "mixed_pdfs", None
+            atomic_write_text(output_txt_path, extracted_text)
+            logger.debug("Extracted text from %s to %s", name, output_txt_path.name)
+            return "text_pdfs", None
+        if pdf_type == 'image':
+            logger.info("PDF %s classified as image-based. Needs OCR/Image processing.", name)
+            return "image_pdfs", None
+        # Handle cases where text extraction might fail or return empty
+        logger.warning("Could not extract sufficient text from %s (classified as %s). Might need image processing.", name, pdf_type)
+        return "errors", f"no text extracted (classified as {pdf_type})" # Count as error/unprocessed for now
+
+    except Exception as e:
+        logger.error("Error processing PDF %s: %s", name, e, exc_info=True)
+        return "errors", f"{type(e).__name__}: {e}"
+
+
+def process_pdf_bytes(pdf_content: bytes, name: str, output_dir: Path, ocr: bool = False) -> str:
+    """
+    Extracts text from a text-based PDF into <output_dir>/<stem>.txt.
+
+    Args:
+        pdf_content: The byte content of the PDF.
+        name: The PDF file name (used for logging and the output file name).
+        output_dir: Path to the directory where the extracted text file is saved.
+        ocr: Whether scanned pages will be OCR'd. If so, a text PDF with scanned
+            pages is left to OCR (which keeps the text of its text pages) instead
+            of being written without them.
+
+    Returns:
+        'text_pdfs', 'image_pdfs', 'mixed_pdfs' (only with ocr) or 'errors' (see MEDIA_OUTCOMES).
+    """
+    return _extract_pdf_text(pdf_content, name, output_dir, ocr)[0]
+
+
+def classify_media_name(name: str) -> str:
+    """Returns the outcome for a non-PDF media file from its name: 'tifs' or 'other'."""
+    if Path(name).suffix.lower() in ('.tif', '.tiff'):
+        logger.info("TIF file found: %s. Needs OCR processing.", name)
+        # Placeholder for TIF processing logic (e.g., using Pillow + pytesseract)
+        return "tifs"
+    # Handle other file types (like _INDEX.HTML) - just log and skip
+    logger.debug("Skipping non-PDF/TIF file: %s", name)
+    return "other"
+
+
+def process_media_file(media_file: Path, output_dir: Path, ocr: bool = False) -> str:
+    """
+    Processes one media file: extracts text from a text-based PDF into
+    <output_dir>/<stem>.txt and classifies everything else.
+
+    Args:
+        media_file: Path to the media file.
+        output_dir: Path to the directory where the extracted text file is saved.
+        ocr: Whether scanned pages will be OCR'd (see process_pdf_bytes).
+
+    Returns:
+        One of MEDIA_OUTCOMES: 'text_pdfs', 'image_pdfs', 'mixed_pdfs', 'tifs', 'other' or 'errors'.
+    """
+    return _timed_media_file(media_file, output_dir, ocr)["outcome"]
+
+
+def _timed_media_file(media_file: Path, output_dir: Path, ocr: bool = False) -> Dict[str, Any]:
+    """Worker entry point: processes one media file and returns its outcome, the
+    failure reason (None unless the outcome is 'errors') and the time it took."""
+    start = time.perf_counter()
+    error = None
+    if media_file.suffix.lower() != '.pdf':
+        outcome = classify_media_name(media_file.name)
+    else:
+        try:
+            pdf_content = media_file.read_bytes()
+        except OSError as e:
+            logger.error("Error reading PDF %s: %s", media_file.name, e)
+            outcome, error = "errors", f"{type(e).__name__}: {e}"
+        else:
+            outcome, error = _extract_pdf_text(pdf_content, media_file.name, output_dir, ocr)
+            del pdf_content
+    return {"outcome": outcome, "error": error, "seconds": round(time.perf_counter() - start, 4)}
+
+
+def _future_result(future) -> Dict[str, Any]:
+    try:
+        return future.result()
+    except Exception as e: # e.g. a worker process died
+        logger.error("Media worker failed: %s", e, exc_info=True)
+        return {"outcome": "errors", "error": f"worker failed: {type(e).__name__}: {e}", "seconds": None}
+
+
+def _bounded_map(
+    executor: Executor,
+    output_dir: Path,
+    pending: List[Tuple[Path, Dict[str, int]]],
+    max_inflight_bytes: int,
+    ocr: bool = False,
+) -> Iterator[Tuple[Tuple[Path, Dict[str, int]], Dict[str, Any]]]:
+    """Submits PDFs (already sorted largest first) to the executor while the PDFs in
+    flight total at most max_inflight_bytes, and yields results as they complete.
+
+    A PDF larger than the budget still runs, but only once nothing else is in flight.
+    """
+    queue = iter(pending)
+    next_item = next(queue, None)
+    inflight: Dict[Future, Tuple[Path, Dict[str, int]]] = {}
+    inflight_bytes = 0
+    while next_item is not None or inflight:
+        while next_item is not None and (not inflight or inflight_bytes + next_item[1]["size"] <= max_inflight_bytes):
+            inflight[executor.submit(_timed_media_file, next_item[0], output_dir, ocr)] = next_item
+            inflight_bytes += next_item[1]["size"]
+            next_item = next(queue, None)
+        done, _ = wait(inflight, return_when=FIRST_COMPLETED)
+        for future in done:
+            item = inflight.pop(future)
+            inflight_bytes -= item[1]["size"]
+            yield item, _future_result(future)
+
 
-def process_media_directory(input_dir: Path, output_dir: Path):
+def process_media_directory(
+    input_dir: Path,
+    output_dir: Path,
+    executor: Optional[Executor] = None,
+    resume: bool = False,
+    max_workers: Optional[int] = None,
+    max_inflight_bytes: int = MEDIA_MAX_INFLIGHT_BYTES,
+    ocr: Optional[bool] = None,
+    ocr_engine: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
     """
     Processes PDF files in an input directory, extracting text from text-based PDFs
-    and saving it to the output directory. Logs image-based PDFs and TIFs for later processing.
+    and saving it to the output directory. Image-based PDFs and TIFs are OCR'd into
+    the same directory (see ocr_processor) when an OCR engine is available, and so
+    are text PDFs with scanned pages: only those pages are recognized, the others
+    keep their text layer.
+
+    PDFs are processed on a process pool, largest first so a big scan does not finish
+    last on an otherwise idle pool. Workers read the files themselves, and at most
+    max_inflight_bytes of PDFs are submitted at a time, which bounds worker memory
+    when a folder holds several very large scans.
 
     Args:
         input_dir: Path to the directory containing media files (PDF, TIF, etc.).
         output_dir: Path to the directory where extracted text files (.txt) will be saved.
+        executor: Optional executor (e.g. a process pool shared with other ingestion
+            stages) that PDFs are processed on. It is not shut down here. Without
+            one, a process pool of max_workers is created for this call (or PDFs are
+            processed in this thread if there is at most one worker or PDF).
+        resume: If True, PDFs completed by a previous run into the same output
+            directory (per its run journal) are not processed again.
+        max_workers: Size of the pool created when no executor is given. Defaults to
+            the CPU count.
+        max_inflight_bytes: Total size of the PDFs submitted to the pool at any time.
+        ocr: Whether to OCR image-based PDFs, the scanned pages of text PDFs and TIFs.
+            Defaults to whether the OCR engine is available; without OCR, image-based
+            PDFs and TIFs are only counted and text PDFs are written without their
+            scanned pages.
+        ocr_engine: Registered OCR engine name. Defaults to DEFAULT_OCR_ENGINE.
+
+    Returns:
+        A dictionary with:
+            'counts': 'files', one count per MEDIA_OUTCOMES entry and 'resumed'
+                (PDFs already completed by a previous run).
+            'failures': {'file', 'error'} for every PDF counted under 'errors'.
+            'timings': {'file', 'bytes', 'outcome', 'seconds'} for every PDF processed
+                in this run, slowest first.
+            'ocr': the ocr_documents() summary, or None if OCR is disabled.
+        or None if the input directory does not exist.
     """
     if not input_dir.is_dir():
-        logger.error(f"Input directory not found: {input_dir}")
-        return
+        logger.error("Input directory not found: %s", input_dir)
+        return None
 
     output_dir.mkdir(parents=True, exist_ok=True)
-    logger.info(f"Output directory set to: {output_dir}")
-
-    processed_text_count = 0
-    image_pdf_count = 0
-    tif_count = 0
-    other_files_count = 0
-    error_count = 0
-
-    media_files = list(input_dir.iterdir())
-    logger.info(f"Found {len(media_files)} items in {input_dir}.")
-
-    for media_file in media_files:
-        if not media_file.is_file():
-            logger.debug(f"Skipping directory: {media_file.name}")
-            continue
-
-        file_extension = media_file.suffix.lower()
-        output_txt_path = output_dir / f"{media_file.stem}.txt"
-
-        if file_extension == '.pdf':
-            logger.info(f"Processing PDF file: {media_file.name}...")
-            try:
-                with open(media_file, 'rb') as f:
-                    pdf_content = f.read()
-
-                if not pdf_content:
-                    logger.warning(f"Skipping empty PDF file: {media_file.name}")
-                    error_count += 1
-                    continue
-
-                pdf_type, extracted_text = analyze_pdf_content(pdf_content)
-
-                if pdf_type == 'text' and extracted_text:
-                    with open(output_txt_path, 'w', encoding='utf-8') as txt_file:
-                        txt_file.write(extracted_text)
-                    logger.info(f"Extracted text from {media_file.name} to {output_txt_path.name}")
-                    processed_text_count += 1
-                elif pdf_type == 'image':
-                    logger.info(f"PDF {media_file.name} classified as image-based. Needs OCR/Image processing.")
-                    image_pdf_count += 1
-                else: # Handle cases where text extraction might fail or return empty
-                    logger.warning(f"Could not extract sufficient text from {media_file.name} (classified as {pdf_type}). Might need image processing.")
-                    error_count += 1 # Count as error/unprocessed for now
-
-            except Exception as e:
-                logger.error(f"Error processing PDF {media_file.name}: {e}", exc_info=True)
-                error_count += 1
-
-        elif file_extension == '.tif' or file_extension == '.tiff':
-            logger.info(f"TIF file found: {media_file.name}. Needs OCR processing.")
-            tif_count += 1
-            # Placeholder for TIF processing logic (e.g., using Pillow + pytesseract)
+    logger.info("Output directory set to: %s", output_dir)
 
-        else:
-            # Handle other file types (like _INDEX.HTML) - just log and skip
-            logger.debug(f"Skipping non-PDF/TIF file: {media_file.name}")
-            other_files_count += 1
+    media_files = [item for item in input_dir.iterdir() if item.is_file()]
+    logger.info("Found %s files in %s.", len(media_files), input_dir)
+    counts = dict.fromkeys(MEDIA_OUTCOMES, 0)
+    counts["files"] = len(media_files)
+    counts["resumed"] = 0
+    failures: List[Dict[str, Any]] = []
+    timings: List[Dict[str, Any]] = []
+    ocr_summary = None
+
+    ocr_engine = ocr_engine or DEFAULT_OCR_ENGINE
+    if ocr is None:
+        ocr = ocr_available(ocr_engine)
+        if not ocr:
+            logger.info("OCR engine '%s' is not available; image-based PDFs and TIFs are only counted.", ocr_engine)
+    journal_config = {"stage": "media", "ocr_engine": ocr_engine} if ocr else {"stage": "media"}
+
+    with RunJournal(output_dir, config=journal_config, resume=resume) as journal:
+        # Only PDFs (and TIFs, with OCR) are worth shipping to a worker and journaling;
+        # everything else is classified by its extension.
+        pending = []
+        ocr_queue: Dict[Path, Tuple[Dict[str, int], str]] = {}
+        for media_file in media_files:
+            if media_file.suffix.lower() != '.pdf':
+                outcome = classify_media_name(media_file.name)
+                counts[outcome] += 1
+                if ocr and outcome == "tifs":
+                    source = source_signature(media_file)
+                    if resume and journal.completed_result(media_file.name, source) is not None:
+                        counts["resumed"] += 1
+                    else:
+                        ocr_queue[media_file] = (source, outcome)
+                continue
+            source = source_signature(media_file)
+            previous = journal.completed_result(media_file.name, source) if resume else None
+            if previous is None:
+                pending.append((media_file, source))
+            else:
+                counts[previous] += 1
+                counts["resumed"] += 1
+        pending.sort(key=lambda item: item[1]["size"], reverse=True)
+
+        own_executor = None
+        if executor is None:
+            max_workers = max_workers or os.cpu_count() or 1
+            # The number of OCR pages is only known once PDFs are classified
+            pool_size = max_workers if ocr else min(max_workers, len(pending))
+            if pool_size > 1:
+                own_executor = executor = ProcessPoolExecutor(max_workers=pool_size)
+        try:
+            progress = ProgressReporter(logger, "Media PDFs", len(pending))
+            if executor is None:
+                results = ((item, _timed_media_file(item[0], output_dir, ocr)) for item in pending)
+            else:
+                results = _bounded_map(executor, output_dir, pending, max_inflight_bytes, ocr)
+
+            for done, ((media_file, source), result) in enumerate(results, start=1):
+                outcome = result["outcome"]
+                counts[outcome] += 1
+                timings.append({"file": media_file.name, "bytes": source["size"], "outcome": outcome, "seconds": result["seconds"]})
+                if outcome == "errors":
+                    failures.append({"file": media_file.name, "error": result["error"]})
+                elif outcome in ("image_pdfs", "mixed_pdfs") and ocr:
+                    ocr_queue[media_file] = (source, outcome) # Journaled once its OCR output is written
+                else:
+                    outputs = [output_dir / f"{media_file.stem}.txt"] if outcome == "text_pdfs" else []
+                    journal.record(media_file.name, source, outcome, outputs)
+                progress.update(done)
+
+            if ocr:
+                def record_ocr(path: Path, document: Dict[str, Any]) -> None:
+                    if document["status"] != "error":
+                        source, outcome = ocr_queue[path]
+                        journal.record(path.name, source, outcome, document["outputs"])
+
+                ocr_summary = ocr_documents(list(ocr_queue), output_dir, executor, ocr_engine, on_document=record_ocr)
+        finally:
+            if own_executor is not None:
+                own_executor.shutdown()
 
-    logger.info(f"Finished processing Media directory.")
-    logger.info(f"  Successfully extracted text from: {processed_text_count} PDFs")
-    logger.info(f"  Image-based PDFs (need OCR/Vision): {image_pdf_count}")
-    logger.info(f"  TIF files (need OCR): {tif_count}")
-    logger.info(f"  Other skipped files: {other_files_count}")
-    logger.info(f"  Errors/Skipped PDFs: {error_count}")
+    timings.sort(key=lambda timing: timing["seconds"] or 0.0, reverse=True)
+    logger.info("Finished processing Media directory.")
+    logger.info("  Successfully extracted text from: %s PDFs", counts["text_pdfs"])
+    logger.info("  Image-based PDFs (need OCR/Vision): %s", counts["image_pdfs"])
+    logger.info("  Text PDFs with scanned pages (need OCR): %s", counts["mixed_pdfs"])
+    logger.info("  TIF files (need OCR): %s", counts["tifs"])
+    logger.info("  Other skipped files: %s", counts["other"])
+    logger.info("  Errors/Skipped PDFs: %s", counts["errors"])
+    if counts["resumed"]:
+        logger.info("  Already completed in a previous run: %s", counts["resumed"])
+    if ocr_summary is not None:
+        logger.info("  OCR'd to text: %s documents (%s errors)", ocr_summary["ocr"], ocr_summary["errors"])
+    if timings:
+        logger.info("  Slowest PDF: %s (%.2fs)", timings[0]["file"], timings[0]["seconds"] or 0.0)
+    return {"counts": counts, "failures": failures, "timings": timings, "ocr": ocr_summary}
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process media files (PDFs) in a directory, extracting text.")
     parser.add_argument("input_dir", help="Path to the input directory containing media files.")
     parser.add_argument("output_dir", help="Path to the output directory for extracted text files (.txt).")
+    parser.add_argument("--resume", action="store_true", help="Skip PDFs completed by a previous run into the same output directory.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--max-inflight-mb", type=int, default=MEDIA_MAX_INFLIGHT_BYTES // (1024 * 1024),
+                        help="Total size in MB of the PDFs being processed at once.")
+    parser.add_argument("--no-ocr", dest="ocr", action="store_false", default=None,
+                        help="Only count image-based PDFs and TIFs instead of OCR'ing them.")
+    parser.add_argument("--ocr-engine", default=None, help=f"OCR engine (default: {DEFAULT_OCR_ENGINE}).")
 
     args = parser.parse_args()
+    configure_process_logging()
 
     input_path = Path(args.input_dir).resolve()
     output_path = Path(args.output_dir).resolve()
 
-    process_media_directory(input_path, output_path)
+    process_media_directory(
+        input_path, output_path, resume=args.resume, max_workers=args.workers,
+        max_inflight_bytes=args.max_inflight_mb * 1024 * 1024, ocr=args.ocr, ocr_engine=args.ocr_engine,
+    )
@@ -0,0 +1,352 @@
+"""
+Local OCR for scanned media: image-based PDFs and TIF files.
+
+Documents are split into pages and every page is an independent unit of
+work on the process pool, so a single 300-page scan uses all workers.
+PDF pages that already have a text layer (see pdf_utils.classify_pdf_pages)
+keep that text and are not OCR'd. Page images are converted to grayscale,
+downscaled to OCR_MAX_PIXELS and deskewed before recognition.
+
+OCR engines are pluggable: an engine is a function that takes a PIL image
+and returns {'text', 'confidence'} (mean word confidence 0-100, or None).
+Tesseract (via pytesseract) is the default. Engines registered with
+register_ocr_engine() must be registered at import time of a module the
+worker processes also import, as workers look engines up by name.
+"""
+
+import json
+import logging
+import os
+import statistics
+import time
+from concurrent.futures import Executor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from PIL import Image, ImageOps
+
+try:
+    import pytesseract
+except ImportError:  # Only needed for the Tesseract engine
+    pytesseract = None
+
+from ..pdf_utils import classify_pdf_pages, render_pdf_page_image
+from .run_journal import atomic_write_text
+
+logger = logging.getLogger(__name__)
+
+# Engine used when none is passed in
+DEFAULT_OCR_ENGINE = os.getenv("OCR_ENGINE", "tesseract")
+# Tesseract language(s), e.g. "eng" or "eng+spa"
+OCR_LANGUAGE = os.getenv("OCR_LANGUAGE", "eng")
+
+# Page images are downscaled to at most this many pixels (about 300 DPI on a letter
+# page); fax and archive scans are often 600 DPI, which only slows recognition.
+OCR_MAX_PIXELS = 8_500_000
+# Deskew searches rotations up to this many degrees either way, in OCR_DESKEW_STEP steps
+OCR_DESKEW_MAX_ANGLE = 5.0
+OCR_DESKEW_STEP = 0.5
+# Pages with a lower mean word confidence are counted as low confidence (candidates
+# for a vision model or manual review)
+OCR_MIN_CONFIDENCE = 60.0
+
+OCR_REPORT_SUFFIX = ".ocr.json"
+
+
+class OcrEngineError(Exception):
+    """Raised when an OCR engine is unknown or cannot run."""
+    pass
+
+
+def _require_pytesseract() -> None:
+    if pytesseract is None:
+        raise OcrEngineError(
+            "pytesseract is not installed. Please install it: pip install pytesseract "
+            "(the tesseract binary must also be on the PATH)"
+        )
+
+
+def tesseract_ocr(image: Image.Image) -> Dict[str, Any]:
+    """Recognizes a page with Tesseract. Text keeps Tesseract's line and paragraph breaks."""
+    _require_pytesseract()
+    data = pytesseract.image_to_data(image, lang=OCR_LANGUAGE, output_type=pytesseract.Output.DICT)
+    lines: List[str] = []
+    words: List[str] = []
+    confidences: List[float] = []
+    current_line = current_paragraph = None
+    for i, word in enumerate(data["text"]):
+        if not word or not word.strip():
+            continue
+        confidence = float(data["conf"][i])
+        if confidence >= 0:
+            confidences.append(confidence)
+        paragraph = (data["block_num"][i], data["par_num"][i])
+        line = paragraph + (data["line_num"][i],)
+        if line != current_line and words:
+            lines.append(" ".join(words))
+            words = []
+            if paragraph != current_paragraph:
+                lines.append("")
+        current_line, current_paragraph = line, paragraph
+        words.append(word.strip())
+    if words:
+        lines.append(" ".join(words))
+    return {
+        "text": "\n".join(lines),
+        "confidence": round(statistics.fmean(confidences), 1) if confidences else None,
+    }
+
+
+# Registered OCR engines: name -> function(PIL image) -> {'text', 'confidence'}
+OCR_ENGINES: Dict[str, Callable[[Image.Image], Dict[str, Any]]] = {
+    "tesseract": tesseract_ocr,
+}
+
+
+def register_ocr_engine(name: str, recognize: Callable[[Image.Image], Dict[str, Any]]) -> None:
+    """Registers an OCR engine (see the module docstring for the interface)."""
+    OCR_ENGINES[name] = recognize
+
+
+def ocr_available(engine: Optional[str] = None) -> bool:
+    """Returns whether an OCR engine is registered and, for Tesseract, installed."""
+    engine = engine or DEFAULT_OCR_ENGINE
+    if engine not in OCR_ENGINES:
+        return False
+    if engine != "tesseract":
+        return True
+    if pytesseract is None:
+        return False
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except Exception:
+        return False
+
+
+def estimate_skew(image: Image.Image, max_angle: float = OCR_DESKEW_MAX_ANGLE, step: float = OCR_DESKEW_STEP) -> float:
+    """Estimates the rotation (degrees, counterclockwise) that straightens a page's text lines.
+
+    Uses a projection profile: on a small binarized copy of the page, the rotation
+    that makes the row sums of ink vary the most puts text lines on single rows.
+    """
+    thumb = image.convert("L")
+    thumb.thumbnail((800, 800))
+    ink = ImageOps.invert(thumb).point(lambda value: 255 if value > 96 else 0)
+    best_angle, best_score = 0.0, -1.0
+    steps = int(round(max_angle / step))
+    for i in range(-steps, steps + 1):
+        angle = i * step
+        rotated = ink.rotate(angle, resample=Image.NEAREST, fillcolor=0)
+        rows = rotated.resize((1, rotated.height), Image.BOX).tobytes()  # One mean ink value per row
+        score = statistics.pvariance(rows)
+        if score > best_score:
+            best_angle, best_score = angle, score
+    return best_angle
+
+
+def preprocess_page_image(image: Image.Image, max_pixels: int = OCR_MAX_PIXELS, deskew: bool = True) -> Image.Image:
+    """Converts a page image to grayscale, downscales it to max_pixels and deskews it."""
+    image = image.convert("L")
+    pixels = image.width * image.height
+    if pixels > max_pixels:
+        scale = (max_pixels / pixels) ** 0.5
+        image = image.resize((max(1, int(image.width * scale)), max(1, int(image.height * scale))), Image.LANCZOS)
+    if deskew:
+        angle = estimate_skew(image)
+        if angle:
+            logger.debug("Deskewing page by %.1f degrees", angle)
+            image = image.rotate(angle, resample=Image.BICUBIC, expand=True, fillcolor=255)
+    return image
+
+
+def _load_page_image(path: Path, page_number: int) -> Image.Image:
+    if path.suffix.lower() == ".pdf":
+        return render_pdf_page_image(path, page_number, OCR_MAX_PIXELS, grayscale=True)
+    with Image.open(path) as tif:
+        tif.seek(page_number)
+        tif.load()
+        return tif.copy()
+
+
+def plan_document_pages(path: Path) -> List[Dict[str, Any]]:
+    """Lists the pages of a document to OCR. PDF pages with a text layer carry their
+    'text' instead and are not OCR'd.
+
+    Returns:
+        One dictionary per page with 'page' (0-based) and 'text' (None if the page needs OCR).
+    """
+    if path.suffix.lower() == ".pdf":
+        return [
+            {"page": page["page"], "text": page["text"] if page["type"] == "text" else None}
+            for page in classify_pdf_pages(path.read_bytes(), include_text=True)
+        ]
+    with Image.open(path) as tif:
+        return [{"page": n, "text": None} for n in range(getattr(tif, "n_frames", 1))]
+
+
+def ocr_page(path: Path, page_number: int, engine: str) -> Dict[str, Any]:
+    """Worker entry point: renders, preprocesses and recognizes one page."""
+    if engine not in OCR_ENGINES:
+        raise OcrEngineError(f"Unknown OCR engine '{engine}'. Available: {', '.join(OCR_ENGINES)}")
+    start = time.perf_counter()
+    image = preprocess_page_image(_load_page_image(path, page_number))
+    result = OCR_ENGINES[engine](image)
+    return {
+        "page": page_number,
+        "text": result.get("text") or "",
+        "confidence": result.get("confidence"),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+
+def _write_document(path: Path, pages: List[Dict[str, Any]], output_dir: Path, engine: str) -> Dict[str, Any]:
+    """Writes <stem>.txt (if any text was found) and the <stem>.ocr.json page report."""
+    pages.sort(key=lambda page: page["page"])
+    text = "\n\n".join(page["text"].strip() for page in pages if page["text"].strip())
+    ocr_confidences = [page["confidence"] for page in pages if page["method"] == "ocr" and page["confidence"] is not None]
+    report = {
+        "source": path.name,
+        "engine": engine,
+        "mean_confidence": round(statistics.fmean(ocr_confidences), 1) if ocr_confidences else None,
+        "pages": [{key: page[key] for key in ("page", "method", "confidence", "chars", "seconds")} for page in pages],
+    }
+    outputs = []
+    if text:
+        text_path = output_dir / f"{path.stem}.txt"
+        atomic_write_text(text_path, text)
+        outputs.append(text_path)
+    report_path = output_dir / f"{path.stem}{OCR_REPORT_SUFFIX}"
+    atomic_write_text(report_path, json.dumps(report, indent=2))
+    outputs.append(report_path)
+    return {"status": "ocr" if text else "empty", "outputs": outputs, "report": report}
+
+
+def ocr_documents(
+    documents: List[Path],
+    output_dir: Path,
+    executor: Optional[Executor] = None,
+    engine: Optional[str] = None,
+    on_document: Optional[Callable[[Path, Dict[str, Any]], None]] = None,
+) -> Dict[str, Any]:
+    """OCRs scanned PDFs and TIFs page by page and writes their text to output_dir.
+
+    Each document gets <stem>.txt with the text of all its pages (next to the
+    text-PDF output of the media stage) and <stem>.ocr.json with the method,
+    confidence and time of every page.
+
+    Args:
+        documents: PDF and TIF files to OCR.
+        output_dir: Directory for the .txt and .ocr.json files.
+        executor: Optional executor (e.g. the media stage's process pool) that pages are
+            planned and recognized on. It is not shut down here. Without one, pages are
+            processed sequentially in this thread.
+        engine: Name of a registered OCR engine. Defaults to DEFAULT_OCR_ENGINE.
+        on_document: Optional callback, called with the path and the
+            {'status', 'outputs', 'report'} (or {'status': 'error', 'error'}) of each
+            document as soon as all of its pages are done.
+
+    Returns:
+        A dictionary with 'engine', 'documents', 'pages', 'ocr_pages' (pages that
+        were recognized, not read from a text layer), 'low_confidence_pages',
+        'ocr' (documents with text), 'empty' (documents without any text),
+        'errors' and 'failures' ({'file', 'error'} per failed document).
+
+    Raises:
+        OcrEngineError: If the engine is not registered.
+    """
+    engine = engine or DEFAULT_OCR_ENGINE
+    if engine not in OCR_ENGINES:
+        raise OcrEngineError(f"Unknown OCR engine '{engine}'. Available: {', '.join(OCR_ENGINES)}")
+    output_dir.mkdir(parents=True, exist_ok=True)
+    summary: Dict[str, Any] = {
+        "engine": engine, "documents": len(documents), "pages": 0, "ocr_pages": 0, "low_confidence_pages": 0,
+        "ocr": 0, "empty": 0, "errors": 0, "failures": [],
+    }
+
+    def finish(path: Path, outcome: Dict[str, Any]) -> None:
+        if outcome["status"] == "error":
+            logger.error("OCR failed for %s: %s", path.name, outcome["error"])
+            summary["failures"].append({"file": path.name, "error": outcome["error"]})
+            summary["errors"] += 1
+        else:
+            summary[outcome["status"]] += 1
+            for page in outcome["report"]["pages"]:
+                summary["pages"] += 1
+                if page["method"] == "ocr":
+                    summary["ocr_pages"] += 1
+                    if page["confidence"] is not None and page["confidence"] < OCR_MIN_CONFIDENCE:
+                        summary["low_confidence_pages"] += 1
+        if on_document is not None:
+            on_document(path, outcome)
+
+    # Plan every document (page count and text-layer pages), then recognize all pages
+    if executor is None:
+        plans = []
+        for path in documents:
+            try:
+                plans.append((path, plan_document_pages(path)))
+            except Exception as e:
+                finish(path, {"status": "error", "error": f"{type(e).__name__}: {e}"})
+    else:
+        plan_futures = {executor.submit(plan_document_pages, path): path for path in documents}
+        plans = []
+        for future in as_completed(plan_futures):
+            path = plan_futures[future]
+            try:
+                plans.append((path, future.result()))
+            except Exception as e:
+                finish(path, {"status": "error", "error": f"{type(e).__name__}: {e}"})
+
+    done_pages: Dict[Path, List[Dict[str, Any]]] = {}
+    remaining: Dict[Path, int] = {}
+    failed: Dict[Path, str] = {}
+    tasks: List[Tuple[Path, int]] = []
+    for path, pages in plans:
+        done_pages[path] = [
+            {"page": page["page"], "method": "text", "text": page["text"], "confidence": None,
+             "chars": len(page["text"]), "seconds": 0.0}
+            for page in pages if page["text"] is not None
+        ]
+        ocr_pages = [page["page"] for page in pages if page["text"] is None]
+        remaining[path] = len(ocr_pages)
+        tasks.extend((path, page_number) for page_number in ocr_pages)
+        if not ocr_pages:
+            finish(path, _write_document(path, done_pages.pop(path), output_dir, engine))
+
+    def page_done(path: Path, result: Optional[Dict[str, Any]], error: Optional[str] = None) -> None:
+        if error is not None:
+            failed.setdefault(path, error)
+        else:
+            result["method"] = "ocr"
+            result["chars"] = len(result["text"])
+            done_pages[path].append(result)
+        remaining[path] -= 1
+        if remaining[path] == 0:
+            pages = done_pages.pop(path)
+            if path in failed:
+                finish(path, {"status": "error", "error": failed.pop(path)})
+            else:
+                finish(path, _write_document(path, pages, output_dir, engine))
+
+    logger.info("OCR: %d documents, %d pages to recognize with %s", len(plans), len(tasks), engine)
+    if executor is None:
+        for path, page_number in tasks:
+            try:
+                page_done(path, ocr_page(path, page_number, engine))
+            except Exception as e:
+                page_done(path, None, f"page {page_number + 1}: {type(e).__name__}: {e}")
+    else:
+        page_futures = {executor.submit(ocr_page, path, page_number, engine): (path, page_number) for path, page_number in tasks}
+        for future in as_completed(page_futures):
+            path, page_number = page_futures[future]
+            try:
+                page_done(path, future.result())
+            except Exception as e:
+                page_done(path, None, f"page {page_number + 1}: {type(e).__name__}: {e}")
+
+    logger.info(
+        "OCR finished: %d documents with text, %d empty, %d errors; %d pages recognized (%d low confidence).",
+        summary["ocr"], summary["empty"], summary["errors"], summary["ocr_pages"], summary["low_confidence_pages"],
+    )
+    return summary
@@ -1,104 +1,320 @@
 # backend/src/services/ingestion/rtf_processor.py
 import argparse
+import functools
 import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
 from pathlib import Path
-import sys
+from typing import Any, Dict, List, Optional, Tuple
 
 from striprtf.striprtf import rtf_to_text
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from .ingestion_logging import ProgressReporter, configure_process_logging
+from .rtf_tokenizer import rtf_to_plain_text
+from .run_journal import RunJournal, atomic_write_text, source_signature
+from .text_decoding import decode_bytes, rtf_declared_codepage
+
 logger = logging.getLogger(__name__)
 
-def process_rtf_directory(input_dir: Path, output_dir: Path):
+# convert_rtf_file() outcomes, which are also the process_rtf_directory() counter names
+RTF_OUTCOMES = ("processed", "skipped", "errors")
+
+
+# Encodings tried, in order, when decoding non-ASCII RTF bytes. The code page the
+# document declares (\ansicpgN) is tried right after UTF-8.
+RTF_ENCODINGS = ['utf-8', 'cp1252', 'latin-1']
+
+# Small files are sent to workers in batches of up to this many bytes or files, so
+# tens of thousands of short notes do not cost one IPC round trip each.
+RTF_BATCH_BYTES = 1024 * 1024
+RTF_BATCH_MAX_FILES = 256
+# Number of slowest files listed in the process_rtf_directory() statistics
+RTF_SLOWEST_FILES = 10
+
+# RTF-to-text engines: name -> function(rtf_text, encoding for \'hh escapes) -> text.
+# 'tokenizer' (rtf_tokenizer) is much faster on notes with embedded pictures and
+# large font tables; 'striprtf' is kept for comparison.
+RTF_ENGINES = {
+    "tokenizer": rtf_to_plain_text,
+    "striprtf": functools.partial(rtf_to_text, errors="ignore"), # Ignore encoding errors within RTF structure
+}
+DEFAULT_RTF_ENGINE = os.getenv("RTF_ENGINE", "tokenizer")
+
+
+def rtf_encodings(raw: bytes) -> List[str]:
+    """Returns the encodings to try for an RTF document, including its declared code page."""
+    declared = rtf_declared_codepage(raw)
+    if declared is None or declared in RTF_ENCODINGS:
+        return RTF_ENCODINGS
+    return [RTF_ENCODINGS[0], declared] + RTF_ENCODINGS[1:]
+
+
+def _convert_rtf(raw: bytes, name: str, output_dir: Path, engine: Optional[str] = None) -> Dict[str, Any]:
+    """Does the work of convert_rtf_bytes() and also returns the encoding used and why
+    a file failed."""
+    output_txt_path = output_dir / f"{Path(name).stem}.txt"
+    logger.debug("Processing RTF file: %s", name)
+    result: Dict[str, Any] = {"outcome": "errors", "encoding": None, "error": None}
+
+    try:
+        rtf_content, encoding = decode_bytes(raw, name, rtf_encodings(raw))
+        result["encoding"] = encoding
+
+        if rtf_content is None:
+            logger.error("Could not decode %s with any attempted encoding. Skipping.", name)
+            result["error"] = "could not decode"
+            return result
+
+        if not rtf_content:
+            logger.warning("Skipping empty RTF file: %s", name)
+            result["outcome"] = "skipped"
+            return result
+
+        # Convert RTF to plain text; \'hh escapes are in the declared code page
+        plain_text = RTF_ENGINES[engine or DEFAULT_RTF_ENGINE](rtf_content, rtf_declared_codepage(raw) or "cp1252")
+
+        if not plain_text:
+            logger.warning("Conversion resulted in empty text for %s. Skipping output.", name)
+            result["outcome"] = "skipped"
+            return result
+
+        atomic_write_text(output_txt_path, plain_text.strip())
+        logger.debug("Converted %s to %s", name, output_txt_path.name)
+        result["outcome"] = "processed"
+        return result
+
+    except Exception as e:
+        logger.error("Error processing RTF file %s: %s", name, e, exc_info=True)
+        result["error"] = f"{type(e).__name__}: {e}"
+        return result
+
+
+def convert_rtf_bytes(raw: bytes, name: str, output_dir: Path, engine: Optional[str] = None) -> str:
+    """
+    Converts RTF bytes to plain text, saved as <output_dir>/<stem>.txt.
+
+    Args:
+        raw: The undecoded RTF content.
+        name: The RTF file name (used for logging and the output file name).
+        output_dir: Path to the directory where the extracted text file is saved.
+        engine: Name of an RTF_ENGINES entry. Defaults to DEFAULT_RTF_ENGINE.
+
+    Returns:
+        One of RTF_OUTCOMES: 'processed', 'skipped' (empty input or output) or 'errors'.
+    """
+    return _convert_rtf(raw, name, output_dir, engine)["outcome"]
+
+
+def _convert_rtf_path(rtf_file: Path, output_dir: Path, engine: Optional[str] = None) -> Dict[str, Any]:
+    """Reads an RTF file once and converts it; the result also has the time it took."""
+    start = time.perf_counter()
+    try:
+        raw = rtf_file.read_bytes()
+    except OSError as e:
+        logger.error("Error reading %s even before decoding: %s", rtf_file.name, e)
+        result = {"outcome": "errors", "encoding": None, "error": f"{type(e).__name__}: {e}"}
+    else:
+        result = _convert_rtf(raw, rtf_file.name, output_dir, engine)
+    result["seconds"] = round(time.perf_counter() - start, 4)
+    return result
+
+
+def convert_rtf_file(rtf_file: Path, output_dir: Path, engine: Optional[str] = None) -> str:
+    """
+    Converts one RTF file to plain text, saved as <output_dir>/<stem>.txt.
+
+    Returns:
+        One of RTF_OUTCOMES: 'processed', 'skipped' (empty input or output) or 'errors'.
+    """
+    return _convert_rtf_path(rtf_file, output_dir, engine)["outcome"]
+
+
+def convert_rtf_batch(rtf_files: List[Path], output_dir: Path, engine: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Worker entry point: converts a batch of RTF files, returning one result per file."""
+    return [_convert_rtf_path(rtf_file, output_dir, engine) for rtf_file in rtf_files]
+
+
+def make_rtf_batches(
+    pending: List[Tuple[Path, Dict[str, int]]],
+    batch_bytes: int = RTF_BATCH_BYTES,
+    max_files: int = RTF_BATCH_MAX_FILES,
+) -> List[List[Tuple[Path, Dict[str, int]]]]:
+    """Groups files (with their source signatures) into batches, largest files first.
+
+    A file of batch_bytes or more is a batch of its own; smaller files fill batches
+    up to batch_bytes and max_files.
+    """
+    batches: List[List[Tuple[Path, Dict[str, int]]]] = []
+    current: List[Tuple[Path, Dict[str, int]]] = []
+    current_bytes = 0
+    for item in sorted(pending, key=lambda item: item[1]["size"], reverse=True):
+        size = item[1]["size"]
+        if current and (current_bytes + size > batch_bytes or len(current) >= max_files):
+            batches.append(current)
+            current, current_bytes = [], 0
+        current.append(item)
+        current_bytes += size
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _batch_results(future, batch: List[Tuple[Path, Dict[str, int]]]) -> List[Dict[str, Any]]:
+    try:
+        return future.result()
+    except Exception as e: # e.g. a worker process died
+        logger.error("RTF worker failed: %s", e, exc_info=True)
+        error = f"worker failed: {type(e).__name__}: {e}"
+        return [{"outcome": "errors", "encoding": None, "error": error, "seconds": None} for _ in batch]
+
+
+def process_rtf_directory(
+    input_dir: Path,
+    output_dir: Path,
+    executor: Optional[Executor] = None,
+    resume: bool = False,
+    max_workers: Optional[int] = None,
+    batch_bytes: int = RTF_BATCH_BYTES,
+    engine: Optional[str] = None,
+) -> Optional[Dict[str, Any]]:
     """
     Processes RTF files in an input directory, converting them to plain text
     and saving the text to the output directory.
 
+    Each file is read once and decoded with the shared detector (see
+    text_decoding). Files are converted on a process pool in batches (see
+    make_rtf_batches), largest first.
+
     Args:
         input_dir: Path to the directory containing RTF files.
         output_dir: Path to the directory where extracted text files (.txt) will be saved.
+        executor: Optional executor (e.g. a process pool shared with other ingestion
+            stages) that batches are converted on. It is not shut down here. Without
+            one, a process pool of max_workers is created for this call (or files are
+            converted in this thread if there is at most one worker or batch).
+        resume: If True, files completed by a previous run into the same output
+            directory (per its run journal) are not converted again.
+        max_workers: Size of the pool created when no executor is given. Defaults to
+            the CPU count.
+        batch_bytes: Target total size of a batch of small files.
+        engine: RTF-to-text engine (see RTF_ENGINES). Defaults to DEFAULT_RTF_ENGINE.
+
+    Returns:
+        A dictionary with:
+            'counts': 'files', one count per RTF_OUTCOMES entry and 'resumed'
+                (files already completed by a previous run).
+            'encodings': encoding -> number of files decoded with it in this run.
+            'failures': {'file', 'error'} for every file counted under 'errors'.
+            'batches': number of batches sent to the pool (or converted inline).
+            'bytes': total size of the files converted in this run.
+            'slowest': {'file', 'bytes', 'seconds'} for the RTF_SLOWEST_FILES slowest files.
+            'engine': the RTF-to-text engine used.
+        or None if the input directory does not exist.
+
+    Raises:
+        ValueError: If the engine is not registered.
     """
+    engine = engine or DEFAULT_RTF_ENGINE
+    if engine not in RTF_ENGINES:
+        raise ValueError(f"Unknown RTF engine '{engine}'. Available: {', '.join(RTF_ENGINES)}")
     if not input_dir.is_dir():
-        logger.error(f"Input directory not found: {input_dir}")
-        return
+        logger.error("Input directory not found: %s", input_dir)
+        return None
 
     output_dir.mkdir(parents=True, exist_ok=True)
-    logger.info(f"Output directory set to: {output_dir}")
-
-    processed_count = 0
-    skipped_count = 0
-    error_count = 0
+    logger.info("Output directory set to: %s", output_dir)
 
     # Use a case-insensitive glob pattern to find both .rtf and .RTF files
-    rtf_files = list(input_dir.glob('*.[rR][tT][fF]'))
-    logger.info(f"Found {len(rtf_files)} RTF files (case-insensitive) in {input_dir}.")
+    rtf_files = [item for item in input_dir.glob('*.[rR][tT][fF]') if item.is_file()]
+    logger.info("Found %s RTF files (case-insensitive) in %s.", len(rtf_files), input_dir)
+    counts = dict.fromkeys(RTF_OUTCOMES, 0)
+    counts["files"] = len(rtf_files)
+    counts["resumed"] = 0
+    encodings: Dict[str, int] = {}
+    failures: List[Dict[str, Any]] = []
+    timings: List[Dict[str, Any]] = []
 
-    for rtf_file in rtf_files:
-        if not rtf_file.is_file(): # Should not happen with glob but good practice
-            continue
-
-        output_txt_path = output_dir / f"{rtf_file.stem}.txt"
-        logger.info(f"Processing RTF file: {rtf_file.name}...")
+    with RunJournal(output_dir, config={"stage": "rich_text", "engine": engine}, resume=resume) as journal:
+        pending = []
+        for rtf_file in rtf_files:
+            source = source_signature(rtf_file)
+            previous = journal.completed_result(rtf_file.name, source) if resume else None
+            if previous is None:
+                pending.append((rtf_file, source))
+            else:
+                counts[previous] += 1
+                counts["resumed"] += 1
+        batches = make_rtf_batches(pending, batch_bytes)
+        logger.info("Converting %d RTF files in %d batches.", len(pending), len(batches))
 
+        own_executor = None
+        if executor is None:
+            pool_size = min(max_workers or os.cpu_count() or 1, len(batches))
+            if pool_size > 1:
+                own_executor = executor = ProcessPoolExecutor(max_workers=pool_size)
         try:
-            # Read the RTF file content
-            # Try common encodings if default fails
-            rtf_content = None
-            encodings_to_try = ['utf-8', 'latin-1', 'cp1252']
-            for encoding in encodings_to_try:
-                try:
-                    with open(rtf_file, 'r', encoding=encoding) as f:
-                        rtf_content = f.read()
-                    logger.debug(f"Successfully read {rtf_file.name} with encoding {encoding}")
-                    break # Exit loop if successful
-                except UnicodeDecodeError:
-                    logger.debug(f"Failed to decode {rtf_file.name} with {encoding}")
-                    continue
-                except Exception as read_err:
-                     logger.error(f"Error reading {rtf_file.name} even before decoding: {read_err}")
-                     raise # Re-raise unexpected reading errors
-
-            if rtf_content is None:
-                logger.error(f"Could not decode {rtf_file.name} with any attempted encoding. Skipping.")
-                error_count += 1
-                continue
-
-            if not rtf_content:
-                logger.warning(f"Skipping empty RTF file: {rtf_file.name}")
-                skipped_count += 1
-                continue
-
-            # Convert RTF to plain text
-            plain_text = rtf_to_text(rtf_content, errors="ignore") # Ignore encoding errors within RTF structure
-
-            if plain_text:
-                with open(output_txt_path, 'w', encoding='utf-8') as txt_file:
-                    txt_file.write(plain_text.strip())
-                logger.info(f"Converted {rtf_file.name} to {output_txt_path.name}")
-                processed_count += 1
+            progress = ProgressReporter(logger, "RTF files", len(pending))
+            if executor is None:
+                results = ((batch, convert_rtf_batch([rtf_file for rtf_file, _ in batch], output_dir, engine)) for batch in batches)
             else:
-                logger.warning(f"Conversion resulted in empty text for {rtf_file.name}. Skipping output.")
-                skipped_count += 1
+                futures = {
+                    executor.submit(convert_rtf_batch, [rtf_file for rtf_file, _ in batch], output_dir, engine): batch
+                    for batch in batches
+                }
+                results = ((futures[future], _batch_results(future, futures[future])) for future in as_completed(futures))
 
-        except Exception as e:
-            logger.error(f"Error processing RTF file {rtf_file.name}: {e}", exc_info=True)
-            error_count += 1
+            done = 0
+            for batch, batch_results in results:
+                for (rtf_file, source), result in zip(batch, batch_results):
+                    outcome = result["outcome"]
+                    counts[outcome] += 1
+                    if result["encoding"]:
+                        encodings[result["encoding"]] = encodings.get(result["encoding"], 0) + 1
+                    timings.append({"file": rtf_file.name, "bytes": source["size"], "seconds": result["seconds"]})
+                    if outcome == "errors":
+                        failures.append({"file": rtf_file.name, "error": result["error"]})
+                    else:
+                        outputs = [output_dir / f"{rtf_file.stem}.txt"] if outcome == "processed" else []
+                        journal.record(rtf_file.name, source, outcome, outputs)
+                done += len(batch)
+                progress.update(done)
+        finally:
+            if own_executor is not None:
+                own_executor.shutdown()
 
-    logger.info(f"Finished processing Rich Text directory.")
-    logger.info(f"  Successfully converted: {processed_count} RTF files")
-    logger.info(f"  Skipped (empty or conversion yielded no text): {skipped_count}")
-    logger.info(f"  Errors: {error_count}")
+    timings.sort(key=lambda timing: timing["seconds"] or 0.0, reverse=True)
+    logger.info("Finished processing Rich Text directory.")
+    logger.info("  Successfully converted: %s RTF files", counts["processed"])
+    logger.info("  Skipped (empty or conversion yielded no text): %s", counts["skipped"])
+    logger.info("  Errors: %s", counts["errors"])
+    if counts["resumed"]:
+        logger.info("  Already completed in a previous run: %s", counts["resumed"])
+    if encodings:
+        logger.info("  Encodings: %s", ", ".join(f"{name}={n}" for name, n in sorted(encodings.items())))
+    return {
+        "counts": counts,
+        "encodings": encodings,
+        "failures": failures,
+        "batches": len(batches),
+        "bytes": sum(source["size"] for _, source in pending),
+        "slowest": timings[:RTF_SLOWEST_FILES],
+        "engine": engine,
+    }
 
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Process RTF files in a directory, converting them to plain text.")
     parser.add_argument("input_dir", help="Path to the input directory containing RTF files.")
     parser.add_argument("output_dir", help="Path to the output directory for extracted text files (.txt).")
+    parser.add_argument("--resume", action="store_true", help="Skip files completed by a previous run into the same output directory.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes (default: CPU count).")
+    parser.add_argument("--engine", choices=list(RTF_ENGINES), default=None, help=f"RTF-to-text engine (default: {DEFAULT_RTF_ENGINE}).")
 
     args = parser.parse_args()
+    configure_process_logging()
 
     input_path = Path(args.input_dir).resolve()
     output_path = Path(args.output_dir).resolve()
 
-    process_rtf_directory(input_path, output_path)
+    process_rtf_directory(input_path, output_path, resume=args.resume, max_workers=args.workers, engine=args.engine)
@@ -0,0 +1,198 @@
+"""
+Streaming RTF-to-text tokenizer for clinical notes.
+
+A faster alternative to striprtf's rtf_to_text, which matches every
+character of the document with a regex. Here:
+
+- Runs of plain text are matched as a whole.
+- Ignorable destinations ({\\* ...} groups, font and color tables,
+  pictures, embedded objects, document info, ...) are skipped by jumping
+  from brace to brace. Their content (often megabytes of hex picture data)
+  is never tokenized or copied.
+- \\uN escapes are decoded as UTF-16 (including surrogate pairs) and
+  their \\ucN fallback characters are skipped.
+- Runs of \\'hh escapes are decoded together in the document's code page
+  (\\ansicpgN, or the encoding passed in), so double-byte code pages work.
+
+iter_rtf_text() yields the text in chunks as it is produced; rtf_to_plain_text()
+joins them. The output follows striprtf's conventions (\\par is a newline,
+table cells are separated by '|'), so both engines can be compared.
+"""
+
+import codecs
+import re
+from typing import Iterator, List
+
+# Destinations whose content is not document text
+IGNORED_DESTINATIONS = frozenset((
+    "annotation", "atnauthor", "atndate", "atnid", "atnref", "author", "background", "bkmkend",
+    "bkmkstart", "blipuid", "buptim", "category", "colorschememapping", "colortbl", "comment",
+    "company", "creatim", "datafield", "datastore", "defchp", "defpap", "do", "doccomm", "docvar",
+    "dptxbxtext", "falt", "ffdeftext", "ffentrymcr", "ffexitmcr", "ffformat", "ffhelptext", "ffl",
+    "ffname", "ffstattext", "file", "filetbl", "fldinst", "fonttbl", "fontemb", "fontfile",
+    "footer", "footerf", "footerl", "footerr", "footnote", "formfield", "ftncn", "ftnsep",
+    "ftnsepc", "generator", "header", "headerf", "headerl", "headerr", "info", "keywords",
+    "latentstyles", "levelnumbers", "leveltext", "listlevel", "listname", "listoverridetable",
+    "listpicture", "listtable", "manager", "nonshppict", "object", "objdata", "operator",
+    "panose", "pgptbl", "picprop", "pict", "pntext", "pntxta", "pntxtb", "printim", "private",
+    "revtbl", "revtim", "rsidtbl", "shpinst", "stylesheet", "subject", "template", "themedata",
+    "title", "userprops", "wgrffmtfilter", "xmlnstbl",
+))
+
+# Control words that produce text
+SPECIAL_CHARS = {
+    "par": "\n", "sect": "\n\n", "page": "\n\n", "line": "\n", "row": "\n", "tab": "\t",
+    "cell": "|", "nestcell": "|", "emdash": "\u2014", "endash": "\u2013", "emspace": "\u2003",
+    "enspace": "\u2002", "qmspace": "\u2005", "bullet": "\u2022", "lquote": "\u2018",
+    "rquote": "\u2019", "ldblquote": "\u201c", "rdblquote": "\u201d",
+}
+# Control symbols (backslash + one non-letter) that produce text
+SPECIAL_SYMBOLS = {
+    "~": "\xa0", "-": "\xad", "_": "\u2011", "{": "{", "}": "}", "\\": "\\", "\n": "\n", "\r": "\n",
+}
+
+# One token: control word (+ optional numeric parameter and its delimiting space),
+# hex escape, control symbol, brace, source line break, or a run of plain text
+_TOKEN = re.compile(
+    r"\\([a-zA-Z]{1,32})(-?\d{1,10})? ?|\\'([0-9a-fA-F]{2})|\\(.)|([{}])|[\r\n]+|([^\\{}\r\n]+)",
+    re.DOTALL,
+)
+# What matters while skipping a group: \bin data, escaped characters and braces
+_SKIP_TOKEN = re.compile(r"\\bin(-?\d{1,10}) ?|\\.|[{}]", re.DOTALL)
+
+# Text is yielded in chunks of about this many parts
+_CHUNK_PARTS = 1024
+
+
+def _skip_group(rtf: str, pos: int) -> int:
+    """Returns the position just after the '}' that closes the group containing pos."""
+    depth = 1
+    while True:
+        match = _SKIP_TOKEN.search(rtf, pos)
+        if match is None:
+            return len(rtf)
+        token = match.group(0)
+        pos = match.end()
+        if token == "{":
+            depth += 1
+        elif token == "}":
+            depth -= 1
+            if depth == 0:
+                return pos
+        elif match.group(1) is not None:
+            pos += max(int(match.group(1)), 0)
+
+
+def _lookup_codec(name: str, default: str) -> str:
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return default
+
+
+def iter_rtf_text(rtf: str, encoding: str = "cp1252") -> Iterator[str]:
+    """Yields the plain text of an RTF document in chunks.
+
+    Args:
+        rtf: The decoded RTF document.
+        encoding: Code page for \\'hh escapes, unless the document declares one (\\ansicpgN).
+    """
+    codepage = _lookup_codec(encoding, "cp1252")
+    parts: List[str] = []
+    hex_bytes = bytearray()
+    # Per group: number of fallback characters after \uN (\ucN, default 1)
+    uc_stack = [1]
+    skip = 0  # Fallback characters still to skip after a \uN
+    group_start = False  # Right after '{' (where a destination control word may follow)
+    star = False  # '\*' seen at the start of the current group
+    high_surrogate = None
+    pos, end = 0, len(rtf)
+    match_token = _TOKEN.match
+
+    while pos < end:
+        match = match_token(rtf, pos)
+        if match is None:  # A lone backslash at the very end
+            break
+        pos = match.end()
+        word, param, hex_code, symbol, brace, text = match.groups()
+
+        if hex_code is None and hex_bytes:
+            parts.append(hex_bytes.decode(codepage, errors="ignore"))
+            hex_bytes.clear()
+
+        if text is not None:
+            group_start = star = False
+            if skip:
+                dropped = min(skip, len(text))
+                text = text[dropped:]
+                skip -= dropped
+            if text:
+                parts.append(text)
+        elif word is not None:
+            if group_start and (star or word in IGNORED_DESTINATIONS):
+                pos = _skip_group(rtf, pos)
+                uc_stack.pop()
+                group_start = star = False
+                skip = 0
+                continue
+            group_start = False
+            if skip:
+                skip -= 1
+                continue
+            if word == "u" and param is not None:
+                code = int(param)
+                if code < 0:
+                    code += 65536
+                skip = uc_stack[-1]
+                if 0xD800 <= code < 0xDC00:
+                    high_surrogate = code
+                elif 0xDC00 <= code < 0xE000 and high_surrogate is not None:
+                    parts.append(chr(0x10000 + ((high_surrogate - 0xD800) << 10) + (code - 0xDC00)))
+                    high_surrogate = None
+                else:
+                    parts.append(chr(code))
+            elif word in SPECIAL_CHARS:
+                parts.append(SPECIAL_CHARS[word])
+            elif word == "uc" and param is not None:
+                uc_stack[-1] = max(int(param), 0)
+            elif word == "bin" and param is not None:
+                pos += max(int(param), 0)
+            elif word == "ansicpg" and param is not None:
+                codepage = _lookup_codec(f"cp{int(param)}", codepage)
+        elif hex_code is not None:
+            group_start = star = False
+            if skip:
+                skip -= 1
+            else:
+                hex_bytes.append(int(hex_code, 16))
+        elif symbol is not None:
+            if symbol == "*":
+                star = group_start
+                continue
+            group_start = False
+            if skip:
+                skip -= 1
+            elif symbol in SPECIAL_SYMBOLS:
+                parts.append(SPECIAL_SYMBOLS[symbol])
+        elif brace == "{":
+            uc_stack.append(uc_stack[-1])
+            group_start, star, skip = True, False, 0
+        elif brace == "}":
+            if len(uc_stack) > 1:
+                uc_stack.pop()
+            group_start, star, skip = False, False, 0
+        # Source line breaks ([\r\n]+) are not text
+
+        if len(parts) >= _CHUNK_PARTS:
+            yield "".join(parts)
+            parts.clear()
+
+    if hex_bytes:
+        parts.append(hex_bytes.decode(codepage, errors="ignore"))
+    if parts:
+        yield "".join(parts)
+
+
+def rtf_to_plain_text(rtf: str, encoding: str = "cp1252") -> str:
+    """Converts an RTF document to plain text (see iter_rtf_text)."""
+    return "".join(iter_rtf_text(rtf, encoding))
@@ -0,0 +1,206 @@
+"""
+Run journal and atomic output writes for resumable ingestion.
+
+Stage outputs are written to a temp file in the target directory and then
+renamed into place, so a crash never leaves a half-written .md or .txt
+under its final name. Each completed unit of work (one input file or
+archive member) is appended to a JSON-lines journal in the stage's output
+directory, together with its source signature and the size of every
+output it produced. A resumed run skips the units whose journal entry
+still verifies and redoes everything else.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_FILE_NAME = ".ingestion_journal.jsonl"
+JOURNAL_VERSION = 1
+TEMP_SUFFIX = ".tmp"
+
+
+def atomic_write_bytes(path: Path, data: bytes, durable: bool = True) -> None:
+    """Writes bytes to a temp file in the target directory, then renames it into place.
+
+    Args:
+        path: Final path of the file.
+        data: Content to write.
+        durable: If True, fsync the temp file before the rename so the content also
+            survives a power loss, not just a process crash.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=TEMP_SUFFIX)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+            if durable:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def atomic_write_text(path: Path, text: str, durable: bool = False) -> None:
+    """Writes UTF-8 text atomically (see atomic_write_bytes)."""
+    atomic_write_bytes(path, text.encode("utf-8"), durable=durable)
+
+
+@contextmanager
+def atomic_output_path(path: Path) -> Iterator[Path]:
+    """Yields a temp path for writers that need a file name (e.g. pyarrow); renames it
+    to `path` if the block succeeds and removes it otherwise."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=TEMP_SUFFIX)
+    os.close(fd)
+    try:
+        yield Path(tmp_name)
+        os.replace(tmp_name, path)
+    except BaseException:
+        if os.path.exists(tmp_name):
+            os.unlink(tmp_name)
+        raise
+
+
+def remove_stale_temp_files(directory: Path) -> int:
+    """Removes temp files left behind by interrupted atomic writes. Returns how many were removed."""
+    removed = 0
+    for item in directory.glob(f".*{TEMP_SUFFIX}"):
+        try:
+            item.unlink()
+            removed += 1
+        except OSError as e:
+            logger.warning("Could not remove stale temp file %s: %s", item, e)
+    return removed
+
+
+def source_signature(path: Path) -> Dict[str, int]:
+    """Returns the size and mtime of an input file, used to tell whether it changed."""
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _config_key(config: Optional[Dict[str, Any]]) -> str:
+    return hashlib.sha256(json.dumps(config or {}, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _load_entries(journal_path: Path) -> Dict[str, Dict[str, Any]]:
+    """Loads the latest entry per unit. A torn last line (crash mid-append) is ignored."""
+    entries: Dict[str, Dict[str, Any]] = {}
+    try:
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get("v") == JOURNAL_VERSION and "unit" in entry:
+                    entries[entry["unit"]] = entry
+    except FileNotFoundError:
+        pass
+    return entries
+
+
+def _check_outputs(output_dir: Path, entry: Dict[str, Any]) -> Optional[str]:
+    """Returns None if all outputs of an entry are present with their recorded size,
+    otherwise 'missing' or 'truncated'."""
+    for name, size in entry.get("outputs", {}).items():
+        try:
+            actual = (output_dir / name).stat().st_size
+        except FileNotFoundError:
+            return "missing"
+        if actual != size:
+            return "truncated"
+    return None
+
+
+def verify_journal(output_dir: Path) -> Dict[str, Any]:
+    """Verifies every output recorded in a stage's journal.
+
+    Returns:
+        A dictionary with 'entries', 'verified', 'missing' and 'truncated' counts and
+        'failed_units' (units whose outputs are missing or have the wrong size).
+    """
+    output_dir = Path(output_dir)
+    entries = _load_entries(output_dir / JOURNAL_FILE_NAME)
+    report: Dict[str, Any] = {"entries": len(entries), "verified": 0, "missing": 0, "truncated": 0, "failed_units": []}
+    for unit, entry in entries.items():
+        problem = _check_outputs(output_dir, entry)
+        if problem is None:
+            report["verified"] += 1
+        else:
+            report[problem] += 1
+            report["failed_units"].append(unit)
+    if report["failed_units"]:
+        logger.warning("Journal %s: %d units failed verification.", output_dir, len(report["failed_units"]))
+    return report
+
+
+class RunJournal:
+    """Append-only record of completed units of work for one stage output directory.
+
+    A fresh run truncates the journal. A resumed run keeps it, removes stale temp
+    files, and treats a unit as complete only if its source signature and the
+    run configuration are unchanged and all of its outputs verify.
+    """
+
+    def __init__(self, output_dir: Path, config: Optional[Dict[str, Any]] = None, resume: bool = False):
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.output_dir / JOURNAL_FILE_NAME
+        self.config_key = _config_key(config)
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        if resume:
+            self._entries = _load_entries(self.path)
+            removed = remove_stale_temp_files(self.output_dir)
+            if removed:
+                logger.info("Removed %d stale temp files from %s", removed, self.output_dir)
+        self._file = open(self.path, "a" if resume else "w", encoding="utf-8")
+
+    def __enter__(self) -> "RunJournal":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+    def completed_result(self, unit: str, source: Dict[str, Any]) -> Optional[Any]:
+        """Returns the recorded result of a unit if it can be skipped, otherwise None."""
+        entry = self._entries.get(unit)
+        if entry is None or entry.get("source") != source or entry.get("config") != self.config_key:
+            return None
+        problem = _check_outputs(self.output_dir, entry)
+        if problem is not None:
+            logger.warning("Output of %s is %s; it will be redone.", unit, problem)
+            return None
+        return entry.get("result")
+
+    def record(self, unit: str, source: Dict[str, Any], result: Any, outputs: List[Path]) -> None:
+        """Records a completed unit. Call only after its outputs were renamed into place."""
+        entry = {
+            "v": JOURNAL_VERSION,
+            "unit": unit,
+            "source": source,
+            "config": self.config_key,
+            "result": result,
+            "outputs": {path.relative_to(self.output_dir).as_posix(): path.stat().st_size for path in outputs},
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            self._entries[unit] = entry
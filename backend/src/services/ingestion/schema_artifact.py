@@ -0,0 +1,110 @@
+"""
+Compiled EHI schema artifact.
+
+The parsed EHI schema (table name -> description, primary key, columns) is
+stored as compact JSON behind a magic/version header, so a stale artifact
+from an older parser is rejected instead of being misread. The content is
+only ever decoded as JSON: a schema path can come from an API request, and
+loading it must not be able to run code. Worker processes receive the
+schema path rather than the schema with each task, and load it once per
+process (get_cached_schema). Plain JSON schema files are still accepted
+everywhere a schema path is taken.
+"""
+
+import functools
+import hashlib
+import json
+import os
+import struct
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .run_journal import atomic_write_bytes
+
+SCHEMA_ARTIFACT_MAGIC = b"EHISCHEMA"
+SCHEMA_ARTIFACT_VERSION = 2  # 1: pickle, no longer loaded
+_HEADER = struct.Struct(f"<{len(SCHEMA_ARTIFACT_MAGIC)}sH")
+
+
+class SchemaArtifactError(Exception):
+    """Raised when a schema artifact is missing, corrupt or from an unsupported version."""
+    pass
+
+
+def is_json_schema(path: Path) -> bool:
+    return path.suffix.lower() == ".json"
+
+
+def write_schema(schemas: Dict[str, Dict[str, Any]], path: Path) -> None:
+    """Writes the schema as compact JSON, behind the artifact header unless the path is .json."""
+    data = json.dumps(schemas, separators=(",", ":")).encode("utf-8")
+    if not is_json_schema(path):
+        data = _HEADER.pack(SCHEMA_ARTIFACT_MAGIC, SCHEMA_ARTIFACT_VERSION) + data
+    atomic_write_bytes(path, data)
+
+
+def load_schema(path: Path) -> Dict[str, Dict[str, Any]]:
+    """Loads a schema from a JSON file or a schema artifact.
+
+    Raises:
+        SchemaArtifactError: If the artifact header is missing, the version is unsupported
+            or the content is not a schema.
+    """
+    if is_json_schema(path):
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    data = Path(path).read_bytes()
+    if len(data) < _HEADER.size:
+        raise SchemaArtifactError(f"Schema artifact {path} is truncated.")
+    magic, version = _HEADER.unpack_from(data, 0)
+    if magic != SCHEMA_ARTIFACT_MAGIC:
+        raise SchemaArtifactError(f"{path} is not an EHI schema artifact.")
+    if version != SCHEMA_ARTIFACT_VERSION:
+        raise SchemaArtifactError(
+            f"Schema artifact {path} has version {version}, expected {SCHEMA_ARTIFACT_VERSION}. Re-run the schema parser."
+        )
+    try:
+        schemas = json.loads(data[_HEADER.size:])
+    except ValueError as e:
+        raise SchemaArtifactError(f"Schema artifact {path} is corrupt: {e}") from e
+    if not isinstance(schemas, dict):
+        raise SchemaArtifactError(f"Schema artifact {path} does not contain a schema.")
+    return schemas
+
+
+@functools.lru_cache(maxsize=4)
+def _load_schema_cached(path: str, mtime_ns: int) -> Dict[str, Dict[str, Any]]:
+    return load_schema(Path(path))
+
+
+def get_cached_schema(path: Optional[str]) -> Optional[Dict[str, Dict[str, Any]]]:
+    """Loads a schema once per process (re-loading only if the file changes)."""
+    if not path:
+        return None
+    return _load_schema_cached(path, os.stat(path).st_mtime_ns)
+
+
+def file_sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def manifest_path_for(output_file: Path) -> Path:
+    """Returns the path of the hash manifest kept next to a schema output file."""
+    return output_file.with_name(output_file.name + ".manifest.json")
+
+
+def load_manifest(path: Path) -> Dict[str, Any]:
+    """Loads a hash manifest; a missing or unreadable manifest yields an empty one."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == SCHEMA_ARTIFACT_VERSION:
+            return manifest
+    except (OSError, ValueError):
+        pass
+    return {"version": SCHEMA_ARTIFACT_VERSION, "files": {}}
+
+
+def write_manifest(path: Path, manifest: Dict[str, Any]) -> None:
+    atomic_write_bytes(path, json.dumps(manifest, indent=1, sort_keys=True).encode("utf-8"))
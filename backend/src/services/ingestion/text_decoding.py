@@ -0,0 +1,58 @@
+"""
+Byte-to-text decoding shared by the ingestion stages (EHI TSV tables, RTF notes).
+
+Inputs are read once as bytes and decoded here. Pure-ASCII input, which is
+most RTF and most EHI tables, is recognized with a single C-level check and
+decoded without trying any other encoding. Otherwise the candidate
+encodings are tried in order; strict codecs (UTF-8) must come before
+permissive ones (cp1252, latin-1), which accept almost any byte sequence.
+"""
+
+import codecs
+import logging
+import re
+from typing import List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# \ansicpgN in an RTF header declares the ANSI code page of the document
+_RTF_CODEPAGE_PATTERN = re.compile(rb"\\ansicpg(\d{3,5})")
+# The header (and with it \ansicpg) is at the very start of an RTF document
+_RTF_HEADER_BYTES = 1024
+
+
+def rtf_declared_codepage(raw: bytes) -> Optional[str]:
+    """Returns the Python codec name of the code page an RTF document declares, if known."""
+    match = _RTF_CODEPAGE_PATTERN.search(raw, 0, _RTF_HEADER_BYTES)
+    if not match:
+        return None
+    name = f"cp{int(match.group(1))}"
+    try:
+        return codecs.lookup(name).name
+    except LookupError:
+        return None
+
+
+def decode_bytes(raw: bytes, name: str, encodings: List[str]) -> Tuple[Optional[str], Optional[str]]:
+    """Decodes bytes with the first encoding that works.
+
+    Args:
+        raw: The undecoded content.
+        name: Input name, used for logging.
+        encodings: Encodings to try, in order, if the content is not pure ASCII.
+
+    Returns:
+        The decoded text and the encoding used ('ascii' for pure-ASCII input),
+        or (None, None) if no encoding works.
+    """
+    if raw.isascii():
+        return raw.decode("ascii"), "ascii"
+    for encoding in encodings:
+        try:
+            content = raw.decode(encoding)
+        except (UnicodeDecodeError, LookupError):
+            logger.debug("Encoding '%s' failed for %s", encoding, name)
+            continue
+        logger.debug("Successfully detected encoding '%s' for %s", encoding, name)
+        return content, encoding
+    return None, None
@@ -0,0 +1,228 @@
+# /backend/src/services/llm_cache.py
+"""
+Persistent cache of LLM responses, so summarizing the same content with the same
+provider, model, prompt and generation parameters again costs no provider call.
+
+Keys are content-addressed (see llm_cache_key): the SHA-256 of the input (PDF
+bytes, text or prompt) combined with everything else that determines the
+response. Entries live in a local SQLite database, encrypted with AES-256-GCM
+under a key derived once from the master key (the cached summaries contain PHI).
+Recently used entries are also kept decrypted in a bounded in-memory LRU tier.
+Entries expire after a TTL and expired rows are purged periodically.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() not in ("0", "false", "no")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./cache/llm_responses.sqlite3")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
+LLM_CACHE_MEMORY_ENTRIES = int(os.getenv("LLM_CACHE_MEMORY_ENTRIES", "512"))
+# Expired rows are purged after this many writes
+PURGE_EVERY_WRITES = 200
+
+RESPONSES_DDL = (
+    'CREATE TABLE IF NOT EXISTS "llm_responses" ('
+    '"key" TEXT PRIMARY KEY, "nonce" BLOB, "ciphertext" BLOB, '
+    '"created_at" REAL, "expires_at" REAL, "last_access" REAL)'
+)
+META_DDL = 'CREATE TABLE IF NOT EXISTS "llm_cache_meta" ("name" TEXT PRIMARY KEY, "value" BLOB)'
+
+
+def llm_cache_key(
+    content: Union[bytes, str],
+    provider: str,
+    model_id: str,
+    prompt_version: str,
+    params: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Returns the cache key of an LLM request.
+
+    Args:
+        content: The input the response is generated from (PDF bytes, text or prompt).
+        provider: The LLM provider.
+        model_id: The model.
+        prompt_version: Version of the prompt the input is sent with.
+        params: Generation parameters that change the response (max tokens, temperature, ...).
+    """
+    if isinstance(content, str):
+        content = content.encode("utf-8")
+    digest = hashlib.sha256(content).hexdigest()
+    request = json.dumps([digest, provider, model_id, prompt_version, params or {}], sort_keys=True)
+    return hashlib.sha256(request.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Two-tier (memory LRU, encrypted SQLite) cache of LLM responses with a TTL."""
+
+    def __init__(
+        self,
+        path: Union[str, Path] = LLM_CACHE_PATH,
+        key: Optional[bytes] = None,
+        ttl_seconds: int = LLM_CACHE_TTL_SECONDS,
+        memory_entries: int = LLM_CACHE_MEMORY_ENTRIES,
+    ):
+        """
+        Args:
+            path: SQLite database file (created if missing).
+            key: 32-byte AES key. Defaults to a key derived from the master key
+                (see EncryptionService.derive_key) with a salt stored in the database.
+            ttl_seconds: How long entries stay valid.
+            memory_entries: Entries kept decrypted in memory.
+        """
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self._memory: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "sets": 0, "expired": 0}
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(RESPONSES_DDL)
+            self._conn.execute(META_DDL)
+        self._aead = AESGCM(key or self._derive_key())
+
+    def _derive_key(self) -> bytes:
+        """Derives the cache key from the master key; the salt is created once per database."""
+        from .security.encryption import encryption_service
+
+        row = self._conn.execute('SELECT "value" FROM "llm_cache_meta" WHERE "name" = ?', ("salt",)).fetchone()
+        salt = row[0] if row else os.urandom(16)
+        if not row:
+            with self._conn:
+                self._conn.execute('INSERT INTO "llm_cache_meta" VALUES (?, ?)', ("salt", salt))
+        key, _ = encryption_service.derive_key("llm_cache", salt)
+        return key
+
+    def _remember(self, key: str, expires_at: float, value: str) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Returns the cached response for a key, or None if it is missing or expired."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._memory.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    return entry[1]
+                del self._memory[key]
+
+            row = self._conn.execute(
+                'SELECT "nonce", "ciphertext", "expires_at" FROM "llm_responses" WHERE "key" = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self._stats["misses"] += 1
+                return None
+            nonce, ciphertext, expires_at = row
+            if expires_at <= now:
+                with self._conn:
+                    self._conn.execute('DELETE FROM "llm_responses" WHERE "key" = ?', (key,))
+                self._stats["expired"] += 1
+                self._stats["misses"] += 1
+                return None
+            try:
+                value = self._aead.decrypt(nonce, ciphertext, key.encode("ascii")).decode("utf-8")
+            except Exception as e:  # Wrong key (e.g. a rotated master key) or a corrupted row
+                logger.warning(f"Could not decrypt cached LLM response {key[:12]}: {e!r}; ignoring it.")
+                self._stats["misses"] += 1
+                return None
+            with self._conn:
+                self._conn.execute('UPDATE "llm_responses" SET "last_access" = ? WHERE "key" = ?', (now, key))
+            self._remember(key, expires_at, value)
+            self._stats["disk_hits"] += 1
+            return value
+
+    def set(self, key: str, value: str, ttl_seconds: Optional[int] = None) -> None:
+        """Stores a response under a key, replacing any previous entry."""
+        now = time.time()
+        expires_at = now + (self.ttl_seconds if ttl_seconds is None else ttl_seconds)
+        nonce = os.urandom(12)
+        # The key is authenticated with the ciphertext, so rows cannot be swapped
+        ciphertext = self._aead.encrypt(nonce, value.encode("utf-8"), key.encode("ascii"))
+        with self._lock:
+            with self._conn:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO "llm_responses" VALUES (?, ?, ?, ?, ?, ?)',
+                    (key, nonce, ciphertext, now, expires_at, now),
+                )
+            self._remember(key, expires_at, value)
+            self._stats["sets"] += 1
+            self._writes += 1
+            if self._writes % PURGE_EVERY_WRITES == 0:
+                self._purge_expired(now)
+
+    def _purge_expired(self, now: float) -> int:
+        with self._conn:
+            purged = self._conn.execute('DELETE FROM "llm_responses" WHERE "expires_at" <= ?', (now,)).rowcount
+        self._stats["expired"] += purged
+        return purged
+
+    def purge_expired(self) -> int:
+        """Deletes expired entries and returns how many were deleted."""
+        now = time.time()
+        with self._lock:
+            self._memory = OrderedDict((k, v) for k, v in self._memory.items() if v[0] > now)
+            return self._purge_expired(now)
+
+    def clear(self) -> None:
+        """Deletes all entries."""
+        with self._lock:
+            with self._conn:
+                self._conn.execute('DELETE FROM "llm_responses"')
+            self._memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns hit, miss and size metrics; 'hit_rate' is hits / lookups."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = self._conn.execute('SELECT COUNT(*) FROM "llm_responses"').fetchone()[0]
+            stats["memory_entries"] = len(self._memory)
+        hits = stats["memory_hits"] + stats["disk_hits"]
+        lookups = hits + stats["misses"]
+        stats["hits"] = hits
+        stats["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+        return stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    """Returns the shared response cache (created on first use), or None if LLM_CACHE_ENABLED is off."""
+    global _llm_cache
+    if not LLM_CACHE_ENABLED:
+        return None
+    if _llm_cache is None:
+        try:
+            _llm_cache = LLMResponseCache()
+            logger.info(f"LLM response cache opened at {LLM_CACHE_PATH}.")
+        except Exception as e:
+            logger.error(f"Could not open the LLM response cache at {LLM_CACHE_PATH}: {e}", exc_info=True)
+            return None
+    return _llm_cache
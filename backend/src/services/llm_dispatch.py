@@ -0,0 +1,387 @@
+# /backend/src/services/llm_dispatch.py
+"""
+Shared dispatch layer for LLM provider calls.
+
+Every provider request goes through dispatch_llm_call() (or dispatch_llm_stream()
+for streamed responses), which:
+
+- limits concurrent requests per provider and per model. Waiting requests are
+  admitted by priority, then arrival order, so interactive summaries overtake
+  background batch work (see llm_priority);
+- spaces requests with token buckets for requests and tokens per minute, so a
+  burst of uploads is smoothed out instead of tripping the provider's rate limits;
+- retries rate-limit, overload, server and connection errors with jittered
+  exponential backoff. A Retry-After from the provider is honoured and pauses
+  the whole provider, since every other request would be rejected as well.
+
+Limits per provider are in PROVIDER_LIMITS and can be overridden with the
+LLM_RATE_LIMITS environment variable (JSON, e.g. '{"anthropic": {"requests_per_minute": 1000}}').
+"""
+
+import asyncio
+import contextvars
+import heapq
+import itertools
+import json
+import logging
+import os
+import random
+import time
+from contextlib import asynccontextmanager, contextmanager
+from email.utils import parsedate_to_datetime
+from enum import IntEnum
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, TypeVar
+
+from anthropic import APIConnectionError as AnthropicConnectionError
+from openai import APIConnectionError as OpenAIConnectionError
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LLMPriority(IntEnum):
+    """Dispatch priority; lower values are admitted first."""
+    INTERACTIVE = 0
+    BACKGROUND = 10
+
+
+# Conservative defaults; raise them to match the account's rate limit tier
+PROVIDER_LIMITS: Dict[str, Dict[str, int]] = {
+    "openai": {"max_concurrency": 16, "model_concurrency": 8, "requests_per_minute": 500, "tokens_per_minute": 450_000},
+    "anthropic": {"max_concurrency": 8, "model_concurrency": 4, "requests_per_minute": 50, "tokens_per_minute": 80_000},
+    "google": {"max_concurrency": 8, "model_concurrency": 4, "requests_per_minute": 150, "tokens_per_minute": 1_000_000},
+    # The mock provider of local_llm: high enough that load tests measure our own path
+    "local": {"max_concurrency": 256, "model_concurrency": 256, "requests_per_minute": 100_000, "tokens_per_minute": 100_000_000},
+}
+DEFAULT_PROVIDER_LIMITS = {"max_concurrency": 4, "model_concurrency": 4, "requests_per_minute": 60, "tokens_per_minute": 100_000}
+
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+MAX_RETRY_AFTER_SECONDS = 120.0
+
+# HTTP statuses worth retrying: timeouts, conflicts, rate limits, server errors and overload
+RETRYABLE_STATUS_CODES = frozenset((408, 409, 429, 500, 502, 503, 504, 529))
+RETRYABLE_ERRORS = (OpenAIConnectionError, AnthropicConnectionError, asyncio.TimeoutError, ConnectionError)
+
+_priority: contextvars.ContextVar = contextvars.ContextVar("llm_priority", default=LLMPriority.INTERACTIVE)
+
+
+@contextmanager
+def llm_priority(priority: int) -> Iterator[None]:
+    """Runs the LLM calls made in this context (and the tasks it starts) at a priority."""
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_llm_priority() -> int:
+    """The dispatch priority of LLM calls made in the current context."""
+    return _priority.get()
+
+
+def _load_limit_overrides() -> None:
+    overrides = os.getenv("LLM_RATE_LIMITS")
+    if not overrides:
+        return
+    try:
+        for provider, limits in json.loads(overrides).items():
+            PROVIDER_LIMITS[provider] = {**PROVIDER_LIMITS.get(provider, DEFAULT_PROVIDER_LIMITS), **limits}
+    except (ValueError, AttributeError) as e:
+        logger.error(f"Ignoring invalid LLM_RATE_LIMITS: {e}")
+
+
+_load_limit_overrides()
+
+
+class PriorityGate:
+    """Counting semaphore whose waiters are admitted by priority, then arrival order."""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, limit)
+        self.active = 0
+        self._waiters: List[list] = []
+        self._order = itertools.count()
+
+    async def acquire(self, priority: int) -> None:
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, [priority, next(self._order), future])
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release()  # The slot was handed over just as the waiter was cancelled
+            raise
+
+    def release(self) -> None:
+        while self._waiters:
+            future = heapq.heappop(self._waiters)[2]
+            if not future.done():
+                future.set_result(None)  # Hand the slot over; the active count stays the same
+                return
+        self.active -= 1
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for waiter in self._waiters if not waiter[2].done())
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at per_minute / 60 per second."""
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(max(1, per_minute))
+        self.tokens = self.capacity
+        self.rate = self.capacity / 60.0
+        self.updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> float:
+        """Takes amount tokens (at most the capacity), waiting for the refill if needed.
+        Returns the time waited in seconds."""
+        amount = min(amount, self.capacity)
+        waited = 0.0
+        while True:
+            self._refill()
+            if self.tokens >= amount:
+                self.tokens -= amount
+                return waited
+            delay = (amount - self.tokens) / self.rate
+            await asyncio.sleep(delay)
+            waited += delay
+
+
+class ProviderDispatcher:
+    """Concurrency gates, rate buckets and pause state of one provider."""
+
+    def __init__(self, provider: str, limits: Dict[str, int]):
+        self.provider = provider
+        self.limits = limits
+        self.gate = PriorityGate(limits["max_concurrency"])
+        self.model_gates: Dict[str, PriorityGate] = {}
+        self.requests = TokenBucket(limits["requests_per_minute"])
+        self.tokens = TokenBucket(limits["tokens_per_minute"])
+        self.paused_until = 0.0
+        self.stats = {"calls": 0, "retries": 0, "rate_limited": 0, "failures": 0, "throttled_seconds": 0.0}
+
+    @asynccontextmanager
+    async def slot(self, model_id: str, priority: int):
+        """Holds a model slot and a provider slot (acquired in that order)."""
+        model_gate = self.model_gates.get(model_id)
+        if model_gate is None:
+            model_gate = self.model_gates[model_id] = PriorityGate(self.limits["model_concurrency"])
+        await model_gate.acquire(priority)
+        try:
+            await self.gate.acquire(priority)
+            try:
+                yield
+            finally:
+                self.gate.release()
+        finally:
+            model_gate.release()
+
+    async def wait_for_capacity(self, tokens: int) -> None:
+        """Waits out a provider pause, then for request and token budget."""
+        waited = 0.0
+        pause = self.paused_until - time.monotonic()
+        if pause > 0:
+            await asyncio.sleep(pause)
+            waited += pause
+        waited += await self.requests.acquire(1)
+        if tokens:
+            waited += await self.tokens.acquire(tokens)
+        self.stats["throttled_seconds"] += waited
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+_dispatchers: Dict[str, ProviderDispatcher] = {}
+
+
+def get_dispatcher(provider: str) -> ProviderDispatcher:
+    dispatcher = _dispatchers.get(provider)
+    if dispatcher is None:
+        limits = {**DEFAULT_PROVIDER_LIMITS, **PROVIDER_LIMITS.get(provider, {})}
+        dispatcher = _dispatchers[provider] = ProviderDispatcher(provider, limits)
+    return dispatcher
+
+
+def configure_provider_limits(provider: str, **limits: int) -> None:
+    """Changes a provider's limits (see PROVIDER_LIMITS); takes effect for new requests."""
+    PROVIDER_LIMITS[provider] = {**PROVIDER_LIMITS.get(provider, DEFAULT_PROVIDER_LIMITS), **limits}
+    _dispatchers.pop(provider, None)
+
+
+def dispatch_stats() -> Dict[str, Dict[str, Any]]:
+    """Returns call, retry and throttling counters and current queue lengths per provider."""
+    return {
+        provider: {**dispatcher.stats, "active": dispatcher.gate.active, "waiting": dispatcher.gate.waiting}
+        for provider, dispatcher in _dispatchers.items()
+    }
+
+
+def error_status_code(error: BaseException) -> Optional[int]:
+    """HTTP status of a provider SDK error (OpenAI/Anthropic status_code, Google API code), if any."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    status = error_status_code(error)
+    if status is not None:
+        return status in RETRYABLE_STATUS_CODES
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+def retry_after_seconds(error: BaseException) -> Optional[float]:
+    """Seconds the provider asked to wait (retry-after-ms or Retry-After), capped at MAX_RETRY_AFTER_SECONDS."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return min(float(headers["retry-after-ms"]) / 1000, MAX_RETRY_AFTER_SECONDS)
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            seconds = float(value)
+        except ValueError:  # An HTTP date
+            seconds = parsedate_to_datetime(value).timestamp() - time.time()
+        return min(max(seconds, 0.0), MAX_RETRY_AFTER_SECONDS)
+    except (TypeError, ValueError):
+        return None
+
+
+def http_status_for_error(error: BaseException) -> int:
+    """HTTP status to report for a provider error that could not be retried away.
+
+    Upstream failures are 502 (the provider's own server errors) or 503 (overload and
+    transport errors), so that a 500 always means an error in this service.
+    """
+    status = error_status_code(error)
+    if status == 429:
+        return 429
+    if status in (502, 503, 504, 529) or (status is None and isinstance(error, RETRYABLE_ERRORS)):
+        return 503
+    if status is not None and status >= 500:
+        return 502
+    return 500
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full-jitter exponential backoff for a 0-based retry attempt."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+
+def _retry_delay(dispatcher: ProviderDispatcher, error: Exception, attempt: int, max_retries: int) -> Optional[float]:
+    """Records a failed attempt and returns how long to wait before retrying, or None to give up."""
+    status = error_status_code(error)
+    if status == 429:
+        dispatcher.stats["rate_limited"] += 1
+    if attempt >= max_retries or not is_retryable(error):
+        dispatcher.stats["failures"] += 1
+        return None
+    retry_after = retry_after_seconds(error)
+    if retry_after is not None:
+        dispatcher.pause(retry_after)
+    dispatcher.stats["retries"] += 1
+    delay = retry_after if retry_after is not None else backoff_delay(attempt)
+    logger.warning(
+        f"{dispatcher.provider} request failed ({status or type(error).__name__}); "
+        f"retry {attempt + 1}/{max_retries} in {delay:.1f}s."
+    )
+    return delay
+
+
+async def dispatch_llm_call(
+    provider: str,
+    model_id: str,
+    call: Callable[[], Awaitable[T]],
+    tokens: int = 0,
+    priority: Optional[int] = None,
+    max_retries: int = LLM_MAX_RETRIES,
+) -> T:
+    """Runs a provider request under the provider's limits, retrying transient errors.
+
+    Args:
+        provider: The LLM provider.
+        model_id: The model (has its own concurrency limit).
+        call: Starts the request; called again for every retry.
+        tokens: Estimated tokens of the request (input and output), for the tokens-per-minute bucket.
+        priority: Dispatch priority; defaults to the current llm_priority().
+        max_retries: Retries after the first attempt.
+
+    Returns:
+        The result of call().
+
+    Raises:
+        The last error, once it is not retryable or the retries are used up.
+    """
+    dispatcher = get_dispatcher(provider)
+    priority = _priority.get() if priority is None else priority
+    attempt = 0
+    while True:
+        async with dispatcher.slot(model_id, priority):
+            await dispatcher.wait_for_capacity(tokens)
+            dispatcher.stats["calls"] += 1
+            try:
+                return await call()
+            except Exception as error:
+                delay = _retry_delay(dispatcher, error, attempt, max_retries)
+                if delay is None:
+                    raise
+        # Back off outside the slot, so other requests can use it meanwhile
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+async def dispatch_llm_stream(
+    provider: str,
+    model_id: str,
+    open_stream: Callable[[], AsyncIterator[T]],
+    tokens: int = 0,
+    priority: Optional[int] = None,
+    max_retries: int = LLM_MAX_RETRIES,
+) -> AsyncIterator[T]:
+    """Like dispatch_llm_call() for a streamed response, yielding its chunks.
+
+    The concurrency slots are held until the stream ends. Errors are retried only
+    until the first chunk has been yielded; after that the caller has already
+    forwarded part of the response, so the error is raised.
+    """
+    dispatcher = get_dispatcher(provider)
+    priority = _priority.get() if priority is None else priority
+    attempt = 0
+    while True:
+        started = False
+        async with dispatcher.slot(model_id, priority):
+            await dispatcher.wait_for_capacity(tokens)
+            dispatcher.stats["calls"] += 1
+            try:
+                async for chunk in open_stream():
+                    started = True
+                    yield chunk
+                return
+            except Exception as error:
+                if started:
+                    dispatcher.stats["failures"] += 1
+                    raise
+                delay = _retry_delay(dispatcher, error, attempt, max_retries)
+                if delay is None:
+                    raise
+        attempt += 1
+        await asyncio.sleep(delay)
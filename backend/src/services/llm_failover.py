@@ -0,0 +1,289 @@
+# /backend/src/services/llm_failover.py
+"""
+Hedged requests and cross-provider failover for summarization calls.
+
+Tail latency of a single provider can exceed 30 s, and a provider that keeps
+failing used to fail the summary. Each summary request is given an ordered list
+of models: the requested one, then its backups (FAILOVER_MODELS). Then:
+
+- hedging: if the current request has not answered after the hedge delay (a
+  percentile of that model's recent latencies), a backup request is started
+  alongside it. The first good answer wins and the other requests are cancelled.
+  Only interactive calls are hedged; background work (see llm_priority) just
+  fails over, as hedging costs a second request;
+- failover: a request failing with a 429, an upstream 502/503/504 or a timeout
+  (after the retries of llm_dispatch) moves on to the next model at once. Other
+  errors (a blocked prompt, a bad request) are raised, as a backup would fail the
+  same way, and so is a 500, which is a bug in this service, not the provider's;
+- health: every finished request records its outcome per model, and regular
+  (non-stream) requests also their latency. The health score (success rate,
+  discounted by median latency) orders the backups, and an unhealthy requested
+  model is tried after the healthiest backup.
+
+Results come with the (provider, model id) that answered, so callers can credit
+and cache a backup's answer as that model's, not the requested one's.
+
+Backups are configured with LLM_FAILOVER_MODELS (JSON), keyed by "provider:model"
+or by provider, e.g. '{"anthropic": ["openai:gpt-4o"], "openai:gpt-4o": ["google:gemini-1.5-pro"]}'.
+Without backups, requests run exactly as before (and still feed the health scores).
+"""
+
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from .llm_dispatch import RETRYABLE_ERRORS, LLMPriority, current_llm_priority, error_status_code
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+Target = Tuple[str, str]  # (provider, model id)
+
+# Backup models by "provider:model" or provider, as "provider:model" strings
+FAILOVER_MODELS: Dict[str, List[str]] = {}
+
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+HEDGE_DEFAULT_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_DEFAULT_DELAY_SECONDS", "10"))
+HEDGE_MIN_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MIN_DELAY_SECONDS", "1"))
+HEDGE_MAX_DELAY_SECONDS = float(os.getenv("LLM_HEDGE_MAX_DELAY_SECONDS", "30"))
+# Latencies needed before the percentile replaces the default hedge delay
+HEDGE_MIN_SAMPLES = 10
+
+# Statuses of provider and transport failures (see llm_dispatch.http_status_for_error)
+FAILOVER_STATUS_CODES = frozenset((429, 502, 503, 504, 529))
+
+HEALTH_WINDOW = 50  # Recent requests kept per model
+HEALTH_LATENCY_SCALE_SECONDS = 10.0  # A median latency of this halves the score
+UNHEALTHY_SCORE = 0.3
+
+
+def _load_failover_models() -> None:
+    config = os.getenv("LLM_FAILOVER_MODELS")
+    if not config:
+        return
+    try:
+        for primary, backups in json.loads(config).items():
+            configure_failover(primary, backups)
+    except (ValueError, AttributeError, TypeError) as e:
+        logger.error(f"Ignoring invalid LLM_FAILOVER_MODELS: {e}")
+
+
+def parse_target(target: str) -> Target:
+    """Splits "provider:model" into (provider, model id)."""
+    provider, sep, model_id = target.partition(":")
+    if not sep or not provider or not model_id:
+        raise ValueError(f"Expected 'provider:model', got {target!r}")
+    return provider, model_id
+
+
+def configure_failover(primary: str, backups: List[str]) -> None:
+    """Sets the backup models of a "provider:model" or of all models of a provider."""
+    for backup in backups:
+        parse_target(backup)
+    FAILOVER_MODELS[primary] = list(backups)
+
+
+class ModelHealth:
+    """Latencies and outcomes of a model's recent requests."""
+
+    def __init__(self, window: int = HEALTH_WINDOW):
+        self._outcomes: Deque[Tuple[Optional[float], bool]] = deque(maxlen=window)
+
+    def record(self, latency: Optional[float], ok: bool) -> None:
+        """Records a request's outcome, and its latency unless None (streams, whose
+        time to first chunk is not comparable with the latency of a whole call)."""
+        self._outcomes.append((latency, ok))
+
+    def latencies(self) -> List[float]:
+        """Sorted latencies of the successful requests."""
+        return sorted(latency for latency, ok in self._outcomes if ok and latency is not None)
+
+    def latency_percentile(self, percentile: float) -> Optional[float]:
+        latencies = self.latencies()
+        if not latencies:
+            return None
+        index = max(0, math.ceil(percentile / 100 * len(latencies)) - 1)
+        return latencies[index]
+
+    def score(self) -> float:
+        """Success rate discounted by median latency, in (0, 1]; 1.0 without history."""
+        if not self._outcomes:
+            return 1.0
+        success_rate = sum(1 for _, ok in self._outcomes if ok) / len(self._outcomes)
+        median = self.latency_percentile(50) or 0.0
+        return success_rate / (1 + median / HEALTH_LATENCY_SCALE_SECONDS)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": len(self._outcomes),
+            "failures": sum(1 for _, ok in self._outcomes if not ok),
+            "p50_seconds": self.latency_percentile(50),
+            "p95_seconds": self.latency_percentile(95),
+            "score": round(self.score(), 4),
+        }
+
+
+_health: Dict[Target, ModelHealth] = {}
+
+
+def get_health(provider: str, model_id: str) -> ModelHealth:
+    key = (provider, model_id)
+    if key not in _health:
+        _health[key] = ModelHealth()
+    return _health[key]
+
+
+def health_stats() -> Dict[str, Dict[str, Any]]:
+    """Returns request counts, latency percentiles and the health score per "provider:model"."""
+    return {f"{provider}:{model_id}": health.stats() for (provider, model_id), health in _health.items()}
+
+
+def hedge_delay(provider: str, model_id: str) -> float:
+    """Seconds to wait for a model before hedging: its HEDGE_PERCENTILE latency, within bounds."""
+    health = get_health(provider, model_id)
+    if len(health.latencies()) < HEDGE_MIN_SAMPLES:
+        return HEDGE_DEFAULT_DELAY_SECONDS
+    delay = health.latency_percentile(HEDGE_PERCENTILE)
+    return min(max(delay, HEDGE_MIN_DELAY_SECONDS), HEDGE_MAX_DELAY_SECONDS)
+
+
+def failover_candidates(
+    provider: str, model_id: str, fits: Optional[Callable[[str], bool]] = None
+) -> List[Target]:
+    """The models to try for a request, in order: the requested one, then its backups by health.
+
+    Args:
+        fits: Whether a request fits a backup provider (e.g. its input budget);
+            backups it does not fit are left out.
+    """
+    primary = (provider, model_id)
+    configured = FAILOVER_MODELS.get(f"{provider}:{model_id}", FAILOVER_MODELS.get(provider, []))
+    backups = []
+    for target in map(parse_target, configured):
+        if target != primary and target not in backups and (fits is None or fits(target[0])):
+            backups.append(target)
+    backups.sort(key=lambda target: -get_health(*target).score())
+    primary_score = get_health(*primary).score()
+    if backups and primary_score < UNHEALTHY_SCORE and get_health(*backups[0]).score() > primary_score:
+        return [backups[0], primary] + backups[1:]
+    return [primary] + backups
+
+
+def is_failover_error(error: BaseException) -> bool:
+    """Whether another model may succeed where this one failed: rate limits, upstream
+    failures, timeouts and connection errors. Errors in this service (500) are not."""
+    status = error_status_code(error)
+    if status is not None:
+        return status in FAILOVER_STATUS_CODES
+    return isinstance(error, RETRYABLE_ERRORS)
+
+
+async def _timed_call(target: Target, call: Callable[[str, str], Awaitable[T]]) -> T:
+    start = time.monotonic()
+    try:
+        result = await call(*target)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        if is_failover_error(e):
+            get_health(*target).record(time.monotonic() - start, ok=False)
+        raise
+    get_health(*target).record(time.monotonic() - start, ok=True)
+    return result
+
+
+async def call_with_failover(
+    provider: str,
+    model_id: str,
+    call: Callable[[str, str], Awaitable[T]],
+    fits: Optional[Callable[[str], bool]] = None,
+) -> Tuple[T, Target]:
+    """Runs call(provider, model_id) with hedging and failover to backup models (see module docstring).
+
+    Returns:
+        The result and the (provider, model id) that answered.
+
+    Raises:
+        The error of the last model tried if none succeeded, or the first error
+        that is not worth failing over for.
+    """
+    remaining = failover_candidates(provider, model_id, fits)
+    if len(remaining) == 1:
+        return await _timed_call(remaining[0], call), remaining[0]
+
+    hedge = current_llm_priority() < LLMPriority.BACKGROUND
+    pending: Dict[asyncio.Task, Target] = {}
+    last_error: Optional[BaseException] = None
+    latest: Target = remaining[0]
+
+    def launch() -> None:
+        nonlocal latest
+        latest = remaining.pop(0)
+        pending[asyncio.ensure_future(_timed_call(latest, call))] = latest
+
+    launch()
+    try:
+        while pending:
+            timeout = hedge_delay(*latest) if hedge and remaining else None
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                logger.info(
+                    f"No answer from {latest[0]}:{latest[1]} after {timeout:.1f}s; "
+                    f"hedging with {remaining[0][0]}:{remaining[0][1]}."
+                )
+                launch()
+                continue
+            for task in done:
+                target = pending.pop(task)
+                error = task.exception()
+                if error is None:
+                    if target != (provider, model_id):
+                        logger.info(f"Answered by {target[0]}:{target[1]} instead of {provider}:{model_id}.")
+                    return task.result(), target
+                if not is_failover_error(error):
+                    raise error
+                last_error = error
+                logger.warning(f"{target[0]}:{target[1]} failed ({error}); failing over.")
+            if remaining and (not pending or not hedge):
+                launch()
+        raise last_error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def stream_with_failover(
+    provider: str,
+    model_id: str,
+    open_stream: Callable[[str, str], AsyncIterator[str]],
+    fits: Optional[Callable[[str], bool]] = None,
+) -> AsyncIterator[Tuple[Target, str]]:
+    """Yields the chunks of open_stream(provider, model_id) with the (provider, model id)
+    streaming them, failing over to backup models until the first chunk; a stream
+    failing after it has started is not restarted."""
+    candidates = failover_candidates(provider, model_id, fits)
+    for index, target in enumerate(candidates):
+        started = False
+        try:
+            async for text in open_stream(*target):
+                if not started:
+                    started = True
+                    get_health(*target).record(None, ok=True)
+                yield target, text
+            return
+        except Exception as e:
+            if not is_failover_error(e):
+                raise
+            if not started:
+                get_health(*target).record(None, ok=False)
+            if started or index == len(candidates) - 1:
+                raise
+            logger.warning(f"{target[0]}:{target[1]} stream failed ({e}); failing over.")
+
+
+_load_failover_models()
@@ -1,6 +1,9 @@
 import os
+import re
+import math
+import zlib
 import asyncio
-from typing import List, Literal, Optional, Any
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Literal, Optional, Tuple, TypeVar, Union
 from fastapi import UploadFile, HTTPException
 import base64
 import logging
@@ -11,17 +14,27 @@ import io
 from openai import AsyncOpenAI, OpenAIError
 from anthropic import AsyncAnthropic, AnthropicError
 import google.generativeai as genai
+from google.api_core import exceptions as GoogleAPIErrors
 
 # PDF processing
 from PyPDF2 import PdfReader
 import fitz  # PyMuPDF
 
+from .llm_cache import get_llm_cache, llm_cache_key
+from .llm_dispatch import dispatch_llm_call, dispatch_llm_stream, http_status_for_error, retry_after_seconds
+from .llm_failover import call_with_failover, stream_with_failover
+from . import local_llm
+from .local_llm import LocalLLMError, local_complete, local_stream
+from .pdf_utils import classify_pdf_pages, extract_pdf_page_texts, iter_pdf_page_images, page_pixel_budget
+
 # Configure basic logging
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 # --- Environment Setup & Lazy Client Initialization ---
 
 # Global variables to hold client instances (initialized lazily)
@@ -39,7 +52,8 @@ def _get_openai_client() -> AsyncOpenAI:
             logger.error("OPENAI_API_KEY environment variable not set.")
             raise OpenAIError("OpenAI API key not configured.")
         try:
-            _openai_client = AsyncOpenAI(api_key=api_key)
+            # Retries are done by llm_dispatch, which also honours the provider's rate limits
+            _openai_client = AsyncOpenAI(api_key=api_key, max_retries=0)
             logger.info("OpenAI client initialized successfully.")
         except Exception as e:
             logger.error(f"Failed to initialize OpenAI client: {e}", exc_info=True)
@@ -56,7 +70,7 @@ def _get_anthropic_client() -> AsyncAnthropic:
             logger.error("ANTHROPIC_API_KEY environment variable not set.")
             raise AnthropicError("Anthropic API key not configured.")
         try:
-            _anthropic_client = AsyncAnthropic(api_key=api_key)
+            _anthropic_client = AsyncAnthropic(api_key=api_key, max_retries=0)
             logger.info("Anthropic client initialized successfully.")
         except Exception as e:
             logger.error(f"Failed to initialize Anthropic client: {e}", exc_info=True)
@@ -104,48 +118,483 @@ def _get_google_client(model_id: str) -> Optional[genai.GenerativeModel]:
 
 # --- PDF Content Extraction --- #
 
+# Rough input budgets per provider, well inside their context windows so the
+# instructions and the summary still fit. Page images cost far more tokens and
+# latency than the text of a page, so their number is capped as well.
+PROVIDER_INPUT_BUDGETS: Dict[str, Dict[str, int]] = {
+    "openai": {"max_input_tokens": 100_000, "max_images": 50},
+    "anthropic": {"max_input_tokens": 150_000, "max_images": 100},
+    "google": {"max_input_tokens": 500_000, "max_images": 100},
+    "local": {"max_input_tokens": 100_000, "max_images": 50},
+}
+DEFAULT_INPUT_BUDGET = {"max_input_tokens": 100_000, "max_images": 20}
+CHARS_PER_TOKEN = 4  # Rough average for English text
+
+# Chunked (map-reduce) summarization of documents that do not fit in one request
+CHUNK_TARGET_TOKENS = 8_000
+CHUNK_OVERLAP_TOKENS = 200
+IMAGES_PER_CHUNK = 8
+REDUCE_FAN_IN = 8  # Summaries combined per reduce request
+MAX_CONCURRENT_CHUNKS = int(os.getenv("LLM_MAX_CONCURRENT_CHUNKS", "4"))
+SUMMARY_MAX_TOKENS = 1000
+CHUNK_SUMMARY_MAX_TOKENS = 600
+SUMMARY_TEMPERATURE = 0.5
+# Part of every response cache key (see llm_cache); bump it when a summarization prompt changes
+PROMPT_VERSION = "1"
+
+# Section boundaries: blank lines, and line breaks before an all-caps heading
+# ("HOSPITAL COURSE:", "MEDICATIONS", "ASSESSMENT: ...")
+_SECTION_BREAK = re.compile(r"\n\s*\n|\n(?=[A-Z][A-Z0-9 /&,()-]{2,60}(?::|[ \t]*\n))")
+_SENTENCE_BREAK = re.compile(r"(?<=[.!?;])\s+|\n")
+
+
+def estimate_text_tokens(text: str) -> int:
+    """Approximate number of input tokens for a text."""
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+def estimate_image_tokens(provider: str, pixels: int) -> int:
+    """Approximate number of input tokens a page image of this many pixels costs with a provider."""
+    if provider == "openai":
+        return 85  # Images sent with detail="low" cost a flat 85 tokens
+    if provider == "google":
+        return 258  # Gemini counts a fixed number of tokens per image
+    return max(1, pixels // 750)  # Anthropic: about one token per 750 pixels
+
+
 async def extract_text_from_pdf(file_content: bytes) -> str:
     """Extracts text content from a PDF file."""
-    # ... (rest of function remains the same)
-    pass
+    page_texts = await asyncio.to_thread(extract_pdf_page_texts, file_content)
+    return "\n\n".join(text.strip() for text in page_texts if text.strip())
 
 
-async def extract_images_from_pdf(file_content: bytes) -> List[str]:
-    """Extracts images from each page of a PDF and returns them as base64 encoded strings."""
-    # ... (rest of function remains the same)
-    pass
+async def extract_images_from_pdf(
+    file_content: bytes, provider: Optional[str] = None, pages: Optional[List[int]] = None
+) -> List[Dict[str, Any]]:
+    """Renders PDF pages to images sized for a provider (see pdf_utils.iter_pdf_page_images).
 
+    Returns:
+        One dictionary per page with 'page', 'media_type', 'width', 'height' and
+        base64 encoded 'data'.
+    """
+    def render() -> List[Dict[str, Any]]:
+        return list(iter_pdf_page_images(file_content, provider=provider, as_base64=True, pages=pages))
 
-# --- Provider-Specific Summarization Functions --- #
+    return await asyncio.to_thread(render)
 
-async def summarize_pdf_openai(
+
+def _split_oversized(text: str, max_chars: int) -> List[str]:
+    """Splits text longer than max_chars at sentence or line ends (or anywhere, as a last resort)."""
+    if len(text) <= max_chars:
+        return [text]
+    pieces: List[str] = []
+    current = ""
+    for sentence in _SENTENCE_BREAK.split(text):
+        while len(sentence) > max_chars:
+            if current:
+                pieces.append(current)
+                current = ""
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if current and len(current) + len(sentence) + 1 > max_chars:
+            pieces.append(current)
+            current = ""
+        current = f"{current} {sentence}" if current else sentence
+    if current:
+        pieces.append(current)
+    return pieces
+
+
+def split_text_into_chunks(
+    page_texts: List[Tuple[int, str]],
+    target_tokens: int = CHUNK_TARGET_TOKENS,
+    overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+) -> List[Dict[str, Any]]:
+    """Splits page texts into chunks of at most about target_tokens, at page and section boundaries.
+
+    A chunk ends at the first page end, or at a section whose content hash selects
+    it, once it holds half the target. Boundaries therefore depend on the content
+    near them rather than on everything before them, so an edit only changes the
+    chunks around it and the other chunk summaries stay cached. Each chunk after
+    the first starts with the last overlap_tokens of the previous chunk as context.
+
+    Args:
+        page_texts: (0-based page number, text) for each page with text, in order.
+        target_tokens: Maximum estimated tokens per chunk (without the overlap).
+        overlap_tokens: Estimated tokens of the previous chunk repeated as context.
+
+    Returns:
+        One dictionary per chunk with 'pages' ([first, last], 0-based), 'text' and
+        'image_pages' (empty).
+    """
+    max_chars = target_tokens * CHARS_PER_TOKEN
+    min_chars = max_chars // 2
+    overlap_chars = overlap_tokens * CHARS_PER_TOKEN
+    chunks: List[Dict[str, Any]] = []
+    sections: List[str] = []
+    size = 0
+    first_page = last_page = 0
+
+    def close() -> None:
+        nonlocal sections, size
+        chunks.append({"pages": [first_page, last_page], "body": "\n\n".join(sections), "image_pages": []})
+        sections, size = [], 0
+
+    for page_number, page_text in page_texts:
+        units = [unit.strip() for unit in _SECTION_BREAK.split(page_text)]
+        units = [piece for unit in units if unit for piece in _split_oversized(unit, max_chars)]
+        for n, unit in enumerate(units):
+            if n == 0:
+                unit = f"[Page {page_number + 1}]\n{unit}"
+            if sections and size + len(unit) > max_chars:
+                close()
+            if not sections:
+                first_page = page_number
+            sections.append(unit)
+            size += len(unit) + 2
+            last_page = page_number
+            ends_page = n == len(units) - 1
+            if size >= min_chars and (ends_page or zlib.crc32(unit.encode("utf-8")) % 4 == 0):
+                close()
+    if sections:
+        close()
+
+    previous_body = ""
+    for chunk in chunks:
+        body = chunk.pop("body")
+        if previous_body and overlap_chars:
+            tail = previous_body[-overlap_chars:]
+            tail = tail[tail.find(" ") + 1:] if len(previous_body) > overlap_chars else tail
+            chunk["text"] = f"[End of the previous part, for context]\n{tail}\n\n[This part]\n{body}"
+        else:
+            chunk["text"] = body
+        previous_body = body
+    return chunks
+
+
+def plan_pdf_request(pdf_content: bytes, provider: str) -> Dict[str, Any]:
+    """Decides what to send to the LLM for a PDF, within the provider's input budget.
+
+    Text pages (including scans with an OCR text layer) are sent as their extracted
+    text. Only pages without usable text ('image' pages, see
+    pdf_utils.classify_pdf_pages) are sent as images, downscaled to the provider's
+    pixel budget. A document that does not fit in one request under the
+    provider's budget is planned as chunks for summarize_chunks() instead: text
+    chunks (see split_text_into_chunks) and groups of IMAGES_PER_CHUNK scanned pages.
+
+    Args:
+        pdf_content: The byte content of the PDF file.
+        provider: The LLM provider (selects the budget and image size).
+
+    Returns:
+        A dictionary with 'route' ('text', 'vision', 'mixed' or 'chunked'), 'pages',
+        'text', 'images' (page image dictionaries with base64 'data'), 'chunks'
+        (for the chunked route; otherwise empty), 'text_pages' and 'image_pages'
+        (0-based page numbers) and 'estimated_tokens'.
+
+    Raises:
+        ValueError: If the PDF is encrypted or has nothing to summarize.
+    """
+    budget = PROVIDER_INPUT_BUDGETS.get(provider, DEFAULT_INPUT_BUDGET)
+    token_budget = budget["max_input_tokens"]
+    pages = classify_pdf_pages(pdf_content, include_text=True)
+    text_pages = [page for page in pages if page["type"] == "text"]
+    image_pages = [page["page"] for page in pages if page["type"] == "image"]
+    if not text_pages and not image_pages:
+        raise ValueError("The PDF has no text and no scanned pages to summarize.")
+
+    page_texts = [(page["page"], page["text"].strip()) for page in text_pages]
+    text_tokens = sum(estimate_text_tokens(text) for _, text in page_texts)
+    # Upper bound: pages are rendered within the provider's pixel budget
+    image_tokens = len(image_pages) * estimate_image_tokens(provider, page_pixel_budget(provider))
+    plan = {
+        "pages": len(pages),
+        "text": "",
+        "images": [],
+        "chunks": [],
+        "text_pages": [page["page"] for page in text_pages],
+        "image_pages": image_pages,
+        "estimated_tokens": text_tokens + image_tokens,
+    }
+
+    if text_tokens + image_tokens > token_budget or len(image_pages) > budget["max_images"]:
+        chunks = split_text_into_chunks(page_texts, min(CHUNK_TARGET_TOKENS, token_budget))
+        for n in range(0, len(image_pages), IMAGES_PER_CHUNK):
+            group = image_pages[n:n + IMAGES_PER_CHUNK]
+            chunks.append({"pages": [group[0], group[-1]], "text": "", "image_pages": group})
+        chunks.sort(key=lambda chunk: chunk["pages"][0])
+        logger.info(f"PDF exceeds the {provider} budget of {token_budget} tokens; summarizing it in {len(chunks)} chunks.")
+        plan.update(route="chunked", chunks=chunks)
+        return plan
+
+    parts = []
+    for page_number, page_text in page_texts:
+        # Page markers let the model place the page images
+        parts.append(f"[Page {page_number + 1}]\n{page_text}" if image_pages else page_text)
+    images = list(iter_pdf_page_images(pdf_content, provider=provider, as_base64=True, pages=image_pages))
+    if images and parts:
+        pages_list = ", ".join(str(image["page"] + 1) for image in images)
+        parts.insert(0, f"Pages {pages_list} of this document are attached as images.")
+    text = "\n\n".join(parts)
+    plan.update(
+        route="mixed" if text and images else "vision" if images else "text",
+        text=text,
+        images=images,
+        estimated_tokens=text_tokens + sum(estimate_image_tokens(provider, i["width"] * i["height"]) for i in images),
+    )
+    return plan
+
+
+def _pages_label(pages: List[int]) -> str:
+    first, last = pages[0] + 1, pages[-1] + 1
+    return f"Page {first}" if first == last else f"Pages {first}-{last}"
+
+
+def _generation_params(max_tokens: int) -> Dict[str, Any]:
+    """Generation parameters of a summary request, as part of its response cache key."""
+    return {"max_tokens": max_tokens, "temperature": SUMMARY_TEMPERATURE}
+
+
+# --- In-Flight Request Coalescing --- #
+
+class _Flight:
+    """One in-flight summarization, shared by every concurrent caller with the same key.
+
+    The work runs as its own task, so callers can come and go: it is cancelled
+    only when the last caller has left (see _leave_flight). Text published while
+    it runs is fanned out to subscribers, so streaming callers that join late
+    still get the whole summary.
+    """
+
+    def __init__(
+        self, key: str, work: Callable[[Callable[[str], None]], Awaitable[Any]], plan: Optional[Dict[str, Any]]
+    ):
+        self.key = key
+        self.plan = plan
+        self.parts: List[str] = []
+        self.subscribers: List[asyncio.Queue] = []
+        self.callers = 0
+        self.task = asyncio.ensure_future(work(self.publish))
+        self.task.add_done_callback(self._finish)
+
+    def publish(self, text: str) -> None:
+        self.parts.append(text)
+        for queue in self.subscribers:
+            queue.put_nowait(text)
+
+    def subscribe(self) -> asyncio.Queue:
+        """Returns a queue of the text published so far and from now on, ending with None."""
+        queue: asyncio.Queue = asyncio.Queue()
+        for text in self.parts:
+            queue.put_nowait(text)
+        if self.task.done():
+            queue.put_nowait(None)
+        else:
+            self.subscribers.append(queue)
+        return queue
+
+    def _finish(self, task: asyncio.Future) -> None:
+        if _in_flight.get(self.key) is self:
+            del _in_flight[self.key]
+        for queue in self.subscribers:
+            queue.put_nowait(None)
+
+
+# In-flight summarizations by response cache key
+_in_flight: Dict[str, _Flight] = {}
+
+
+def _join_flight(
+    key: str, work: Callable[[Callable[[str], None]], Awaitable[Any]], plan: Optional[Dict[str, Any]] = None
+) -> _Flight:
+    """Joins the in-flight summarization for a key, starting work(publish) if there is none."""
+    flight = _in_flight.get(key)
+    if flight is None:
+        flight = _in_flight[key] = _Flight(key, work, plan)
+    else:
+        logger.info(f"Joining an identical in-flight summarization ({flight.callers} caller(s) already waiting).")
+    flight.callers += 1
+    return flight
+
+
+def _leave_flight(flight: _Flight, queue: Optional[asyncio.Queue] = None) -> None:
+    """Leaves a flight; the work is cancelled if it is unfinished and no caller is left."""
+    if queue is not None and queue in flight.subscribers:
+        flight.subscribers.remove(queue)
+    flight.callers -= 1
+    if flight.callers == 0 and not flight.task.done():
+        logger.info("All callers of an in-flight summarization have gone; cancelling it.")
+        flight.task.cancel()
+
+
+async def _single_flight(key: str, work: Callable[[], Awaitable[T]]) -> T:
+    """Runs work() once for all concurrent callers with the same key and returns its result."""
+    flight = _join_flight(key, lambda publish: work())
+    try:
+        # Shielded, so a caller going away does not cancel the work for the others
+        return await asyncio.shield(flight.task)
+    finally:
+        _leave_flight(flight)
+
+
+async def summarize_chunks(
+    provider: str,
     model_id: str,
-    text_content: Optional[str] = None,
-    image_data: Optional[List[str]] = None,
-) -> str:
-    """Summarizes PDF content (text or images) using the OpenAI API."""
-    client = _get_openai_client()  # Use getter
-    messages = [
-        {
-            "role": "system",
-            "content": "You are an expert medical assistant. Summarize the provided medical document content accurately and concisely.",
-        }
-    ]
-    # ... (rest of function needs to use 'client' instead of 'openai_client')
+    chunks: List[Dict[str, Any]],
+    pdf_content: Optional[bytes] = None,
+    max_concurrency: int = MAX_CONCURRENT_CHUNKS,
+) -> Dict[str, Any]:
+    """Summarizes a document chunk by chunk and reduces the chunk summaries to one summary.
+
+    Chunks are summarized concurrently, at most max_concurrency requests at a time.
+    Their summaries are then combined REDUCE_FAN_IN at a time, level by level, until
+    one summary is left. Every chunk and reduce summary goes through the response
+    cache (see llm_cache), so re-running a document, or an edited version of it,
+    only sends the requests whose content changed. Only the requested model's
+    answers are cached: a backup's answer (see llm_failover) is not its answer.
+
+    Args:
+        provider: The LLM provider.
+        model_id: The model to use.
+        chunks: Chunks from plan_pdf_request() or split_text_into_chunks().
+        pdf_content: The PDF, needed to render the 'image_pages' of chunks.
+        max_concurrency: Maximum concurrent provider requests.
+
+    Returns:
+        A dictionary with 'summary', 'generated_by' (the "provider:model" that wrote
+        the summary), 'models' (every "provider:model" that answered a chunk or reduce
+        request), 'chunks', 'requests' (sent to the provider), 'cached' (answered
+        from the cache) and 'levels' (reduce levels).
+    """
+    if provider not in PDF_SUMMARIZERS:
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+    if not chunks:
+        raise ValueError("No chunks to summarize.")
+    semaphore = asyncio.Semaphore(max_concurrency)
+    cache = get_llm_cache()
+    stats = {"requests": 0, "cached": 0}
+    requested = f"{provider}:{model_id}"
+    models = set()
+
+    async def summarize(prompt: str, image_pages: List[int], max_tokens: int) -> Tuple[str, str]:
+        async with semaphore:
+            images = await extract_images_from_pdf(pdf_content, provider, image_pages) if image_pages else None
+            content = prompt + "".join(image["data"] for image in images or [])
+            key = llm_cache_key(content, provider, model_id, PROMPT_VERSION, _generation_params(max_tokens))
+            cached = cache.get(key) if cache is not None else None
+            if cached is not None:
+                stats["cached"] += 1
+                models.add(requested)
+                return cached, requested
+
+            async def request() -> Tuple[str, str]:
+                stats["requests"] += 1
+                summary, generated_by = await _summarize(
+                    provider, model_id, text_content=prompt, image_data=images, max_tokens=max_tokens
+                )
+                if cache is not None and generated_by == requested:
+                    cache.set(key, summary)
+                return summary, generated_by
+
+            summary, generated_by = await _single_flight(key, request)
+            models.add(generated_by)
+            return summary, generated_by
+
+    single = len(chunks) == 1
+    map_requests = []
+    for chunk in chunks:
+        label = _pages_label(chunk["pages"])
+        if chunk["image_pages"]:
+            prompt = f"{label} of a longer medical document are attached as images. Summarize them."
+        else:
+            prompt = f"{label} of a longer medical document. Summarize this part.\n\n{chunk['text']}"
+        max_tokens = SUMMARY_MAX_TOKENS if single else CHUNK_SUMMARY_MAX_TOKENS
+        map_requests.append(summarize(prompt, chunk["image_pages"], max_tokens))
+    answers = await asyncio.gather(*map_requests)
+    summaries = list(zip([chunk["pages"] for chunk in chunks], [summary for summary, _ in answers]))
+    generated_by = answers[0][1]
+
+    levels = 0
+    while len(summaries) > 1:
+        levels += 1
+        groups = [summaries[n:n + REDUCE_FAN_IN] for n in range(0, len(summaries), REDUCE_FAN_IN)]
+        max_tokens = SUMMARY_MAX_TOKENS if len(groups) == 1 else CHUNK_SUMMARY_MAX_TOKENS
+        reduce_requests = []
+        for group in groups:
+            parts = "\n\n".join(f"[{_pages_label(pages)}]\n{summary}" for pages, summary in group)
+            prompt = (
+                "The following are summaries of consecutive parts of one medical document. "
+                f"Combine them into a single summary, in document order.\n\n{parts}"
+            )
+            reduce_requests.append(summarize(prompt, [], max_tokens))
+        reduced = await asyncio.gather(*reduce_requests)
+        summaries = [([group[0][0][0], group[-1][0][-1]], summary) for group, (summary, _) in zip(groups, reduced)]
+        generated_by = reduced[0][1]
+        logger.info(f"Reduce level {levels}: {len(groups)} summaries.")
+
+    return {
+        "summary": summaries[0][1],
+        "generated_by": generated_by,
+        "models": sorted(models, key=lambda model: (model != requested, model)),
+        "chunks": len(chunks),
+        "levels": levels,
+        **stats,
+    }
+
+
+def _image_source(image: Union[str, Dict[str, Any]]) -> Tuple[str, str]:
+    """Returns the media type and base64 data of an image passed to the summarize functions.
+
+    Images are either base64 PNG strings or page image dictionaries from
+    extract_images_from_pdf() / plan_pdf_request().
+    """
+    if isinstance(image, str):
+        return "image/png", image
+    return image["media_type"], image["data"]
+
+
+# --- Provider-Specific Summarization Functions --- #
+
+def _request_tokens(
+    provider: str, text_content: Optional[str], image_data: Optional[List[Union[str, Dict[str, Any]]]], max_tokens: int
+) -> int:
+    """Estimated tokens of a request (input and maximum output), for the dispatch rate limits."""
+    tokens = max_tokens + estimate_text_tokens(text_content or "")
+    for image in image_data or []:
+        pixels = image["width"] * image["height"] if isinstance(image, dict) else page_pixel_budget(provider)
+        tokens += estimate_image_tokens(provider, pixels)
+    return tokens
+
+
+def _provider_http_error(label: str, error: Exception) -> HTTPException:
+    """HTTPException for a provider error that dispatch could not retry away (429 stays 429)."""
+    status_code = http_status_for_error(error)
+    retry_after = retry_after_seconds(error)
+    headers = {"Retry-After": str(math.ceil(retry_after))} if status_code != 500 and retry_after is not None else None
+    return HTTPException(status_code=status_code, detail=f"{label} API error: {error}", headers=headers)
+
+
+SYSTEM_PROMPT = "You are an expert medical assistant. Summarize the provided medical document content accurately and concisely."
+GOOGLE_INSTRUCTION = "Summarize the following medical document content accurately and concisely:"
+
+
+def _openai_messages(
+    text_content: Optional[str], image_data: Optional[List[Union[str, Dict[str, Any]]]]
+) -> Optional[List[Dict[str, Any]]]:
+    """Builds the OpenAI chat messages for PDF content, or returns None if there is no content."""
     content_list = []
     if text_content:
         content_list.append({"type": "text", "text": text_content})
         logger.info(f"Preparing OpenAI request with text content ({len(text_content)} chars).")
 
     if image_data:
-        for i, img_b64 in enumerate(image_data):
-            # Ensure the base64 string has the correct prefix if necessary
-            # Assuming img_b64 is the raw base64 data
+        for image in image_data:
+            media_type, img_b64 = _image_source(image)
             content_list.append(
                 {
                     "type": "image_url",
                     "image_url": {
-                        "url": f"data:image/png;base64,{img_b64}",  # Assuming PNG, adjust if needed
+                        "url": f"data:{media_type};base64,{img_b64}",
                         "detail": "low",  # Use low detail for summarization to save tokens
                     },
                 }
@@ -153,18 +602,106 @@ async def summarize_pdf_openai(
         logger.info(f"Preparing OpenAI request with {len(image_data)} images.")
 
     if not content_list:
+        return None
+    return [{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": content_list}]
+
+
+def _google_prompt_parts(
+    text_content: Optional[str], image_data: Optional[List[Union[str, Dict[str, Any]]]]
+) -> Optional[List[Any]]:
+    """Builds the Gemini prompt parts for PDF content, or returns None if there is no content."""
+    prompt_parts: List[Any] = []
+    if text_content:
+        prompt_parts.append(text_content)
+        logger.info(f"Preparing Google request with text content ({len(text_content)} chars).")
+
+    if image_data:
+        for i, image in enumerate(image_data):
+            try:
+                # Decode base64 to bytes, then load with PIL
+                img_bytes = base64.b64decode(_image_source(image)[1])
+                img = Image.open(io.BytesIO(img_bytes))
+                # Gemini API expects PIL Image objects directly for multimodal input
+                prompt_parts.append(img)
+            except Exception as e:
+                logger.error(f"Error processing image {i} for Google API: {e}", exc_info=True)
+                # Skip corrupted images or handle as needed
+                continue
+        logger.info(f"Preparing Google request with {len(image_data)} images.")
+
+    if not prompt_parts:
+        return None
+    # Add the instruction part
+    return [GOOGLE_INSTRUCTION] + prompt_parts
+
+
+def _anthropic_messages(
+    text_content: Optional[str], image_data: Optional[List[Union[str, Dict[str, Any]]]]
+) -> Optional[List[Dict[str, Any]]]:
+    """Builds the Anthropic messages for PDF content, or returns None if there is no content."""
+    content_list = []
+    if text_content:
+        content_list.append({"type": "text", "text": text_content})
+        logger.info(f"Preparing Anthropic request with text content ({len(text_content)} chars).")
+
+    if image_data:
+        for i, image in enumerate(image_data):
+            # Anthropic expects image media type and base64 data separately
+            try:
+                media_type, img_b64 = _image_source(image)
+                content_list.append(
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": media_type,
+                            "data": img_b64,
+                        },
+                    }
+                )
+            except Exception as e:
+                logger.error(f"Error processing image {i} for Anthropic API: {e}", exc_info=True)
+                continue  # Skip problematic images
+        logger.info(f"Preparing Anthropic request with {len(image_data)} images.")
+
+    if not content_list:
+        return None
+    return [{"role": "user", "content": content_list}]
+
+
+def _check_google_response(response) -> None:
+    """Raises an HTTPException if Gemini blocked the prompt."""
+    feedback = getattr(response, "prompt_feedback", None)
+    if feedback is not None and feedback.block_reason:
+        logger.error(f"Google API request blocked due to: {feedback.block_reason}")
+        raise HTTPException(status_code=400, detail=f"Request blocked by Google API: {feedback.block_reason}")
+
+
+async def summarize_pdf_openai(
+    model_id: str,
+    text_content: Optional[str] = None,
+    image_data: Optional[List[Union[str, Dict[str, Any]]]] = None,
+    max_tokens: int = SUMMARY_MAX_TOKENS,
+) -> str:
+    """Summarizes PDF content (text or images) using the OpenAI API."""
+    client = _get_openai_client()  # Use getter
+    messages = _openai_messages(text_content, image_data)
+    if messages is None:
         logger.warning("No text or image content provided to summarize_pdf_openai.")
         return "Error: No content provided for summarization."
 
-    messages.append({"role": "user", "content": content_list})
-
     try:
         logger.debug(f"Sending request to OpenAI model: {model_id}")
-        response = await client.chat.completions.create(
-            model=model_id,
-            messages=messages,
-            max_tokens=1000,  # Adjust as needed
-            temperature=0.5,
+        response = await dispatch_llm_call(
+            "openai",
+            model_id,
+            lambda: client.chat.completions.create(
+                model=model_id,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=SUMMARY_TEMPERATURE,
+            ),
+            tokens=_request_tokens("openai", text_content, image_data, max_tokens),
         )
         summary = response.choices[0].message.content
         logger.info(f"Received summary from OpenAI model {model_id}.")
@@ -172,7 +709,7 @@ async def summarize_pdf_openai(
 
     except OpenAIError as e:
         logger.error(f"OpenAI API error during summarization: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"OpenAI API error: {e}")
+        raise _provider_http_error("OpenAI", e)
     except Exception as e:
         logger.error(f"Unexpected error during OpenAI summarization: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
@@ -181,59 +718,47 @@ async def summarize_pdf_openai(
 async def summarize_pdf_google(
     model_id: str,
     text_content: Optional[str] = None,
-    image_data: Optional[List[str]] = None,
+    image_data: Optional[List[Union[str, Dict[str, Any]]]] = None,
+    max_tokens: int = SUMMARY_MAX_TOKENS,
 ) -> str:
     """Summarizes PDF content (text or images) using the Google Gemini API."""
     model = _get_google_client(model_id)  # Use getter
     if not model:
         raise HTTPException(status_code=503, detail=f"Google GenAI model '{model_id}' is unavailable or API key missing.")
 
-    prompt_parts = []
-    if text_content:
-        prompt_parts.append(text_content)
-        logger.info(f"Preparing Google request with text content ({len(text_content)} chars).")
-
-    if image_data:
-        for i, img_b64 in enumerate(image_data):
-            try:
-                # Decode base64 to bytes, then load with PIL
-                img_bytes = base64.b64decode(img_b64)
-                img = Image.open(io.BytesIO(img_bytes))
-                # Gemini API expects PIL Image objects directly for multimodal input
-                prompt_parts.append(img)
-            except Exception as e:
-                logger.error(f"Error processing image {i} for Google API: {e}", exc_info=True)
-                # Skip corrupted images or handle as needed
-                continue
-        logger.info(f"Preparing Google request with {len(image_data)} images.")
-
-    if not prompt_parts:
+    prompt_parts = _google_prompt_parts(text_content, image_data)
+    if prompt_parts is None:
         logger.warning("No text or image content provided to summarize_pdf_google.")
         return "Error: No content provided for summarization."
 
-    # Add the instruction part
-    prompt_parts.insert(0, "Summarize the following medical document content accurately and concisely:")
-
     try:
         logger.debug(f"Sending request to Google model: {model_id}")
         # Use generate_content_async for async operation
-        response = await model.generate_content_async(prompt_parts)
+        response = await dispatch_llm_call(
+            "google",
+            model_id,
+            lambda: model.generate_content_async(
+                prompt_parts,
+                generation_config={"max_output_tokens": max_tokens, "temperature": SUMMARY_TEMPERATURE},
+            ),
+            tokens=_request_tokens("google", text_content, image_data, max_tokens),
+        )
 
         # Check for safety ratings and blocks
-        if response.prompt_feedback.block_reason:
-            logger.error(f"Google API request blocked due to: {response.prompt_feedback.block_reason}")
-            raise HTTPException(status_code=400, detail=f"Request blocked by Google API: {response.prompt_feedback.block_reason}")
+        _check_google_response(response)
         if not response.candidates:
             logger.error("Google API returned no candidates.")
-            raise HTTPException(status_code=500, detail="Google API returned no response candidates.")
+            raise HTTPException(status_code=502, detail="Google API returned no response candidates.")
 
         summary = response.text
         logger.info(f"Received summary from Google model {model_id}.")
         return summary.strip()
 
-    except genai.GoogleAPIError as e:
+    except HTTPException:
+        raise
+    except GoogleAPIErrors.GoogleAPIError as e:
         logger.error(f"Google API error during summarization: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Google API error: {e}")
+        raise _provider_http_error("Google", e)
     except Exception as e:
         logger.error(f"Unexpected error during Google summarization: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
@@ -242,54 +767,29 @@ async def summarize_pdf_google(
 async def summarize_pdf_anthropic(
     model_id: str,
     text_content: Optional[str] = None,
-    image_data: Optional[List[str]] = None,
+    image_data: Optional[List[Union[str, Dict[str, Any]]]] = None,
+    max_tokens: int = SUMMARY_MAX_TOKENS,
 ) -> str:
     """Summarizes PDF content (text or images) using the Anthropic Claude API."""
     client = _get_anthropic_client()  # Use getter
-    messages = []
-    content_list = []
-
-    # --- Construct Content List ---
-    if text_content:
-        content_list.append({"type": "text", "text": text_content})
-        logger.info(f"Preparing Anthropic request with text content ({len(text_content)} chars).")
-
-    if image_data:
-        for i, img_b64 in enumerate(image_data):
-            # Anthropic expects image media type and base64 data separately
-            try:
-                # Minimal check: is it likely PNG or JPEG? Decode a few bytes if needed.
-                # For now, assume PNG as it's common, but this could be improved.
-                media_type = "image/png"  # Or determine dynamically
-                content_list.append(
-                    {
-                        "type": "image",
-                        "source": {
-                            "type": "base64",
-                            "media_type": media_type,
-                            "data": img_b64,
-                        },
-                    }
-                )
-            except Exception as e:
-                logger.error(f"Error processing image {i} for Anthropic API: {e}", exc_info=True)
-                continue  # Skip problematic images
-        logger.info(f"Preparing Anthropic request with {len(image_data)} images.")
-
-    if not content_list:
+    messages = _anthropic_messages(text_content, image_data)
+    if messages is None:
         logger.warning("No text or image content provided to summarize_pdf_anthropic.")
         return "Error: No content provided for summarization."
 
-    messages.append({"role": "user", "content": content_list})
-
     try:
         logger.debug(f"Sending request to Anthropic model: {model_id}")
-        response = await client.messages.create(
-            model=model_id,
-            system="You are an expert medical assistant. Summarize the provided medical document content accurately and concisely.",
-            messages=messages,
-            max_tokens=1000,  # Adjust as needed
-            temperature=0.5,
+        response = await dispatch_llm_call(
+            "anthropic",
+            model_id,
+            lambda: client.messages.create(
+                model=model_id,
+                system=SYSTEM_PROMPT,
+                messages=messages,
+                max_tokens=max_tokens,
+                temperature=SUMMARY_TEMPERATURE,
+            ),
+            tokens=_request_tokens("anthropic", text_content, image_data, max_tokens),
         )
 
         # Extract text content from the response blocks
@@ -303,22 +803,411 @@ async def summarize_pdf_anthropic(
 
     except AnthropicError as e:
         logger.error(f"Anthropic API error during summarization: {e}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"Anthropic API error: {e}")
+        raise _provider_http_error("Anthropic", e)
     except Exception as e:
         logger.error(f"Unexpected error during Anthropic summarization: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
 
 
+# --- Streaming Summarization Functions --- #
+# Same requests as the summarize_pdf_* functions, but the summary is yielded as the
+# provider generates it. Errors are raised as HTTPException like theirs.
+
+async def stream_pdf_openai(
+    model_id: str,
+    text_content: Optional[str] = None,
+    image_data: Optional[List[Union[str, Dict[str, Any]]]] = None,
+    max_tokens: int = SUMMARY_MAX_TOKENS,
+) -> AsyncIterator[str]:
+    """Streams a summary of PDF content (text or images) from the OpenAI API."""
+    client = _get_openai_client()
+    messages = _openai_messages(text_content, image_data)
+    if messages is None:
+        raise HTTPException(status_code=400, detail="No content provided for summarization.")
+
+    async def open_stream() -> AsyncIterator[str]:
+        stream = await client.chat.completions.create(
+            model=model_id,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=SUMMARY_TEMPERATURE,
+            stream=True,
+        )
+        async for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+    try:
+        tokens = _request_tokens("openai", text_content, image_data, max_tokens)
+        async for text in dispatch_llm_stream("openai", model_id, open_stream, tokens=tokens):
+            yield text
+    except OpenAIError as e:
+        logger.error(f"OpenAI API error during streamed summarization: {e}", exc_info=True)
+        raise _provider_http_error("OpenAI", e)
+
+
+async def stream_pdf_google(
+    model_id: str,
+    text_content: Optional[str] = None,
+    image_data: Optional[List[Union[str, Dict[str, Any]]]] = None,
+    max_tokens: int = SUMMARY_MAX_TOKENS,
+) -> AsyncIterator[str]:
+    """Streams a summary of PDF content (text or images) from the Google Gemini API."""
+    model = _get_google_client(model_id)
+    if not model:
+        raise HTTPException(status_code=503, detail=f"Google GenAI model '{model_id}' is unavailable or API key missing.")
+    prompt_parts = _google_prompt_parts(text_content, image_data)
+    if prompt_parts is None:
+        raise HTTPException(status_code=400, detail="No content provided for summarization.")
+
+    async def open_stream() -> AsyncIterator[str]:
+        response = await model.generate_content_async(
+            prompt_parts,
+            generation_config={"max_output_tokens": max_tokens, "temperature": SUMMARY_TEMPERATURE},
+            stream=True,
+        )
+        async for chunk in response:
+            _check_google_response(chunk)
+            try:
+                text = chunk.text
+            except ValueError:  # A chunk without text parts (e.g. only a finish reason)
+                continue
+            if text:
+                yield text
+
+    try:
+        tokens = _request_tokens("google", text_content, image_data, max_tokens)
+        async for text in dispatch_llm_stream("google", model_id, open_stream, tokens=tokens):
+            yield text
+    except GoogleAPIErrors.GoogleAPIError as e:
+        logger.error(f"Google API error during streamed summarization: {e}", exc_info=True)
+        raise _provider_http_error("Google", e)
+
+
+async def stream_pdf_anthropic(
+    model_id: str,
+    text_content: Optional[str] = None,
+    image_data: Optional[List[Union[str, Dict[str, Any]]]] = None,
+    max_tokens: int = SUMMARY_MAX_TOKENS,
+) -> AsyncIterator[str]:
+    """Streams a summary of PDF content (text or images) from the Anthropic Claude API."""
+    client = _get_anthropic_client()
+    messages = _anthropic_messages(text_content, image_data)
+    if messages is None:
+        raise HTTPException(status_code=400, detail="No content provided for summarization.")
+
+    async def open_stream() -> AsyncIterator[str]:
+        async with client.messages.stream(
+            model=model_id,
+            system=SYSTEM_PROMPT,
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=SUMMARY_TEMPERATURE,
+        ) as stream:
+            async for text in stream.text_stream:
+                yield text
+
+    try:
+        tokens = _request_tokens("anthropic", text_content, image_data, max_tokens)
+        async for text in dispatch_llm_stream("anthropic", model_id, open_stream, tokens=tokens):
+            yield text
+    except AnthropicError as e:
+        logger.error(f"Anthropic API error during streamed summarization: {e}", exc_info=True)
+        raise _provider_http_error("Anthropic", e)
+
+
+# --- Local Provider --- #
+# The deterministic mock provider of local_llm, dispatched like a real provider so
+# load tests exercise the same limits and retries.
+
+async def summarize_pdf_local(
+    model_id: str,
+    text_content: Optional[str] = None,
+    image_data: Optional[List[Union[str, Dict[str, Any]]]] = None,
+    max_tokens: int = SUMMARY_MAX_TOKENS,
+) -> str:
+    """Summarizes PDF content (text or images) with the local mock provider (see local_llm)."""
+    if not text_content and not image_data:
+        logger.warning("No text or image content provided to summarize_pdf_local.")
+        return "Error: No content provided for summarization."
+    try:
+        return await dispatch_llm_call(
+            "local",
+            model_id,
+            lambda: local_complete(model_id, text_content, image_data, max_tokens),
+            tokens=_request_tokens("local", text_content, image_data, max_tokens),
+        )
+    except (LocalLLMError, asyncio.TimeoutError) as e:
+        logger.error(f"Local provider error during summarization: {e}")
+        raise _provider_http_error("Local", e)
+
+
+async def stream_pdf_local(
+    model_id: str,
+    text_content: Optional[str] = None,
+    image_data: Optional[List[Union[str, Dict[str, Any]]]] = None,
+    max_tokens: int = SUMMARY_MAX_TOKENS,
+) -> AsyncIterator[str]:
+    """Streams a summary of PDF content (text or images) from the local mock provider."""
+    if not text_content and not image_data:
+        raise HTTPException(status_code=400, detail="No content provided for summarization.")
+    try:
+        tokens = _request_tokens("local", text_content, image_data, max_tokens)
+        async for text in dispatch_llm_stream(
+            "local", model_id, lambda: local_stream(model_id, text_content, image_data, max_tokens), tokens=tokens
+        ):
+            yield text
+    except (LocalLLMError, asyncio.TimeoutError) as e:
+        logger.error(f"Local provider error during streamed summarization: {e}")
+        raise _provider_http_error("Local", e)
+
+
 # --- Main Router Function --- #
-# Note: summarize_pdf_auto remains largely the same, calling the refactored functions
+
+# Summarize and stream functions by provider
+PDF_SUMMARIZERS = {
+    "openai": summarize_pdf_openai,
+    "google": summarize_pdf_google,
+    "anthropic": summarize_pdf_anthropic,
+    "local": summarize_pdf_local,
+}
+PDF_STREAMERS = {
+    "openai": stream_pdf_openai,
+    "google": stream_pdf_google,
+    "anthropic": stream_pdf_anthropic,
+    "local": stream_pdf_local,
+}
+
+
+def _fits_provider(
+    text_content: Optional[str], image_data: Optional[List[Union[str, Dict[str, Any]]]]
+) -> Callable[[str], bool]:
+    """Whether a request fits a (backup) provider's input budget."""
+    tokens = estimate_text_tokens(text_content or "")
+    images = len(image_data or [])
+
+    def fits(provider: str) -> bool:
+        budget = PROVIDER_INPUT_BUDGETS.get(provider, DEFAULT_INPUT_BUDGET)
+        return provider in PDF_SUMMARIZERS and tokens <= budget["max_input_tokens"] and images <= budget["max_images"]
+
+    return fits
+
+
+async def _summarize(provider: str, model_id: str, **request: Any) -> Tuple[str, str]:
+    """Calls the provider's summarize function, hedged and failed over to backup models (see llm_failover).
+
+    Returns:
+        The summary and the "provider:model" that answered, which differs from the
+        requested one when a backup answered.
+    """
+    summary, (answered_provider, answered_model) = await call_with_failover(
+        provider,
+        model_id,
+        lambda backup_provider, backup_model: PDF_SUMMARIZERS[backup_provider](model_id=backup_model, **request),
+        fits=_fits_provider(request.get("text_content"), request.get("image_data")),
+    )
+    return summary, f"{answered_provider}:{answered_model}"
+
+
+async def _stream_summary(provider: str, model_id: str, **request: Any) -> AsyncIterator[Tuple[str, str]]:
+    """Streams from the provider's stream function, failing over to backup models until the
+    first chunk; yields the chunks with the "provider:model" streaming them."""
+    async for (answered_provider, answered_model), text in stream_with_failover(
+        provider,
+        model_id,
+        lambda backup_provider, backup_model: PDF_STREAMERS[backup_provider](model_id=backup_model, **request),
+        fits=_fits_provider(request.get("text_content"), request.get("image_data")),
+    ):
+        yield f"{answered_provider}:{answered_model}", text
+
+
+async def _prepare_pdf_summary(
+    provider: str, model_id: str, pdf_content: bytes, filename: Optional[str]
+) -> Dict[str, Any]:
+    """Looks up a PDF's cached summary and, on a miss, plans its request (see plan_pdf_request).
+
+    Returns:
+        A dictionary with 'cache_key', 'summary' (the cached summary, or None) and
+        'plan' (None if the summary was cached; the in-flight request's plan if an
+        identical request is being summarized).
+    """
+    if provider not in PDF_SUMMARIZERS:
+        raise ValueError(f"Unsupported LLM provider: {provider}")
+    if not pdf_content:
+        raise HTTPException(status_code=400, detail="The uploaded PDF is empty.")
+
+    cache = get_llm_cache()
+    cache_key = llm_cache_key(
+        pdf_content, provider, model_id, PROMPT_VERSION, {"input": "pdf", **_generation_params(SUMMARY_MAX_TOKENS)}
+    )
+    cached = cache.get(cache_key) if cache is not None else None
+    if cached is not None:
+        logger.info(f"Returning the cached {provider}:{model_id} summary of {filename}.")
+        return {"cache_key": cache_key, "summary": cached, "plan": None}
+    flight = _in_flight.get(cache_key)
+    if flight is not None:
+        # An identical request is being summarized; it will be joined, so skip planning
+        return {"cache_key": cache_key, "summary": None, "plan": flight.plan}
+
+    try:
+        # Classification and rendering are CPU-bound; keep them off the event loop
+        plan = await asyncio.to_thread(plan_pdf_request, pdf_content, provider)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to read PDF {filename}: {e}", exc_info=True)
+        raise HTTPException(status_code=400, detail=f"Could not read the PDF: {e}")
+
+    logger.info(
+        f"Summarizing {filename} via the {plan['route']} route: {plan['pages']} pages, "
+        f"{len(plan['text_pages'])} as text, {len(plan['image_pages'])} as images, "
+        f"~{plan['estimated_tokens']} input tokens."
+    )
+    return {"cache_key": cache_key, "summary": None, "plan": plan}
+
+
+def _pdf_summary_work(
+    provider: str,
+    model_id: str,
+    plan: Dict[str, Any],
+    pdf_content: bytes,
+    filename: Optional[str],
+    cache_key: str,
+    stream: bool = False,
+) -> Callable[[Callable[[str], None]], Awaitable[Dict[str, Any]]]:
+    """The summarization of a planned PDF, as flight work: it returns the summary (see
+    summarize_pdf_auto), caching it if the requested model wrote it all, and, if
+    stream is set, publishes it as the provider streams it."""
+    requested = f"{provider}:{model_id}"
+
+    async def work(publish: Callable[[str], None]) -> Dict[str, Any]:
+        if plan["route"] == "chunked":
+            result = await summarize_chunks(provider, model_id, plan["chunks"], pdf_content)
+            logger.info(
+                f"Summarized {filename} in {result['chunks']} chunks and {result['levels']} reduce levels "
+                f"({result['requests']} requests, {result['cached']} cached)."
+            )
+            summary, generated_by, models = result["summary"], result["generated_by"], result["models"]
+        elif not stream:
+            summary, generated_by = await _summarize(
+                provider,
+                model_id,
+                text_content=plan["text"] or None,
+                image_data=plan["images"] or None,
+            )
+            models = [generated_by]
+        else:
+            parts: List[str] = []
+            generated_by = requested
+            async for generated_by, text in _stream_summary(
+                provider,
+                model_id,
+                text_content=plan["text"] or None,
+                image_data=plan["images"] or None,
+            ):
+                parts.append(text)
+                publish(text)
+            summary = "".join(parts).strip()
+            models = [generated_by]
+        cache = get_llm_cache()
+        if cache is not None and summary and models == [requested]:
+            cache.set(cache_key, summary)
+        return {"summary": summary, "generated_by": generated_by, "models": models}
+
+    return work
+
 
 async def summarize_pdf_auto(
     provider: Literal["openai", "google", "anthropic"],
     model_id: str,
     pdf_file: UploadFile,
-) -> str:
-    # ... (implementation remains the same, calls the refactored functions)
-    pass
+) -> Dict[str, Any]:
+    """Summarizes an uploaded PDF, sending page text where the PDF has it and page
+    images only for its scanned pages (see plan_pdf_request).
+
+    Summaries are cached by the PDF's SHA-256, provider, model, prompt version and
+    generation parameters (see llm_cache), so summarizing the same PDF again with
+    the same model returns the stored summary without a provider call. Concurrent
+    identical requests (a double submit, a frontend retry) share one in-flight
+    summarization; it is cancelled only once all of them have gone away.
+    Slow or failing provider calls are hedged or failed over to the backup models
+    configured in llm_failover; a summary written (in part) by a backup is not cached.
+
+    Returns:
+        A dictionary with 'summary', 'generated_by' (the "provider:model" that wrote
+        it) and 'models' (every "provider:model" that answered one of its requests).
+
+    Raises:
+        ValueError: If the provider is not supported.
+        HTTPException: If the PDF cannot be read or has nothing to summarize, or the provider call fails.
+    """
+    await pdf_file.seek(0)
+    pdf_content = await pdf_file.read()
+    prepared = await _prepare_pdf_summary(provider, model_id, pdf_content, pdf_file.filename)
+    if prepared["summary"] is not None:
+        requested = f"{provider}:{model_id}"
+        return {"summary": prepared["summary"], "generated_by": requested, "models": [requested]}
+
+    work = _pdf_summary_work(provider, model_id, prepared["plan"], pdf_content, pdf_file.filename, prepared["cache_key"])
+    flight = _join_flight(prepared["cache_key"], work, prepared["plan"])
+    try:
+        # Shielded, so a caller going away does not cancel the summary for the others
+        return await asyncio.shield(flight.task)
+    finally:
+        _leave_flight(flight)
+
+
+async def stream_pdf_summary(
+    provider: Literal["openai", "google", "anthropic"],
+    model_id: str,
+    pdf_content: bytes,
+    filename: Optional[str] = None,
+) -> AsyncIterator[Dict[str, Any]]:
+    """Summarizes a PDF like summarize_pdf_auto(), yielding the summary as it is generated.
+
+    Events (dictionaries with an 'event' name):
+    - 'start': 'route', 'pages' and 'cached', once the PDF is planned (or found in the cache).
+    - 'delta': 'text', the next piece of the summary.
+    - 'end': 'summary', the complete summary, and 'generated_by' and 'models' (as
+      returned by summarize_pdf_auto), once the provider has finished.
+
+    A cached summary is sent as a single delta. Long documents (the chunked route)
+    are summarized chunk by chunk first, and the final summary is sent as a single delta.
+    Identical concurrent requests (streamed or not) share one provider request.
+
+    Raises:
+        ValueError: If the provider is not supported.
+        HTTPException: As summarize_pdf_auto(). Validation, cache and planning errors
+            are raised before the 'start' event.
+    """
+    prepared = await _prepare_pdf_summary(provider, model_id, pdf_content, filename)
+    plan = prepared["plan"]
+    if plan is None:
+        yield {"event": "start", "route": "cached", "pages": None, "cached": True}
+        yield {"event": "delta", "text": prepared["summary"]}
+        requested = f"{provider}:{model_id}"
+        yield {"event": "end", "summary": prepared["summary"], "generated_by": requested, "models": [requested]}
+        return
+
+    yield {"event": "start", "route": plan["route"], "pages": plan["pages"], "cached": False}
+    work = _pdf_summary_work(provider, model_id, plan, pdf_content, filename, prepared["cache_key"], stream=True)
+    flight = _join_flight(prepared["cache_key"], work, plan)
+    queue = flight.subscribe()
+    try:
+        streamed = False
+        while True:
+            text = await queue.get()
+            if text is None:
+                break
+            streamed = True
+            yield {"event": "delta", "text": text}
+        result = await asyncio.shield(flight.task)
+        if not streamed:  # A chunked or non-streamed summary, sent whole
+            yield {"event": "delta", "text": result["summary"]}
+    finally:
+        # Also runs when the client disconnects and the generator is closed
+        _leave_flight(flight, queue)
+    yield {"event": "end", **result}
 
 
 # --- Added Functions (Placeholder - Need actual implementation) --- #
@@ -336,22 +1225,37 @@ def get_llm_client(provider: str) -> Any:  # Return type Any for now
             return genai  # Return the configured module/object
         else:
             raise ValueError("Google GenAI is not configured or API key is missing.")
+    elif provider == "local":
+        return local_llm  # The mock provider needs no client
     else:
         raise ValueError(f"Unsupported LLM provider: {provider}")
 
 
+def text_summary_cache_key(provider: str, model_id: str, text: str) -> str:
+    """Response cache key of a plain-text summary (shared by interactive and batch summaries)."""
+    return llm_cache_key(text, provider, model_id, PROMPT_VERSION, _generation_params(SUMMARY_MAX_TOKENS))
+
+
 async def summarize_text_with_llm(provider: str, model_id: str, text: str) -> str:
-    """Summarizes plain text using the specified LLM provider and model."""
-    logger.info(f"Summarizing text ({len(text)} chars) with {provider}:{model_id}")
-    if provider == "openai":
-        # Simplified call, assuming text-only input for this function
-        return await summarize_pdf_openai(model_id=model_id, text_content=text)
-    elif provider == "anthropic":
-        return await summarize_pdf_anthropic(model_id=model_id, text_content=text)
-    elif provider == "google":
-        return await summarize_pdf_google(model_id=model_id, text_content=text)
-    else:
+    """Summarizes plain text using the specified LLM provider and model (cached, see llm_cache;
+    an answer of a backup model, see llm_failover, is not cached as the requested model's)."""
+    if provider not in PDF_SUMMARIZERS:
         raise ValueError(f"Unsupported provider for text summarization: {provider}")
+    cache = get_llm_cache()
+    cache_key = text_summary_cache_key(provider, model_id, text)
+    cached = cache.get(cache_key) if cache is not None else None
+    if cached is not None:
+        logger.info(f"Returning the cached {provider}:{model_id} summary of text ({len(text)} chars).")
+        return cached
+
+    async def request() -> str:
+        logger.info(f"Summarizing text ({len(text)} chars) with {provider}:{model_id}")
+        summary, generated_by = await _summarize(provider, model_id, text_content=text)
+        if cache is not None and generated_by == f"{provider}:{model_id}":
+            cache.set(cache_key, summary)
+        return summary
+
+    return await _single_flight(cache_key, request)
 
 
 async def analyze_image_with_llm(provider: str, model_id: str, image_b64: str) -> str:
@@ -364,5 +1268,7 @@ async def analyze_image_with_llm(provider: str, model_id: str, image_b64: str) -
         return await summarize_pdf_anthropic(model_id=model_id, image_data=[image_b64])
     elif provider == "google":
         return await summarize_pdf_google(model_id=model_id, image_data=[image_b64])
+    elif provider == "local":
+        return await summarize_pdf_local(model_id=model_id, image_data=[image_b64])
     else:
         raise ValueError(f"Unsupported provider for image analysis: {provider}")
@@ -0,0 +1,224 @@
+# /backend/src/services/local_llm.py
+"""
+Deterministic local LLM provider ("local"), for load tests and offline benchmarks.
+
+It answers the same requests as the real providers without the network or an
+API key. A summary is derived from the request content only (its leading
+sentences and a content hash), so the same input always gets the same summary.
+The model id selects a profile (see LOCAL_LLM_PROFILES) that shapes how the
+answer arrives:
+
+- latency: time to the first token, drawn from a fixed, uniform, lognormal or
+  exponential distribution;
+- tokens_per_second: output throughput (0 for instant output), which paces the
+  streamed chunks and the duration of regular calls;
+- error injection: the share of requests failing with a 429 (with Retry-After),
+  a 529 overload, or a timeout after timeout_seconds.
+
+Random draws are seeded per request from LOCAL_LLM_SEED, the content hash and the
+attempt number for that content, so a run over the same inputs makes the same
+draws however the concurrent requests interleave, and the retry of an injected
+error can succeed. Errors are shaped like the provider SDK errors (status_code
+and response headers), so llm_dispatch retries and reports them like real ones.
+
+Profiles can be overridden with LOCAL_LLM_PROFILES (JSON, e.g.
+'{"local-flaky": {"rate_limit_rate": 0.3}}'). The provider is only offered by
+/summarize-pdf/ and model_registry when LOCAL_LLM_ENABLED is set.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+from types import SimpleNamespace
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+LOCAL_LLM_ENABLED = os.getenv("LOCAL_LLM_ENABLED", "false").lower() in ("1", "true", "yes")
+LOCAL_LLM_SEED = int(os.getenv("LOCAL_LLM_SEED", "0"))
+
+DEFAULT_LOCAL_PROFILE: Dict[str, Any] = {
+    "latency": {"distribution": "fixed", "ms": 0},
+    "tokens_per_second": 0,  # 0: the whole output at once
+    "rate_limit_rate": 0.0,
+    "overload_rate": 0.0,
+    "timeout_rate": 0.0,
+    "timeout_seconds": 30.0,
+    "retry_after_seconds": 1.0,
+}
+# Profiles by model id; unknown model ids get DEFAULT_LOCAL_PROFILE
+LOCAL_LLM_PROFILES: Dict[str, Dict[str, Any]] = {
+    "local-instant": {},
+    "local-realistic": {
+        "latency": {"distribution": "lognormal", "median_ms": 800, "sigma": 0.5},
+        "tokens_per_second": 80,
+    },
+    "local-flaky": {
+        "latency": {"distribution": "lognormal", "median_ms": 800, "sigma": 0.5},
+        "tokens_per_second": 80,
+        "rate_limit_rate": 0.1,
+        "overload_rate": 0.05,
+        "timeout_rate": 0.02,
+        "timeout_seconds": 10.0,
+    },
+}
+
+SUMMARY_SENTENCES = 3
+CHARS_PER_TOKEN = 4
+# Attempt counters are reset past this many distinct contents
+MAX_TRACKED_CONTENTS = 10_000
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+def _load_profile_overrides() -> None:
+    overrides = os.getenv("LOCAL_LLM_PROFILES")
+    if not overrides:
+        return
+    try:
+        for model_id, settings in json.loads(overrides).items():
+            LOCAL_LLM_PROFILES[model_id] = {**LOCAL_LLM_PROFILES.get(model_id, {}), **settings}
+    except (ValueError, AttributeError) as e:
+        logger.error(f"Ignoring invalid LOCAL_LLM_PROFILES: {e}")
+
+
+_load_profile_overrides()
+
+
+class LocalLLMError(Exception):
+    """An injected provider error, shaped like the OpenAI/Anthropic status errors."""
+
+    def __init__(self, status_code: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"Error code: {status_code} - {message}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+class LocalLLMTimeout(asyncio.TimeoutError):
+    """An injected request timeout."""
+
+
+def local_profile(model_id: str) -> Dict[str, Any]:
+    """Returns the profile of a local model (see LOCAL_LLM_PROFILES)."""
+    return {**DEFAULT_LOCAL_PROFILE, **LOCAL_LLM_PROFILES.get(model_id, {})}
+
+
+def configure_local_profile(model_id: str, **settings: Any) -> None:
+    """Changes a local model's profile; takes effect for new requests."""
+    LOCAL_LLM_PROFILES[model_id] = {**LOCAL_LLM_PROFILES.get(model_id, {}), **settings}
+
+
+def local_models() -> List[str]:
+    """Model ids of the local provider."""
+    return list(LOCAL_LLM_PROFILES)
+
+
+def _content_digest(text_content: Optional[str], image_data: Optional[List[Union[str, Dict[str, Any]]]]) -> str:
+    digest = hashlib.sha256((text_content or "").encode("utf-8"))
+    for image in image_data or []:
+        digest.update((image if isinstance(image, str) else image["data"]).encode("ascii"))
+    return digest.hexdigest()
+
+
+def local_summary(
+    model_id: str,
+    text_content: Optional[str] = None,
+    image_data: Optional[List[Union[str, Dict[str, Any]]]] = None,
+    max_tokens: int = 1000,
+) -> str:
+    """The deterministic summary of a request: its leading sentences, within max_tokens."""
+    images = len(image_data or [])
+    text = " ".join((text_content or "").split())
+    lead = " ".join(_SENTENCE_END.split(text)[:SUMMARY_SENTENCES])
+    digest = _content_digest(text_content, image_data)[:12]
+    header = f"Summary by {model_id} of {len(text)} characters and {images} image(s) [{digest}]."
+    summary = f"{header} {lead}".strip()
+    return summary[: max_tokens * CHARS_PER_TOKEN]
+
+
+_attempts: Dict[str, int] = {}
+
+
+def _request_rng(model_id: str, digest: str) -> random.Random:
+    """A random generator seeded by the content and its attempt number (see module docstring)."""
+    if len(_attempts) >= MAX_TRACKED_CONTENTS:
+        _attempts.clear()
+    key = f"{model_id}:{digest}"
+    attempt = _attempts.get(key, 0)
+    _attempts[key] = attempt + 1
+    return random.Random(f"{LOCAL_LLM_SEED}:{key}:{attempt}")
+
+
+def sample_latency(latency: Dict[str, Any], rng: random.Random) -> float:
+    """Draws a time to first token (seconds) from a latency distribution."""
+    distribution = latency.get("distribution", "fixed")
+    if distribution == "fixed":
+        ms = latency.get("ms", 0)
+    elif distribution == "uniform":
+        ms = rng.uniform(latency["min_ms"], latency["max_ms"])
+    elif distribution == "lognormal":
+        ms = rng.lognormvariate(math.log(latency["median_ms"]), latency.get("sigma", 0.5))
+    elif distribution == "exponential":
+        ms = rng.expovariate(1 / latency["mean_ms"]) if latency["mean_ms"] > 0 else 0
+    else:
+        raise ValueError(f"Unknown latency distribution: {distribution}")
+    return max(0.0, ms) / 1000
+
+
+async def _start_request(
+    model_id: str, text_content: Optional[str], image_data: Optional[List[Union[str, Dict[str, Any]]]]
+) -> Dict[str, Any]:
+    """Waits out the time to first token, or fails with an injected error."""
+    profile = local_profile(model_id)
+    rng = _request_rng(model_id, _content_digest(text_content, image_data))
+    draw = rng.random()
+    if draw < profile["rate_limit_rate"]:
+        retry_after = str(profile["retry_after_seconds"])
+        raise LocalLLMError(429, "Rate limit exceeded (injected)", {"retry-after": retry_after})
+    draw -= profile["rate_limit_rate"]
+    if draw < profile["overload_rate"]:
+        raise LocalLLMError(529, "Overloaded (injected)")
+    draw -= profile["overload_rate"]
+    if draw < profile["timeout_rate"]:
+        await asyncio.sleep(profile["timeout_seconds"])
+        raise LocalLLMTimeout(f"Request timed out after {profile['timeout_seconds']}s (injected)")
+    await asyncio.sleep(sample_latency(profile["latency"], rng))
+    return profile
+
+
+def _output_seconds(profile: Dict[str, Any], text: str) -> float:
+    tokens_per_second = profile["tokens_per_second"]
+    if not tokens_per_second:
+        return 0.0
+    return max(1, len(text) // CHARS_PER_TOKEN) / tokens_per_second
+
+
+async def local_complete(
+    model_id: str,
+    text_content: Optional[str] = None,
+    image_data: Optional[List[Union[str, Dict[str, Any]]]] = None,
+    max_tokens: int = 1000,
+) -> str:
+    """Returns the summary of a request after the latency and output time of the model's profile."""
+    profile = await _start_request(model_id, text_content, image_data)
+    summary = local_summary(model_id, text_content, image_data, max_tokens)
+    await asyncio.sleep(_output_seconds(profile, summary))
+    return summary
+
+
+async def local_stream(
+    model_id: str,
+    text_content: Optional[str] = None,
+    image_data: Optional[List[Union[str, Dict[str, Any]]]] = None,
+    max_tokens: int = 1000,
+) -> AsyncIterator[str]:
+    """Yields the summary of a request word by word, at the throughput of the model's profile."""
+    profile = await _start_request(model_id, text_content, image_data)
+    for word in re.findall(r"\S+\s*", local_summary(model_id, text_content, image_data, max_tokens)):
+        await asyncio.sleep(_output_seconds(profile, word))
+        yield word
@@ -8,6 +8,8 @@ import google.generativeai as genai
 from google.api_core import exceptions as GoogleAPIErrors
 from openai import OpenAI, APIError as OpenAIAPIError
 
+from .local_llm import LOCAL_LLM_ENABLED, local_models
+
 # Import constants for default models (if needed as fallbacks or references)
 
 logger = logging.getLogger(__name__)
@@ -96,6 +98,13 @@ def get_anthropic_pdf_models() -> List[Dict[str, str]]:
     return [{"id": m, "provider": "anthropic", "name": m} for m in known_models]
 
 
+def get_local_pdf_models() -> List[Dict[str, str]]:
+    """Returns the models of the local mock provider (see local_llm) if LOCAL_LLM_ENABLED is set."""
+    if not LOCAL_LLM_ENABLED:
+        return []
+    return [{"id": m, "provider": "local", "name": f"Local mock ({m})"} for m in local_models()]
+
+
 async def get_available_pdf_models() -> Dict[str, List[Dict[str, str]]]:
     """Gets available models suitable for PDF summarization from configured providers."""
     # Fetch models concurrently
@@ -108,6 +117,7 @@ async def get_available_pdf_models() -> Dict[str, List[Dict[str, str]]]:
         "openai": openai_models,
         "google": google_models,
         "anthropic": anthropic_models,  # Still using static list for now
+        "local": get_local_pdf_models(),
     }
 
     # Filter out providers with no models found
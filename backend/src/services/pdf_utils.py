@@ -1,12 +1,21 @@
 # /backend/services/pdf_utils.py
 import io
+import os
 import base64
 import logging
-from typing import List, Tuple, Optional
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Tuple, Optional, Union
 
+from PIL import Image
 from PyPDF2 import PdfReader
 from PyPDF2.errors import PdfReadError
-from pdf2image import convert_from_bytes
+
+try:
+    import fitz  # PyMuPDF
+except ImportError:  # PyPDF2 is used instead
+    fitz = None
 
 logger = logging.getLogger(__name__)
 
@@ -14,49 +23,228 @@ logger = logging.getLogger(__name__)
 # Increased from 100 to 500 based on testing with scanned documents.
 TEXT_EXTRACTION_THRESHOLD_PER_PAGE = 500
 
+# Text extraction backend used when none is passed to analyze_pdf_content()
+DEFAULT_PDF_TEXT_BACKEND = os.getenv("PDF_TEXT_BACKEND") or ("pymupdf" if fitz is not None else "pypdf2")
+# Backend tried when the selected one cannot open a PDF
+FALLBACK_PDF_TEXT_BACKEND = "pypdf2"
+
+# Page-level classification (PyMuPDF only): pages sampled before committing to a full
+# extraction, the text a page needs to count as text, and the image area that makes
+# a page with less text a scanned page.
+PDF_CLASSIFY_SAMPLE_PAGES = 5
+PAGE_TEXT_MIN_CHARS = 100
+PAGE_IMAGE_COVERAGE_THRESHOLD = 0.5
+
+# Page rasterization. Providers downscale large images before the model sees them,
+# so pixels above these rough per-provider budgets only cost render time and upload size.
+PAGE_PIXEL_BUDGETS = {
+    "anthropic": 1_150_000,
+    "openai": 512 * 512,  # Page images are sent with detail="low", which is 512x512 at most
+    "google": 1536 * 1024,
+}
+DEFAULT_PAGE_PIXEL_BUDGET = 1_150_000
+MAX_RENDER_DPI = 300
+DEFAULT_PAGE_IMAGE_FORMAT = "jpeg"
+PAGE_IMAGE_QUALITY = 80
+PAGE_IMAGE_MEDIA_TYPES = {"jpeg": "image/jpeg", "webp": "image/webp", "png": "image/png"}
+
+
+def _extract_pages_pymupdf(pdf_content: bytes) -> List[str]:
+    """Returns the text of every page using PyMuPDF."""
+    if fitz is None:
+        raise ImportError("PyMuPDF is not installed. Install it with 'pip install PyMuPDF'.")
+    with fitz.open(stream=pdf_content, filetype="pdf") as doc:
+        if doc.needs_pass:
+            raise ValueError("PDF is encrypted")
+        return [page.get_text() for page in doc]
+
+
+def _extract_pages_pypdf2(pdf_content: bytes) -> List[str]:
+    """Returns the text of every page using PyPDF2. Pages that fail to extract are empty."""
+    reader = PdfReader(io.BytesIO(pdf_content))
+    page_texts = []
+    for page in reader.pages:
+        try:
+            page_texts.append(page.extract_text() or "")
+        except Exception as page_error:
+            logger.warning(f"Error extracting text from a page: {page_error}")
+            page_texts.append("")  # Try next page
+    return page_texts
+
+
+# Registered text extraction backends: name -> function(pdf_content) -> per-page text
+PDF_TEXT_BACKENDS: Dict[str, Callable[[bytes], List[str]]] = {
+    "pymupdf": _extract_pages_pymupdf,
+    "pypdf2": _extract_pages_pypdf2,
+}
+
+
+def register_pdf_text_backend(name: str, extract_pages: Callable[[bytes], List[str]]) -> None:
+    """Registers a text extraction backend that returns the text of every page of a PDF."""
+    PDF_TEXT_BACKENDS[name] = extract_pages
+
+
+def extract_pdf_page_texts(pdf_content: bytes, backend: Optional[str] = None) -> List[str]:
+    """Extracts the text of every page of a PDF.
+
+    Args:
+        pdf_content: The byte content of the PDF file.
+        backend: Name of a registered backend. Defaults to DEFAULT_PDF_TEXT_BACKEND.
+            If it fails to open the PDF, the PyPDF2 backend is tried instead.
+
+    Returns:
+        One string per page (empty for pages without text).
+
+    Raises:
+        ValueError: If the backend is not registered.
+        Exception: Whatever the fallback backend raises if it cannot read the PDF either.
+    """
+    backend = backend or DEFAULT_PDF_TEXT_BACKEND
+    if backend not in PDF_TEXT_BACKENDS:
+        raise ValueError(f"Unknown PDF text backend '{backend}'. Available: {', '.join(PDF_TEXT_BACKENDS)}")
+    try:
+        return PDF_TEXT_BACKENDS[backend](pdf_content)
+    except Exception as e:
+        if backend == FALLBACK_PDF_TEXT_BACKEND:
+            raise
+        logger.warning(f"{backend} could not extract text ({e}); falling back to {FALLBACK_PDF_TEXT_BACKEND}.")
+        return PDF_TEXT_BACKENDS[FALLBACK_PDF_TEXT_BACKEND](pdf_content)
+
+
+def _sample_page_numbers(page_count: int, sample_size: int = PDF_CLASSIFY_SAMPLE_PAGES) -> List[int]:
+    """Returns up to sample_size page numbers spread evenly from the first to the last page."""
+    if page_count <= sample_size:
+        return list(range(page_count))
+    if sample_size <= 1:
+        return [0]
+    step = (page_count - 1) / (sample_size - 1)
+    return sorted({round(i * step) for i in range(sample_size)})
+
+
+def _image_coverage(page) -> float:
+    """Fraction of the page area covered by images (overlaps counted twice, capped at 1)."""
+    page_rect = page.rect
+    page_area = abs(page_rect)
+    if not page_area:
+        return 0.0
+    covered = sum(abs(fitz.Rect(info["bbox"]) & page_rect) for info in page.get_image_info())
+    return min(covered / page_area, 1.0)
+
+
+def _classify_page(page) -> Dict[str, Any]:
+    """Classifies a PyMuPDF page from its signals (see classify_pdf_pages) and keeps its text."""
+    has_fonts = bool(page.get_fonts())
+    # A page without font resources cannot show text, so skip extracting it
+    text = page.get_text() if has_fonts else ""
+    chars = len(text.strip())
+    coverage = _image_coverage(page)
+    if chars >= PAGE_TEXT_MIN_CHARS:
+        page_type = "text"  # Includes scans with an OCR text layer
+    elif coverage >= PAGE_IMAGE_COVERAGE_THRESHOLD:
+        page_type = "image"
+    elif chars:
+        page_type = "text"
+    else:
+        page_type = "empty"
+    return {
+        "page": page.number,
+        "type": page_type,
+        "chars": chars,
+        "image_coverage": round(coverage, 3),
+        "has_fonts": has_fonts,
+        "text": text,
+    }
+
+
+def classify_pdf_pages(pdf_content: bytes, include_text: bool = False) -> List[Dict[str, Any]]:
+    """Classifies every page of a PDF, so mixed documents can send only their scanned
+    pages to OCR or vision. Requires PyMuPDF.
+
+    A page is 'text' if it has at least PAGE_TEXT_MIN_CHARS characters of text,
+    'image' if images cover at least PAGE_IMAGE_COVERAGE_THRESHOLD of it, 'text'
+    if it has any text at all, and 'empty' otherwise.
+
+    Args:
+        pdf_content: The byte content of the PDF file.
+        include_text: If True, each page also has its extracted 'text'.
+
+    Returns:
+        One dictionary per page with 'page' (0-based), 'type', 'chars',
+        'image_coverage' and 'has_fonts' (whether the page has font resources).
+    """
+    if fitz is None:
+        raise ImportError("PyMuPDF is not installed. Install it with 'pip install PyMuPDF'.")
+    with fitz.open(stream=pdf_content, filetype="pdf") as doc:
+        if doc.needs_pass:
+            raise ValueError("PDF is encrypted")
+        pages = [_classify_page(page) for page in doc]
+    if not include_text:
+        for page in pages:
+            del page["text"]
+    return pages
+
 
-def analyze_pdf_content(pdf_content: bytes) -> Tuple[str, Optional[str]]:
+def _sampled_page_texts(pdf_content: bytes) -> Optional[List[str]]:
+    """Extracts every page's text with PyMuPDF, unless none of the sampled pages is a
+    text page, in which case the PDF is image-based and None is returned early."""
+    with fitz.open(stream=pdf_content, filetype="pdf") as doc:
+        if doc.needs_pass:
+            raise ValueError("PDF is encrypted")
+        page_count = doc.page_count
+        sampled = {n: _classify_page(doc[n]) for n in _sample_page_numbers(page_count)}
+        if len(sampled) < page_count and not any(page["type"] == "text" for page in sampled.values()):
+            logger.info(f"No text on {len(sampled)} sampled pages of {page_count}; skipping full text extraction.")
+            return None
+        return [sampled[n]["text"] if n in sampled else doc[n].get_text() for n in range(page_count)]
+
+
+def analyze_pdf_content(pdf_content: bytes, backend: Optional[str] = None) -> Tuple[str, Optional[str]]:
     """Analyzes PDF content to extract text and determine if it's image-based.
 
+    With the PyMuPDF backend, a few pages spread over the document are classified
+    first (see classify_pdf_pages), and a PDF with no text page in that sample is
+    classified as image-based without extracting the rest.
+
     Args:
         pdf_content: The byte content of the PDF file.
+        backend: Text extraction backend (see extract_pdf_page_texts). Defaults to
+            DEFAULT_PDF_TEXT_BACKEND.
 
     Returns:
         A tuple containing:
         - pdf_type: 'text' or 'image'.
         - extracted_text: The extracted text if pdf_type is 'text', otherwise None.
     """
-    extracted_text = ""
-    pdf_type = "image"  # Default to image
     try:
-        pdf_file = io.BytesIO(pdf_content)
-        reader = PdfReader(pdf_file)
-        num_pages = len(reader.pages)
+        if (backend or DEFAULT_PDF_TEXT_BACKEND) == "pymupdf" and fitz is not None:
+            try:
+                page_texts = _sampled_page_texts(pdf_content)
+            except Exception as e:
+                logger.warning(f"pymupdf could not extract text ({e}); falling back to {FALLBACK_PDF_TEXT_BACKEND}.")
+                page_texts = extract_pdf_page_texts(pdf_content, FALLBACK_PDF_TEXT_BACKEND)
+            if page_texts is None:
+                logger.info("Classified PDF as image-based (no text on sampled pages).")
+                return "image", None
+        else:
+            page_texts = extract_pdf_page_texts(pdf_content, backend)
+        num_pages = len(page_texts)
         if num_pages == 0:
             logger.warning("PDF has 0 pages.")
             return "image", None  # Treat as image if no pages
 
-        total_chars = 0
-        for page in reader.pages:
-            try:
-                page_text = page.extract_text()
-                if page_text:
-                    extracted_text += page_text + "\n\n"  # Add separator
-                    total_chars += len(page_text)
-            except Exception as page_error:
-                logger.warning(f"Error extracting text from a page: {page_error}")
-                continue  # Try next page
-
-        avg_chars_per_page = total_chars / num_pages if num_pages > 0 else 0
+        # Collect the non-empty pages and join once; += on a str copies the text per page
+        parts = [page_text for page_text in page_texts if page_text]
+        total_chars = sum(len(page_text) for page_text in parts)
+
+        avg_chars_per_page = total_chars / num_pages
         logger.info(
             f"PDF Analysis: {num_pages} pages, {total_chars} total chars, "
             f"{avg_chars_per_page:.2f} avg chars/page."
         )
 
         if avg_chars_per_page >= TEXT_EXTRACTION_THRESHOLD_PER_PAGE:
-            pdf_type = "text"
             logger.info("Classified PDF as text-based.")
-            return pdf_type, extracted_text.strip()
+            return "text", "\n\n".join(parts).strip()
         else:
             logger.info("Classified PDF as image-based (low text content).")
             return "image", None
@@ -70,27 +258,167 @@ def analyze_pdf_content(pdf_content: bytes) -> Tuple[str, Optional[str]]:
         return "image", None  # Fallback to image if analysis fails
 
 
-def convert_pdf_to_images(pdf_content: bytes) -> List[str]:
-    """Converts PDF pages to a list of base64 encoded PNG images."""
+def page_pixel_budget(provider: Optional[str] = None) -> int:
+    """Returns the page image pixel budget for a provider (DEFAULT_PAGE_PIXEL_BUDGET if unknown)."""
+    return PAGE_PIXEL_BUDGETS.get(provider or "", DEFAULT_PAGE_PIXEL_BUDGET)
+
+
+def _page_zoom(page_rect, pixel_budget: int) -> float:
+    """Zoom factor that renders a page at no more than pixel_budget pixels and MAX_RENDER_DPI."""
+    area_points = abs(page_rect)
+    if not area_points:
+        return 1.0
+    zoom = min((pixel_budget / area_points) ** 0.5, MAX_RENDER_DPI / 72)
+    # The pixmap size is rounded up to whole pixels, which can overshoot the budget
+    while True:
+        pixels = (page_rect * fitz.Matrix(zoom, zoom)).irect
+        if pixels.width * pixels.height <= pixel_budget:
+            return zoom
+        zoom *= 0.99
+
+
+def _render_pixmap(page, pixel_budget: int, grayscale: bool = False):
+    """Renders a PyMuPDF page within the pixel budget, as RGB or grayscale without alpha."""
+    zoom = _page_zoom(page.rect, pixel_budget)
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace, alpha=False)
+    logger.debug(f"Rendered page {page.number + 1} at {pix.width}x{pix.height}.")
+    return pix
+
+
+def render_pdf_page_image(
+    pdf_source: Union[bytes, str, Path], page_number: int, pixel_budget: int, grayscale: bool = False
+) -> Image.Image:
+    """Renders one PDF page to a PIL image of at most pixel_budget pixels (and MAX_RENDER_DPI).
+
+    Args:
+        pdf_source: The PDF's byte content or its path (opened lazily, so only the
+            page's objects are read).
+        page_number: 0-based page number.
+        pixel_budget: Maximum number of pixels in the image.
+        grayscale: Render in grayscale ('L') instead of RGB.
+    """
+    if fitz is None:
+        raise ImportError("PyMuPDF is not installed. Install it with 'pip install PyMuPDF'.")
+    if isinstance(pdf_source, bytes):
+        doc = fitz.open(stream=pdf_source, filetype="pdf")
+    else:
+        doc = fitz.open(str(pdf_source), filetype="pdf")
+    with doc:
+        if doc.needs_pass:
+            raise ValueError("PDF is encrypted")
+        pix = _render_pixmap(doc[page_number], pixel_budget, grayscale)
+        return Image.frombytes("L" if grayscale else "RGB", (pix.width, pix.height), pix.samples)
+
+
+def _encode_page_image(
+    page_number: int, size: Tuple[int, int], samples: bytes, image_format: str, quality: int, as_base64: bool
+) -> Dict[str, Any]:
+    """Encodes raw RGB page samples with PIL (which releases the GIL while encoding)."""
+    image = Image.frombytes("RGB", size, samples)
+    buffered = io.BytesIO()
+    if image_format == "png":
+        image.save(buffered, format="PNG", optimize=False)
+    else:
+        image.save(buffered, format=image_format.upper(), quality=quality)
+    data = buffered.getvalue()
+    return {
+        "page": page_number,
+        "media_type": PAGE_IMAGE_MEDIA_TYPES[image_format],
+        "width": size[0],
+        "height": size[1],
+        "data": base64.b64encode(data).decode("utf-8") if as_base64 else data,
+    }
+
+
+def iter_pdf_page_images(
+    pdf_content: bytes,
+    provider: Optional[str] = None,
+    pixel_budget: Optional[int] = None,
+    image_format: str = DEFAULT_PAGE_IMAGE_FORMAT,
+    quality: int = PAGE_IMAGE_QUALITY,
+    as_base64: bool = False,
+    pages: Optional[Iterable[int]] = None,
+    max_workers: Optional[int] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Renders PDF pages to images one page at a time, in page order.
+
+    Only the page being rendered and the pages waiting to be encoded are held in
+    memory, so callers can stream pages into an LLM request without rasterizing
+    the whole document first. Requires PyMuPDF.
+
+    Args:
+        pdf_content: The byte content of the PDF file.
+        provider: LLM provider the images are for; selects the pixel budget
+            (see PAGE_PIXEL_BUDGETS).
+        pixel_budget: Maximum pixels per page image; overrides the provider's budget.
+            Pages are never rendered above MAX_RENDER_DPI.
+        image_format: 'jpeg', 'webp' or 'png'.
+        quality: JPEG/WebP quality.
+        as_base64: If True, 'data' is a base64 string instead of bytes.
+        pages: Optional 0-based page numbers to render (e.g. the 'image' pages from
+            classify_pdf_pages); defaults to all pages.
+        max_workers: If greater than 1, pages are encoded on a thread pool of this
+            size while the next pages render. Rendering itself stays on the calling
+            thread, as PyMuPDF documents must not be shared between threads.
+
+    Yields:
+        A dictionary per page with 'page' (0-based), 'media_type', 'width',
+        'height' and 'data'.
+
+    Raises:
+        ValueError: If the image format is not supported or the PDF is encrypted.
+    """
+    if fitz is None:
+        raise ImportError("PyMuPDF is not installed. Install it with 'pip install PyMuPDF'.")
+    if image_format not in PAGE_IMAGE_MEDIA_TYPES:
+        raise ValueError(f"Unsupported page image format '{image_format}'. Available: {', '.join(PAGE_IMAGE_MEDIA_TYPES)}")
+    pixel_budget = pixel_budget or page_pixel_budget(provider)
+    encode_args = (image_format, quality, as_base64)
+
+    with fitz.open(stream=pdf_content, filetype="pdf") as doc:
+        if doc.needs_pass:
+            raise ValueError("PDF is encrypted")
+        page_numbers = range(doc.page_count) if pages is None else [n for n in pages if 0 <= n < doc.page_count]
+
+        def render(page_number: int) -> Tuple[int, Tuple[int, int], bytes]:
+            # JPEG and WebP have no alpha or CMYK, so every page is rendered as RGB
+            pix = _render_pixmap(doc[page_number], pixel_budget)
+            return page_number, (pix.width, pix.height), pix.samples
+
+        if not max_workers or max_workers <= 1:
+            for page_number in page_numbers:
+                yield _encode_page_image(*render(page_number), *encode_args)
+            return
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="page-encode") as encoder:
+            pending: Deque[Future] = deque()
+            for page_number in page_numbers:
+                pending.append(encoder.submit(_encode_page_image, *render(page_number), *encode_args))
+                # Keep at most one rendered page per worker waiting, so memory stays bounded
+                while len(pending) > max_workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+
+
+def convert_pdf_to_images(pdf_content: bytes, provider: Optional[str] = None) -> List[str]:
+    """Converts PDF pages to a list of base64 encoded PNG images.
+
+    Prefer iter_pdf_page_images(), which streams pages instead of holding all of
+    them and can produce smaller JPEG/WebP images.
+    """
     base64_images = []
     try:
-        # Convert PDF bytes to PIL Image objects at 300 DPI
-        images = convert_from_bytes(pdf_content, fmt="png", dpi=300)
-
-        for i, image in enumerate(images):
-            buffered = io.BytesIO()
-            image.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
-            base64_images.append(img_str)
-            logger.debug(f"Converted page {i + 1} to base64 PNG.")
+        for image in iter_pdf_page_images(pdf_content, provider=provider, image_format="png", as_base64=True):
+            base64_images.append(image["data"])
+            logger.debug(f"Converted page {image['page'] + 1} to base64 PNG.")
 
         if not base64_images:
-            logger.warning("pdf2image conversion resulted in 0 images.")
+            logger.warning("PDF conversion resulted in 0 images.")
 
     except Exception as e:
-        logger.error(
-            f"Error converting PDF to images using pdf2image: {e}", exc_info=True
-        )
+        logger.error(f"Error converting PDF to images: {e}", exc_info=True)
         # Return empty list on failure, downstream needs to handle this
 
     return base64_images
@@ -0,0 +1,126 @@
+import pytest
+from pathlib import Path
+
+pa = pytest.importorskip("pyarrow")
+import pyarrow.parquet as pq
+
+from src.services.ingestion.columnar_writer import write_columnar_table, ehi_type_to_arrow
+from src.services.ingestion.ehr_parser import process_file
+
+SCHEMA_DATA = {
+    "ORDER_RESULTS": {
+        "description": "Results for lab orders.",
+        "primary_key": ["ORDER_PROC_ID", "LINE"],
+        "columns": [
+            {"name": "ORDER_PROC_ID", "type": "NUMERIC", "discontinued": "", "description": "Order ID"},
+            {"name": "LINE", "type": "INTEGER", "discontinued": "", "description": "Line number"},
+            {"name": "RESULT_DATE", "type": "DATETIME", "discontinued": "", "description": "Result date"},
+            {"name": "ORD_VALUE", "type": "VARCHAR", "discontinued": "", "description": "Result value"},
+        ],
+    }
+}
+
+TSV_CONTENT = (
+    "ORDER_PROC_ID\tLINE\tRESULT_DATE\tORD_VALUE\n"
+    "1001\t1\t3/14/2023 12:00:00 AM\t5.4\n"
+    "1001\t2\t3/15/2023 1:30:00 PM\t\n"
+    "1002\t1\t\tNegative\n"
+)
+
+
+def test_ehi_type_mapping():
+    """Tests mapping EHI schema types to Arrow types."""
+    assert ehi_type_to_arrow("INTEGER") == pa.int64()
+    assert ehi_type_to_arrow("INTERVAL") == pa.string()
+    # Exact numerics: decimals with a declared precision, never float64
+    assert ehi_type_to_arrow("NUMERIC") == pa.string()
+    assert ehi_type_to_arrow("NUMERIC(18,2)") == pa.decimal128(18, 2)
+    assert ehi_type_to_arrow("DECIMAL (40)") == pa.decimal256(40, 0)
+    assert ehi_type_to_arrow("FLOAT") == pa.float64()
+    assert ehi_type_to_arrow("DATETIME (Local)") == pa.timestamp("ms")
+    assert ehi_type_to_arrow("VARCHAR") == pa.string()
+    assert ehi_type_to_arrow(None) == pa.string()
+
+
+def test_write_parquet_typed_with_statistics(tmp_path: Path):
+    """Tests that Parquet output is typed from the schema and carries row-group statistics."""
+    output_path = write_columnar_table(TSV_CONTENT, "ORDER_RESULTS.tsv", tmp_path, "parquet", SCHEMA_DATA)
+    assert output_path == tmp_path / "ORDER_RESULTS.parquet"
+
+    table = pq.read_table(output_path)
+    assert table.schema.field("ORDER_PROC_ID").type == pa.int64()  # NUMERIC without a precision, inferred
+    assert table.schema.field("LINE").type == pa.int64()
+    assert table.schema.field("RESULT_DATE").type == pa.timestamp("ms")
+    assert table.column("ORD_VALUE").to_pylist() == ["5.4", None, "Negative"]
+    assert table.schema.metadata[b"primary_key"] == b"ORDER_PROC_ID,LINE"
+
+    stats = pq.ParquetFile(output_path).metadata.row_group(0).column(1).statistics
+    assert stats.has_min_max
+    assert (stats.min, stats.max) == (1, 2)
+
+
+def test_write_arrow_without_schema(tmp_path: Path):
+    """Tests Arrow IPC output falls back to string columns when no schema is available."""
+    output_path = write_columnar_table(TSV_CONTENT, "ORDER_RESULTS.tsv", tmp_path, "arrow")
+    with pa.memory_map(str(output_path)) as source:
+        table = pa.ipc.open_file(source).read_all()
+    assert table.num_rows == 3
+    assert all(field.type == pa.string() for field in table.schema)
+
+
+def test_unparseable_values_fall_back_to_string(tmp_path: Path):
+    """Tests that a column whose values don't match its declared type is kept as string."""
+    tsv = "ORDER_PROC_ID\tLINE\n1001\tabc\n"
+    output_path = write_columnar_table(tsv, "ORDER_RESULTS.tsv", tmp_path, "parquet", SCHEMA_DATA)
+    table = pq.read_table(output_path)
+    assert table.schema.field("LINE").type == pa.string()
+
+
+def test_process_file_writes_markdown_and_parquet(tmp_path: Path):
+    """Tests that process_file writes both Markdown and columnar output when requested."""
+    tsv_path = tmp_path / "ORDER_RESULTS.tsv"
+    tsv_path.write_text(TSV_CONTENT, encoding="utf-8")
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+
+    process_file(tsv_path, output_dir, SCHEMA_DATA, columnar_format="parquet")
+
+    assert (output_dir / "ORDER_RESULTS.md").is_file()
+    assert pq.read_table(output_dir / "ORDER_RESULTS.parquet").num_rows == 3
+
+
+def test_decimal_columns_keep_every_digit(tmp_path: Path):
+    """Tests that declared-precision numerics round-trip exactly, and overflowing values stay strings."""
+    schema = {"CHARGES": {"columns": [
+        {"name": "TX_ID", "type": "NUMERIC(20,0)"},
+        {"name": "AMOUNT", "type": "NUMERIC(18,2)"},
+    ]}}
+    tsv = "TX_ID\tAMOUNT\n12345678901234567890\t1234567890123456.78\n1\t0.10\n"
+    table = pq.read_table(write_columnar_table(tsv, "CHARGES.tsv", tmp_path, "parquet", schema))
+    assert table.schema.field("TX_ID").type == pa.decimal128(20, 0)
+    assert [str(value) for value in table.column("TX_ID").to_pylist()] == ["12345678901234567890", "1"]
+    assert [str(value) for value in table.column("AMOUNT").to_pylist()] == ["1234567890123456.78", "0.10"]
+
+    overflow = "TX_ID\tAMOUNT\n1\t0.125\n"
+    table = pq.read_table(write_columnar_table(overflow, "CHARGES.tsv", tmp_path, "parquet", schema))
+    assert table.column("AMOUNT").to_pylist() == ["0.125"]
+
+
+def test_bare_numeric_columns_are_inferred(tmp_path: Path):
+    """Tests that NUMERIC columns without a precision are typed from their values."""
+    schema = {"ARPB_TRANSACTIONS": {"columns": [
+        {"name": name, "type": "NUMERIC"} for name in ("TX_ID", "AMOUNT", "HUGE", "CODE")
+    ]}}
+    tsv = (
+        "TX_ID\tAMOUNT\tHUGE\tCODE\n"
+        "123456789012345678\t1234567890123456.78\t12345678901234567890\t12\n"
+        "7\t-0.5\t\tA1\n"
+    )
+    table = pq.read_table(write_columnar_table(tsv, "ARPB_TRANSACTIONS.tsv", tmp_path, "parquet", schema))
+    assert table.schema.field("TX_ID").type == pa.int64()
+    assert table.column("TX_ID").to_pylist() == [123456789012345678, 7]
+    assert table.schema.field("AMOUNT").type == pa.decimal128(18, 2)
+    assert [str(value) for value in table.column("AMOUNT").to_pylist()] == ["1234567890123456.78", "-0.50"]
+    assert table.schema.field("HUGE").type == pa.decimal128(20, 0)
+    assert str(table.column("HUGE")[0].as_py()) == "12345678901234567890"
+    assert table.column("CODE").to_pylist() == ["12", "A1"]
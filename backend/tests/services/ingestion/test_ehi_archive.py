@@ -0,0 +1,117 @@
+import io
+import json
+import zipfile
+from pathlib import Path
+
+import fitz
+from PIL import Image
+
+from src.services.ingestion.ehi_archive import EhiArchive, route_member
+from src.services.ingestion.ingestion_orchestrator import orchestrate_archive_ingestion, orchestrate_ingestion
+from src.services.ingestion.ocr_processor import register_ocr_engine
+
+RTF_CONTENT = r"{\rtf1\ansi{\fonttbl\f0\fswiss Helvetica;}\f0\pard Progress note: patient stable.\par}"
+
+
+def _text_pdf_bytes() -> bytes:
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(36, 36, 576, 806), "Discharge summary. " * 60, fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def _archive_ocr(image):
+    return {"text": "Recognized archive page", "confidence": 90.0}
+
+
+register_ocr_engine("archive-fake", _archive_ocr)
+
+
+def _write_export_zip(zip_path: Path) -> None:
+    with zipfile.ZipFile(zip_path, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("Requested Record/EHITables/PATIENT.tsv", "PAT_ID\tNAME\n1\tJane\n2\tJohn\n")
+        zf.writestr("Requested Record/EHITables/EMPTY.tsv", "")
+        zf.writestr("Requested Record/Media/summary.pdf", _text_pdf_bytes())
+        zf.writestr("Requested Record/Media/scan.tif", b"II*\x00")
+        zf.writestr("Requested Record/Media/_INDEX.HTML", "<html></html>")
+        zf.writestr("Requested Record/Rich Text/note.RTF", RTF_CONTENT)
+        zf.writestr("Requested Record/README.txt", "Export")
+
+
+def test_route_member():
+    """Tests routing archive members to stages by path and extension."""
+    assert route_member("Requested Record/EHITables/PATIENT.tsv") == "ehi_tables"
+    assert route_member("Requested Record/Rich Text/note.RTF") == "rich_text"
+    assert route_member("Requested Record/media/scan.TIF") == "media"
+    assert route_member("Requested Record/summary.pdf") is None
+    assert route_member("Requested Record/README.txt") is None
+
+
+def test_ehi_archive_virtual_directory(tmp_path: Path):
+    """Tests listing and reading members without extracting the archive."""
+    zip_path = tmp_path / "export.zip"
+    _write_export_zip(zip_path)
+
+    with EhiArchive(zip_path) as archive:
+        tables = archive.files("ehitables")
+        routed = archive.routed_files()
+        assert sorted(info.filename.rsplit("/", 1)[-1] for info in tables) == ["EMPTY.tsv", "PATIENT.tsv"]
+        assert len(routed["media"]) == 3
+        assert [info.filename for info in routed[None]] == ["Requested Record/README.txt"]
+        assert archive.read_bytes("Requested Record/EHITables/PATIENT.tsv").startswith(b"PAT_ID")
+        with archive.open("Requested Record/Rich Text/note.RTF") as member:
+            assert member.read(5) == b"{\\rtf"
+
+
+def test_orchestrate_ingestion_from_zip(tmp_path: Path):
+    """Tests that a ZIP export is ingested in place with directory-mode counts and outputs."""
+    zip_path = tmp_path / "export.zip"
+    _write_export_zip(zip_path)
+    output = tmp_path / "out"
+
+    summary = orchestrate_ingestion(zip_path, output, max_workers=2)
+
+    stages = summary["stages"]
+    assert {name: stage["status"] for name, stage in stages.items()} == {
+        "ehi_tables": "completed",
+        "media": "completed",
+        "rich_text": "completed",
+    }
+    tables = stages["ehi_tables"]["counts"]
+    assert (tables["files_done"], tables["processed"], tables["skipped"], tables["rows"]) == (2, 1, 1, 2)
+    assert stages["media"]["counts"] == {"files": 3, "text_pdfs": 1, "image_pdfs": 0, "mixed_pdfs": 0, "tifs": 1, "other": 1, "errors": 0, "resumed": 0}
+    assert stages["rich_text"]["counts"] == {"files": 1, "processed": 1, "skipped": 0, "errors": 0, "resumed": 0}
+    assert summary["unrouted_members"] == 1
+
+    assert (output / "EHITables_Markdown" / "PATIENT.md").is_file()
+    assert "Discharge summary" in (output / "Media_Text" / "summary.txt").read_text(encoding="utf-8")
+    assert (output / "RichText_Text" / "note.txt").read_text(encoding="utf-8") == "Progress note: patient stable."
+    assert not list(output.rglob("*.tif"))
+
+
+def test_orchestrate_archive_ingestion_ocrs_scans(tmp_path: Path):
+    """Tests that scanned PDFs and TIFs in a ZIP export are OCR'd like in directory mode, and resumed."""
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), False))
+    tif = io.BytesIO()
+    Image.new("RGB", (300, 400), "white").save(tif, format="TIFF")
+    zip_path = tmp_path / "export.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("Requested Record/Media/summary.pdf", _text_pdf_bytes())
+        zf.writestr("Requested Record/Media/scan.pdf", doc.tobytes())
+        zf.writestr("Requested Record/Media/fax.tif", tif.getvalue())
+    doc.close()
+    output = tmp_path / "out"
+
+    media = orchestrate_archive_ingestion(zip_path, output, max_workers=2, ocr=True, ocr_engine="archive-fake")["stages"]["media"]
+    assert (media["counts"]["text_pdfs"], media["counts"]["image_pdfs"], media["counts"]["tifs"]) == (1, 1, 1)
+    assert (media["ocr"]["documents"], media["ocr"]["ocr"]) == (2, 2)
+    for stem in ("scan", "fax"):
+        assert (output / "Media_Text" / f"{stem}.txt").read_text(encoding="utf-8") == "Recognized archive page"
+        assert json.loads((output / "Media_Text" / f"{stem}.ocr.json").read_text(encoding="utf-8"))["engine"] == "archive-fake"
+
+    resumed = orchestrate_archive_ingestion(zip_path, output, max_workers=2, resume=True, ocr=True, ocr_engine="archive-fake")
+    assert resumed["stages"]["media"]["counts"]["resumed"] == 3 and resumed["stages"]["media"]["ocr"] is None
@@ -0,0 +1,139 @@
+import os
+import pickle
+import shutil
+import struct
+from pathlib import Path
+
+import pytest
+
+from src.services.ingestion.ehi_schema_parser import parse_all_schemas, parse_schema_html
+from src.services.ingestion.ehr_parser import run_ehr_parsing
+from src.services.ingestion.schema_artifact import (
+    SCHEMA_ARTIFACT_MAGIC,
+    SCHEMA_ARTIFACT_VERSION,
+    SchemaArtifactError,
+    load_schema,
+)
+
+# Define the fixtures directory relative to the test file
+FIXTURES_DIR = Path(__file__).parent.parent.parent / 'fixtures' / 'ehi_schema'
+
+EXPECTED_ORDER_RESULTS = {
+    "description": (
+        "This table contains information on results from clinical system orders.\n"
+        "        It includeslaband imaging result components."
+    ),
+    "primary_key": ["ORDER_PROC_ID", "LINE"],
+    "columns": [
+        {"name": "ORDER_PROC_ID", "type": "NUMERIC", "discontinued": "",
+         "description": "The unique identifier for the order record."},
+        {"name": "LINE", "type": "INTEGER", "discontinued": "",
+         "description": "The line number for the information associated with this record."},
+        {"name": "RESULT_DATE", "type": "DATETIME", "discontinued": "Yes",
+         "description": "The date the result was entered."},
+        {"name": "ORD_VALUE", "type": "VARCHAR", "discontinued": "", "description": ""},
+    ],
+}
+
+
+def test_parse_schema_html():
+    """Tests extracting description, primary key and columns from an Epic schema page."""
+    html = (FIXTURES_DIR / "ORDER_RESULTS.htm").read_text(encoding="utf-8")
+    assert parse_schema_html(html) == EXPECTED_ORDER_RESULTS
+
+
+def test_parse_schema_html_bytes():
+    """Tests that raw UTF-8 bytes parse the same as decoded text."""
+    raw = (FIXTURES_DIR / "ORDER_RESULTS.htm").read_bytes()
+    assert parse_schema_html(raw) == EXPECTED_ORDER_RESULTS
+
+
+def test_parse_schema_html_missing_sections():
+    """Tests defaults when the description and primary key sections are missing."""
+    html = (FIXTURES_DIR / "ORDER_RESULTS.htm").read_text(encoding="utf-8")
+    html = html.replace('class="KeyValue"', 'class="Other"').replace("Primary Key", "Keys")
+    schema = parse_schema_html(html)
+    assert schema["description"] == "No description found."
+    assert schema["primary_key"] == []
+    assert len(schema["columns"]) == 4
+
+
+def test_parse_schema_html_without_columns():
+    """Tests that a page without column information is rejected."""
+    assert parse_schema_html("<html><body><p>Not a schema page</p></body></html>") is None
+
+
+def _copy_schema_pages(schema_dir: Path, names) -> None:
+    schema_dir.mkdir(parents=True, exist_ok=True)
+    for name in names:
+        shutil.copy(FIXTURES_DIR / "ORDER_RESULTS.htm", schema_dir / f"{name}.htm")
+
+
+def test_parse_all_schemas_incremental(tmp_path: Path):
+    """Tests that unchanged pages are reused from the manifest and changed pages re-parsed."""
+    schema_dir = tmp_path / "schemas"
+    _copy_schema_pages(schema_dir, ["ORDER_RESULTS", "ORDER_RESULTS_2"])
+    output_file = tmp_path / "schema.ehischema"
+
+    stats = parse_all_schemas(schema_dir, output_file)
+    assert stats == {"files": 2, "parsed": 2, "reused": 0, "errors": 0}
+    assert load_schema(output_file) == {
+        "ORDER_RESULTS": EXPECTED_ORDER_RESULTS,
+        "ORDER_RESULTS_2": EXPECTED_ORDER_RESULTS,
+    }
+
+    assert parse_all_schemas(schema_dir, output_file)["reused"] == 2
+
+    changed = schema_dir / "ORDER_RESULTS_2.htm"
+    changed.write_text(changed.read_text(encoding="utf-8").replace("ORD_VALUE", "ORD_NUM_VALUE"), encoding="utf-8")
+    os.utime(changed, ns=(changed.stat().st_atime_ns, changed.stat().st_mtime_ns + 1_000_000_000))
+    stats = parse_all_schemas(schema_dir, output_file)
+    assert stats == {"files": 2, "parsed": 1, "reused": 1, "errors": 0}
+    assert load_schema(output_file)["ORDER_RESULTS_2"]["columns"][-1]["name"] == "ORD_NUM_VALUE"
+
+    assert parse_all_schemas(schema_dir, output_file, force=True)["parsed"] == 2
+
+
+def test_parse_all_schemas_parallel_matches_json(tmp_path: Path):
+    """Tests that the process pool path produces the same schema as JSON output."""
+    schema_dir = tmp_path / "schemas"
+    _copy_schema_pages(schema_dir, [f"TABLE_{i}" for i in range(10)])
+
+    parse_all_schemas(schema_dir, tmp_path / "schema.json", max_workers=2)
+    parse_all_schemas(schema_dir, tmp_path / "schema.ehischema", max_workers=2)
+
+    json_schema = load_schema(tmp_path / "schema.json")
+    assert len(json_schema) == 10
+    assert json_schema == load_schema(tmp_path / "schema.ehischema")
+
+
+def test_load_schema_rejects_invalid_artifact(tmp_path: Path):
+    """Tests that files without the artifact header, old pickle artifacts and non-JSON content are rejected."""
+    bad = tmp_path / "schema.ehischema"
+    bad.write_bytes(b"not a schema artifact")
+    with pytest.raises(SchemaArtifactError):
+        load_schema(bad)
+
+    payload = pickle.dumps({"ORDER_RESULTS": {}})
+    for version in (1, SCHEMA_ARTIFACT_VERSION):
+        bad.write_bytes(struct.pack("<9sH", SCHEMA_ARTIFACT_MAGIC, version) + payload)
+        with pytest.raises(SchemaArtifactError):
+            load_schema(bad)
+
+
+def test_run_ehr_parsing_with_schema_artifact(tmp_path: Path):
+    """Tests that the EHR parser accepts a compiled schema artifact."""
+    schema_dir = tmp_path / "schemas"
+    _copy_schema_pages(schema_dir, ["ORDER_RESULTS"])
+    artifact = tmp_path / "schema.ehischema"
+    parse_all_schemas(schema_dir, artifact)
+
+    input_dir = tmp_path / "EHITables"
+    input_dir.mkdir()
+    (input_dir / "ORDER_RESULTS.tsv").write_text("ORDER_PROC_ID\tLINE\n1001\t1\n", encoding="utf-8")
+
+    stats = run_ehr_parsing(str(input_dir), str(tmp_path / "out"), str(artifact))
+
+    assert stats["processed"] == 1
+    markdown = (tmp_path / "out" / "ORDER_RESULTS.md").read_text(encoding="utf-8")
+    assert "clinical system orders" in markdown
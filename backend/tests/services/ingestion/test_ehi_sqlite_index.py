@@ -0,0 +1,208 @@
+import csv
+import json
+import sqlite3
+from pathlib import Path
+
+from src.services.ingestion import ehi_sqlite_index
+from src.services.ingestion.ehi_sqlite_index import build_sqlite_index, ehi_type_to_sqlite
+from src.services.ingestion.ehr_parser import run_ehr_parsing
+
+SCHEMA_DATA = {
+    "ORDER_RESULTS": {
+        "description": "Results for lab orders.",
+        "primary_key": ["ORDER_PROC_ID", "LINE"],
+        "columns": [
+            {"name": "ORDER_PROC_ID", "type": "NUMERIC", "discontinued": "", "description": "Order ID"},
+            {"name": "LINE", "type": "INTEGER", "discontinued": "", "description": "Line number"},
+            {"name": "RESULT_DATE", "type": "DATETIME", "discontinued": "", "description": "Result date"},
+            {"name": "ORD_VALUE", "type": "VARCHAR", "discontinued": "", "description": "Result value"},
+        ],
+    },
+    "HNO_INFO": {
+        "description": "Clinical notes.",
+        "primary_key": ["NOTE_ID"],
+        "columns": [
+            {"name": "NOTE_ID", "type": "VARCHAR", "discontinued": "", "description": "Note ID"},
+            {"name": "PAT_ENC_CSN_ID", "type": "NUMERIC", "discontinued": "", "description": "Encounter"},
+        ],
+    },
+}
+
+
+def _write_tables(input_dir: Path) -> None:
+    input_dir.mkdir(parents=True, exist_ok=True)
+    (input_dir / "ORDER_RESULTS.tsv").write_text(
+        "ORDER_PROC_ID\tLINE\tRESULT_DATE\tORD_VALUE\n"
+        "1001\t1\t3/14/2023 12:00:00 AM\t5.4\n"
+        "1001\t2\t3/15/2023 1:30:00 PM\t\n"
+        "1002\t1\t\tNegative\n",
+        encoding="utf-8",
+    )
+    (input_dir / "HNO_INFO.tsv").write_text(
+        "NOTE_ID\tPAT_ENC_CSN_ID\n"
+        "N1\t555\n"
+        "N2\t555\n"
+        "N3\t777\n",
+        encoding="utf-8",
+    )
+
+
+def test_ehi_type_to_sqlite():
+    """Tests mapping EHI schema types to SQLite declared types."""
+    assert ehi_type_to_sqlite("INTEGER") == "INTEGER"
+    assert ehi_type_to_sqlite("INTERVAL") == "TEXT"
+    assert ehi_type_to_sqlite("NUMERIC") == "TEXT"
+    assert ehi_type_to_sqlite("NUMERIC(18,0)") == "NUMERIC"
+    assert ehi_type_to_sqlite("NUMERIC(20,0)") == "TEXT"
+    assert ehi_type_to_sqlite("DECIMAL(18,2)") == "TEXT"
+    assert ehi_type_to_sqlite("FLOAT") == "REAL"
+    assert ehi_type_to_sqlite("DATETIME (UTC)") == "DATETIME"
+    assert ehi_type_to_sqlite("VARCHAR") == "TEXT"
+
+
+def test_build_sqlite_index(tmp_path: Path):
+    """Tests loading TSVs into SQLite with typed columns, PK indexes and lookup indexes."""
+    input_dir = tmp_path / "EHITables"
+    _write_tables(input_dir)
+    db_path = tmp_path / "ehi.sqlite"
+
+    stats = build_sqlite_index(sorted(input_dir.glob("*.tsv")), db_path, SCHEMA_DATA)
+    assert stats == {"tables": 2, "rows": 6, "errors": 0}
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+        rows = conn.execute(
+            'SELECT LINE, RESULT_DATE, ORD_VALUE FROM ORDER_RESULTS WHERE ORDER_PROC_ID = ? ORDER BY LINE', (1001,)
+        ).fetchall()
+        assert rows == [(1, "2023-03-14 00:00:00", "5.4"), (2, "2023-03-15 13:30:00", None)]
+
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT * FROM ORDER_RESULTS WHERE ORDER_PROC_ID = 1001"
+        ).fetchall()
+        assert any("idx_ORDER_RESULTS_pk" in str(step) for step in plan)
+
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT NOTE_ID FROM HNO_INFO WHERE PAT_ENC_CSN_ID = 555"
+        ).fetchall()
+        assert any("idx_HNO_INFO_PAT_ENC_CSN_ID" in str(step) for step in plan)
+
+        info = conn.execute(
+            'SELECT primary_key, row_count FROM "_ehi_table_info" WHERE table_name = ?', ("ORDER_RESULTS",)
+        ).fetchone()
+        assert info == ("ORDER_PROC_ID,LINE", 3)
+    finally:
+        conn.close()
+
+
+def test_numeric_ids_round_trip(tmp_path: Path):
+    """Tests that 18-digit IDs come back exactly, with or without a declared precision."""
+    schema = {"ARPB_TRANSACTIONS": {"columns": [
+        {"name": "TX_ID", "type": "NUMERIC(18,0)"},
+        {"name": "ACCOUNT_ID", "type": "NUMERIC"},
+        {"name": "AMOUNT", "type": "NUMERIC(18,2)"},
+    ]}}
+    tsv_path = tmp_path / "ARPB_TRANSACTIONS.tsv"
+    tsv_path.write_text(
+        "TX_ID\tACCOUNT_ID\tAMOUNT\n123456789012345678\t987654321098765432\t1234567890123456.78\n",
+        encoding="utf-8",
+    )
+    db_path = tmp_path / "ehi.sqlite"
+    build_sqlite_index([tsv_path], db_path, schema)
+
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(
+            "SELECT TX_ID, ACCOUNT_ID, AMOUNT FROM ARPB_TRANSACTIONS WHERE TX_ID = ?", (123456789012345678,)
+        ).fetchone()
+        assert row == (123456789012345678, "987654321098765432", "1234567890123456.78")
+    finally:
+        conn.close()
+
+
+def test_build_sqlite_index_decodes_cp1252(tmp_path: Path):
+    """Tests that non-UTF-8 TSVs are decoded with the shared EHR parser fallback."""
+    tsv_path = tmp_path / "HNO_INFO.tsv"
+    tsv_path.write_bytes("NOTE_ID\tNOTE_TEXT\nN1\tCaf\u00e9 \u2013 follow-up\n".encode("cp1252"))
+    db_path = tmp_path / "ehi.sqlite"
+    assert build_sqlite_index([tsv_path], db_path)["tables"] == 1
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT NOTE_TEXT FROM HNO_INFO").fetchone() == ("Caf\u00e9 \u2013 follow-up",)
+    finally:
+        conn.close()
+
+
+def test_failed_load_keeps_previous_table(tmp_path: Path, monkeypatch):
+    """Tests that a load failing partway rolls back, keeping the previous table and its info row."""
+    input_dir = tmp_path / "EHITables"
+    _write_tables(input_dir)
+    db_path = tmp_path / "ehi.sqlite"
+    build_sqlite_index([input_dir / "HNO_INFO.tsv"], db_path, SCHEMA_DATA)
+
+    # The second row exceeds the csv field limit, after the first batch is inserted
+    monkeypatch.setattr(ehi_sqlite_index, "SQLITE_BATCH_SIZE", 1)
+    (input_dir / "HNO_INFO.tsv").write_text(
+        "NOTE_ID\tPAT_ENC_CSN_ID\nN9\t999\n" + "N" * (csv.field_size_limit() + 1) + "\t1\n",
+        encoding="utf-8",
+    )
+    stats = build_sqlite_index([input_dir / "HNO_INFO.tsv"], db_path, SCHEMA_DATA)
+    assert stats == {"tables": 0, "rows": 0, "errors": 1}
+
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT NOTE_ID FROM HNO_INFO ORDER BY NOTE_ID").fetchall() == [("N1",), ("N2",), ("N3",)]
+        assert conn.execute('SELECT row_count FROM "_ehi_table_info" WHERE table_name = ?', ("HNO_INFO",)).fetchone() == (3,)
+    finally:
+        conn.close()
+
+
+def test_run_ehr_parsing_with_sqlite(tmp_path: Path):
+    """Tests that run_ehr_parsing builds the SQLite index alongside the Markdown output."""
+    input_dir = tmp_path / "EHITables"
+    _write_tables(input_dir)
+    schema_path = tmp_path / "schema.json"
+    schema_path.write_text(json.dumps(SCHEMA_DATA), encoding="utf-8")
+    output_dir = tmp_path / "out"
+    db_path = tmp_path / "ehi.sqlite"
+
+    run_ehr_parsing(str(input_dir), str(output_dir), str(schema_path), sqlite_db=str(db_path))
+
+    assert (output_dir / "ORDER_RESULTS.md").is_file()
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM HNO_INFO").fetchone()[0] == 3
+    finally:
+        conn.close()
+
+
+def test_run_ehr_parsing_resumes_sqlite_index(tmp_path: Path, monkeypatch):
+    """Tests that a resumed run only loads the tables that are not in the index yet."""
+    from src.services.ingestion import ehr_parser
+
+    input_dir = tmp_path / "EHITables"
+    _write_tables(input_dir)
+    output_dir = tmp_path / "out"
+    db_path = tmp_path / "ehi.sqlite"
+    loaded = []
+
+    def recording_build(tsv_files, *args):
+        loaded.append(sorted(file_path.stem for file_path in tsv_files))
+        return build_sqlite_index(tsv_files, *args)
+
+    monkeypatch.setattr(ehr_parser, "build_sqlite_index", recording_build)
+
+    run_ehr_parsing(str(input_dir), str(output_dir), sqlite_db=str(db_path))
+    run_ehr_parsing(str(input_dir), str(output_dir), sqlite_db=str(db_path), resume=True)
+    (input_dir / "HNO_INFO.tsv").write_text("NOTE_ID\tPAT_ENC_CSN_ID\nN4\t888\n", encoding="utf-8")
+    run_ehr_parsing(str(input_dir), str(output_dir), sqlite_db=str(db_path), resume=True)
+
+    assert loaded == [["HNO_INFO", "ORDER_RESULTS"], [], ["HNO_INFO"]]
+    conn = sqlite3.connect(db_path)
+    try:
+        assert conn.execute("SELECT COUNT(*) FROM ORDER_RESULTS").fetchone()[0] == 3
+        assert conn.execute("SELECT NOTE_ID FROM HNO_INFO").fetchall() == [("N4",)]
+    finally:
+        conn.close()
@@ -0,0 +1,77 @@
+import threading
+from pathlib import Path
+
+import pytest
+
+from src.services.ingestion.ehr_parser import run_ehr_parsing
+from src.services.ingestion.ingestion_jobs import (
+    IngestionJobManager,
+    IngestionCapacityError,
+    IngestionJobStatus,
+)
+
+
+def _write_tables(input_dir: Path, count: int = 3) -> None:
+    input_dir.mkdir(parents=True, exist_ok=True)
+    for i in range(count):
+        (input_dir / f"TABLE_{i}.tsv").write_text("ID\tVALUE\n1\ta\n2\tb\n", encoding="utf-8")
+
+
+def test_run_ehr_parsing_reports_progress(tmp_path: Path):
+    """Tests that run_ehr_parsing returns counters and reports progress per file."""
+    input_dir = tmp_path / "EHITables"
+    _write_tables(input_dir)
+    updates = []
+
+    stats = run_ehr_parsing(str(input_dir), str(tmp_path / "out"), progress_callback=updates.append)
+
+    assert stats["files_total"] == 3
+    assert stats["processed"] == 3
+    assert stats["rows"] == 6
+    assert stats["bytes_done"] == stats["bytes_total"] > 0
+    assert [u["files_done"] for u in updates] == [1, 2, 3]
+
+
+def test_run_ehr_parsing_cancelled(tmp_path: Path):
+    """Tests that a set cancel event marks the run as cancelled."""
+    input_dir = tmp_path / "EHITables"
+    _write_tables(input_dir)
+    cancel_event = threading.Event()
+    cancel_event.set()
+
+    stats = run_ehr_parsing(str(input_dir), str(tmp_path / "out"), cancel_event=cancel_event)
+
+    assert stats["cancelled"] is True
+    assert stats["files_done"] <= stats["files_total"]
+
+
+def test_job_manager_runs_job_in_worker_process(tmp_path: Path):
+    """Tests that a job runs in a separate process and exposes final counters."""
+    input_dir = tmp_path / "EHITables"
+    _write_tables(input_dir)
+    manager = IngestionJobManager()
+
+    job_id = manager.start_ehr_job(input_dir=str(input_dir), output_dir=str(tmp_path / "out"))
+    job = manager.wait(job_id, timeout=120)
+
+    assert job["status"] == IngestionJobStatus.COMPLETED.value
+    assert job["files_done"] == 3
+    assert job["rows"] == 6
+    assert job["eta_seconds"] is None
+    assert job["error"] is None
+    assert (tmp_path / "out" / "TABLE_0.md").is_file()
+    assert manager.get_job("unknown") is None
+
+
+def test_job_manager_failed_and_capacity(tmp_path: Path):
+    """Tests that an invalid run is reported as failed and that the job cap is enforced."""
+    manager = IngestionJobManager()
+    manager.max_concurrent_jobs = 1
+
+    job_id = manager.start_ehr_job(input_dir=str(tmp_path / "missing"))
+    with pytest.raises(IngestionCapacityError):
+        manager.start_ehr_job(input_dir=str(tmp_path / "missing"))
+
+    job = manager.wait(job_id, timeout=120)
+    assert job["status"] == IngestionJobStatus.FAILED.value
+    assert job["error"] == "RuntimeError: EHR parsing could not start (invalid input directory or options)."
@@ -0,0 +1,79 @@
+import concurrent.futures
+import importlib
+import logging
+
+import pytest
+
+from src.services.ingestion import ehi_schema_parser
+from src.services.ingestion.ehr_parser import run_ehr_parsing
+from src.services.ingestion.ingestion_logging import (
+    ProgressReporter,
+    apply_env_verbosity,
+    get_subsystem_logger,
+    set_verbosity,
+)
+
+
+@pytest.fixture
+def restore_levels():
+    loggers = [get_subsystem_logger(), get_subsystem_logger("ehr"), get_subsystem_logger("schema")]
+    levels = [log.level for log in loggers]
+    yield
+    for log, level in zip(loggers, levels):
+        log.setLevel(level)
+
+
+def test_import_does_not_configure_root_logger():
+    """Tests that importing the schema parser leaves the root logger untouched."""
+    root = logging.getLogger()
+    level, handlers = root.level, list(root.handlers)
+    importlib.reload(ehi_schema_parser)
+    assert root.level == level
+    assert root.handlers == handlers
+
+
+def test_set_verbosity_per_subsystem(restore_levels):
+    """Tests that subsystem levels are independent and unknown subsystems are rejected."""
+    set_verbosity("debug", "ehr")
+    set_verbosity(logging.WARNING, "schema")
+    assert get_subsystem_logger("ehr").isEnabledFor(logging.DEBUG)
+    assert not get_subsystem_logger("schema").isEnabledFor(logging.INFO)
+    assert get_subsystem_logger("ehr").name == "src.services.ingestion.ehr_parser"
+    with pytest.raises(ValueError):
+        set_verbosity(logging.DEBUG, "unknown")
+
+
+def test_run_ehr_parsing_restores_verbosity(restore_levels, tmp_path):
+    """Tests that a verbose run leaves the EHR logger at the level it found, even when it fails early."""
+    set_verbosity(logging.WARNING, "ehr")
+    assert run_ehr_parsing(str(tmp_path / "missing"), verbose=True) is None
+    (tmp_path / "T.tsv").write_text("A\n1\n")
+    with concurrent.futures.ThreadPoolExecutor(1) as executor:
+        run_ehr_parsing(str(tmp_path), str(tmp_path / "out"), verbose=True, executor=executor)
+    assert get_subsystem_logger("ehr").level == logging.WARNING
+
+
+def test_apply_env_verbosity(restore_levels):
+    """Tests parsing of the INGESTION_LOG_LEVELS format, skipping invalid entries."""
+    apply_env_verbosity("WARNING, ehr=DEBUG, nope=INFO, schema=LOUD")
+    assert get_subsystem_logger().level == logging.WARNING
+    assert get_subsystem_logger("ehr").level == logging.DEBUG
+
+
+def test_progress_reporter_samples(caplog):
+    """Tests that progress is logged once per interval plus the final item."""
+    log = logging.getLogger("tests.progress")
+    reporter = ProgressReporter(log, "Files", total=1000, interval=3600)
+    with caplog.at_level(logging.INFO, logger="tests.progress"):
+        logged = [reporter.update(done) for done in range(1, 1001)]
+    assert sum(logged) == 1
+    assert caplog.messages[-1].startswith("Files: 1000/1000 done")
+
+
+def test_progress_reporter_disabled_level(caplog):
+    """Tests that nothing is emitted when the reporter's level is disabled."""
+    log = logging.getLogger("tests.progress.quiet")
+    log.setLevel(logging.WARNING)
+    reporter = ProgressReporter(log, "Files", total=1, interval=0)
+    assert reporter.update(1) is False
+    assert not caplog.records
@@ -0,0 +1,122 @@
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import fitz
+
+from src.services.ingestion.ingestion_orchestrator import orchestrate_ingestion
+from src.services.ingestion.media_processor import process_media_directory
+from src.services.ingestion.rtf_processor import process_rtf_directory
+
+RTF_CONTENT = r"{\rtf1\ansi{\fonttbl\f0\fswiss Helvetica;}\f0\pard Progress note: patient stable.\par}"
+
+
+def _write_text_pdf(path: Path) -> None:
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(36, 36, 576, 806), "Discharge summary. " * 60, fontsize=8)
+    doc.save(str(path))
+    doc.close()
+
+
+def _write_export(root: Path) -> None:
+    tables = root / "EHITables"
+    tables.mkdir(parents=True)
+    (tables / "PATIENT.tsv").write_text("PAT_ID\tNAME\n1\tJane\n2\tJohn\n", encoding="utf-8")
+
+    media = root / "Media"
+    media.mkdir()
+    _write_text_pdf(media / "summary.pdf")
+    (media / "scan.tif").write_bytes(b"II*\x00")
+    (media / "_INDEX.HTML").write_text("<html></html>", encoding="utf-8")
+
+    rich_text = root / "Rich Text"
+    rich_text.mkdir()
+    (rich_text / "note.RTF").write_text(RTF_CONTENT, encoding="utf-8")
+    (rich_text / "empty.rtf").write_text("", encoding="utf-8")
+
+
+def test_orchestrate_ingestion_runs_all_stages(tmp_path: Path):
+    """Tests that all three stages run on the shared pool and report timings and counts."""
+    _write_export(tmp_path / "export")
+    output = tmp_path / "out"
+
+    summary = orchestrate_ingestion(tmp_path / "export", output, max_workers=2)
+
+    stages = summary["stages"]
+    assert {name: stage["status"] for name, stage in stages.items()} == {
+        "ehi_tables": "completed",
+        "media": "completed",
+        "rich_text": "completed",
+    }
+    assert stages["ehi_tables"]["counts"]["processed"] == 1
+    assert stages["media"]["counts"] == {"files": 3, "text_pdfs": 1, "image_pdfs": 0, "mixed_pdfs": 0, "tifs": 1, "other": 1, "errors": 0, "resumed": 0}
+    assert [timing["file"] for timing in stages["media"]["timings"]] == ["summary.pdf"]
+    assert stages["media"]["failures"] == []
+    assert stages["rich_text"]["counts"] == {"files": 2, "processed": 1, "skipped": 1, "errors": 0, "resumed": 0}
+    assert all(stage["seconds"] >= 0 for stage in stages.values())
+    assert summary["seconds"] >= max(stage["seconds"] for stage in stages.values())
+
+    assert (output / "EHITables_Markdown" / "PATIENT.md").is_file()
+    assert "Discharge summary" in (output / "Media_Text" / "summary.txt").read_text(encoding="utf-8")
+    assert (output / "RichText_Text" / "note.txt").read_text(encoding="utf-8") == "Progress note: patient stable."
+
+
+def test_orchestrate_ingestion_missing_stage(tmp_path: Path):
+    """Tests that a stage without an input directory is reported as missing."""
+    (tmp_path / "export" / "Rich Text").mkdir(parents=True)
+
+    summary = orchestrate_ingestion(tmp_path / "export", tmp_path / "out", max_workers=1)
+
+    assert summary["stages"]["ehi_tables"]["status"] == "missing"
+    assert summary["stages"]["media"]["counts"] is None
+    assert summary["stages"]["rich_text"]["counts"]["files"] == 0
+
+
+def test_stage_functions_accept_executor(tmp_path: Path):
+    """Tests that the media and RTF stages give the same counts inline and on an executor."""
+    _write_export(tmp_path / "export")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        media_result = process_media_directory(tmp_path / "export" / "Media", tmp_path / "media", executor)
+        rtf_result = process_rtf_directory(tmp_path / "export" / "Rich Text", tmp_path / "rtf", executor)
+
+    inline_result = process_media_directory(tmp_path / "export" / "Media", tmp_path / "media_inline", max_workers=1)
+    assert media_result["counts"] == inline_result["counts"]
+    assert rtf_result["counts"] == process_rtf_directory(tmp_path / "export" / "Rich Text", tmp_path / "rtf_inline", max_workers=1)["counts"]
+    assert process_rtf_directory(tmp_path / "missing", tmp_path / "rtf") is None
+
+
+def test_process_media_directory_bounded_pool(tmp_path: Path):
+    """Tests the structured media result: largest PDFs first, failures and per-file timings."""
+    media = tmp_path / "Media"
+    media.mkdir()
+    _write_text_pdf(media / "small.pdf")
+    doc = fitz.open()
+    for _ in range(3):
+        doc.new_page().insert_textbox(fitz.Rect(36, 36, 576, 806), "Operative report. " * 80, fontsize=8)
+    doc.save(str(media / "large.pdf"))
+    doc.close()
+    (media / "broken.pdf").write_bytes(b"")
+    (media / "scan.tif").write_bytes(b"II*\x00")
+
+    submitted = []
+
+    class RecordingExecutor(ThreadPoolExecutor):
+        def submit(self, fn, media_file, *args):
+            submitted.append(media_file.name)
+            return super().submit(fn, media_file, *args)
+
+    # A one-byte budget forces one PDF in flight at a time, so submission order is observable
+    with RecordingExecutor(max_workers=2) as executor:
+        result = process_media_directory(media, tmp_path / "out", executor, max_inflight_bytes=1)
+
+    assert submitted == ["large.pdf", "small.pdf", "broken.pdf"]
+    assert result["counts"] == {"files": 4, "text_pdfs": 2, "image_pdfs": 0, "mixed_pdfs": 0, "tifs": 1, "other": 0, "errors": 1, "resumed": 0}
+    assert [failure["file"] for failure in result["failures"]] == ["broken.pdf"]
+    assert result["failures"][0]["error"] == "empty file"
+    assert sorted(timing["file"] for timing in result["timings"]) == ["broken.pdf", "large.pdf", "small.pdf"]
+    assert all(timing["seconds"] >= 0 for timing in result["timings"])
+
+    pooled = process_media_directory(media, tmp_path / "pooled", max_workers=2)
+    assert pooled["counts"] == result["counts"]
+    assert (tmp_path / "pooled" / "large.txt").is_file()
@@ -0,0 +1,105 @@
+import json
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import fitz
+from PIL import Image, ImageDraw
+
+from src.services.ingestion.media_processor import process_media_directory
+from src.services.ingestion.ocr_processor import estimate_skew, preprocess_page_image, register_ocr_engine
+
+TEXT = "Discharge summary. Patient stable, follow up in two weeks. " * 12
+
+
+def _fake_ocr(image: Image.Image):
+    return {"text": f"Recognized {image.mode} page", "confidence": 91.0 if image.width > 300 else 40.0}
+
+
+register_ocr_engine("fake", _fake_ocr)
+
+
+def _write_scanned_pdf(path: Path) -> None:
+    """A text page followed by a scanned page (full-page image with a short caption)."""
+    doc = fitz.open()
+    doc.new_page().insert_textbox(fitz.Rect(36, 36, 576, 806), TEXT, fontsize=8)
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), False))
+    page.insert_text((36, 36), "Scan", fontsize=8)
+    doc.save(str(path))
+    doc.close()
+
+
+def _lined_page() -> Image.Image:
+    image = Image.new("L", (800, 1000), 255)
+    draw = ImageDraw.Draw(image)
+    for y in range(60, 940, 40):
+        draw.rectangle([80, y, 720, y + 8], fill=0)
+    return image
+
+
+def test_preprocess_page_image_deskews_and_downscales():
+    """Tests skew estimation and that preprocessing yields a grayscale image within budget."""
+    page = _lined_page()
+    assert estimate_skew(page) == 0.0
+    assert estimate_skew(page.rotate(3, fillcolor=255)) == -3.0
+
+    processed = preprocess_page_image(page.convert("RGB").rotate(-2, fillcolor=(255, 255, 255)), max_pixels=200_000)
+    assert processed.mode == "L"
+    assert processed.width < 800 and processed.width * processed.height <= 200_000 * 1.1  # Deskew expands a little
+
+
+def test_process_media_directory_ocr(tmp_path: Path):
+    """Tests that scanned PDFs and TIFs are OCR'd page by page into text and a page report."""
+    media = tmp_path / "Media"
+    media.mkdir()
+    _write_scanned_pdf(media / "scan.pdf")
+    frames = [Image.new("RGB", (600, 800), "white"), Image.new("RGB", (200, 300), "white")]
+    frames[0].save(media / "fax.tif", save_all=True, append_images=frames[1:])
+    (media / "_INDEX.HTML").write_text("<html></html>", encoding="utf-8")
+    output = tmp_path / "out"
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        result = process_media_directory(media, output, executor, ocr=True, ocr_engine="fake")
+
+    assert result["counts"] == {"files": 3, "text_pdfs": 0, "image_pdfs": 1, "mixed_pdfs": 0, "tifs": 1, "other": 1, "errors": 0, "resumed": 0}
+    ocr = result["ocr"]
+    assert (ocr["documents"], ocr["ocr"], ocr["pages"], ocr["ocr_pages"], ocr["low_confidence_pages"]) == (2, 2, 4, 3, 1)
+
+    scan_text = (output / "scan.txt").read_text(encoding="utf-8")
+    assert scan_text.startswith("Discharge summary.") and scan_text.endswith("Recognized L page")
+    report = json.loads((output / "scan.ocr.json").read_text(encoding="utf-8"))
+    assert [page["method"] for page in report["pages"]] == ["text", "ocr"]
+    assert report["mean_confidence"] == 91.0
+    assert (output / "fax.txt").read_text(encoding="utf-8") == "Recognized L page\n\nRecognized L page"
+
+    resumed = process_media_directory(media, output, max_workers=1, resume=True, ocr=True, ocr_engine="fake")
+    assert resumed["counts"]["resumed"] == 2
+    assert resumed["ocr"]["documents"] == 0
+
+    without_ocr = process_media_directory(media, tmp_path / "plain", max_workers=1, ocr=False)
+    assert without_ocr["ocr"] is None
+    assert not (tmp_path / "plain" / "scan.txt").exists()
+
+
+def test_process_media_directory_ocrs_only_scanned_pages_of_text_pdfs(tmp_path: Path):
+    """Tests that a PDF classified as text but with a scanned page keeps its text pages and OCRs the scan."""
+    media = tmp_path / "Media"
+    media.mkdir()
+    doc = fitz.open()
+    for _ in range(3):
+        doc.new_page().insert_textbox(fitz.Rect(36, 36, 576, 806), TEXT, fontsize=8)
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), False))
+    doc.save(str(media / "mixed.pdf"))
+    doc.close()
+
+    result = process_media_directory(media, tmp_path / "out", max_workers=1, ocr=True, ocr_engine="fake")
+    assert (result["counts"]["text_pdfs"], result["counts"]["mixed_pdfs"]) == (0, 1)
+    report = json.loads((tmp_path / "out" / "mixed.ocr.json").read_text(encoding="utf-8"))
+    assert [page["method"] for page in report["pages"]] == ["text", "text", "text", "ocr"]
+    assert (tmp_path / "out" / "mixed.txt").read_text(encoding="utf-8").endswith("Recognized L page")
+
+    # Without OCR, the text pages are still written
+    without_ocr = process_media_directory(media, tmp_path / "plain", max_workers=1, ocr=False)
+    assert without_ocr["counts"]["text_pdfs"] == 1
+    assert (tmp_path / "plain" / "mixed.txt").read_text(encoding="utf-8").startswith("Discharge summary.")
@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from src.services.ingestion.rtf_processor import make_rtf_batches, process_rtf_directory
+from src.services.ingestion.text_decoding import decode_bytes, rtf_declared_codepage
+
+NOTE = r"{\rtf1\ansi\ansicpg1252{\fonttbl\f0\fswiss Helvetica;}\f0\pard Progress note: patient stable.\par}"
+
+
+def test_decode_bytes_detection():
+    """Tests the ASCII fast path, strict-before-permissive order and RTF code pages."""
+    assert decode_bytes(b"ID\tNAME\n", "a.tsv", ["utf-8"]) == ("ID\tNAME\n", "ascii")
+    assert decode_bytes("café".encode("utf-8"), "b.tsv", ["utf-8", "cp1252"]) == ("café", "utf-8")
+    assert decode_bytes("café “note”".encode("cp1252"), "c.tsv", ["utf-8", "cp1252"])[1] == "cp1252"
+    assert decode_bytes(b"\x81", "d.tsv", ["utf-8"]) == (None, None)
+
+    assert rtf_declared_codepage(rb"{\rtf1\ansi\ansicpg1251 text}") == "cp1251"
+    assert rtf_declared_codepage(rb"{\rtf1\ansi\ansicpg99999 text}") is None
+    assert rtf_declared_codepage(rb"{\rtf1\ansi text}") is None
+
+
+def test_make_rtf_batches():
+    """Tests that large files run alone and small files are grouped, largest first."""
+    sizes = {"big.rtf": 300, "a.rtf": 40, "b.rtf": 60, "c.rtf": 50, "d.rtf": 10}
+    pending = [(Path(name), {"size": size, "mtime_ns": 0}) for name, size in sizes.items()]
+
+    batches = make_rtf_batches(pending, batch_bytes=100, max_files=2)
+
+    assert [[path.name for path, _ in batch] for batch in batches] == [["big.rtf"], ["b.rtf"], ["c.rtf", "a.rtf"], ["d.rtf"]]
+
+
+def test_process_rtf_directory_statistics(tmp_path: Path):
+    """Tests batched conversion on a pool and the structured statistics."""
+    notes = tmp_path / "Rich Text"
+    notes.mkdir()
+    for n in range(6):
+        (notes / f"note{n}.rtf").write_text(NOTE, encoding="ascii")
+    (notes / "accent.RTF").write_bytes(r"{\rtf1\ansi\ansicpg1252 Caf\'e9 ".encode("ascii") + "résumé\\par}".encode("cp1252"))
+    (notes / "empty.rtf").write_bytes(b"")
+
+    result = process_rtf_directory(notes, tmp_path / "out", max_workers=2, batch_bytes=200)
+
+    assert result["counts"] == {"files": 8, "processed": 7, "skipped": 1, "errors": 0, "resumed": 0}
+    assert result["encodings"] == {"ascii": 7, "cp1252": 1}
+    assert result["failures"] == []
+    assert result["batches"] == 4
+    assert result["bytes"] == sum(path.stat().st_size for path in notes.iterdir())
+    assert len(result["slowest"]) == 8
+    assert (tmp_path / "out" / "accent.txt").read_text(encoding="utf-8") == "Café résumé"
+    assert (tmp_path / "out" / "note5.txt").read_text(encoding="utf-8") == "Progress note: patient stable."
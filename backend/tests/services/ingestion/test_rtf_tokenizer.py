@@ -0,0 +1,42 @@
+import pytest
+from striprtf.striprtf import rtf_to_text
+
+from src.services.ingestion.rtf_tokenizer import iter_rtf_text, rtf_to_plain_text
+
+NOTES = [
+    r"{\rtf1\ansi\ansicpg1252{\fonttbl\f0\fswiss Helvetica;}\f0\pard Progress note: patient stable.\par}",
+    r"{\rtf1\ansi{\colortbl;\red0\green0\blue0;}{\info{\title Visit}}Hello {\b bold} world\par\tab BP\cell 120/80\row}",
+    r"{\rtf1\ansi Caf\'e9 \ldblquote quoted\rdblquote  a\~b {\*\generator Epic;}end\par}",
+]
+
+
+@pytest.mark.parametrize("note", NOTES)
+def test_matches_striprtf(note):
+    """Tests that the tokenizer and striprtf produce the same text for ordinary notes."""
+    assert rtf_to_plain_text(note) == rtf_to_text(note, errors="ignore")
+
+
+def test_skips_destinations_and_binary_data():
+    """Tests that pictures, objects and \\bin data are skipped, including braces inside them."""
+    picture = "89504e47" * 5000
+    note = (
+        r"{\rtf1\ansi Before {\pict\pngblip " + picture + r"}"
+        r"{\object{\*\objdata 0105}{\result embedded}} {\pict\bin5 {}\{}} after\par}"
+    )
+    assert rtf_to_plain_text(note) == "Before   after\n"
+
+
+def test_unicode_and_codepage_escapes():
+    """Tests \\uN with \\ucN fallbacks, surrogate pairs and double-byte \\'hh runs."""
+    assert rtf_to_plain_text("{\\rtf1\\ansi \\u8364?5 and {\\uc2\\u233\\'65\\'65}x}") == "\u20ac5 and \u00e9x"
+    assert rtf_to_plain_text(r"{\rtf1\ansi \u-10179?\u-8704? ok}") == "\U0001F600 ok"
+    assert rtf_to_plain_text(r"{\rtf1\ansi\ansicpg932 \'82\'a0 jp}") == "あ jp"
+    assert rtf_to_plain_text(r"{\rtf1\ansi \'e9}", encoding="latin-1") == "é"
+
+
+def test_emits_text_incrementally():
+    """Tests that long notes are yielded in several chunks."""
+    note = "{\\rtf1\\ansi " + "line\\par " * 5000 + "}"
+    chunks = list(iter_rtf_text(note))
+    assert len(chunks) > 1
+    assert "".join(chunks) == "line\n" * 5000
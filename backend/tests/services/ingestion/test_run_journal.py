@@ -0,0 +1,112 @@
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from src.services.ingestion.ehr_parser import run_ehr_parsing
+from src.services.ingestion.ingestion_orchestrator import orchestrate_ingestion, verify_ingestion_output
+from src.services.ingestion.run_journal import (
+    JOURNAL_FILE_NAME,
+    RunJournal,
+    atomic_output_path,
+    atomic_write_text,
+    source_signature,
+    verify_journal,
+)
+
+
+def test_atomic_writes_leave_no_temp_files(tmp_path: Path):
+    """Tests that atomic writes rename into place and clean up after failures."""
+    target = tmp_path / "out.md"
+    atomic_write_text(target, "# Table")
+    assert target.read_text(encoding="utf-8") == "# Table"
+
+    with pytest.raises(RuntimeError):
+        with atomic_output_path(tmp_path / "table.parquet") as tmp_file:
+            tmp_file.write_bytes(b"partial")
+            raise RuntimeError("writer failed")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["out.md"]
+
+
+def test_run_journal_resume_checks(tmp_path: Path):
+    """Tests that a unit is skipped only if source, config and outputs are unchanged."""
+    source_file = tmp_path / "A.tsv"
+    source_file.write_text("ID\n1\n", encoding="utf-8")
+    output_dir = tmp_path / "out"
+    output_dir.mkdir()
+    output = output_dir / "A.md"
+    output.write_text("# A", encoding="utf-8")
+    source = source_signature(source_file)
+
+    with RunJournal(output_dir, config={"columnar_format": None}) as journal:
+        journal.record("A.tsv", source, "processed", [output])
+        journal.record("B.tsv", {"size": 1, "mtime_ns": 1}, "skipped", [])
+    with open(output_dir / JOURNAL_FILE_NAME, "a", encoding="utf-8") as f:
+        f.write('{"v": 1, "unit": "C.tsv", "sour')  # torn line from a crash mid-append
+    (output_dir / ".A.md.abc123.tmp").write_text("partial", encoding="utf-8")
+
+    with RunJournal(output_dir, config={"columnar_format": None}, resume=True) as journal:
+        assert journal.completed_result("A.tsv", source) == "processed"
+        assert journal.completed_result("B.tsv", {"size": 2, "mtime_ns": 1}) is None
+        assert journal.completed_result("C.tsv", source) is None
+    assert not (output_dir / ".A.md.abc123.tmp").exists()
+
+    with RunJournal(output_dir, config={"columnar_format": "parquet"}, resume=True) as journal:
+        assert journal.completed_result("A.tsv", source) is None
+
+    output.write_text("#", encoding="utf-8")
+    report = verify_journal(output_dir)
+    assert (report["verified"], report["truncated"], report["failed_units"]) == (1, 1, ["A.tsv"])
+    with RunJournal(output_dir, config={"columnar_format": None}, resume=True) as journal:
+        assert journal.completed_result("A.tsv", source) is None
+
+    with RunJournal(output_dir, config={"columnar_format": None}):  # A fresh run starts a new journal
+        pass
+    assert verify_journal(output_dir)["entries"] == 0
+
+
+def test_run_ehr_parsing_resume(tmp_path: Path):
+    """Tests that a resumed run redoes only files whose outputs are missing or truncated."""
+    input_dir = tmp_path / "EHITables"
+    input_dir.mkdir()
+    for name in ("A", "B", "C"):
+        (input_dir / f"{name}.tsv").write_text("ID\tVALUE\n1\tx\n", encoding="utf-8")
+    output_dir = tmp_path / "out"
+
+    first = run_ehr_parsing(str(input_dir), str(output_dir))
+    assert (first["processed"], first["resumed"]) == (3, 0)
+
+    expected = (output_dir / "B.md").read_text(encoding="utf-8")
+    (output_dir / "B.md").write_text(expected[:10], encoding="utf-8")  # Simulate a truncated output
+    (output_dir / "C.md").unlink()
+
+    resumed = run_ehr_parsing(str(input_dir), str(output_dir), resume=True)
+
+    assert (resumed["processed"], resumed["resumed"], resumed["files_done"], resumed["rows"]) == (3, 1, 3, 3)
+    assert (output_dir / "B.md").read_text(encoding="utf-8") == expected
+    assert (output_dir / "C.md").is_file()
+    assert verify_journal(output_dir)["verified"] == 3
+
+
+def test_orchestrate_archive_resume_and_verify(tmp_path: Path):
+    """Tests that a resumed archive run skips completed members and the verification pass."""
+    zip_path = tmp_path / "export.zip"
+    with zipfile.ZipFile(zip_path, "w") as zf:
+        zf.writestr("Requested Record/EHITables/A.tsv", "ID\n1\n")
+        zf.writestr("Requested Record/EHITables/B.tsv", "ID\n2\n")
+        zf.writestr("Requested Record/Rich Text/note.rtf", r"{\rtf1\ansi Note.\par}")
+    output = tmp_path / "out"
+
+    orchestrate_ingestion(zip_path, output, max_workers=1)
+    (output / "EHITables_Markdown" / "B.md").write_text("", encoding="utf-8")
+
+    reports = verify_ingestion_output(output)
+    assert reports["ehi_tables"]["failed_units"] == ["Requested Record/EHITables/B.tsv"]
+    assert reports["rich_text"]["verified"] == 1
+
+    summary = orchestrate_ingestion(zip_path, output, max_workers=1, resume=True)
+
+    assert summary["stages"]["ehi_tables"]["counts"]["resumed"] == 1
+    assert summary["stages"]["ehi_tables"]["counts"]["processed"] == 2
+    assert summary["stages"]["rich_text"]["counts"]["resumed"] == 1
+    assert not any(report["failed_units"] for report in verify_ingestion_output(output).values())
@@ -0,0 +1,187 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import llm_cache, llm_service
+from src.services.batch_summarization import (
+    STATE_FILE_NAME,
+    LocalBatchBackend,
+    OpenAIBatchBackend,
+    collect_pending_documents,
+    run_batch_summarization,
+    split_batches,
+    summary_file_writer,
+)
+from src.services.llm_cache import LLMResponseCache
+
+NOTE = "Progress note. Patient stable on lisinopril, follow up in two weeks. "
+
+
+@pytest.fixture(autouse=True)
+def response_cache(tmp_path, monkeypatch):
+    """A fresh response cache per test, so no test reads or writes the shared one."""
+    cache = LLMResponseCache(tmp_path / "llm_cache.sqlite3", key=b"k" * 32)
+    monkeypatch.setattr(llm_cache, "_llm_cache", cache)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def export(tmp_path):
+    """An ingestion output directory with three notes and an empty one."""
+    root = tmp_path / "output"
+    (root / "RichText_Text").mkdir(parents=True)
+    (root / "Media_Text").mkdir()
+    for name, text in [("a.txt", NOTE), ("b.txt", NOTE * 2), ("empty.txt", "  ")]:
+        (root / "RichText_Text" / name).write_text(text)
+    (root / "Media_Text" / "scan.txt").write_text(NOTE * 3)
+    return root
+
+
+def test_local_batches_write_cache_and_mark_done(export):
+    """Tests that pending notes are summarized in batches, written, cached and then no longer pending."""
+    calls = []
+
+    async def summarize(model_id, text):
+        calls.append(text)
+        if text.count("Progress note.") == 2:
+            raise RuntimeError("provider error")
+        return f"Summary of {len(text)} chars "
+
+    documents = collect_pending_documents(export)
+    assert [(document["stage"], document["name"]) for document in documents] == [
+        ("rich_text", "a.txt"), ("rich_text", "b.txt"), ("media", "scan.txt"),
+    ]
+    assert all(len(document["custom_id"]) <= 64 for document in documents)
+
+    result = asyncio.run(run_batch_summarization(
+        documents, "anthropic", "model", backend=LocalBatchBackend(summarize=summarize),
+        write_summaries=summary_file_writer(export), max_requests=2, poll_seconds=0.01,
+    ))
+
+    assert (result["batches"], result["submitted"], result["summarized"], result["failed"]) == (2, 3, 2, 1)
+    assert (export / "Summaries" / "Media_Text" / "scan.txt").read_text() == f"Summary of {len((NOTE * 3).strip())} chars"
+    assert [document["name"] for document in collect_pending_documents(export)] == ["b.txt"]
+
+    # Summaries are cached under the interactive text summary key
+    summary = asyncio.run(llm_service.summarize_text_with_llm("anthropic", "model", NOTE.strip()))
+    assert summary == f"Summary of {len(NOTE.strip())} chars"
+    rerun = asyncio.run(run_batch_summarization(
+        documents, "anthropic", "model", backend=LocalBatchBackend(summarize=summarize), poll_seconds=0.01,
+    ))
+    assert (rerun["cached"], rerun["submitted"], len(calls)) == (2, 1, 4)
+
+
+async def _length_summary(model_id, text):
+    return f"S{len(text)}"
+
+
+class FakeRemoteBackend(LocalBatchBackend):
+    """A remote-like backend, which also knows a batch submitted by a previous run."""
+
+    name = "fake"
+
+    def __init__(self):
+        super().__init__(summarize=_length_summary)
+        self.submitted, self.polls = [], {}
+
+    async def submit(self, requests):
+        self.submitted.append([request["custom_id"] for request in requests])
+        return await super().submit(requests)
+
+    async def poll(self, batch_id):
+        self.polls[batch_id] = self.polls.get(batch_id, 0) + 1
+        if batch_id == "previous-run":
+            ended = self.polls[batch_id] >= 2
+            return {"ended": ended, "status": "ended" if ended else "in_progress", "done": 0, "total": 1}
+        return await super().poll(batch_id)
+
+    async def results(self, batch_id):
+        if batch_id == "previous-run":
+            return {"written": {"summary": "Written"}, self.resumed: {"summary": "From the previous run"}}
+        return await super().results(batch_id)
+
+
+def test_resume_polls_batches_of_an_interrupted_run(export, monkeypatch):
+    """Tests that batches in the state file are polled instead of resubmitted, and oversized notes are chunked."""
+    documents = collect_pending_documents(export)
+    backend = FakeRemoteBackend()
+    backend.resumed = documents[0]["custom_id"]
+    state_path = export / "Summaries" / STATE_FILE_NAME
+    state_path.parent.mkdir()
+    state_path.write_text(json.dumps({
+        "provider": "openai", "model_id": "model", "backend": "fake",
+        # "written" was saved before the previous run stopped, so it is no longer pending
+        "batches": [{"id": "previous-run", "custom_ids": ["written", backend.resumed]}],
+    }))
+
+    async def fake_summarize(model_id, text_content=None, image_data=None, max_tokens=1000):
+        return "Chunked summary"
+
+    monkeypatch.setitem(llm_service.PROVIDER_INPUT_BUDGETS, "openai", {"max_input_tokens": 40, "max_images": 1})
+    monkeypatch.setitem(llm_service.PDF_SUMMARIZERS, "openai", fake_summarize)
+
+    result = asyncio.run(run_batch_summarization(
+        documents, "openai", "model", backend=backend, state_path=state_path, poll_seconds=0.01,
+    ))
+
+    assert backend.submitted == [[documents[1]["custom_id"]]] and backend.polls["previous-run"] == 2
+    assert result["summaries"] == {
+        documents[0]["custom_id"]: "From the previous run",
+        documents[1]["custom_id"]: f"S{len((NOTE * 2).strip())}",
+        documents[2]["custom_id"]: "Chunked summary",  # Over the 40-token budget
+    }
+    assert result["oversized"] == 1 and not state_path.exists()
+
+
+def test_openai_backend_uploads_jsonl_and_reads_results():
+    """Tests the OpenAI Batch request file and the parsing of its output and error files."""
+    uploads = []
+    output = [
+        {"custom_id": "doc-1", "response": {"status_code": 200, "body": {"choices": [{"message": {"content": " Fine. "}}]}}},
+        {"custom_id": "doc-2", "response": {"status_code": 400, "body": {"error": "context length"}}},
+    ]
+    errors = [{"custom_id": "doc-3", "response": None, "error": {"code": "expired"}}]
+    batch = SimpleNamespace(
+        id="batch-1", status="completed", output_file_id="out", error_file_id="err",
+        request_counts=SimpleNamespace(completed=1, failed=2, total=3),
+    )
+
+    async def create_file(file, purpose):
+        uploads.append((file, purpose))
+        return SimpleNamespace(id="file-1")
+
+    async def create_batch(input_file_id, endpoint, completion_window):
+        assert (input_file_id, endpoint, completion_window) == ("file-1", "/v1/chat/completions", "24h")
+        return batch
+
+    async def retrieve(batch_id):
+        return batch
+
+    async def content(file_id):
+        lines = output if file_id == "out" else errors
+        return SimpleNamespace(text="\n".join(json.dumps(line) for line in lines))
+
+    client = SimpleNamespace(
+        files=SimpleNamespace(create=create_file, content=content),
+        batches=SimpleNamespace(create=create_batch, retrieve=retrieve),
+    )
+    backend = OpenAIBatchBackend(client)
+
+    async def run():
+        batch_id = await backend.submit([backend.request(f"doc-{n}", "gpt", NOTE) for n in (1, 2, 3)])
+        return batch_id, await backend.poll(batch_id), await backend.results(batch_id)
+
+    batch_id, progress, results = asyncio.run(run())
+    name, data = uploads[0][0]
+    requests = [json.loads(line) for line in data.decode().splitlines()]
+    assert uploads[0][1] == "batch" and [request["custom_id"] for request in requests] == ["doc-1", "doc-2", "doc-3"]
+    assert requests[0]["body"]["messages"][1] == {"role": "user", "content": NOTE}
+    assert (batch_id, progress["ended"], progress["done"]) == ("batch-1", True, 3)
+    assert results["doc-1"] == {"summary": "Fine."}
+    assert "context length" in results["doc-2"]["error"] and "expired" in results["doc-3"]["error"]
+
+    assert [len(part) for part in split_batches(requests, max_requests=2)] == [2, 1]
+    assert [len(part) for part in split_batches(requests, max_bytes=len(json.dumps(requests[0])) + 10)] == [1, 1, 1]
@@ -0,0 +1,59 @@
+import time
+
+from src.services.llm_cache import LLMResponseCache, llm_cache_key
+
+SUMMARY = "Patient stable after appendectomy; follow up in two weeks."
+
+
+def test_llm_cache_key():
+    """Tests that every part of a request changes its key, and only those parts."""
+    key = llm_cache_key(b"%PDF-1.7 ...", "anthropic", "model", "1", {"max_tokens": 1000})
+    assert key == llm_cache_key(b"%PDF-1.7 ...", "anthropic", "model", "1", {"max_tokens": 1000})
+    assert len({
+        key,
+        llm_cache_key(b"%PDF-1.7 ..!", "anthropic", "model", "1", {"max_tokens": 1000}),
+        llm_cache_key(b"%PDF-1.7 ...", "openai", "model", "1", {"max_tokens": 1000}),
+        llm_cache_key(b"%PDF-1.7 ...", "anthropic", "model-2", "1", {"max_tokens": 1000}),
+        llm_cache_key(b"%PDF-1.7 ...", "anthropic", "model", "2", {"max_tokens": 1000}),
+        llm_cache_key(b"%PDF-1.7 ...", "anthropic", "model", "1", {"max_tokens": 600}),
+    }) == 6
+
+
+def test_llm_response_cache_tiers_and_encryption(tmp_path):
+    """Tests memory and disk hits, encryption at rest, persistence and the wrong-key case."""
+    path = tmp_path / "cache.sqlite3"
+    cache = LLMResponseCache(path, key=b"k" * 32, memory_entries=1)
+    cache.set("a", SUMMARY)
+    cache.set("b", "Second summary")
+
+    assert cache.get("b") == "Second summary"  # Memory tier
+    assert cache.get("a") == SUMMARY  # Evicted from memory, decrypted from disk
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"], stats["entries"]) == (1, 1, 1, 2)
+    assert stats["hit_rate"] == round(2 / 3, 4)
+    cache.close()
+
+    assert b"appendectomy" not in path.read_bytes()
+    reopened = LLMResponseCache(path, key=b"k" * 32)
+    assert reopened.get("a") == SUMMARY
+    reopened.close()
+    wrong_key = LLMResponseCache(path, key=b"x" * 32)
+    assert wrong_key.get("a") is None
+    wrong_key.close()
+
+
+def test_llm_response_cache_ttl(tmp_path):
+    """Tests that expired entries are misses and are purged."""
+    cache = LLMResponseCache(tmp_path / "cache.sqlite3", key=b"k" * 32, ttl_seconds=60)
+    cache.set("old", SUMMARY, ttl_seconds=0)
+    cache.set("fresh", SUMMARY)
+    time.sleep(0.01)
+
+    assert cache.get("old") is None
+    assert cache.get("fresh") == SUMMARY
+    cache.set("old-too", SUMMARY, ttl_seconds=0)
+    time.sleep(0.01)
+    assert cache.purge_expired() == 1
+    assert cache.stats()["entries"] == 1
+    cache.close()
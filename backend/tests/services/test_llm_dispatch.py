@@ -0,0 +1,168 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from src.services import llm_dispatch
+from src.services.llm_dispatch import (
+    LLMPriority,
+    PriorityGate,
+    TokenBucket,
+    configure_provider_limits,
+    dispatch_llm_call,
+    dispatch_llm_stream,
+    dispatch_stats,
+    http_status_for_error,
+    llm_priority,
+    retry_after_seconds,
+)
+
+
+class FakeAPIError(Exception):
+    """Shaped like the OpenAI/Anthropic status errors: status_code and response headers."""
+
+    def __init__(self, status_code, headers=None):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+        self.response = SimpleNamespace(headers=headers or {})
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """A test provider with its own limits and dispatcher."""
+    monkeypatch.setattr(llm_dispatch, "BACKOFF_BASE_SECONDS", 0.01)
+    configure_provider_limits(
+        "test", max_concurrency=4, model_concurrency=2, requests_per_minute=6000, tokens_per_minute=1_000_000
+    )
+    yield "test"
+    llm_dispatch.PROVIDER_LIMITS.pop("test", None)
+    llm_dispatch._dispatchers.pop("test", None)
+
+
+def test_priority_gate_admits_interactive_first():
+    """Tests that a waiting interactive request overtakes earlier background requests."""
+    order = []
+
+    async def run():
+        gate = PriorityGate(1)
+        await gate.acquire(LLMPriority.INTERACTIVE)
+
+        async def waiter(name, priority):
+            await gate.acquire(priority)
+            order.append(name)
+            gate.release()
+
+        tasks = [asyncio.create_task(waiter("batch-1", LLMPriority.BACKGROUND))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(waiter("batch-2", LLMPriority.BACKGROUND)))
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(waiter("upload", LLMPriority.INTERACTIVE)))
+        await asyncio.sleep(0)
+        gate.release()
+        await asyncio.gather(*tasks)
+        assert gate.active == 0
+
+    asyncio.run(run())
+    assert order == ["upload", "batch-1", "batch-2"]
+
+
+def test_token_bucket_waits_for_refill():
+    """Tests that a drained bucket delays the next acquisition by the refill time."""
+    async def run():
+        bucket = TokenBucket(per_minute=600)  # 10 per second
+        assert await bucket.acquire(600) == 0.0
+        start = time.monotonic()
+        await bucket.acquire(2)
+        return time.monotonic() - start
+
+    assert 0.15 <= asyncio.run(run()) < 1.0
+
+
+def test_dispatch_limits_model_concurrency(provider):
+    """Tests that concurrent calls to one model stay under its limit."""
+    active, peak = [0], [0]
+
+    async def call():
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01)
+        active[0] -= 1
+        return "ok"
+
+    async def run():
+        return await asyncio.gather(*(dispatch_llm_call(provider, "model", call) for _ in range(6)))
+
+    assert asyncio.run(run()) == ["ok"] * 6
+    assert peak[0] == 2
+
+
+def test_dispatch_retries_and_honours_retry_after(provider):
+    """Tests retries of 429/503 with Retry-After, and that other errors are not retried."""
+    errors = [FakeAPIError(429, {"retry-after": "0.1"}), FakeAPIError(503)]
+
+    async def flaky():
+        if errors:
+            raise errors.pop(0)
+        return "summary"
+
+    start = time.monotonic()
+    with llm_priority(LLMPriority.BACKGROUND):
+        assert asyncio.run(dispatch_llm_call(provider, "model", flaky)) == "summary"
+    assert time.monotonic() - start >= 0.1
+    stats = dispatch_stats()[provider]
+    assert (stats["calls"], stats["retries"], stats["rate_limited"], stats["failures"]) == (3, 2, 1, 0)
+
+    async def bad_request():
+        raise FakeAPIError(400)
+
+    with pytest.raises(FakeAPIError):
+        asyncio.run(dispatch_llm_call(provider, "model", bad_request))
+    assert dispatch_stats()[provider]["calls"] == 4
+
+    async def always_limited():
+        raise FakeAPIError(429, {"retry-after-ms": "1"})
+
+    with pytest.raises(FakeAPIError):
+        asyncio.run(dispatch_llm_call(provider, "model", always_limited, max_retries=2))
+    assert dispatch_stats()[provider]["calls"] == 7
+
+
+def test_dispatch_stream_retries_only_before_the_first_chunk(provider):
+    """Tests that a stream failing to start is retried, and one failing midway is not."""
+    failures = [FakeAPIError(529)]
+
+    def open_stream(fail_midway=False):
+        async def chunks():
+            if failures:
+                raise failures.pop(0)
+            yield "Patient "
+            if fail_midway:
+                raise FakeAPIError(503)
+            yield "stable."
+        return chunks()
+
+    async def collect(**kwargs):
+        return [chunk async for chunk in dispatch_llm_stream(provider, "model", lambda: open_stream(**kwargs))]
+
+    assert asyncio.run(collect()) == ["Patient ", "stable."]
+    assert dispatch_stats()[provider]["retries"] == 1
+
+    with pytest.raises(FakeAPIError):
+        asyncio.run(collect(fail_midway=True))
+    assert dispatch_stats()[provider]["retries"] == 1
+    assert dispatch_stats()[provider]["active"] == 0
+
+
+def test_error_mapping():
+    """Tests Retry-After parsing and the HTTP status reported for provider errors."""
+    assert retry_after_seconds(FakeAPIError(429, {"retry-after": "7"})) == 7.0
+    assert retry_after_seconds(FakeAPIError(429, {"retry-after": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert retry_after_seconds(FakeAPIError(429, {"retry-after": "3600"})) == llm_dispatch.MAX_RETRY_AFTER_SECONDS
+    assert retry_after_seconds(ValueError("no response")) is None
+
+    assert http_status_for_error(FakeAPIError(429)) == 429
+    assert http_status_for_error(FakeAPIError(529)) == 503
+    assert http_status_for_error(FakeAPIError(500)) == 502
+    assert http_status_for_error(FakeAPIError(400)) == 500
+    assert http_status_for_error(ConnectionError()) == 503
@@ -0,0 +1,137 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from src.services import llm_cache, llm_dispatch, llm_failover, local_llm
+from src.services.llm_cache import LLMResponseCache
+from src.services.llm_dispatch import LLMPriority, llm_priority
+from src.services.llm_failover import (
+    ModelHealth,
+    call_with_failover,
+    configure_failover,
+    failover_candidates,
+    get_health,
+    hedge_delay,
+)
+from src.services.llm_service import stream_pdf_summary, summarize_text_with_llm, text_summary_cache_key
+from src.services.local_llm import configure_local_profile
+
+NOTE = "Patient seen for hypertension. BP 128/82. Continue lisinopril."
+
+
+@pytest.fixture(autouse=True)
+def isolated(tmp_path, monkeypatch):
+    """A fresh response cache, failover table, health history and local models per test."""
+    cache = LLMResponseCache(tmp_path / "llm_cache.sqlite3", key=b"k" * 32)
+    monkeypatch.setattr(llm_cache, "_llm_cache", cache)
+    monkeypatch.setattr(llm_failover, "FAILOVER_MODELS", {})
+    monkeypatch.setattr(llm_failover, "_health", {})
+    monkeypatch.setattr(llm_failover, "HEDGE_DEFAULT_DELAY_SECONDS", 0.05)
+    monkeypatch.setattr(llm_dispatch, "BACKOFF_BASE_SECONDS", 0.001)
+    monkeypatch.setattr(local_llm, "LOCAL_LLM_PROFILES", {})
+    configure_local_profile("fast", latency={"distribution": "fixed", "ms": 10})
+    configure_local_profile("slow", latency={"distribution": "fixed", "ms": 500})
+    configure_local_profile("limited", rate_limit_rate=1.0, retry_after_seconds=0.001)
+    yield
+    cache.close()
+
+
+def test_slow_request_is_hedged_and_loser_cancelled():
+    """Tests that an interactive request is hedged after the delay, while background work waits."""
+    configure_failover("local:slow", ["local:fast"])
+
+    start = time.monotonic()
+    summary = asyncio.run(summarize_text_with_llm("local", "slow", NOTE))
+    assert summary.startswith("Summary by fast ") and time.monotonic() - start < 0.4
+    assert (get_health("local", "slow").stats()["requests"], get_health("local", "fast").stats()["requests"]) == (0, 1)
+    # The backup's answer is not cached as the requested model's
+    assert llm_cache.get_llm_cache().get(text_summary_cache_key("local", "slow", NOTE)) is None
+
+    async def background():
+        with llm_priority(LLMPriority.BACKGROUND):
+            return await summarize_text_with_llm("local", "slow", NOTE + " Addendum.")
+
+    assert asyncio.run(background()).startswith("Summary by slow ")
+
+
+def test_failover_on_rate_limits_and_health_ordering():
+    """Tests failover on persistent 429s, that health moves the unhealthy model last, and no failover on 400."""
+    configure_failover("local", ["local:fast"])
+
+    for n in range(3):
+        summary = asyncio.run(summarize_text_with_llm("local", "limited", f"{NOTE} Visit {n}."))
+        assert summary.startswith("Summary by fast ")
+    # After its first failure, the unhealthy model is only tried after the backup
+    assert get_health("local", "limited").stats()["requests"] == 1
+    assert failover_candidates("local", "limited") == [("local", "fast"), ("local", "limited")]
+    assert failover_candidates("local", "limited", fits=lambda provider: False) == [("local", "limited")]
+
+    calls = []
+
+    async def bad_request(provider, model_id):
+        calls.append(model_id)
+        raise HTTPException(status_code=400, detail="Request blocked")
+
+    with pytest.raises(HTTPException):
+        asyncio.run(call_with_failover("local", "slow", bad_request))
+    assert calls == ["slow"]
+
+
+def test_failover_on_upstream_errors_only():
+    """Tests that a provider's server error fails over, while a 500 (a bug here) is raised."""
+    configure_failover("local:slow", ["local:fast"])
+    calls = []
+
+    async def failing(status_code):
+        async def call(provider, model_id):
+            calls.append(model_id)
+            if model_id == "slow":
+                raise HTTPException(status_code=status_code, detail="error")
+            return "ok"
+        return await call_with_failover("local", "slow", call)
+
+    with llm_priority(LLMPriority.BACKGROUND):
+        with pytest.raises(HTTPException) as exc_info:
+            asyncio.run(failing(500))
+        assert exc_info.value.status_code == 500
+        assert asyncio.run(failing(502)) == ("ok", ("local", "fast"))
+    assert calls == ["slow", "slow", "fast"]
+
+
+def test_stream_fails_over_before_the_first_chunk():
+    """Tests that a streamed summary whose model fails to start is served by the backup."""
+    import fitz
+
+    configure_failover("local:limited", ["local:fast"])
+    doc = fitz.open()
+    doc.new_page().insert_textbox(fitz.Rect(36, 36, 576, 806), NOTE * 10, fontsize=8)
+    pdf_content = doc.tobytes()
+
+    async def stream():
+        return [event async for event in stream_pdf_summary("local", "limited", pdf_content, "note.pdf")]
+
+    events = asyncio.run(stream())
+    assert events[-1]["event"] == "end" and events[-1]["summary"].startswith("Summary by fast ")
+    assert (events[-1]["generated_by"], events[-1]["models"]) == ("local:fast", ["local:fast"])
+    # Streams record outcomes only, so they do not move the hedge delay of regular calls
+    assert get_health("local", "fast").stats()["requests"] == 1 and get_health("local", "fast").latencies() == []
+    assert [event["event"] for event in asyncio.run(stream())].count("delta") > 1  # Not cached, streamed again
+
+
+def test_hedge_delay_follows_the_latency_percentile(monkeypatch):
+    """Tests the hedge delay (default, then p95 within bounds) and the health score."""
+    assert hedge_delay("local", "new") == 0.05
+    health = get_health("local", "new")
+    for n in range(1, 21):
+        health.record(n / 10, ok=True)
+    assert hedge_delay("local", "new") == 1.9
+    monkeypatch.setattr(llm_failover, "HEDGE_MAX_DELAY_SECONDS", 1.0)
+    assert hedge_delay("local", "new") == 1.0
+
+    flaky = ModelHealth()
+    assert flaky.score() == 1.0
+    flaky.record(10.0, ok=True)
+    flaky.record(1.0, ok=False)
+    assert flaky.score() == pytest.approx(0.25)
@@ -0,0 +1,259 @@
+import asyncio
+import io
+
+import fitz
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from src.services import llm_cache, llm_service
+from src.services.llm_cache import LLMResponseCache
+from src.services.llm_service import (
+    plan_pdf_request,
+    split_text_into_chunks,
+    stream_pdf_summary,
+    summarize_chunks,
+    summarize_pdf_auto,
+)
+
+PAGE_TEXT = "Discharge summary. Patient stable, follow up in two weeks. " * 12
+
+
+@pytest.fixture(autouse=True)
+def response_cache(tmp_path, monkeypatch):
+    """A fresh response cache per test, so no test reads or writes the shared one."""
+    cache = LLMResponseCache(tmp_path / "llm_cache.sqlite3", key=b"k" * 32)
+    monkeypatch.setattr(llm_cache, "_llm_cache", cache)
+    yield cache
+    cache.close()
+
+
+def _pdf_bytes(pages, scanned=()) -> bytes:
+    """Builds a PDF with one page per text; pages listed in `scanned` get a full-page image."""
+    doc = fitz.open()
+    for number, text in enumerate(pages):
+        page = doc.new_page()
+        if number in scanned:
+            page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), False))
+        if text:
+            page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def test_plan_pdf_request_routes():
+    """Tests that text pages are sent as text and only scanned pages as images."""
+    text_plan = plan_pdf_request(_pdf_bytes([PAGE_TEXT, PAGE_TEXT]), "anthropic")
+    assert (text_plan["route"], text_plan["images"], text_plan["text_pages"]) == ("text", [], [0, 1])
+    assert text_plan["text"].count("Discharge summary.") == 24
+
+    mixed = plan_pdf_request(_pdf_bytes([PAGE_TEXT, "", PAGE_TEXT], scanned=(1,)), "openai")
+    assert mixed["route"] == "mixed"
+    assert [image["page"] for image in mixed["images"]] == [1]
+    assert mixed["images"][0]["media_type"] == "image/jpeg"
+    assert mixed["text"].startswith("Pages 2 of this document are attached as images.\n\n[Page 1]\n")
+
+    vision = plan_pdf_request(_pdf_bytes(["", ""], scanned=(0, 1)), "google")
+    assert (vision["route"], vision["text"], vision["image_pages"]) == ("vision", "", [0, 1])
+    assert vision["estimated_tokens"] == 2 * 258
+
+    with pytest.raises(ValueError):
+        plan_pdf_request(_pdf_bytes(["", ""]), "openai")
+
+
+def test_plan_pdf_request_chunks_over_budget(monkeypatch):
+    """Tests that a document over the provider's budget is planned as text and image chunks."""
+    monkeypatch.setitem(llm_service.PROVIDER_INPUT_BUDGETS, "openai", {"max_input_tokens": 300, "max_images": 1})
+
+    plan = plan_pdf_request(_pdf_bytes([PAGE_TEXT, "", "", PAGE_TEXT], scanned=(1, 2)), "openai")
+
+    assert plan["route"] == "chunked" and plan["images"] == []
+    assert [(chunk["pages"], chunk["image_pages"]) for chunk in plan["chunks"]] == [
+        ([0, 0], []), ([1, 2], [1, 2]), ([3, 3], []),
+    ]
+    assert plan["chunks"][2]["text"].startswith("[End of the previous part, for context]")
+
+
+def _long_note(pages: int):
+    return [(n, f"HOSPITAL COURSE:\nDay {n}. " + PAGE_TEXT + "\n\nMEDICATIONS\n" + PAGE_TEXT) for n in range(pages)]
+
+
+def test_split_text_into_chunks_is_local_to_edits():
+    """Tests chunk sizes and that editing one page leaves the chunks away from it unchanged."""
+    page_texts = _long_note(30)
+    chunks = split_text_into_chunks(page_texts, target_tokens=1000, overlap_tokens=50)
+
+    assert all(len(chunk["text"]) <= (1000 + 50) * 4 + 100 for chunk in chunks)
+    assert [chunk["pages"][0] for chunk in chunks] == sorted(chunk["pages"][0] for chunk in chunks)
+    assert chunks[0]["pages"][0] == 0 and chunks[-1]["pages"][1] == 29
+
+    edited = list(page_texts)
+    edited[15] = (15, edited[15][1] + " Patient fell on day 15; CT head negative." * 20)
+    edited_chunks = split_text_into_chunks(edited, target_tokens=1000, overlap_tokens=50)
+    changed = [chunk for chunk in edited_chunks if chunk not in chunks]
+    assert 1 <= len(changed) <= 3
+    assert all(chunk["pages"][1] >= 15 for chunk in changed)
+
+
+def test_summarize_chunks_concurrency_reduce_and_cache(monkeypatch):
+    """Tests concurrent chunk summaries under the cap, hierarchical reduction and cache reuse."""
+    active, peak, prompts = [0], [0], []
+
+    async def fake_summarize(model_id, text_content=None, image_data=None, max_tokens=1000):
+        active[0] += 1
+        peak[0] = max(peak[0], active[0])
+        await asyncio.sleep(0.01)
+        active[0] -= 1
+        prompts.append(text_content)
+        return f"summary {len(prompts)}"
+
+    monkeypatch.setitem(llm_service.PDF_SUMMARIZERS, "anthropic", fake_summarize)
+    monkeypatch.setattr(llm_service, "REDUCE_FAN_IN", 3)
+    chunks = split_text_into_chunks(_long_note(30), target_tokens=1000, overlap_tokens=50)
+    assert len(chunks) > 9
+
+    result = asyncio.run(summarize_chunks("anthropic", "model", chunks, max_concurrency=2))
+
+    assert peak[0] == 2
+    assert result["levels"] == 3 and result["cached"] == 0
+    reduces = [len(chunks)]
+    while reduces[-1] > 1:
+        reduces.append(-(-reduces[-1] // 3))
+    assert result["requests"] == sum(reduces)  # Chunk summaries, then each reduce level
+    assert prompts[-1].startswith("The following are summaries") and result["summary"] == f"summary {len(prompts)}"
+
+    rerun = asyncio.run(summarize_chunks("anthropic", "model", chunks))
+    assert (rerun["requests"], rerun["summary"]) == (0, result["summary"])
+
+    edited = chunks[:4] + [dict(chunks[4], text=chunks[4]["text"] + " Addendum.")] + chunks[5:]
+    partial = asyncio.run(summarize_chunks("anthropic", "model", edited))
+    assert partial["requests"] == 1 + partial["levels"]  # The edited chunk and one reduce per level
+
+
+def test_summarize_pdf_auto(monkeypatch):
+    """Tests that the uploaded PDF is routed to the provider with its text and scanned pages."""
+    calls = []
+
+    async def fake_summarize(model_id, text_content=None, image_data=None):
+        calls.append((model_id, text_content, image_data))
+        return "Summary"
+
+    monkeypatch.setitem(llm_service.PDF_SUMMARIZERS, "anthropic", fake_summarize)
+    upload = UploadFile(io.BytesIO(_pdf_bytes([PAGE_TEXT, ""], scanned=(1,))), filename="note.pdf")
+
+    result = asyncio.run(summarize_pdf_auto("anthropic", "model", upload))
+    assert result == {"summary": "Summary", "generated_by": "anthropic:model", "models": ["anthropic:model"]}
+    model_id, text, images = calls[0]
+    assert model_id == "model" and "[Page 1]" in text
+    assert [(image["page"], image["media_type"]) for image in images] == [(1, "image/jpeg")]
+
+    # The same PDF and model again: answered from the response cache
+    assert asyncio.run(summarize_pdf_auto("anthropic", "model", upload))["summary"] == "Summary"
+    assert len(calls) == 1
+    asyncio.run(summarize_pdf_auto("anthropic", "other-model", upload))
+    assert len(calls) == 2
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(summarize_pdf_auto("anthropic", "model", UploadFile(io.BytesIO(b"not a pdf"), filename="x.pdf")))
+    assert error.value.status_code == 400
+    with pytest.raises(ValueError):
+        asyncio.run(summarize_pdf_auto("other", "model", upload))
+
+
+def test_stream_pdf_summary(monkeypatch):
+    """Tests the streamed events, and that the streamed summary is cached like a regular one."""
+    async def fake_stream(model_id, text_content=None, image_data=None, max_tokens=1000):
+        for text in ["Patient ", "stable.", " "]:
+            yield text
+
+    async def collect(pdf_content, provider="openai"):
+        return [event async for event in stream_pdf_summary(provider, "model", pdf_content, "note.pdf")]
+
+    monkeypatch.setitem(llm_service.PDF_STREAMERS, "openai", fake_stream)
+    pdf_content = _pdf_bytes([PAGE_TEXT])
+
+    events = asyncio.run(collect(pdf_content))
+    assert [event["event"] for event in events] == ["start", "delta", "delta", "delta", "end"]
+    assert (events[0]["route"], events[0]["cached"]) == ("text", False)
+    assert events[-1]["summary"] == "Patient stable."
+
+    cached = asyncio.run(collect(pdf_content))
+    assert [(event["event"], event.get("text")) for event in cached] == [
+        ("start", None), ("delta", "Patient stable."), ("end", None),
+    ]
+    assert cached[0]["cached"]
+
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(collect(_pdf_bytes(["", ""])))
+    assert error.value.status_code == 422
+
+
+async def _collect(events):
+    return [event async for event in events]
+
+
+def test_identical_concurrent_requests_share_one_call(monkeypatch):
+    """Tests that concurrent identical requests, streamed or not, share one provider call."""
+    calls, release = [], None
+
+    async def fake_summarize(model_id, text_content=None, image_data=None):
+        calls.append(model_id)
+        await release.wait()
+        return "Summary"
+
+    async def fake_stream(model_id, text_content=None, image_data=None, max_tokens=1000):
+        calls.append(model_id)
+        yield "Summary"
+
+    monkeypatch.setitem(llm_service.PDF_SUMMARIZERS, "anthropic", fake_summarize)
+    monkeypatch.setitem(llm_service.PDF_STREAMERS, "anthropic", fake_stream)
+    pdf_content = _pdf_bytes([PAGE_TEXT])
+
+    async def run():
+        nonlocal release
+        release = asyncio.Event()
+        uploads = [UploadFile(io.BytesIO(pdf_content), filename="note.pdf") for _ in range(3)]
+        tasks = [asyncio.create_task(summarize_pdf_auto("anthropic", "model", upload)) for upload in uploads]
+        await asyncio.sleep(0.1)
+        streamed = asyncio.create_task(_collect(stream_pdf_summary("anthropic", "model", pdf_content, "note.pdf")))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*tasks), await streamed
+
+    results, events = asyncio.run(run())
+    assert [result["summary"] for result in results] == ["Summary"] * 3 and calls == ["model"]
+    assert [(event["event"], event.get("text")) for event in events][1:] == [("delta", "Summary"), ("end", None)]
+    assert llm_service._in_flight == {}
+
+
+def test_in_flight_request_cancelled_only_when_all_callers_leave():
+    """Tests that cancelling one caller keeps the shared request running, and cancelling all stops it."""
+    started, cancelled = [], []
+
+    async def request():
+        started.append(1)
+        try:
+            await asyncio.sleep(0.2)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        return "Summary"
+
+    async def run():
+        first = asyncio.create_task(llm_service._single_flight("key", request))
+        second = asyncio.create_task(llm_service._single_flight("key", request))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == "Summary"
+        assert first.cancelled() and not cancelled
+
+        callers = [asyncio.create_task(llm_service._single_flight("key", request)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+
+    asyncio.run(run())
+    assert (len(started), len(cancelled)) == (2, 1)
+    assert llm_service._in_flight == {}
@@ -0,0 +1,130 @@
+import asyncio
+import io
+import time
+
+import fitz
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from src.services import llm_cache, llm_dispatch, local_llm
+from src.services.batch_summarization import LocalBatchBackend, run_batch_summarization
+from src.services.llm_cache import LLMResponseCache
+from src.services.llm_service import (
+    analyze_image_with_llm,
+    stream_pdf_summary,
+    summarize_pdf_auto,
+    summarize_text_with_llm,
+)
+from src.services.local_llm import configure_local_profile, local_summary, sample_latency
+from src.services.model_registry import get_local_pdf_models
+
+NOTE = "Patient seen for hypertension. BP 128/82. Continue lisinopril. Recheck BMP in two weeks."
+
+
+def _scanned_pdf() -> bytes:
+    """A PDF with a text page and a scanned (image-only) page."""
+    doc = fitz.open()
+    doc.new_page().insert_textbox(fitz.Rect(36, 36, 576, 806), NOTE * 10, fontsize=8)
+    page = doc.new_page()
+    page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), False))
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.fixture(autouse=True)
+def response_cache(tmp_path, monkeypatch):
+    """A fresh response cache per test, so no test reads or writes the shared one."""
+    cache = LLMResponseCache(tmp_path / "llm_cache.sqlite3", key=b"k" * 32)
+    monkeypatch.setattr(llm_cache, "_llm_cache", cache)
+    yield cache
+    cache.close()
+
+
+@pytest.fixture
+def profile(monkeypatch):
+    """A test model of the local provider, with fast retries."""
+    monkeypatch.setattr(llm_dispatch, "BACKOFF_BASE_SECONDS", 0.001)
+    monkeypatch.setattr(local_llm, "_attempts", {})
+    monkeypatch.delitem(llm_dispatch._dispatchers, "local", raising=False)
+    configure_local_profile("local-test")
+    yield "local-test"
+    local_llm.LOCAL_LLM_PROFILES.pop("local-test", None)
+
+
+def test_summaries_are_deterministic_on_every_path(profile):
+    """Tests that the text, PDF, streamed, image and batch paths all work offline and agree."""
+    expected = local_summary(profile, NOTE)
+    assert expected.startswith(f"Summary by {profile} of {len(NOTE)} characters and 0 image(s) [")
+    assert expected.endswith("BP 128/82. Continue lisinopril.")
+    assert asyncio.run(summarize_text_with_llm("local", profile, NOTE)) == expected
+
+    pdf_content = _scanned_pdf()
+    result = asyncio.run(summarize_pdf_auto("local", profile, UploadFile(io.BytesIO(pdf_content), filename="n.pdf")))
+    assert "and 1 image(s)" in result["summary"]
+
+    async def stream():
+        return [event async for event in stream_pdf_summary("local", "other-" + profile, pdf_content, "n.pdf")]
+
+    events = asyncio.run(stream())
+    assert len([event for event in events if event["event"] == "delta"]) > 5
+    assert events[-1]["summary"] == result["summary"].replace(profile, "other-" + profile, 1)
+    assert "1 image(s)" in asyncio.run(analyze_image_with_llm("local", profile, "aGVsbG8="))
+
+    batch = asyncio.run(run_batch_summarization(
+        [{"custom_id": "doc-1", "text": NOTE + " Addendum."}], "local", profile,
+        backend=LocalBatchBackend("local"), poll_seconds=0.01,
+    ))
+    assert batch["summaries"]["doc-1"] == local_summary(profile, NOTE + " Addendum.")
+
+
+def test_latency_and_throughput(profile):
+    """Tests the latency distributions and that output is paced by tokens_per_second."""
+    rng = local_llm.random.Random(1)
+    assert sample_latency({"distribution": "fixed", "ms": 250}, rng) == 0.25
+    uniform = {"distribution": "uniform", "min_ms": 100, "max_ms": 200}
+    assert all(0.1 <= sample_latency(uniform, rng) <= 0.2 for _ in range(20))
+    draws = sorted(sample_latency({"distribution": "lognormal", "median_ms": 100, "sigma": 0.5}, rng) for _ in range(201))
+    assert 0.07 < draws[100] < 0.14
+    with pytest.raises(ValueError):
+        sample_latency({"distribution": "pareto"}, rng)
+
+    configure_local_profile(profile, latency={"distribution": "fixed", "ms": 100}, tokens_per_second=1000)
+    tokens = len(local_summary(profile, NOTE)) // 4
+    start = time.monotonic()
+    asyncio.run(summarize_text_with_llm("local", profile, NOTE))
+    assert 0.1 + tokens / 1000 <= time.monotonic() - start < 1.0
+
+
+def test_injected_errors_are_retried_and_reported(profile):
+    """Tests that injected 429s are retried by dispatch, and timeouts that persist surface as 503."""
+    async def summarize_visits():
+        return await asyncio.gather(*(summarize_text_with_llm("local", profile, f"{NOTE} Visit {n}.") for n in range(20)))
+
+    configure_local_profile(profile, rate_limit_rate=0.25, retry_after_seconds=0.001)
+    summaries = asyncio.run(summarize_visits())
+    assert summaries == [local_summary(profile, f"{NOTE} Visit {n}.") for n in range(20)]
+    stats = llm_dispatch.dispatch_stats()["local"]
+    assert stats["rate_limited"] > 0 and stats["failures"] == 0
+
+    # The same inputs make the same draws in a new run
+    local_llm._attempts.clear()
+    llm_dispatch._dispatchers.pop("local", None)
+    llm_cache._llm_cache.clear()
+    asyncio.run(summarize_visits())
+    assert llm_dispatch.dispatch_stats()["local"]["rate_limited"] == stats["rate_limited"]
+
+    configure_local_profile(profile, rate_limit_rate=0.0, timeout_rate=1.0, timeout_seconds=0.01)
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(summarize_text_with_llm("local", profile, "Another note."))
+    assert error.value.status_code == 503
+
+
+def test_local_models_are_listed_only_when_enabled(monkeypatch):
+    """Tests that model_registry offers the local models only when LOCAL_LLM_ENABLED is set."""
+    from src.services import model_registry
+
+    monkeypatch.setattr(model_registry, "LOCAL_LLM_ENABLED", False)
+    assert get_local_pdf_models() == []
+    monkeypatch.setattr(model_registry, "LOCAL_LLM_ENABLED", True)
+    assert [model["id"] for model in get_local_pdf_models()][:3] == ["local-instant", "local-realistic", "local-flaky"]
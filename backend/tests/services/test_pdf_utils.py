@@ -0,0 +1,114 @@
+import base64
+import io
+
+import fitz
+import pytest
+from PIL import Image
+
+from src.services import pdf_utils
+from src.services.pdf_utils import (
+    analyze_pdf_content,
+    classify_pdf_pages,
+    convert_pdf_to_images,
+    extract_pdf_page_texts,
+    iter_pdf_page_images,
+)
+
+PAGE_TEXT = "Discharge summary. Patient stable, follow up in two weeks. " * 12
+
+
+def _pdf_bytes(pages, scanned=()) -> bytes:
+    """Builds a PDF with one page per text; pages listed in `scanned` get a full-page image."""
+    doc = fitz.open()
+    for number, text in enumerate(pages):
+        page = doc.new_page()
+        if number in scanned:
+            page.insert_image(page.rect, pixmap=fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 40, 40), False))
+        if text:
+            page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+@pytest.mark.parametrize("backend", ["pymupdf", "pypdf2"])
+def test_analyze_pdf_content_backends(backend):
+    """Tests that both backends classify text and image PDFs the same way."""
+    pdf_type, text = analyze_pdf_content(_pdf_bytes([PAGE_TEXT, PAGE_TEXT]), backend=backend)
+    assert pdf_type == "text"
+    assert text.count("Discharge summary.") == 24
+
+    assert analyze_pdf_content(_pdf_bytes(["", "", "Page 3"]), backend=backend) == ("image", None)
+
+
+def test_extract_pdf_page_texts_falls_back_to_pypdf2(monkeypatch):
+    """Tests that a PDF the selected backend cannot open is retried with PyPDF2."""
+    def failing_backend(pdf_content):
+        raise RuntimeError("cannot open")
+
+    monkeypatch.setitem(pdf_utils.PDF_TEXT_BACKENDS, "failing", failing_backend)
+
+    pages = extract_pdf_page_texts(_pdf_bytes([PAGE_TEXT, ""]), backend="failing")
+
+    assert len(pages) == 2 and "Discharge summary." in pages[0] and pages[1] == ""
+    with pytest.raises(ValueError):
+        extract_pdf_page_texts(b"%PDF", backend="unknown")
+    assert analyze_pdf_content(b"not a pdf") == ("image", None)
+
+
+def test_classify_pdf_pages_mixed_document():
+    """Tests per-page classification of a document with text, scanned and blank pages."""
+    pdf = _pdf_bytes([PAGE_TEXT, "Scanned page 2", "", PAGE_TEXT], scanned={1, 3})
+
+    pages = classify_pdf_pages(pdf, include_text=True)
+
+    assert [page["type"] for page in pages] == ["text", "image", "empty", "text"]
+    assert pages[1]["image_coverage"] == 1.0 and pages[1]["has_fonts"]
+    assert not pages[2]["has_fonts"] and pages[2]["text"] == ""
+    assert "text" not in classify_pdf_pages(pdf)[0]
+
+
+def test_analyze_pdf_content_exits_early_on_scans(monkeypatch):
+    """Tests that a scanned PDF is classified from a page sample without full extraction."""
+    pdf = _pdf_bytes([f"Scan {n}" for n in range(20)], scanned=set(range(20)))
+    calls = []
+    original_get_text = fitz.Page.get_text
+    monkeypatch.setattr(fitz.Page, "get_text", lambda page, *args, **kwargs: calls.append(page.number) or original_get_text(page, *args, **kwargs))
+
+    assert analyze_pdf_content(pdf) == ("image", None)
+    assert calls == [0, 5, 10, 14, 19]
+
+    calls.clear()
+    pdf_type, text = analyze_pdf_content(_pdf_bytes([PAGE_TEXT] * 8))
+    assert pdf_type == "text" and text.count("Discharge summary.") == 96
+    assert sorted(calls) == list(range(8))
+
+
+def test_iter_pdf_page_images_streams_within_budget():
+    """Tests that pages render lazily, in order, within the pixel budget and chosen format."""
+    pdf = _pdf_bytes([PAGE_TEXT, "", PAGE_TEXT], scanned={1})
+
+    images = iter_pdf_page_images(pdf, pixel_budget=200_000, image_format="webp")
+    first = next(images)
+    assert (first["page"], first["media_type"]) == (0, "image/webp")
+    assert first["width"] * first["height"] <= 200_000
+    assert Image.open(io.BytesIO(first["data"])).format == "WEBP"
+    assert [image["page"] for image in images] == [1, 2]
+
+    inline = list(iter_pdf_page_images(pdf, provider="openai", as_base64=True, pages=[2, 0]))
+    threaded = list(iter_pdf_page_images(pdf, provider="openai", as_base64=True, pages=[2, 0], max_workers=2))
+    assert [image["page"] for image in threaded] == [2, 0]
+    assert [image["data"] for image in threaded] == [image["data"] for image in inline]
+    assert Image.open(io.BytesIO(base64.b64decode(inline[0]["data"]))).format == "JPEG"
+
+    with pytest.raises(ValueError):
+        next(iter_pdf_page_images(pdf, image_format="gif"))
+
+
+def test_convert_pdf_to_images_returns_png_base64():
+    """Tests the list-returning wrapper kept for existing callers."""
+    images = convert_pdf_to_images(_pdf_bytes([PAGE_TEXT, ""]))
+
+    assert len(images) == 2
+    assert Image.open(io.BytesIO(base64.b64decode(images[0]))).format == "PNG"
+    assert convert_pdf_to_images(b"not a pdf") == []